@@ -0,0 +1,320 @@
+# app/analise.py
+"""Histórico de compras em colunas NumPy, para filtros e estatísticas vetorizados
+
+As compras são lidas do banco uma vez e guardadas coluna a coluna, em
+ordem de (dia, id). Compras novas entram por sincronizar(), que lê só as
+linhas com id maior que o último carregado, e são encaixadas na posição
+da sua data. Filtros, agrupamento por supermercado e médias móveis são
+operações NumPy sobre essas colunas, sem laços em Python por compra.
+
+Memória por compra (bytes):
+
+    id               int32     4
+    produto_id       int32     4
+    supermercado_id  int32     4
+    dia              int32     4   dia juliano (app/datas.py)
+    preco_unitario   float64   8   NaN quando a quantidade não é positiva
+    promocao         bool      1
+    quem_pagou       uint16    2   código no dicionário quem_pagou_valores
+                              --
+                              27
+
+As colunas são alocadas com folga (CRESCIMENTO), para que acrescentar não
+realoque a cada compra: no pior caso, logo após crescer, são ~40 bytes.
+Nomes de produtos e supermercados não são copiados: ficam no catálogo.
+"""
+import threading
+
+import numpy as np
+
+COLUNAS = (
+    ('id', np.int32),
+    ('produto_id', np.int32),
+    ('supermercado_id', np.int32),
+    ('dia', np.int32),
+    ('preco_unitario', np.float64),
+    ('promocao', np.bool_),
+    ('quem_pagou', np.uint16),
+)
+
+BYTES_POR_COMPRA = sum(np.dtype(tipo).itemsize for _, tipo in COLUNAS)
+
+# Capacidade reservada a cada crescimento, em relação às compras carregadas
+CRESCIMENTO = 1.5
+
+# Linhas lidas por vez do banco
+LOTE = 100_000
+
+SQL_COMPRAS = '''
+SELECT id, produto_id, supermercado_id, CAST(data_compra AS INTEGER),
+       CASE WHEN quantidade > 0 THEN preco / quantidade END, promoção,
+       COALESCE(quem_pagou, '')
+FROM compras
+WHERE id > ?
+ORDER BY id
+'''
+
+
+class HistoricoColunar:
+    """As compras em colunas NumPy ordenadas por (dia, id)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.invalidar()
+
+    def invalidar(self):
+        """Descarta tudo; o próximo uso recarrega do banco"""
+        with self._lock:
+            self.carregado = False
+            self.tamanho = 0
+            self.maior_id = 0
+            self._colunas = {nome: np.empty(0, dtype=tipo) for nome, tipo in COLUNAS}
+            self.quem_pagou_valores = []      # código -> texto
+            self._codigos_quem_pagou = {}     # texto -> código
+
+    def _coluna(self, nome):
+        """Visão da coluna só com as compras carregadas (sem a folga)"""
+        return self._colunas[nome][:self.tamanho]
+
+    @property
+    def dia(self):
+        return self._coluna('dia')
+
+    @property
+    def produto_id(self):
+        return self._coluna('produto_id')
+
+    @property
+    def supermercado_id(self):
+        return self._coluna('supermercado_id')
+
+    @property
+    def bytes_alocados(self):
+        return sum(coluna.nbytes for coluna in self._colunas.values())
+
+    # Carga e atualização
+    def carregar(self, conn):
+        """Lê todas as compras pela conexão informada e as ordena uma única vez"""
+        with self._lock:
+            self.invalidar()
+            lotes = []
+            cursor = conn.execute(SQL_COMPRAS, (0,))
+            while True:
+                lote = cursor.fetchmany(LOTE)
+                if not lote:
+                    break
+                lotes.append(self._colunas_do_lote(lote))
+            if lotes:
+                colunas = {nome: np.concatenate([lote[nome] for lote in lotes])
+                           for nome, _ in COLUNAS}
+                del lotes
+                # Sem folga na carga: ela só é reservada quando chegam compras novas
+                ordem = np.lexsort((colunas['id'], colunas['dia']))
+                self._colunas = {nome: coluna[ordem] for nome, coluna in colunas.items()}
+                self.tamanho = len(ordem)
+                self.maior_id = int(colunas['id'].max())
+            self.carregado = True
+
+    def sincronizar(self, conn):
+        """Acrescenta as compras com id maior que o último carregado
+
+        Retorna quantas entraram; sem compras novas custa uma busca pelo
+        rowid. Também recebe as gravadas por outros processos.
+        """
+        with self._lock:
+            cursor = conn.execute(SQL_COMPRAS, (self.maior_id,))
+            novas = 0
+            while True:
+                lote = cursor.fetchmany(LOTE)
+                if not lote:
+                    break
+                self._acrescentar(self._colunas_do_lote(lote))
+                novas += len(lote)
+            return novas
+
+    def _codigo_quem_pagou(self, valor):
+        codigo = self._codigos_quem_pagou.get(valor)
+        if codigo is None:
+            codigo = self._codigos_quem_pagou[valor] = len(self.quem_pagou_valores)
+            self.quem_pagou_valores.append(valor)
+        return codigo
+
+    def _colunas_do_lote(self, linhas):
+        """Converte as linhas de SQL_COMPRAS em colunas NumPy"""
+        ids, produtos, supermercados, dias, precos, promocoes, quem_pagou = zip(*linhas)
+        return {
+            'id': np.array(ids, dtype=np.int32),
+            'produto_id': np.array(produtos, dtype=np.int32),
+            'supermercado_id': np.array(supermercados, dtype=np.int32),
+            'dia': np.array(dias, dtype=np.int32),
+            'preco_unitario': np.array(precos, dtype=np.float64),
+            'promocao': np.array(promocoes, dtype=np.bool_),
+            'quem_pagou': np.array([self._codigo_quem_pagou(valor) for valor in quem_pagou],
+                                   dtype=np.uint16),
+        }
+
+    def _acrescentar(self, novas):
+        """Encaixa compras novas (ids maiores que os carregados) nas colunas"""
+        # Os ids são crescentes: ordenar por dia (estável) dá a ordem (dia, id)
+        ordem = np.argsort(novas['dia'], kind='stable')
+        novas = {nome: coluna[ordem] for nome, coluna in novas.items()}
+        self.maior_id = max(self.maior_id, int(novas['id'].max()))
+
+        n, k = self.tamanho, len(ordem)
+        dias = self.dia
+        if n == 0 or novas['dia'][0] >= dias[-1]:
+            # Caso comum: as compras novas são as mais recentes
+            self._reservar(n + k)
+            for nome, coluna in novas.items():
+                self._colunas[nome][n:n + k] = coluna
+        else:
+            # Data retroativa: cada compra entra depois das do mesmo dia (que
+            # têm id menor); np.insert copia cada coluna uma vez
+            posicoes = np.searchsorted(dias, novas['dia'], side='right')
+            for nome, coluna in novas.items():
+                self._colunas[nome] = np.insert(self._colunas[nome][:n], posicoes, coluna)
+        self.tamanho = n + k
+
+    def _reservar(self, tamanho):
+        """Garante capacidade para tamanho compras, com folga"""
+        if tamanho <= len(self._colunas['id']):
+            return
+        capacidade = max(int(tamanho * CRESCIMENTO), 1024)
+        for nome, coluna in self._colunas.items():
+            nova = np.empty(capacidade, dtype=coluna.dtype)
+            nova[:self.tamanho] = coluna[:self.tamanho]
+            self._colunas[nome] = nova
+
+    def remover_produto(self, produto_id):
+        """Tira as compras de um produto excluído"""
+        with self._lock:
+            manter = self.produto_id != produto_id
+            if manter.all():
+                return
+            restantes = int(manter.sum())
+            for nome, coluna in self._colunas.items():
+                coluna[:restantes] = coluna[:self.tamanho][manter]
+            self.tamanho = restantes
+
+    # Consultas
+    def filtrar(self, produto_ids=None, supermercado_ids=None, dia_inicio=None, dia_fim=None):
+        """Posições das compras que passam nos filtros, em ordem de (dia, id)
+
+        produto_ids/supermercado_ids: coleções de ids (None: sem filtro);
+        dia_inicio/dia_fim: dias julianos, inclusive. O período é um
+        intervalo contíguo das colunas (busca binária pela data).
+        """
+        with self._lock:
+            dias = self.dia
+            inicio = 0 if dia_inicio is None else int(np.searchsorted(dias, dia_inicio, 'left'))
+            fim = len(dias) if dia_fim is None else int(np.searchsorted(dias, dia_fim, 'right'))
+            if inicio >= fim:
+                return np.empty(0, dtype=np.int64)
+            selecao = np.ones(fim - inicio, dtype=bool)
+            for coluna, ids in ((self.produto_id, produto_ids),
+                                (self.supermercado_id, supermercado_ids)):
+                if ids is None:
+                    continue
+                ids = list(ids)
+                # Um id só (o caso comum) dispensa o isin, que ordena os valores
+                selecao &= (coluna[inicio:fim] == ids[0] if len(ids) == 1
+                            else np.isin(coluna[inicio:fim], np.array(ids, dtype=np.int32)))
+            return np.flatnonzero(selecao) + inicio
+
+    def colunas(self, posicoes, *nomes):
+        """Cópias das colunas pedidas nas posições informadas"""
+        with self._lock:
+            return tuple(self._coluna(nome)[posicoes] for nome in nomes)
+
+
+def agrupar_por_supermercado(supermercados, precos):
+    """Resumo por supermercado das compras informadas (em ordem de data)
+
+    Retorna (ids, compras, mínimo, média, máximo, último preço), um
+    elemento por supermercado; preços NaN são ignorados.
+    """
+    validos = ~np.isnan(precos)
+    supermercados, precos = supermercados[validos], precos[validos]
+    if len(precos) == 0:
+        vazio = np.empty(0)
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64), vazio, vazio, vazio, vazio
+    # A ordenação estável mantém a ordem de data dentro de cada supermercado
+    ordem = np.argsort(supermercados, kind='stable')
+    supermercados, precos = supermercados[ordem], precos[ordem]
+    inicios = np.flatnonzero(np.r_[True, supermercados[1:] != supermercados[:-1]])
+    fins = np.r_[inicios[1:], len(precos)]
+    compras = fins - inicios
+    return (supermercados[inicios], compras,
+            np.minimum.reduceat(precos, inicios),
+            np.add.reduceat(precos, inicios) / compras,
+            np.maximum.reduceat(precos, inicios),
+            precos[fins - 1])
+
+
+def media_movel(dias, precos, janela=30):
+    """Média dos preços nos últimos `janela` dias corridos, a cada dia com compra
+
+    dias (juliano) em ordem crescente; retorna (dias, médias). Somas e
+    contagens diárias vêm de bincount e a janela, de somas acumuladas.
+    """
+    validos = ~np.isnan(precos)
+    dias, precos = dias[validos], precos[validos]
+    if len(dias) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    deslocamentos = (dias - dias[0]).astype(np.int64)
+    n = int(deslocamentos[-1]) + 1
+    somas = np.r_[0.0, np.cumsum(np.bincount(deslocamentos, weights=precos, minlength=n))]
+    contagens = np.r_[0, np.cumsum(np.bincount(deslocamentos, minlength=n))]
+    dias_com_compra = np.unique(deslocamentos)
+    fim = dias_com_compra + 1
+    inicio = np.maximum(fim - janela, 0)
+    medias = (somas[fim] - somas[inicio]) / (contagens[fim] - contagens[inicio])
+    return dias_com_compra + int(dias[0]), medias
+
+
+class ConsultaColunar:
+    """Resultado de um filtro do histórico, paginado como database.ConsultaPaginada
+
+    Guarda só as chaves (dia, id) das compras filtradas, num único int64
+    por compra; cada página busca as suas linhas com buscar_linhas(ids),
+    que retorna {id: linha}. O resultado é um retrato: compras gravadas
+    depois não entram.
+    """
+
+    descendente = True
+
+    def __init__(self, dias, ids, buscar_linhas):
+        # (dia, id) em um inteiro, em ordem crescente (as colunas já vêm assim)
+        self._chaves = (dias.astype(np.int64) << 32) | ids.astype(np.int64)
+        self.buscar_linhas = buscar_linhas
+
+    def contar(self):
+        return len(self._chaves)
+
+    def pagina(self, tamanho, depois_de=None, antes_de=None):
+        """Retorna [(linha, chave)] após a chave depois_de ou antes de antes_de
+
+        A ordem é decrescente: "depois" são as chaves menores.
+        """
+        if antes_de is not None:
+            inicio = int(np.searchsorted(self._chaves, self._combinar(antes_de), 'right'))
+            selecionadas = self._chaves[inicio:inicio + tamanho]
+        else:
+            fim = (len(self._chaves) if depois_de is None
+                   else int(np.searchsorted(self._chaves, self._combinar(depois_de), 'left')))
+            selecionadas = self._chaves[max(fim - tamanho, 0):fim]
+        selecionadas = selecionadas[::-1]
+        ids = (selecionadas & 0xFFFFFFFF).tolist()
+        linhas = self.buscar_linhas(ids)
+        # Compras excluídas depois do filtro ficam de fora
+        return [(linhas[compra_id], (int(chave >> 32), compra_id))
+                for chave, compra_id in zip(selecionadas.tolist(), ids) if compra_id in linhas]
+
+    def inicio(self, tamanho):
+        """Retorna (total, primeira página)"""
+        return self.contar(), self.pagina(tamanho)
+
+    @staticmethod
+    def _combinar(chave):
+        dia, compra_id = chave
+        return (int(dia) << 32) | int(compra_id)
@@ -0,0 +1,148 @@
+# app/anomalias.py
+"""Preços fora do padrão e promoções prováveis
+
+Para cada (produto, supermercado) são mantidos a média móvel exponencial
+(EWMA) do preço unitário, a sua variância exponencial e os últimos
+JANELA_MEDIANA preços. Um preço novo é comparado com esse estado antes de
+entrar nele: o z-score mede a distância até a média, e um preço bem abaixo
+da mediana recente sugere promoção.
+
+O estado é atualizado a cada compra por um gatilho (ver database.py) e
+recalculado do zero por calcular_historico, que percorre o histórico
+inteiro com numpy.
+"""
+import json
+import math
+
+# Peso da compra mais recente na média e na variância exponenciais
+ALFA = 0.2
+# Quantos preços anteriores entram na mediana móvel
+JANELA_MEDIANA = 9
+# Compras anteriores necessárias antes de julgar um preço
+MINIMO_HISTORICO = 4
+# Desvio mínimo, em fração da média (preços que nunca mudaram)
+PISO_DESVIO = 0.02
+# |z| a partir do qual o preço é considerado fora do padrão
+LIMITE_Z = 3.0
+# Preço abaixo da mediana em pelo menos esta fração (ou z abaixo de
+# Z_PROMOCAO) sugere promoção
+DESCONTO_PROMOCAO = 0.15
+Z_PROMOCAO = -2.0
+
+
+def _mediana(valores):
+    ordenados = sorted(valores)
+    meio = len(ordenados) // 2
+    return ordenados[meio] if len(ordenados) % 2 else (ordenados[meio - 1] + ordenados[meio]) / 2
+
+
+class AvaliacaoPreco:
+    """Comparação de um preço unitário com o histórico do produto no supermercado"""
+
+    def __init__(self, preco, contagem, media, variancia, mediana):
+        self.preco = preco
+        self.contagem = contagem    # compras anteriores
+        self.media = media          # EWMA antes desta compra
+        self.mediana = mediana      # mediana dos últimos JANELA_MEDIANA preços
+        desvio = max(math.sqrt(variancia), PISO_DESVIO * media)
+        self.z = (preco - media) / desvio if desvio > 0 else 0.0
+
+    @classmethod
+    def do_estado(cls, preco, estado):
+        """Avalia o preço a partir de (contagem, ewma, variância, janela JSON)"""
+        contagem, media, variancia, janela = estado
+        return cls(preco, contagem, media, variancia, _mediana(json.loads(janela)))
+
+    @property
+    def confiavel(self):
+        return self.contagem >= MINIMO_HISTORICO
+
+    @property
+    def anomalo(self):
+        return self.confiavel and abs(self.z) >= LIMITE_Z
+
+    @property
+    def promocao(self):
+        return self.confiavel and (self.preco <= self.mediana * (1 - DESCONTO_PROMOCAO)
+                                   or self.z <= Z_PROMOCAO)
+
+    @property
+    def variacao(self):
+        """Diferença relativa para a mediana recente (0.1 = 10% acima)"""
+        return self.preco / self.mediana - 1 if self.mediana else 0.0
+
+
+def calcular_historico(grupos, precos):
+    """Percorre o histórico de uma vez e retorna as estatísticas de cada compra
+
+    grupos (um id por (produto, supermercado)) e precos vêm ordenados por
+    grupo e, dentro dele, pela data. Retorna um dicionário de arrays por
+    compra, com o estado antes dela ('media', 'mediana', 'z', 'anomalo',
+    'promocao') e depois dela ('ewma', 'variancia', 'contagem').
+
+    As compras são processadas por posição no grupo: a iteração k atualiza,
+    de uma vez, a k-ésima compra de todos os grupos. O número de iterações
+    é o tamanho do maior grupo, não o do histórico.
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    grupos = np.asarray(grupos)
+    x = np.asarray(precos, dtype=float)
+    n = len(x)
+    if n == 0:
+        vazio = np.empty(0)
+        return {chave: vazio for chave in ('media', 'mediana', 'z', 'anomalo', 'promocao',
+                                           'ewma', 'variancia', 'contagem')}
+
+    inicio_grupo = np.ones(n, dtype=bool)
+    inicio_grupo[1:] = grupos[1:] != grupos[:-1]
+    primeira = np.maximum.accumulate(np.where(inicio_grupo, np.arange(n), 0))
+    posicao = np.arange(n) - primeira
+
+    # Média e variância exponenciais, posição por posição
+    ewma = x.copy()
+    variancia = np.zeros(n)
+    por_posicao = np.argsort(posicao, kind='stable')
+    limites = np.cumsum(np.bincount(posicao))
+    for k in range(1, len(limites)):
+        linhas = por_posicao[limites[k - 1]:limites[k]]
+        anteriores = linhas - 1
+        diferenca = x[linhas] - ewma[anteriores]
+        ewma[linhas] = ewma[anteriores] + ALFA * diferenca
+        variancia[linhas] = (1 - ALFA) * (variancia[anteriores] + ALFA * diferenca ** 2)
+
+    # Estado antes de cada compra: o da compra anterior do grupo
+    seguintes = np.flatnonzero(~inicio_grupo)
+    media = np.full(n, np.nan)
+    variancia_antes = np.full(n, np.nan)
+    media[seguintes] = ewma[seguintes - 1]
+    variancia_antes[seguintes] = variancia[seguintes - 1]
+
+    # Mediana dos JANELA_MEDIANA preços anteriores do mesmo grupo
+    janelas = sliding_window_view(np.concatenate([np.full(JANELA_MEDIANA, np.nan), x[:-1]]),
+                                  JANELA_MEDIANA)
+    mediana = np.full(n, np.nan)
+    cheias = posicao >= JANELA_MEDIANA
+    mediana[cheias] = np.median(janelas[cheias], axis=1)
+    parciais = (posicao > 0) & ~cheias
+    if parciais.any():
+        janelas_parciais = janelas[parciais].copy()
+        fora = np.arange(JANELA_MEDIANA) < (JANELA_MEDIANA - posicao[parciais])[:, None]
+        janelas_parciais[fora] = np.nan
+        mediana[parciais] = np.nanmedian(janelas_parciais, axis=1)
+
+    desvio = np.maximum(np.sqrt(variancia_antes), PISO_DESVIO * media)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(desvio > 0, (x - media) / desvio, 0.0)
+    confiavel = posicao >= MINIMO_HISTORICO
+    return {
+        'media': media,
+        'mediana': mediana,
+        'z': z,
+        'anomalo': confiavel & (np.abs(z) >= LIMITE_Z),
+        'promocao': confiavel & ((x <= mediana * (1 - DESCONTO_PROMOCAO)) | (z <= Z_PROMOCAO)),
+        'ewma': ewma,
+        'variancia': variancia,
+        'contagem': posicao + 1,
+    }
@@ -0,0 +1,412 @@
+# app/api.py
+"""Servidor HTTP/JSON local para registrar e consultar compras pelo celular
+
+Uso: python servidor.py [--host 127.0.0.1] [--porta 8765] [--banco supermercado.db]
+     SUPERMERCADO_TOKEN=... python servidor.py --host 0.0.0.0   (na rede local)
+
+Rotas:
+    GET  /produtos?q=arroz&limite=5     busca de produtos (a do autocompletar)
+    GET  /supermercados
+    GET  /precos?produto=&supermercado=&desde=&ate=&limite=50&depois=DIA,ID
+    POST /compras                       {"produto", "supermercado", "preco", "data",
+                                         "quantidade", "promocao", "quem_pagou",
+                                         "observacoes"}
+    GET  /saude
+
+Um único processo asyncio atende todas as conexões. As leituras rodam em
+um pequeno conjunto de threads, cada uma com a sua conexão (o banco em
+disco usa WAL, então leitores não esperam o escritor). As compras passam
+por um único escritor: enquanto um lote está sendo gravado, as que chegam
+esperam na fila e entram juntas no lote seguinte, com um só commit.
+
+Por padrão o servidor só ouve no próprio computador. Para aceitar outros
+aparelhos (--host 0.0.0.0) é obrigatório um token compartilhado, que toda
+requisição deve enviar no cabeçalho "Authorization: Bearer <token>".
+"""
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from app import database
+from app.unidades import unidade_referencia
+from app.utils import parsear_data
+
+PORTA_PADRAO = 8765
+LEITORES_PADRAO = 4
+# Compras gravadas no mesmo commit, no máximo
+LOTE_MAXIMO = 256
+LIMITE_CORPO = 64 * 1024
+LIMITE_PAGINA = 200
+# Conexões paradas por mais que isso são fechadas (segundos)
+TEMPO_OCIOSO = 30
+HOST_PADRAO = '127.0.0.1'
+# Variável de ambiente com o token (evita deixá-lo visível na linha de comando)
+VARIAVEL_TOKEN = 'SUPERMERCADO_TOKEN'
+
+
+class ErroRequisicao(Exception):
+    """Erro que vira uma resposta {"erro": mensagem} com o status informado"""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+class EscritorCompras:
+    """Grava as compras recebidas em lotes, por uma única thread
+
+    registrar() devolve o resultado de database.inserir_compras para a sua
+    compra. O lote é o que estiver na fila quando o anterior terminar, de
+    modo que sob carga o custo do commit é dividido entre muitas compras e,
+    sem carga, uma compra sozinha não espera por ninguém.
+    """
+
+    def __init__(self, lote_maximo=LOTE_MAXIMO):
+        self.lote_maximo = lote_maximo
+        self.lotes = 0
+        self.compras = 0
+        self._fila = asyncio.Queue()
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='escritor')
+        self._tarefa = None
+
+    def iniciar(self):
+        self._tarefa = asyncio.get_running_loop().create_task(self._gravar())
+
+    async def encerrar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+        self._thread.shutdown(wait=True)
+
+    async def registrar(self, compra):
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((compra, futuro))
+        return await futuro
+
+    @property
+    def media_lote(self):
+        return self.compras / self.lotes if self.lotes else 0.0
+
+    async def _gravar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._fila.get()]
+            while len(lote) < self.lote_maximo and not self._fila.empty():
+                lote.append(self._fila.get_nowait())
+            try:
+                resultados = await loop.run_in_executor(
+                    self._thread, database.inserir_compras, [compra for compra, _ in lote])
+            except Exception as e:
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            self.lotes += 1
+            self.compras += len(lote)
+            for (_, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+
+def _inteiro(consulta, nome, padrao, maximo):
+    texto = consulta.get(nome, '')
+    if not texto:
+        return padrao
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"'{nome}' deve ser um número inteiro")
+    return max(1, min(valor, maximo))
+
+
+def _data(consulta, nome):
+    texto = consulta.get(nome, '')
+    if not texto:
+        return None
+    data = parsear_data(texto)
+    if data is None:
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST,
+                             f"'{nome}' inválida! Use DD/MM/AAAA ou AAAA-MM-DD")
+    return data
+
+
+def _chave_pagina(texto):
+    """'DIA,ID' (o campo 'proxima' da página anterior) -> (dia, id)"""
+    if not texto:
+        return None
+    try:
+        dia, compra_id = texto.split(',')
+        return int(dia), int(compra_id)
+    except ValueError:
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "'depois' deve ser o 'proxima' recebido")
+
+
+def _compra_json(linha):
+    (data_compra, produto, supermercado, preco, quantidade, preco_unitario, promocao,
+     quem_pagou, preco_referencia, unidade_base) = linha
+    return {
+        'data': data_compra.isoformat(), 'produto': produto, 'supermercado': supermercado,
+        'preco': preco, 'quantidade': quantidade, 'preco_unitario': preco_unitario,
+        'promocao': bool(promocao), 'quem_pagou': quem_pagou,
+        'preco_referencia': preco_referencia,
+        'unidade_referencia': unidade_referencia(unidade_base),
+    }
+
+
+def consultar_precos(produto='', supermercado='', desde=None, ate=None, limite=50, depois=None):
+    """Uma página da consulta de preços, mais recentes primeiro
+
+    O total só é contado na primeira página (sem 'depois').
+    """
+    consulta = database.consulta_precos_paginada(produto, supermercado, desde, ate)
+    pagina = consulta.pagina(limite, depois_de=depois)
+    resposta = {'compras': [_compra_json(linha) for linha, _ in pagina],
+                'proxima': None}
+    if len(pagina) == limite:
+        resposta['proxima'] = ','.join(str(valor) for valor in pagina[-1][1])
+    if depois is None:
+        resposta['total'] = consulta.contar()
+    return resposta
+
+
+class ServidorAPI:
+    """Rotas e protocolo HTTP/1.1 (com keep-alive) sobre asyncio.start_server"""
+
+    def __init__(self, leitores=LEITORES_PADRAO, lote_maximo=LOTE_MAXIMO, token=None):
+        self.leitores = ThreadPoolExecutor(max_workers=leitores, thread_name_prefix='leitor')
+        # Com token, toda requisição precisa de "Authorization: Bearer <token>"
+        self.autorizacao = f"Bearer {token}".encode('utf-8') if token else None
+        self.escritor = EscritorCompras(lote_maximo)
+        self.requisicoes = 0
+        self.inicio = time.time()
+        self.rotas = {
+            ('GET', '/produtos'): self.produtos,
+            ('GET', '/supermercados'): self.supermercados,
+            ('GET', '/precos'): self.precos,
+            ('POST', '/compras'): self.registrar_compra,
+            ('GET', '/saude'): self.saude,
+        }
+
+    async def _ler(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.leitores, funcao, *args)
+
+    # Rotas: recebem (consulta, corpo) e retornam (status, objeto JSON)
+    async def produtos(self, consulta, corpo):
+        termo = consulta.get('q', '')
+        limite = _inteiro(consulta, 'limite', 5, 50)
+        return HTTPStatus.OK, {'produtos': await self._ler(
+            database.buscar_produtos_similares, termo, limite)}
+
+    async def supermercados(self, consulta, corpo):
+        return HTTPStatus.OK, {'supermercados': await self._ler(database.listar_supermercados)}
+
+    async def precos(self, consulta, corpo):
+        resposta = await self._ler(
+            consultar_precos, consulta.get('produto', ''), consulta.get('supermercado', ''),
+            _data(consulta, 'desde'), _data(consulta, 'ate'),
+            _inteiro(consulta, 'limite', 50, LIMITE_PAGINA), _chave_pagina(consulta.get('depois')))
+        return HTTPStatus.OK, resposta
+
+    async def registrar_compra(self, consulta, corpo):
+        try:
+            compra = json.loads(corpo or b'{}')
+        except ValueError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Corpo JSON inválido")
+        if not isinstance(compra, dict):
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "O corpo deve ser um objeto JSON")
+
+        valido, dados = database.validar_compra(
+            compra.get('produto'), compra.get('supermercado'), compra.get('preco'),
+            compra.get('data'), compra.get('quantidade', 1))
+        if not valido:
+            raise ErroRequisicao(HTTPStatus.UNPROCESSABLE_ENTITY, dados)
+        dados.update(promocao=bool(compra.get('promocao')),
+                     quem_pagou=str(compra.get('quem_pagou') or ''),
+                     observacoes=str(compra.get('observacoes') or ''))
+
+        sucesso, resultado = await self.escritor.registrar(dados)
+        if not sucesso:
+            raise ErroRequisicao(HTTPStatus.UNPROCESSABLE_ENTITY, resultado)
+        return HTTPStatus.CREATED, {'id': resultado}
+
+    async def saude(self, consulta, corpo):
+        return HTTPStatus.OK, {
+            'banco': database.DB_PATH,
+            'requisicoes': self.requisicoes,
+            'segundos': round(time.time() - self.inicio, 1),
+            'compras_gravadas': self.escritor.compras,
+            'lotes_gravados': self.escritor.lotes,
+            'media_por_lote': round(self.escritor.media_lote, 2),
+            'conexoes': database.estatisticas_conexoes(),
+        }
+
+    # Protocolo
+    async def _ler_requisicao(self, reader):
+        """(método, caminho, consulta, corpo, manter conexão, Authorization) ou None
+        no fim da conexão"""
+        # Linha da requisição e cabeçalhos de uma vez (um só timeout por requisição)
+        try:
+            bloco = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), TEMPO_OCIOSO)
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise ErroRequisicao(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                 "Cabeçalhos grandes demais")
+
+        linha, *linhas = bloco.decode('latin-1').split('\r\n')
+        try:
+            metodo, alvo, versao = linha.split()
+        except ValueError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Linha de requisição inválida")
+        cabecalhos = {}
+        for linha in linhas:
+            nome, _, valor = linha.partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+        try:
+            tamanho = int(cabecalhos.get('content-length', 0))
+        except ValueError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Content-Length inválido")
+        if tamanho > LIMITE_CORPO:
+            raise ErroRequisicao(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo grande demais")
+        corpo = await reader.readexactly(tamanho) if tamanho else b''
+
+        conexao = cabecalhos.get('connection', '').lower()
+        manter = conexao != 'close' if versao == 'HTTP/1.1' else conexao == 'keep-alive'
+        partes = urlsplit(alvo)
+        consulta = {nome: valores[-1] for nome, valores in parse_qs(partes.query).items()}
+        return (metodo.upper(), partes.path.rstrip('/') or '/', consulta, corpo, manter,
+                cabecalhos.get('authorization', ''))
+
+    def _autorizada(self, autorizacao):
+        """Confere o token (em tempo constante); sem token configurado, tudo passa"""
+        if self.autorizacao is None:
+            return True
+        return hmac.compare_digest(autorizacao.encode('latin-1'), self.autorizacao)
+
+    async def _responder(self, metodo, caminho, consulta, corpo):
+        rota = self.rotas.get((metodo, caminho))
+        if rota is None:
+            if any(caminho == c for _, c in self.rotas):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'erro': f"Método {metodo} não permitido"}
+            return HTTPStatus.NOT_FOUND, {'erro': f"Rota {caminho} não existe"}
+        try:
+            return await rota(consulta, corpo)
+        except ErroRequisicao as e:
+            return e.status, {'erro': e.mensagem}
+        except Exception as e:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'erro': f"Erro no banco de dados: {e}"}
+
+    @staticmethod
+    def _resposta(status, objeto, manter):
+        corpo = json.dumps(objeto, ensure_ascii=False).encode('utf-8')
+        cabecalho = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     "Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(corpo)}\r\n"
+                     f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n")
+        return cabecalho.encode('latin-1') + corpo
+
+    async def atender(self, reader, writer):
+        """Atende as requisições de uma conexão até ela ser fechada"""
+        try:
+            while True:
+                try:
+                    requisicao = await self._ler_requisicao(reader)
+                except ErroRequisicao as e:
+                    writer.write(self._resposta(e.status, {'erro': e.mensagem}, False))
+                    await writer.drain()
+                    break
+                if requisicao is None:
+                    break
+                metodo, caminho, consulta, corpo, manter, autorizacao = requisicao
+                self.requisicoes += 1
+                if self._autorizada(autorizacao):
+                    status, objeto = await self._responder(metodo, caminho, consulta, corpo)
+                else:
+                    status, objeto = HTTPStatus.UNAUTHORIZED, {'erro': "Token ausente ou inválido"}
+                writer.write(self._resposta(status, objeto, manter))
+                await writer.drain()
+                if not manter:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def servir(self, host, porta, ao_iniciar=None):
+        """Atende até ser cancelado; ao_iniciar(endereços) é chamado quando estiver ouvindo"""
+        # Catálogo carregado antes da primeira requisição
+        await self._ler(database.obter_catalogo)
+        self.escritor.iniciar()
+        servidor = await asyncio.start_server(self.atender, host, porta, backlog=1024)
+        try:
+            if ao_iniciar:
+                ao_iniciar([s.getsockname() for s in servidor.sockets])
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            await self.escritor.encerrar()
+            self.leitores.shutdown(wait=True)
+
+
+def _somente_local(host):
+    """Indica se o endereço de escuta só aceita conexões do próprio computador"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON local de compras")
+    parser.add_argument('--host', default=HOST_PADRAO,
+                        help="endereço de escuta (padrão: só este computador; "
+                             "0.0.0.0 para a rede local, com --token)")
+    parser.add_argument('--token', default=os.environ.get(VARIAVEL_TOKEN),
+                        help=f"token exigido no cabeçalho Authorization (padrão: ${VARIAVEL_TOKEN}); "
+                             "obrigatório fora de 127.0.0.1")
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--banco', help="arquivo do banco (padrão: supermercado.db)")
+    parser.add_argument('--leitores', type=int, default=LEITORES_PADRAO,
+                        help="threads (e conexões) de leitura")
+    parser.add_argument('--lote', type=int, default=LOTE_MAXIMO,
+                        help="compras gravadas no mesmo commit, no máximo")
+    args = parser.parse_args(argv)
+    if not args.token and not _somente_local(args.host):
+        parser.error(f"para ouvir em {args.host} defina um token ({VARIAVEL_TOKEN} ou --token), "
+                     "por exemplo: python -c \"import secrets; print(secrets.token_urlsafe())\"")
+
+    # Uma conexão por leitor mais a do escritor ficam abertas no pool
+    database.configurar_banco(args.banco or database.DB_PATH, tamanho_max=args.leitores + 1)
+    database.init_db()
+
+    def iniciado(enderecos):
+        for host, porta, *_ in enderecos:
+            print(f"Servidor ouvindo em http://{host}:{porta}", flush=True)
+
+    servidor = ServidorAPI(args.leitores, args.lote, args.token)
+    try:
+        asyncio.run(servidor.servir(args.host, args.porta, ao_iniciar=iniciado))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
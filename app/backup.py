@@ -0,0 +1,324 @@
+# app/backup.py
+"""Backups online e incrementais do banco de dados
+
+A cópia usa a API de backup do SQLite (consistente mesmo com o banco em
+uso), é pulada quando o banco não mudou desde o último backup, e arquivos
+com o mesmo conteúdo (hash SHA-256) são reaproveitados. Os backups
+antigos são descartados por uma política de gerações diárias, semanais e
+mensais.
+
+Uso: python -m app.backup {criar,listar,verificar,restaurar} [--banco ARQUIVO]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from app import database, eventos
+
+PASTA_BACKUPS = Path('backups')
+MANIFESTO = 'manifesto.json'
+PAGINAS_POR_PASSO = 1024
+
+# Quantas gerações manter de cada tipo (o backup mais recente nunca é apagado)
+RETENCAO_PADRAO = {'diarios': 7, 'semanais': 4, 'mensais': 12}
+
+
+def marca_alteracao(caminho):
+    """Identifica o estado do arquivo do banco para saber se ele mudou
+
+    Em modo WAL o contador de alterações do cabeçalho não avança a cada
+    commit, por isso a marca também leva tamanho e mtime do banco e do WAL
+    (este só se tiver páginas: truncá-lo no checkpoint altera o mtime).
+    """
+    partes = []
+    with open(caminho, 'rb') as arquivo:
+        cabecalho = arquivo.read(100)
+    partes.append(int.from_bytes(cabecalho[24:28], 'big'))
+    for arquivo in (Path(caminho), Path(f"{caminho}-wal")):
+        if arquivo.exists() and arquivo.stat().st_size > 0:
+            estado = arquivo.stat()
+            partes.extend([estado.st_size, estado.st_mtime_ns])
+    return ':'.join(str(p) for p in partes)
+
+
+def _hash_arquivo(caminho):
+    """SHA-256 do conteúdo de um arquivo, lido em blocos"""
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def ler_manifesto(pasta=PASTA_BACKUPS):
+    """Lista de backups registrados, do mais antigo para o mais recente"""
+    caminho = Path(pasta) / MANIFESTO
+    if not caminho.exists():
+        return []
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)['backups']
+
+
+def _gravar_manifesto(pasta, entradas):
+    """Grava o manifesto de forma atômica"""
+    caminho = Path(pasta) / MANIFESTO
+    temporario = caminho.with_suffix('.tmp')
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump({'versao': 1, 'backups': entradas}, arquivo, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def selecionar_retidos(entradas, diarios=7, semanais=4, mensais=12):
+    """Retorna os índices das entradas mantidas pela política de retenção
+
+    Para cada tipo de geração fica o backup mais recente de cada um dos
+    últimos N dias, semanas ou meses que tiveram backup.
+    """
+    if not entradas:
+        return set()
+    ordem = sorted(range(len(entradas)), key=lambda i: (entradas[i]['criado_em'], i), reverse=True)
+    retidos = {ordem[0]}
+
+    periodos = (
+        (diarios, lambda d: d.date()),
+        (semanais, lambda d: d.isocalendar()[:2]),
+        (mensais, lambda d: (d.year, d.month)),
+    )
+    for quantidade, periodo in periodos:
+        vistos = set()
+        for i in ordem:
+            if len(vistos) >= quantidade:
+                break
+            chave = periodo(datetime.fromisoformat(entradas[i]['criado_em']))
+            if chave not in vistos:
+                vistos.add(chave)
+                retidos.add(i)
+    return retidos
+
+
+def aplicar_retencao(pasta=PASTA_BACKUPS, **retencao):
+    """Remove do manifesto e do disco os backups fora da política; retorna quantos saíram"""
+    pasta = Path(pasta)
+    entradas = ler_manifesto(pasta)
+    retidos = selecionar_retidos(entradas, **{**RETENCAO_PADRAO, **retencao})
+    mantidas = [e for i, e in enumerate(entradas) if i in retidos]
+
+    # Um arquivo pode ser compartilhado por várias entradas (deduplicação)
+    em_uso = {e['arquivo'] for e in mantidas}
+    for entrada in entradas:
+        if entrada['arquivo'] not in em_uso:
+            (pasta / entrada['arquivo']).unlink(missing_ok=True)
+            em_uso.add(entrada['arquivo'])
+
+    _gravar_manifesto(pasta, mantidas)
+    return len(entradas) - len(mantidas)
+
+
+def _copiar_banco(destino, ao_progresso=None):
+    """Copia o banco em uso para destino com a API de backup, em passos"""
+    def progresso(status, restantes, total):
+        if ao_progresso:
+            ao_progresso(total - restantes, total)
+
+    origem = database.get_connection()
+    copia = sqlite3.connect(destino)
+    try:
+        origem.backup(copia, pages=PAGINAS_POR_PASSO, progress=progresso)
+        # O backup herda o modo WAL; volta ao journal padrão para ser um arquivo único
+        copia.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        copia.close()
+        origem.close()
+
+
+def fazer_backup(pasta=PASTA_BACKUPS, comprimir=True, forcar=False, ao_progresso=None,
+                 **retencao):
+    """Faz um backup online do banco; retorna o caminho ou None se nada mudou
+
+    ao_progresso(paginas_copiadas, total_paginas) é chamado a cada passo.
+    Com forcar=True o backup é feito mesmo sem alterações no banco.
+    """
+    if not Path(database.DB_PATH).exists():
+        return None
+    pasta = Path(pasta)
+    pasta.mkdir(exist_ok=True)
+
+    # Leva as páginas pendentes do WAL para o arquivo antes de medir a marca
+    conn = database.get_connection()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+    entradas = ler_manifesto(pasta)
+    marca = marca_alteracao(database.DB_PATH)
+    if entradas and not forcar and entradas[-1]['marca'] == marca:
+        return None
+
+    agora = datetime.now()
+    temporario = pasta / f".backup_{agora:%Y%m%d_%H%M%S_%f}.tmp"
+    try:
+        _copiar_banco(temporario, ao_progresso)
+        tamanho = temporario.stat().st_size
+        conteudo = _hash_arquivo(temporario)
+
+        iguais = [e for e in entradas
+                  if e['sha256'] == conteudo and (pasta / e['arquivo']).exists()]
+        if iguais:
+            nome = iguais[-1]['arquivo']
+        else:
+            extensao = '.db.gz' if comprimir else '.db'
+            nome = f"supermercado_{agora:%Y%m%d_%H%M%S}{extensao}"
+            sequencia = 1
+            while (pasta / nome).exists():
+                sequencia += 1
+                nome = f"supermercado_{agora:%Y%m%d_%H%M%S}_{sequencia}{extensao}"
+            if comprimir:
+                with open(temporario, 'rb') as entrada, gzip.open(pasta / nome, 'wb', 6) as saida:
+                    shutil.copyfileobj(entrada, saida, 1 << 20)
+            else:
+                os.replace(temporario, pasta / nome)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+    entradas.append({
+        'arquivo': nome,
+        'criado_em': agora.isoformat(timespec='seconds'),
+        'sha256': conteudo,
+        'tamanho': tamanho,
+        'marca': marca,
+    })
+    _gravar_manifesto(pasta, entradas)
+    aplicar_retencao(pasta, **retencao)
+    return str(pasta / nome)
+
+
+def _abrir_copia(arquivo, destino):
+    """Descompacta (se preciso) o backup para destino"""
+    if str(arquivo).endswith('.gz'):
+        with gzip.open(arquivo, 'rb') as entrada, open(destino, 'wb') as saida:
+            shutil.copyfileobj(entrada, saida, 1 << 20)
+    else:
+        shutil.copyfile(arquivo, destino)
+
+
+def verificar_backup(arquivo, pasta=PASTA_BACKUPS):
+    """Confere hash e integridade de um backup; retorna (ok, mensagem)"""
+    arquivo = Path(arquivo)
+    if not arquivo.exists():
+        return False, f"Arquivo não encontrado: {arquivo}"
+    esperado = next((e['sha256'] for e in ler_manifesto(pasta) if e['arquivo'] == arquivo.name), None)
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        copia = Path(temporaria) / 'verificacao.db'
+        try:
+            _abrir_copia(arquivo, copia)
+        except (OSError, EOFError) as e:
+            return False, f"Arquivo corrompido: {e}"
+        if esperado is not None and _hash_arquivo(copia) != esperado:
+            return False, "O conteúdo não confere com o hash registrado"
+
+        try:
+            conn = sqlite3.connect(copia)
+            try:
+                resultado = conn.execute("PRAGMA integrity_check").fetchone()[0]
+                compras = conn.execute("SELECT COUNT(*) FROM compras").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            return False, f"Banco inválido: {e}"
+
+    if resultado != 'ok':
+        return False, f"Falha na verificação de integridade: {resultado}"
+    return True, f"Backup íntegro ({compras} compras)"
+
+
+def restaurar_backup(arquivo, pasta=PASTA_BACKUPS, ao_progresso=None):
+    """Restaura um backup sobre o banco em uso, após verificá-lo
+
+    O estado atual é salvo antes (backup forçado), e as migrações são
+    reaplicadas caso o backup seja de uma versão anterior do esquema.
+    """
+    ok, mensagem = verificar_backup(arquivo, pasta)
+    if not ok:
+        raise ValueError(mensagem)
+
+    seguranca = fazer_backup(pasta, forcar=True)
+
+    def progresso(status, restantes, total):
+        if ao_progresso:
+            ao_progresso(total - restantes, total)
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        copia_path = Path(temporaria) / 'restauracao.db'
+        _abrir_copia(arquivo, copia_path)
+        copia = sqlite3.connect(copia_path)
+        destino = database.get_connection()
+        try:
+            copia.backup(destino, pages=PAGINAS_POR_PASSO, progress=progresso)
+        finally:
+            destino.close()
+            copia.close()
+
+    database.init_db()
+    database.invalidar_catalogo()
+    database.invalidar_historico()
+    eventos.publicar(eventos.DadosSubstituidos('restauração de backup'))
+    return seguranca
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backups do banco de dados")
+    parser.add_argument('--banco', help="arquivo do banco (padrão: supermercado.db)")
+    parser.add_argument('--pasta', default=str(PASTA_BACKUPS))
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    criar = comandos.add_parser('criar', help="faz um backup se o banco mudou")
+    criar.add_argument('--forcar', action='store_true')
+    criar.add_argument('--sem-compressao', action='store_true')
+    comandos.add_parser('listar', help="lista os backups registrados")
+    verificar = comandos.add_parser('verificar', help="confere hash e integridade")
+    verificar.add_argument('arquivos', nargs='*', help="padrão: todos os do manifesto")
+    restaurar = comandos.add_parser('restaurar', help="restaura um backup sobre o banco")
+    restaurar.add_argument('arquivo')
+    args = parser.parse_args(argv)
+
+    if args.banco:
+        database.configurar_banco(args.banco)
+    pasta = Path(args.pasta)
+
+    def progresso(copiadas, total):
+        print(f"\r{copiadas}/{total} páginas", end='', file=sys.stderr)
+
+    if args.comando == 'criar':
+        caminho = fazer_backup(pasta, comprimir=not args.sem_compressao,
+                               forcar=args.forcar, ao_progresso=progresso)
+        print(file=sys.stderr)
+        print(f"Backup criado: {caminho}" if caminho else "Banco sem alterações, backup pulado")
+    elif args.comando == 'listar':
+        for entrada in ler_manifesto(pasta):
+            print(f"{entrada['criado_em']}  {entrada['arquivo']}  "
+                  f"{entrada['tamanho'] / 1e6:.1f} MB  {entrada['sha256'][:12]}")
+    elif args.comando == 'verificar':
+        arquivos = args.arquivos or sorted({pasta / e['arquivo'] for e in ler_manifesto(pasta)})
+        falhas = 0
+        for arquivo in arquivos:
+            ok, mensagem = verificar_backup(arquivo, pasta)
+            falhas += not ok
+            print(f"{'✅' if ok else '❌'} {arquivo}: {mensagem}")
+        return 1 if falhas else 0
+    elif args.comando == 'restaurar':
+        seguranca = restaurar_backup(args.arquivo, pasta, ao_progresso=progresso)
+        print(file=sys.stderr)
+        print(f"Banco restaurado de {args.arquivo} (estado anterior salvo em {seguranca})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# app/catalogo.py
+"""Catálogo em memória de produtos e supermercados, com índices por nome
+
+Resolver "Nome (Marca)" ou o nome de um supermercado para o id vira uma
+consulta a dicionário em vez de uma ou mais consultas SQL. O catálogo é
+carregado uma vez (carregar) e mantido pelas próprias operações de
+escrita (adicionar_produto, remover_produto, adicionar_supermercado); ver
+database.obter_catalogo.
+"""
+import threading
+import time
+
+from app.utils import normalizar_texto, extrair_nome_produto, extrair_marca_produto
+
+
+class RegistroProduto:
+    __slots__ = ('id', 'nome', 'marca')
+
+    def __init__(self, produto_id, nome, marca):
+        self.id = produto_id
+        self.nome = nome
+        self.marca = marca or ''
+
+    @property
+    def nome_formatado(self):
+        return f"{self.nome} ({self.marca})" if self.marca else self.nome
+
+
+class RegistroSupermercado:
+    __slots__ = ('id', 'nome')
+
+    def __init__(self, supermercado_id, nome):
+        self.id = supermercado_id
+        self.nome = nome
+
+
+def _adicionar_id(indice, chave, registro_id):
+    """Mantém em indice[chave] a lista de ids em ordem crescente"""
+    ids = indice.setdefault(chave, [])
+    if registro_id not in ids:
+        ids.append(registro_id)
+        ids.sort()
+
+
+def _remover_id(indice, chave, registro_id):
+    ids = indice.get(chave)
+    if ids and registro_id in ids:
+        ids.remove(registro_id)
+        if not ids:
+            del indice[chave]
+
+
+class Catalogo:
+    """Produtos e supermercados por id, com índices de nome exato,
+    nome normalizado (sem acentos/maiúsculas) e (nome, marca)
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.invalidar()
+
+    def invalidar(self):
+        """Descarta tudo; o próximo uso recarrega do banco"""
+        with self._lock:
+            self.carregado = False
+            self.carregado_em = None           # time.monotonic() da última carga completa
+            self.produtos = {}                 # id -> RegistroProduto
+            self.supermercados = {}            # id -> RegistroSupermercado
+            self._por_nome = {}                # nome sem espaços nas pontas -> [ids]
+            self._por_nome_normalizado = {}    # nome normalizado -> [ids]
+            self._por_nome_marca = {}          # (nome, marca) sem espaços nas pontas -> [ids]
+            self._por_nome_marca_normalizado = {}
+            self._supermercado_por_nome = {}   # nome -> id (o menor)
+            self._supermercado_normalizado = {}
+            self._nomes_produtos = None        # listas ordenadas, refeitas sob demanda
+            self._nomes_supermercados = None
+
+    def carregar(self, conn):
+        """Carrega todos os produtos e supermercados pela conexão informada
+
+        As consultas esperam o fim da carga (o lock é o mesmo), então nunca
+        veem um catálogo pela metade.
+        """
+        with self._lock:
+            self.invalidar()
+            for linha in conn.execute("SELECT id, nome, marca FROM produtos"):
+                self.adicionar_produto(*linha)
+            for linha in conn.execute("SELECT id, nome FROM supermercados"):
+                self.adicionar_supermercado(*linha)
+            self.carregado = True
+            self.carregado_em = time.monotonic()
+
+    def carregar_novos(self, conn):
+        """Acrescenta os produtos e supermercados com id maior que os conhecidos
+
+        Traz o que outro processo cadastrou depois da carga, sem reler tudo
+        (renomeações feitas por outro processo só entram na carga completa).
+        """
+        with self._lock:
+            for linha in conn.execute("SELECT id, nome, marca FROM produtos WHERE id > ?",
+                                      (max(self.produtos, default=0),)):
+                self.adicionar_produto(*linha)
+            for linha in conn.execute("SELECT id, nome FROM supermercados WHERE id > ?",
+                                      (max(self.supermercados, default=0),)):
+                self.adicionar_supermercado(*linha)
+
+    # Alterações incrementais
+    def adicionar_produto(self, produto_id, nome, marca=''):
+        """Inclui (ou atualiza) um produto e os seus índices"""
+        with self._lock:
+            self.remover_produto(produto_id)
+            registro = self.produtos[produto_id] = RegistroProduto(produto_id, nome, marca)
+            for indice, chave in self._chaves(registro):
+                _adicionar_id(indice, chave, produto_id)
+            self._nomes_produtos = None
+
+    def remover_produto(self, produto_id):
+        with self._lock:
+            registro = self.produtos.pop(produto_id, None)
+            if registro is None:
+                return
+            for indice, chave in self._chaves(registro):
+                _remover_id(indice, chave, produto_id)
+            self._nomes_produtos = None
+
+    def _chaves(self, registro):
+        """(índice, chave) de um produto em cada índice"""
+        nome, marca = registro.nome.strip(), registro.marca.strip()
+        nome_normalizado = normalizar_texto(nome)
+        return ((self._por_nome, nome),
+                (self._por_nome_normalizado, nome_normalizado),
+                (self._por_nome_marca, (nome, marca)),
+                (self._por_nome_marca_normalizado, (nome_normalizado, normalizar_texto(marca))))
+
+    def adicionar_supermercado(self, supermercado_id, nome):
+        with self._lock:
+            self.supermercados[supermercado_id] = RegistroSupermercado(supermercado_id, nome)
+            for indice, chave in ((self._supermercado_por_nome, nome),
+                                  (self._supermercado_normalizado,
+                                   normalizar_texto(nome.strip()))):
+                if chave not in indice or supermercado_id < indice[chave]:
+                    indice[chave] = supermercado_id
+            self._nomes_supermercados = None
+
+    # Consultas
+    def resolver_produto(self, nome, marca=''):
+        """Id do produto pelo nome, ou None
+
+        Tenta o nome exato (sem espaços nas pontas) e depois o normalizado;
+        com mais de um produto com o mesmo nome, a marca desempata e, sem
+        ela, vence o menor id.
+        """
+        nome, marca = nome.strip(), (marca or '').strip()
+        with self._lock:
+            # O texto exato (o caso comum, vindo do combobox) dispensa normalizar
+            ids = self._por_nome_marca.get((nome, marca)) if marca else self._por_nome.get(nome)
+            if ids:
+                return ids[0]
+            nome_normalizado = normalizar_texto(nome)
+            if marca:
+                ids = self._por_nome_marca_normalizado.get(
+                    (nome_normalizado, normalizar_texto(marca)))
+                if ids:
+                    return ids[0]
+            ids = self._por_nome.get(nome) or self._por_nome_normalizado.get(nome_normalizado)
+            return ids[0] if ids else None
+
+    def resolver_texto_produto(self, texto):
+        """Id do produto a partir de 'Nome (Marca)' ou 'Nome'"""
+        return self.resolver_produto(extrair_nome_produto(texto), extrair_marca_produto(texto))
+
+    def resolver_supermercado(self, nome):
+        """Id do supermercado pelo nome exato ou normalizado, ou None"""
+        with self._lock:
+            supermercado_id = self._supermercado_por_nome.get(nome)
+            if supermercado_id is None:
+                supermercado_id = self._supermercado_normalizado.get(
+                    normalizar_texto(nome.strip()))
+            return supermercado_id
+
+    def produto(self, produto_id):
+        with self._lock:
+            return self.produtos.get(produto_id)
+
+    def supermercado(self, supermercado_id):
+        with self._lock:
+            return self.supermercados.get(supermercado_id)
+
+    def nomes_produtos(self):
+        """'Nome (Marca)' de todos os produtos, em ordem de nome"""
+        with self._lock:
+            if self._nomes_produtos is None:
+                self._nomes_produtos = [
+                    registro.nome_formatado for registro in
+                    sorted(self.produtos.values(), key=lambda r: (r.nome, r.id))]
+            return list(self._nomes_produtos)
+
+    def nomes_supermercados(self):
+        """Nomes de todos os supermercados, em ordem alfabética"""
+        with self._lock:
+            if self._nomes_supermercados is None:
+                self._nomes_supermercados = sorted(
+                    registro.nome for registro in self.supermercados.values())
+            return list(self._nomes_supermercados)
+
+    def produtos_com_nome(self, trecho, exato=False):
+        """Ids dos produtos cujo nome contém o trecho (ou é igual, com exato=True)
+
+        Como o LIKE do SQLite, não diferencia maiúsculas de minúsculas.
+        """
+        trecho = trecho.lower()
+        with self._lock:
+            if exato:
+                return [registro.id for registro in self.produtos.values()
+                        if registro.nome.lower() == trecho]
+            return [registro.id for registro in self.produtos.values()
+                    if trecho in registro.nome.lower()]
+
+    def supermercados_com_nome(self, trecho):
+        """Ids dos supermercados cujo nome contém o trecho"""
+        trecho = trecho.lower()
+        with self._lock:
+            return [registro.id for registro in self.supermercados.values()
+                    if trecho in registro.nome.lower()]
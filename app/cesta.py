@@ -0,0 +1,256 @@
+# app/cesta.py
+"""Cesta de compras mais barata entre supermercados
+
+Os preços dos itens de uma lista são lidos uma vez para uma matriz
+(itens x supermercados). Sobre ela são calculados o total em cada
+supermercado e a melhor divisão da lista entre até N supermercados, por
+branch and bound: a busca parte de uma solução gulosa melhorada por
+trocas e descarta combinações cujo limite inferior de custo já não
+supera a melhor encontrada.
+"""
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.database import (formatar_nome_produto, itens_lista, nomes_supermercados,
+                          precos_por_supermercado)
+
+# Diferença de custo abaixo da qual duas soluções são consideradas iguais
+TOLERANCIA = 1e-9
+
+# Tempo da busca (segundos) antes de devolver a melhor divisão encontrada
+TEMPO_MAXIMO = 0.08
+
+
+class MatrizPrecos:
+    """Preços unitários dos itens (linhas) em cada supermercado (colunas)
+
+    precos[i, s] é NaN quando o item i não tem preço no supermercado s.
+    """
+
+    def __init__(self, produtos, quantidades, supermercados, precos):
+        self.produtos = list(produtos)            # nomes exibidos dos itens
+        self.quantidades = np.asarray(quantidades, dtype=float)
+        self.supermercados = list(supermercados)  # nomes dos supermercados
+        self.precos = np.asarray(precos, dtype=float).reshape(len(self.produtos),
+                                                              len(self.supermercados))
+
+    @property
+    def custos(self):
+        """Custo de cada item (preço x quantidade) em cada supermercado"""
+        return self.precos * self.quantidades[:, None]
+
+
+def carregar_matriz(lista_id, janela_dias=None, hoje=None):
+    """Monta a MatrizPrecos de uma lista
+
+    Sem janela_dias usa o último preço de cada supermercado; com ela, a
+    média das compras dos últimos janela_dias dias.
+    """
+    itens = itens_lista(lista_id)
+    desde = None
+    if janela_dias:
+        desde = (hoje or date.today()) - timedelta(days=janela_dias)
+    linhas = precos_por_supermercado([item[0] for item in itens], desde)
+
+    nomes = nomes_supermercados()
+    colunas = sorted({supermercado_id for _, supermercado_id, _ in linhas},
+                     key=lambda supermercado_id: nomes[supermercado_id])
+    indice_linha = {item[0]: i for i, item in enumerate(itens)}
+    indice_coluna = {supermercado_id: j for j, supermercado_id in enumerate(colunas)}
+
+    precos = np.full((len(itens), len(colunas)), np.nan)
+    for produto_id, supermercado_id, preco in linhas:
+        precos[indice_linha[produto_id], indice_coluna[supermercado_id]] = preco
+
+    return MatrizPrecos([formatar_nome_produto(nome, marca) for _, nome, marca, _ in itens],
+                        [item[3] for item in itens],
+                        [nomes[supermercado_id] for supermercado_id in colunas],
+                        precos)
+
+
+def comparar_supermercados(matriz):
+    """Retorna [(supermercado, total, itens com preço)], dos mais completos e baratos"""
+    custos = matriz.custos
+    totais = np.nansum(custos, axis=0)
+    cobertos = np.count_nonzero(~np.isnan(custos), axis=0)
+    ranking = zip(matriz.supermercados, totais.tolist(), cobertos.tolist())
+    return sorted(ranking, key=lambda r: (-r[2], r[1]))
+
+
+class ResultadoCesta:
+    """Melhor divisão de uma lista entre supermercados"""
+
+    def __init__(self, supermercados, itens, sem_preco, nao_cobertos, nos, exato, segundos):
+        self.supermercados = supermercados  # escolhidos, em ordem alfabética
+        self.itens = itens                  # [(produto, quantidade, supermercado, preço, custo)]
+        self.sem_preco = sem_preco          # itens sem preço em nenhum supermercado
+        self.nao_cobertos = nao_cobertos    # itens sem preço nos supermercados escolhidos
+        self.nos = nos                      # combinações examinadas pela busca
+        self.exato = exato                  # False se o tempo acabou antes do fim da busca
+        self.segundos = segundos
+
+    @property
+    def total(self):
+        return sum(item[4] for item in self.itens)
+
+    def por_supermercado(self):
+        """Retorna {supermercado: [itens]} na ordem de self.supermercados"""
+        grupos = {supermercado: [] for supermercado in self.supermercados}
+        for item in self.itens:
+            grupos[item[2]].append(item)
+        return grupos
+
+
+def _guloso(custos, limite):
+    """Solução inicial: acrescenta o supermercado que mais reduz o total"""
+    atual = custos.max(axis=0)
+    escolhidos = []
+    for _ in range(limite):
+        novos = np.minimum(atual, custos)
+        totais = novos.sum(axis=1)
+        totais[escolhidos] = np.inf
+        melhor = int(totais.argmin())
+        escolhidos.append(melhor)
+        atual = novos[melhor]
+    return atual.sum(), escolhidos
+
+
+def _melhorar_por_trocas(custos, escolhidos):
+    """Troca um supermercado escolhido por outro enquanto o total diminuir"""
+    escolhidos = list(escolhidos)
+    total = custos[escolhidos].min(axis=0).sum()
+    melhorou = len(escolhidos) < len(custos)
+    while melhorou:
+        melhorou = False
+        for i in range(len(escolhidos)):
+            outros = escolhidos[:i] + escolhidos[i + 1:]
+            base = custos[outros].min(axis=0) if outros else np.full(custos.shape[1], np.inf)
+            totais = np.minimum(base, custos).sum(axis=1)
+            totais[escolhidos] = np.inf
+            j = int(totais.argmin())
+            if totais[j] < total - TOLERANCIA:
+                escolhidos[i], total = j, totais[j]
+                melhorou = True
+    return total, escolhidos
+
+
+def _melhor_combinacao(custos, limite, prazo=None):
+    """Índices de até `limite` supermercados (linhas de custos) de menor custo total
+
+    custos tem um supermercado por linha e não tem NaN. Cada nó da busca
+    tem um custo parcial (o mínimo por item entre os escolhidos) e avalia
+    de uma vez, com numpy, o total ao acrescentar cada candidato. Os
+    candidatos são visitados do maior ganho para o menor, e cada filho só
+    pode acrescentar os que vêm depois dele; assim os últimos filhos têm
+    poucos candidatos, de ganho pequeno, e são descartados logo.
+
+    Os limites inferiores usam dois fatos: nenhum item sai mais barato que
+    o mínimo entre os candidatos, e o ganho de acrescentar vários
+    supermercados não passa da soma dos ganhos de cada um isoladamente.
+
+    Retorna (índices, nós, exato); exato é False se o prazo (em
+    perf_counter) acabou antes de a busca provar que a solução é a melhor.
+    """
+    melhor_total, melhor = _melhorar_por_trocas(custos, _guloso(custos, limite)[1])
+    nos = 0
+    exato = True
+
+    def buscar(candidatos, atual, escolhidos):
+        nonlocal melhor_total, melhor, nos, exato
+        faltam = limite - len(escolhidos)
+        totais = np.minimum(atual, custos[candidatos]).sum(axis=1)
+        nos += len(totais)
+        k = int(totais.argmin())
+        if totais[k] < melhor_total - TOLERANCIA:
+            melhor_total, melhor = float(totais[k]), escolhidos + [int(candidatos[k])]
+        if faltam == 1 or len(candidatos) == 1:
+            return
+
+        ganhos = atual.sum() - totais
+        ordem = np.argsort(-ganhos, kind='stable')
+        ganhos = ganhos[ordem]
+        candidatos = candidatos[ordem]
+        totais = totais[ordem]
+        if totais[0] - ganhos[1:faltam].sum() >= melhor_total - TOLERANCIA:
+            return
+        # Mínimo por item entre os candidatos p, p+1, ... (na nova ordem)
+        minimos = np.minimum.accumulate(custos[candidatos][::-1])[::-1]
+
+        for p in range(len(candidatos) - 1):
+            if ganhos[p] <= TOLERANCIA:
+                break
+            if prazo is not None and time.perf_counter() > prazo:
+                exato = False
+                return
+            # Os ganhos estão em ordem: os faltam - 1 seguintes são os maiores
+            if totais[p] - ganhos[p + 1:p + faltam].sum() >= melhor_total - TOLERANCIA:
+                continue
+            novo = np.minimum(atual, custos[candidatos[p]])
+            if np.minimum(novo, minimos[p + 1]).sum() >= melhor_total - TOLERANCIA:
+                continue
+            buscar(candidatos[p + 1:], novo, escolhidos + [int(candidatos[p])])
+
+    buscar(np.arange(len(custos)), custos.max(axis=0), [])
+    return melhor, nos, exato
+
+
+def otimizar_cesta(matriz, maximo_supermercados=1, tempo_maximo=TEMPO_MAXIMO):
+    """Divide a lista entre até maximo_supermercados supermercados, pelo menor total
+
+    Cobrir todos os itens tem prioridade sobre o preço: um item sem preço
+    nos supermercados escolhidos custa mais que qualquer lista completa.
+    Passados tempo_maximo segundos (None: sem limite), a busca para e
+    devolve a melhor divisão encontrada, com exato=False no resultado.
+    """
+    inicio = time.perf_counter()
+    custos = matriz.custos
+    com_preco = ~np.isnan(custos).all(axis=1)
+    sem_preco = [p for p, ok in zip(matriz.produtos, com_preco) if not ok]
+    linhas = np.flatnonzero(com_preco)
+    custos = custos[linhas]
+
+    nos = 0
+    exato = True
+    if len(linhas) == 0:
+        escolhidos = []
+    else:
+        penalidade = np.nanmax(custos, axis=1).sum() + 1
+        custos_busca = np.where(np.isnan(custos), penalidade, custos).T.copy()
+        limite = max(1, min(maximo_supermercados, custos_busca.shape[0]))
+        if limite == 1:
+            escolhidos = [int(custos_busca.sum(axis=1).argmin())]
+        else:
+            # Lojas mais baratas sozinhas primeiro: limites mais justos cedo
+            ordem = np.argsort(custos_busca.sum(axis=1), kind='stable')
+            prazo = None if tempo_maximo is None else inicio + tempo_maximo
+            indices, nos, exato = _melhor_combinacao(custos_busca[ordem], limite, prazo)
+            escolhidos = [int(ordem[i]) for i in indices]
+
+    itens = []
+    nao_cobertos = []
+    if escolhidos:
+        sub = custos[:, escolhidos]
+        cobertos = ~np.isnan(sub).all(axis=1)
+        melhores = np.argmin(np.where(np.isnan(sub), np.inf, sub), axis=1)
+        for k, linha in enumerate(linhas):
+            produto = matriz.produtos[linha]
+            if not cobertos[k]:
+                nao_cobertos.append(produto)
+                continue
+            coluna = escolhidos[melhores[k]]
+            itens.append((produto, float(matriz.quantidades[linha]),
+                          matriz.supermercados[coluna], float(matriz.precos[linha, coluna]),
+                          float(custos[k, coluna])))
+
+    # Só entram os supermercados em que de fato se compra algo
+    usados = sorted({item[2] for item in itens})
+    return ResultadoCesta(usados, itens, sem_preco, nao_cobertos, nos, exato,
+                          time.perf_counter() - inicio)
+
+
+def calcular_cesta(lista_id, maximo_supermercados=1, janela_dias=None):
+    """Retorna (comparar_supermercados, otimizar_cesta) da lista, lendo os preços uma vez"""
+    matriz = carregar_matriz(lista_id, janela_dias)
+    return comparar_supermercados(matriz), otimizar_cesta(matriz, maximo_supermercados)
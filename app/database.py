@@ -1,15 +1,353 @@
 # app/database.py
+import json
+import re
 import sqlite3
-import shutil
 import os
-from datetime import datetime
-from pathlib import Path
+import threading
+import time
+from datetime import date, datetime
 
-def init_db():
-    """Inicializa o banco de dados e cria as tabelas necessárias"""
-    conn = sqlite3.connect('supermercado.db')
-    cursor = conn.cursor()
+from app import anomalias, datas, eventos, instrumentacao, unidades
+from app.catalogo import Catalogo
+from app.utils import (normalizar_texto, parsear_data, extrair_nome_produto,
+                       extrair_marca_produto)
+
+DB_PATH = 'supermercado.db'
+
+# date <-> dia juliano em compras.data_compra (ver app/datas.py)
+datas.registrar_adaptadores()
+
+# Pragmas aplicados uma única vez, quando a conexão é aberta
+PRAGMAS_CONEXAO = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",      # ~16 MB de cache de páginas
+    "PRAGMA mmap_size = 268435456",    # 256 MB mapeados em memória
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class ConexaoPool(sqlite3.Connection):
+    """Conexão SQLite que volta para o pool ao ser fechada"""
+
+    _pool = None
+
+    def close(self):
+        """Devolve a conexão ao pool em vez de fechá-la"""
+        if self._pool is None or not self._pool.devolver(self):
+            super().close()
+
+    def fechar_definitivamente(self):
+        """Fecha a conexão de fato, sem devolvê-la ao pool"""
+        self._pool = None
+        super().close()
+
+
+# Comandos cujo plano pode ser obtido com EXPLAIN QUERY PLAN
+_COM_PLANO = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+# Listas de marcadores de tamanho variável (IN (?, ?, ...)) contam como uma consulta só
+_MARCADORES = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+def _texto_sql(sql):
+    """SQL em uma linha, usado como nome da métrica"""
+    return _MARCADORES.sub('?, …', ' '.join(sql.split()))
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mede cada comando, da execução até a última linha lida
+
+    Só é usado enquanto o diagnóstico está ativo (ver _instrumentar_conexoes).
+    O comando é registrado quando as linhas acabam, quando o cursor executa
+    outro comando ou quando é descartado.
+    """
+
+    _sql = None
+
+    def execute(self, sql, params=()):
+        self._registrar()
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._sql, self._params, self._inicio = sql, params, inicio
+            self._ms = (time.perf_counter() - inicio) * 1000
+            self._linhas = 0
+
+    def executemany(self, sql, seq_params):
+        self._registrar()
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_params)
+        finally:
+            instrumentacao.coletor.registrar('sql', _texto_sql(sql), inicio,
+                                             (time.perf_counter() - inicio) * 1000,
+                                             max(self.rowcount, 0))
+
+    def _ler(self, leitura, *args):
+        inicio = time.perf_counter()
+        linhas = leitura(*args)
+        self._ms += (time.perf_counter() - inicio) * 1000
+        return linhas
+
+    def fetchone(self):
+        linha = self._ler(super().fetchone)
+        if linha is None:
+            self._registrar()
+        else:
+            self._linhas += 1
+        return linha
+
+    def fetchmany(self, size=None):
+        tamanho = self.arraysize if size is None else size
+        linhas = self._ler(super().fetchmany, tamanho)
+        self._linhas += len(linhas)
+        if len(linhas) < tamanho:
+            self._registrar()
+        return linhas
+
+    def fetchall(self):
+        linhas = self._ler(super().fetchall)
+        self._linhas += len(linhas)
+        self._registrar()
+        return linhas
+
+    def __next__(self):
+        try:
+            linha = self._ler(super().__next__)
+        except StopIteration:
+            self._registrar()
+            raise
+        self._linhas += 1
+        return linha
+
+    def close(self):
+        self._registrar()
+        super().close()
+
+    def __del__(self):
+        self._registrar()
+
+    def _registrar(self):
+        """Registra o comando pendente; os lentos levam o plano de execução"""
+        if self._sql is None:
+            return
+        sql, params, ms = self._sql, self._params, self._ms
+        self._sql = None
+        instrumentacao.coletor.registrar('sql', _texto_sql(sql), self._inicio, ms, self._linhas)
+        if ms >= instrumentacao.LIMITE_LENTA_MS and sql.lstrip().upper().startswith(_COM_PLANO):
+            try:
+                plano = [linha[3] for linha in sqlite3.Connection.execute(
+                    self.connection, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+            except sqlite3.Error as e:
+                plano = [f"(plano indisponível: {e})"]
+            instrumentacao.coletor.registrar_lenta(sql.strip(), params, ms, self._linhas, plano)
+
+
+def _cursor_instrumentado(self, factory=CursorInstrumentado):
+    return sqlite3.Connection.cursor(self, factory)
+
+
+def _execute_instrumentado(self, sql, params=()):
+    return self.cursor().execute(sql, params)
+
+
+def _executemany_instrumentado(self, sql, seq_params):
+    return self.cursor().executemany(sql, seq_params)
+
+
+def _instrumentar_conexoes(ativo):
+    """Troca os métodos das conexões do pool pelos que medem cada comando
+
+    Desligado, os métodos voltam a ser os do sqlite3, sem custo algum.
+    """
+    metodos = {'cursor': _cursor_instrumentado, 'execute': _execute_instrumentado,
+               'executemany': _executemany_instrumentado}
+    for nome, metodo in metodos.items():
+        if ativo:
+            setattr(ConexaoPool, nome, metodo)
+        elif nome in vars(ConexaoPool):
+            delattr(ConexaoPool, nome)
+
+
+instrumentacao.registrar_gancho(_instrumentar_conexoes)
+
+
+class GerenciadorConexoes:
+    """Mantém um pequeno conjunto de conexões reutilizáveis com o banco"""
+
+    def __init__(self, caminho=DB_PATH, tamanho_max=4, cache_statements=256):
+        self.caminho = str(caminho)
+        self.tamanho_max = tamanho_max
+        self.cache_statements = cache_statements
+        self._livres = []
+        self._lock = threading.Lock()
+        self.abertas = 0
+        self.reutilizadas = 0
+
+    def _abrir(self):
+        """Abre uma nova conexão e aplica os pragmas de desempenho"""
+        conn = sqlite3.connect(self.caminho,
+                               factory=ConexaoPool,
+                               cached_statements=self.cache_statements,
+                               detect_types=sqlite3.PARSE_COLNAMES,
+                               check_same_thread=False)
+        # WAL é persistente no arquivo, mas só vale para bancos em disco
+        if self.caminho != ':memory:':
+            conn.execute("PRAGMA journal_mode = WAL")
+        for pragma in PRAGMAS_CONEXAO:
+            conn.execute(pragma)
+        # Usadas ao reinterpretar as medidas numéricas de todos os produtos
+        for funcao in (unidades.medida_base, unidades.unidade_base, unidades.fator_referencia):
+            conn.create_function(funcao.__name__, 2, funcao, deterministic=True)
+        conn._pool = self
+        self.abertas += 1
+        return conn
+
+    def obter(self):
+        """Retorna uma conexão livre do pool ou abre uma nova"""
+        with self._lock:
+            if self._livres:
+                self.reutilizadas += 1
+                return self._livres.pop()
+        return self._abrir()
+
+    def devolver(self, conn):
+        """Recebe uma conexão de volta; retorna False se ela deve ser fechada"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._livres) < self.tamanho_max:
+                self._livres.append(conn)
+                return True
+            self.abertas -= 1
+        return False
+
+    def fechar_todas(self):
+        """Fecha todas as conexões livres do pool"""
+        with self._lock:
+            livres, self._livres = self._livres, []
+            self.abertas -= len(livres)
+        for conn in livres:
+            conn.fechar_definitivamente()
+
+    def estatisticas(self):
+        """Retorna quantas conexões foram abertas e quantas foram reutilizadas"""
+        with self._lock:
+            return {
+                'caminho': self.caminho,
+                'abertas': self.abertas,
+                'livres': len(self._livres),
+                'reutilizadas': self.reutilizadas,
+            }
+
+
+_gerenciador = GerenciadorConexoes()
+
+
+def configurar_banco(caminho, **opcoes):
+    """Altera o arquivo do banco de dados usado pela aplicação"""
+    global _gerenciador, DB_PATH
+    _gerenciador.fechar_todas()
+    DB_PATH = str(caminho)
+    _gerenciador = GerenciadorConexoes(DB_PATH, **opcoes)
+    _catalogo.invalidar()
+    invalidar_historico()
+    return _gerenciador
+
+
+_catalogo = Catalogo()
+
+
+def obter_catalogo(recarregar=False):
+    """Catálogo em memória de produtos e supermercados, carregado no primeiro uso"""
+    if recarregar or not _catalogo.carregado:
+        conn = get_connection()
+        try:
+            _catalogo.carregar(conn)
+        finally:
+            conn.close()
+    return _catalogo
+
+
+# Numa falta, o catálogo é relido por completo no máximo uma vez neste
+# intervalo (segundos); nas demais, só as linhas novas são buscadas
+INTERVALO_RECARGA_CATALOGO = 30
+
+
+def atualizar_catalogo():
+    """Catálogo após uma falta: traz o que outro processo cadastrou
     
+    Uma falta pode ser um nome que não existe (um pedido da API, por
+    exemplo); por isso a recarga completa é limitada a uma por intervalo.
+    """
+    if not _catalogo.carregado:
+        return obter_catalogo()
+    conn = get_connection()
+    try:
+        if time.monotonic() - _catalogo.carregado_em >= INTERVALO_RECARGA_CATALOGO:
+            _catalogo.carregar(conn)
+        else:
+            _catalogo.carregar_novos(conn)
+    finally:
+        conn.close()
+    return _catalogo
+
+
+def invalidar_catalogo():
+    """Descarta o catálogo após escritas que não passam pelas funções deste módulo"""
+    _catalogo.invalidar()
+
+
+_historico = None
+_lock_historico = threading.Lock()
+
+
+def obter_historico():
+    """Histórico colunar das compras (app/analise.py), carregado no primeiro uso
+
+    A cada chamada recebe as compras gravadas desde a anterior (só as com
+    id maior que o último carregado).
+    """
+    global _historico
+    with _lock_historico:
+        if _historico is None:
+            # Importado aqui: o numpy só é carregado quando o histórico é usado
+            from app.analise import HistoricoColunar
+            _historico = HistoricoColunar()
+        historico = _historico
+    conn = get_connection()
+    try:
+        if historico.carregado:
+            historico.sincronizar(conn)
+        else:
+            historico.carregar(conn)
+    finally:
+        conn.close()
+    return historico
+
+
+def invalidar_historico():
+    """Descarta o histórico colunar após substituir ou excluir compras fora deste módulo"""
+    if _historico is not None:
+        _historico.invalidar()
+
+
+def _resolver_produto(produto_nome, marca=''):
+    """Id do produto pelo catálogo; numa falta, tenta de novo após
+    atualizar_catalogo (outro processo pode ter cadastrado o produto)"""
+    produto_id = obter_catalogo().resolver_produto(produto_nome, marca)
+    if produto_id is None:
+        produto_id = atualizar_catalogo().resolver_produto(produto_nome, marca)
+    return produto_id
+
+
+def estatisticas_conexoes():
+    """Retorna as estatísticas de uso do pool de conexões"""
+    return _gerenciador.estatisticas()
+
+
+def _migracao_esquema_inicial(cursor):
+    """Cria as tabelas básicas e as categorias padrão"""
     # Tabela de supermercados
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS supermercados (
@@ -57,9 +395,6 @@ def init_db():
         FOREIGN KEY (supermercado_id) REFERENCES supermercados(id)
     )
     ''')
-
-    adicionar_coluna_quem_pagou()
-
     
     # Inserir categorias padrão
     categorias_padrao = [
@@ -70,53 +405,632 @@ def init_db():
     
     for categoria in categorias_padrao:
         cursor.execute('INSERT OR IGNORE INTO categorias (nome) VALUES (?)', (categoria,))
+
+
+def _colunas(cursor, tabela):
+    """Retorna os nomes das colunas de uma tabela"""
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    return [col[1] for col in cursor.fetchall()]
+
+
+def _migracao_colunas_antigas(cursor):
+    """Adiciona qnt_medida e quem_pagou em bancos criados antes desses campos"""
+    if 'qnt_medida' not in _colunas(cursor, 'produtos'):
+        cursor.execute("ALTER TABLE produtos ADD COLUMN qnt_medida TEXT DEFAULT ''")
     
-    conn.commit()
-    conn.close()
+    if 'quem_pagou' not in _colunas(cursor, 'compras'):
+        cursor.execute("ALTER TABLE compras ADD COLUMN quem_pagou TEXT DEFAULT ''")
+
+
+def _migracao_indices(cursor):
+    """Cria índices de cobertura para as consultas da interface"""
+    # Consulta/estatísticas/gráfico por produto, em ordem de data
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_compras_produto_data
+    ON compras (produto_id, data_compra, supermercado_id, preco, quantidade)
+    ''')
     
-    # Verificar e adicionar coluna qnt_medida se não existir
-    adicionar_coluna_qnt_medida()
+    # Consulta filtrada por supermercado
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_compras_supermercado_data
+    ON compras (supermercado_id, data_compra, produto_id, preco, quantidade)
+    ''')
+    
+    # Últimas compras (ORDER BY data_compra DESC LIMIT 20)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_compras_data ON compras (data_compra)")
+    
+    # Busca exata pelo nome no registro e listagem ordenada
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_produtos_nome ON produtos (nome)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_supermercados_nome ON supermercados (nome)")
 
 
-def adicionar_coluna_qnt_medida():
-    """Adiciona a coluna qnt_medida se não existir na tabela produtos"""
-    conn = sqlite3.connect('supermercado.db')
-    cursor = conn.cursor()
+# Letras acentuadas do português e a forma de normalizar_texto ("Ç" -> "c"),
+# para que os gatilhos da busca não dependam de funções Python. São só
+# estas porque o SQLite limita o aninhamento de replace() a ~30 níveis.
+_LETRAS_ACENTUADAS = tuple((letra, normalizar_texto(letra))
+                           for letra in 'áàâãéêíóôõúüçÁÀÂÃÉÊÍÓÔÕÚÜÇ')
+
+
+def _sql_sem_acentos(expressao):
+    """Expressão SQL equivalente a normalizar_texto(expressao) para textos em português"""
+    for letra, simples in _LETRAS_ACENTUADAS:
+        expressao = f"replace({expressao}, '{letra}', '{simples}')"
+    return f"lower({expressao})"
+
+
+def _migracao_busca_produtos(cursor):
+    """Cria o índice FTS5 (trigramas) de nome/marca dos produtos"""
+    # O texto é gravado sem acentos e em minúsculas, para que "acucar"
+    # encontre "Açúcar"; o rowid é o id do produto
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca
+    USING fts5(nome, marca, tokenize = 'trigram')
+    ''')
+    
+    _criar_gatilhos_busca(cursor)
+    
+    # Indexar os produtos já cadastrados
+    cursor.execute("DELETE FROM produtos_busca")
+    cursor.execute(f'''
+    INSERT INTO produtos_busca (rowid, nome, marca)
+    SELECT id, {_sql_sem_acentos('nome')}, {_sql_sem_acentos('marca')} FROM produtos
+    ''')
+
+
+def _criar_gatilhos_busca(cursor):
+    """Cria os gatilhos que mantêm produtos_busca, só com SQL
+    
+    Assim o sqlite3 de linha de comando e outros programas também podem
+    gravar em produtos sem as funções registradas por GerenciadorConexoes.
+    """
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS produtos_busca_ai AFTER INSERT ON produtos BEGIN
+        INSERT INTO produtos_busca (rowid, nome, marca)
+        VALUES (new.id, {_sql_sem_acentos('new.nome')}, {_sql_sem_acentos('new.marca')});
+    END
+    ''')
+    
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS produtos_busca_ad AFTER DELETE ON produtos BEGIN
+        DELETE FROM produtos_busca WHERE rowid = old.id;
+    END
+    ''')
+    
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS produtos_busca_au AFTER UPDATE OF nome, marca ON produtos BEGIN
+        UPDATE produtos_busca
+        SET nome = {_sql_sem_acentos('new.nome')}, marca = {_sql_sem_acentos('new.marca')}
+        WHERE rowid = new.id;
+    END
+    ''')
+
+
+# Períodos dos agregados de preço: código -> (início do período, duração)
+PERIODOS_AGREGADOS = {
+    'D': ("date({data})", '+1 day'),                            # dia
+    'S': ("date({data}, 'weekday 0', '-6 days')", '+7 days'),   # semana (segunda)
+    'M': ("date({data}, 'start of month')", '+1 month'),        # mês
+}
+
+
+def _sql_recalcular_agregado(periodo, ref):
+    """SQL que recalcula um único agregado a partir das compras (ref = old/new)"""
+    inicio, duracao = PERIODOS_AGREGADOS[periodo]
+    inicio_ref = inicio.format(data=f'{ref}.data_compra')
+    # data_compra é o dia juliano; julianday() das bordas (meia-noite) fica
+    # meio dia abaixo, então >= e < delimitam exatamente os dias do período
+    return f'''
+        DELETE FROM precos_agregados
+        WHERE produto_id = {ref}.produto_id AND periodo = '{periodo}'
+          AND inicio = {inicio_ref} AND supermercado_id = {ref}.supermercado_id;
+        INSERT INTO precos_agregados
+        SELECT produto_id, '{periodo}', {inicio_ref}, supermercado_id,
+               MIN(preco / quantidade), MAX(preco / quantidade), SUM(preco / quantidade),
+               COUNT(*), date(MIN(data_compra)), date(MAX(data_compra))
+        FROM compras
+        WHERE produto_id = {ref}.produto_id AND supermercado_id = {ref}.supermercado_id
+          AND quantidade > 0
+          AND data_compra >= julianday({inicio_ref})
+          AND data_compra < julianday({inicio_ref}, '{duracao}')
+        GROUP BY produto_id, supermercado_id;'''
+
+
+def _migracao_agregados(cursor):
+    """Cria os agregados de preço por produto/supermercado/período"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS precos_agregados (
+        produto_id INTEGER NOT NULL,
+        periodo TEXT NOT NULL,           -- 'D' dia, 'S' semana, 'M' mês
+        inicio DATE NOT NULL,            -- primeiro dia do período
+        supermercado_id INTEGER NOT NULL,
+        minimo REAL NOT NULL,
+        maximo REAL NOT NULL,
+        soma REAL NOT NULL,
+        contagem INTEGER NOT NULL,
+        primeira_compra DATE NOT NULL,
+        ultima_compra DATE NOT NULL,
+        PRIMARY KEY (produto_id, periodo, inicio, supermercado_id)
+    ) WITHOUT ROWID
+    ''')
+    
+    _criar_gatilhos_agregados(cursor)
+    _reconstruir_agregados(cursor)
+
+
+def _criar_gatilhos_agregados(cursor):
+    """Cria os gatilhos que mantêm precos_agregados a cada escrita em compras"""
+    # Inserção: atualiza os três períodos sem reler as compras
+    atualizacoes = ''.join(f'''
+        INSERT INTO precos_agregados
+        VALUES (new.produto_id, '{periodo}', {inicio.format(data='new.data_compra')},
+                new.supermercado_id, new.preco / new.quantidade, new.preco / new.quantidade,
+                new.preco / new.quantidade, 1, date(new.data_compra), date(new.data_compra))
+        ON CONFLICT (produto_id, periodo, inicio, supermercado_id) DO UPDATE SET
+            minimo = MIN(minimo, excluded.minimo),
+            maximo = MAX(maximo, excluded.maximo),
+            soma = soma + excluded.soma,
+            contagem = contagem + 1,
+            primeira_compra = MIN(primeira_compra, excluded.primeira_compra),
+            ultima_compra = MAX(ultima_compra, excluded.ultima_compra);'''
+        for periodo, (inicio, _) in PERIODOS_AGREGADOS.items())
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS compras_agregados_ai AFTER INSERT ON compras
+    WHEN new.quantidade > 0 BEGIN {atualizacoes}
+    END
+    ''')
     
+    # Exclusão/alteração: mínimo e máximo não podem ser "desfeitos", então o
+    # período afetado é recalculado (poucas linhas, pelo índice de produto)
+    recalculo_old = ''.join(_sql_recalcular_agregado(p, 'old') for p in PERIODOS_AGREGADOS)
+    recalculo_new = ''.join(_sql_recalcular_agregado(p, 'new') for p in PERIODOS_AGREGADOS)
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS compras_agregados_ad AFTER DELETE ON compras
+    BEGIN {recalculo_old}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS compras_agregados_au AFTER UPDATE OF
+        produto_id, supermercado_id, preco, quantidade, data_compra ON compras
+    BEGIN {recalculo_old} {recalculo_new}
+    END
+    ''')
+
+
+def _reconstruir_agregados(cursor):
+    """Recalcula todos os agregados a partir da tabela compras"""
+    cursor.execute("DELETE FROM precos_agregados")
+    for periodo, (inicio, _) in PERIODOS_AGREGADOS.items():
+        cursor.execute(f'''
+        INSERT INTO precos_agregados
+        SELECT produto_id, '{periodo}', {inicio.format(data='data_compra')}, supermercado_id,
+               MIN(preco / quantidade), MAX(preco / quantidade), SUM(preco / quantidade),
+               COUNT(*), date(MIN(data_compra)), date(MAX(data_compra))
+        FROM compras
+        WHERE quantidade > 0
+        GROUP BY 1, 2, 3, 4
+        ''')
+
+
+def reconstruir_agregados():
+    """Reconstrói por completo os agregados de preço e de gastos, o estado
+    dos preços e as medidas dos produtos; retorna (linhas de agregados de
+    preço, compras fora do padrão, promoções prováveis)"""
+    conn = get_connection()
+    cursor = conn.cursor()
     try:
-        # Verificar se a coluna qnt_medida existe
-        cursor.execute("PRAGMA table_info(produtos)")
-        colunas = [col[1] for col in cursor.fetchall()]
-        
-        if 'qnt_medida' not in colunas:
-            print("Adicionando coluna 'qnt_medida' à tabela produtos...")
-            cursor.execute("ALTER TABLE produtos ADD COLUMN qnt_medida TEXT DEFAULT ''")
-            conn.commit()
-            print("Coluna 'qnt_medida' adicionada com sucesso!")
-    except Exception as e:
-        print(f"Erro ao adicionar coluna: {e}")
+        cursor.execute("BEGIN")
+        # Produtos gravados por outros programas ficam sem as medidas
+        _atualizar_medidas(cursor)
+        _reconstruir_agregados(cursor)
+        _reconstruir_gastos(cursor)
+        anomalas, promocoes = _reconstruir_estado_precos(cursor)
+        total = cursor.execute("SELECT COUNT(*) FROM precos_agregados").fetchone()[0]
+        conn.commit()
+        return total, anomalas, promocoes
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
 
-def get_connection():
-    """Retorna uma conexão com o banco de dados"""
-    return sqlite3.connect('supermercado.db')
+def _migracao_unidades(cursor):
+    """Guarda qnt_medida/unidade_medida como números (medida e unidade base)
+
+    fator_referencia multiplica o preço unitário e dá o preço por kg, L ou
+    unidade; a medida é interpretada uma vez por produto, ao gravá-lo.
+    """
+    colunas = _colunas(cursor, 'produtos')
+    for coluna, tipo in (('medida_base', 'REAL'), ('unidade_base', 'TEXT'),
+                         ('fator_referencia', 'REAL')):
+        if coluna not in colunas:
+            cursor.execute(f"ALTER TABLE produtos ADD COLUMN {coluna} {tipo}")
+    _atualizar_medidas(cursor)
+
+
+def _atualizar_medidas(cursor):
+    """Reinterpreta as medidas de todos os produtos (app/unidades.py)"""
+    cursor.execute('''
+    UPDATE produtos SET
+        medida_base = medida_base(qnt_medida, unidade_medida),
+        unidade_base = unidade_base(qnt_medida, unidade_medida),
+        fator_referencia = fator_referencia(qnt_medida, unidade_medida)
+    ''')
+
+
+def _migracao_listas(cursor):
+    """Cria as listas de compra e a visão do último preço por produto/supermercado"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS listas_compras (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS itens_lista (
+        lista_id INTEGER NOT NULL,
+        produto_id INTEGER NOT NULL,
+        quantidade REAL NOT NULL DEFAULT 1,
+        PRIMARY KEY (lista_id, produto_id),
+        FOREIGN KEY (lista_id) REFERENCES listas_compras(id),
+        FOREIGN KEY (produto_id) REFERENCES produtos(id)
+    ) WITHOUT ROWID
+    ''')
+    
+    # Cobre a visão abaixo: para cada produto, os dias de cada supermercado
+    # já vêm em ordem, e MAX(inicio) não precisa ler a tabela
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_agregados_ultimo_preco
+    ON precos_agregados (periodo, produto_id, supermercado_id, inicio, soma, contagem)
+    ''')
+    
+    # Preço unitário médio do último dia com compra; com MAX(), o SQLite
+    # garante que soma e contagem vêm da mesma linha que o máximo
+    cursor.execute('''
+    CREATE VIEW IF NOT EXISTS ultimos_precos AS
+    SELECT produto_id, supermercado_id, MAX(inicio) AS data,
+           soma / contagem AS preco_unitario
+    FROM precos_agregados
+    WHERE periodo = 'D'
+    GROUP BY produto_id, supermercado_id
+    ''')
+
+
+# Dimensões dos gastos mensais: código -> chave da compra (ref = old/new)
+DIMENSOES_GASTOS = {
+    'P': "COALESCE({ref}.quem_pagou, '')",                                  # quem pagou
+    'C': "COALESCE((SELECT categoria_id FROM produtos WHERE id = {ref}.produto_id), 0)",  # categoria
+    'S': "{ref}.supermercado_id",                                           # supermercado
+}
+
+MES_GASTOS = "date({data}, 'start of month')"
+
+
+def _sql_somar_gasto(ref, sinal):
+    """SQL que soma (sinal='+') ou desconta (sinal='-') a compra ref dos gastos"""
+    mes = MES_GASTOS.format(data=f'{ref}.data_compra')
+    comandos = []
+    for dimensao, chave in DIMENSOES_GASTOS.items():
+        chave = chave.format(ref=ref)
+        comandos.append(f'''
+        INSERT INTO gastos_mensais VALUES ({mes}, '{dimensao}', {chave}, {sinal}{ref}.preco, {sinal}1)
+        ON CONFLICT (dimensao, mes, chave) DO UPDATE SET
+            total = total + excluded.total,
+            compras = compras + excluded.compras;''')
+        if sinal == '-':
+            comandos.append(f'''
+        DELETE FROM gastos_mensais
+        WHERE dimensao = '{dimensao}' AND mes = {mes} AND chave = {chave} AND compras = 0;''')
+    return ''.join(comandos)
+
+
+def _migracao_gastos(cursor):
+    """Cria os gastos por mês e quem pagou, categoria e supermercado
+    
+    Somas e contagens podem ser desfeitas, então inserir, excluir ou alterar
+    uma compra mexe só nas suas linhas, sem reler a tabela compras.
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS gastos_mensais (
+        mes DATE NOT NULL,               -- primeiro dia do mês
+        dimensao TEXT NOT NULL,          -- 'P' quem pagou, 'C' categoria, 'S' supermercado
+        chave NOT NULL,                  -- quem_pagou, categoria_id (0: sem) ou supermercado_id
+        total REAL NOT NULL,
+        compras INTEGER NOT NULL,
+        PRIMARY KEY (dimensao, mes, chave)
+    ) WITHOUT ROWID
+    ''')
+    
+    _criar_gatilhos_gastos(cursor)
+    
+    # Trocar a categoria do produto move os seus gastos (só as compras dele)
+    mes = MES_GASTOS.format(data='data_compra')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS produtos_gastos_au AFTER UPDATE OF categoria_id ON produtos
+    WHEN old.categoria_id IS NOT new.categoria_id BEGIN
+        INSERT INTO gastos_mensais
+        SELECT {mes}, 'C', COALESCE(old.categoria_id, 0), -SUM(preco), -COUNT(*)
+        FROM compras WHERE produto_id = new.id GROUP BY 1
+        ON CONFLICT (dimensao, mes, chave) DO UPDATE SET
+            total = total + excluded.total,
+            compras = compras + excluded.compras;
+        DELETE FROM gastos_mensais
+        WHERE dimensao = 'C' AND chave = COALESCE(old.categoria_id, 0) AND compras = 0;
+        INSERT INTO gastos_mensais
+        SELECT {mes}, 'C', COALESCE(new.categoria_id, 0), SUM(preco), COUNT(*)
+        FROM compras WHERE produto_id = new.id GROUP BY 1
+        ON CONFLICT (dimensao, mes, chave) DO UPDATE SET
+            total = total + excluded.total,
+            compras = compras + excluded.compras;
+    END
+    ''')
+    
+    _reconstruir_gastos(cursor)
+
+
+def _criar_gatilhos_gastos(cursor):
+    """Cria os gatilhos que somam e descontam cada compra de gastos_mensais"""
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS compras_gastos_ai AFTER INSERT ON compras
+    BEGIN {_sql_somar_gasto('new', '+')}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS compras_gastos_ad AFTER DELETE ON compras
+    BEGIN {_sql_somar_gasto('old', '-')}
+    END
+    ''')
+    # A categoria vem do produto: lida depois da alteração, vale para old e new
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS compras_gastos_au AFTER UPDATE OF
+        produto_id, supermercado_id, preco, data_compra, quem_pagou ON compras
+    BEGIN {_sql_somar_gasto('old', '-')} {_sql_somar_gasto('new', '+')}
+    END
+    ''')
+
+
+def _reconstruir_gastos(cursor):
+    """Recalcula todos os gastos mensais a partir da tabela compras"""
+    cursor.execute("DELETE FROM gastos_mensais")
+    mes = MES_GASTOS.format(data='c.data_compra')
+    for dimensao, chave in DIMENSOES_GASTOS.items():
+        if dimensao == 'C':
+            # LEFT JOIN: compra de produto excluído conta como "sem categoria", como no gatilho
+            chave, origem = "COALESCE(p.categoria_id, 0)", "LEFT JOIN produtos p ON p.id = c.produto_id"
+        else:
+            chave, origem = chave.format(ref='c'), ""
+        cursor.execute(f'''
+        INSERT INTO gastos_mensais
+        SELECT {mes}, '{dimensao}', {chave}, SUM(c.preco), COUNT(*)
+        FROM compras c {origem}
+        GROUP BY 1, 3
+        ''')
+
+
+def _migracao_estado_precos(cursor):
+    """Cria o estado (EWMA, variância, últimos preços) de cada produto/supermercado"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS estado_precos (
+        produto_id INTEGER NOT NULL,
+        supermercado_id INTEGER NOT NULL,
+        contagem INTEGER NOT NULL,
+        ewma REAL NOT NULL,
+        variancia REAL NOT NULL,
+        janela TEXT NOT NULL,            -- últimos preços unitários (JSON)
+        ultima_data DATE NOT NULL,
+        PRIMARY KEY (produto_id, supermercado_id)
+    ) WITHOUT ROWID
+    ''')
+    
+    _criar_gatilho_estado_precos(cursor)
+    _reconstruir_estado_precos(cursor)
+
+
+def _criar_gatilho_estado_precos(cursor):
+    """Cria o gatilho que atualiza o estado dos preços a cada compra nova"""
+    # Cada compra nova entra no estado em O(1). Compras fora de ordem,
+    # alteradas ou excluídas só são consideradas ao reconstruir o estado.
+    # A janela é mantida com as funções JSON do SQLite, sem funções Python.
+    alfa = anomalias.ALFA
+    janela = anomalias.JANELA_MEDIANA
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS compras_estado_ai AFTER INSERT ON compras
+    WHEN new.quantidade > 0 BEGIN
+        INSERT INTO estado_precos
+        VALUES (new.produto_id, new.supermercado_id, 1, new.preco / new.quantidade, 0,
+                json_array(new.preco / new.quantidade), date(new.data_compra))
+        ON CONFLICT (produto_id, supermercado_id) DO UPDATE SET
+            contagem = contagem + 1,
+            ewma = ewma + {alfa} * (excluded.ewma - ewma),
+            variancia = (1 - {alfa}) * (variancia + {alfa} * (excluded.ewma - ewma)
+                                                           * (excluded.ewma - ewma)),
+            janela = json_insert(CASE WHEN json_array_length(janela) >= {janela}
+                                      THEN json_remove(janela, '$[0]') ELSE janela END,
+                                 '$[#]', excluded.ewma),
+            ultima_data = MAX(ultima_data, excluded.ultima_data);
+    END
+    ''')
+
+
+# Linhas lidas por vez ao percorrer as compras
+LOTE_HISTORICO = 100_000
+
+
+def _reconstruir_estado_precos(cursor):
+    """Recalcula o estado dos preços percorrendo todas as compras em ordem de data
+    
+    Retorna (compras fora do padrão, promoções prováveis) no histórico.
+    """
+    cursor.execute("DELETE FROM estado_precos")
+    cursor.execute('''
+    SELECT id, produto_id, supermercado_id, julianday(data_compra), preco / quantidade
+    FROM compras
+    WHERE quantidade > 0
+    ''')
+    lote = cursor.fetchmany(LOTE_HISTORICO)
+    if not lote:
+        return 0, 0
+    
+    # Importado aqui: o numpy só é carregado quando há histórico a percorrer
+    import numpy as np
+    lotes = []
+    while lote:
+        lotes.append(np.array(lote, dtype=float))
+        lote = cursor.fetchmany(LOTE_HISTORICO)
+    ids, produtos, supermercados, datas, precos = np.concatenate(lotes).T
+    del lotes
+    # Mesma ordem em que o gatilho veria as compras: data e, no mesmo dia, id
+    ordem = np.lexsort((ids, datas, supermercados, produtos))
+    produtos, supermercados, datas, precos = (produtos[ordem], supermercados[ordem],
+                                              datas[ordem], precos[ordem])
+    novo = np.ones(len(ordem), dtype=bool)
+    novo[1:] = (produtos[1:] != produtos[:-1]) | (supermercados[1:] != supermercados[:-1])
+    resultado = anomalias.calcular_historico(np.cumsum(novo), precos)
+    
+    # Estado final: a última compra de cada grupo
+    ultimas = np.flatnonzero(np.append(novo[1:], True))
+    primeiras = np.flatnonzero(novo)
+    cursor.executemany(
+        "INSERT INTO estado_precos VALUES (?, ?, ?, ?, ?, ?, date(?))",
+        ((int(produtos[u]), int(supermercados[u]), int(resultado['contagem'][u]),
+          float(resultado['ewma'][u]), float(resultado['variancia'][u]),
+          json.dumps(precos[max(p, u - anomalias.JANELA_MEDIANA + 1):u + 1].tolist()),
+          float(datas[u]))
+         for p, u in zip(primeiras, ultimas)))
+    return int(resultado['anomalo'].sum()), int(resultado['promocao'].sum())
+
+
+# Gatilhos de compras, recriados quando o formato de data_compra muda
+GATILHOS_COMPRAS = (
+    'compras_agregados_ai', 'compras_agregados_ad', 'compras_agregados_au',
+    'compras_gastos_ai', 'compras_gastos_ad', 'compras_gastos_au', 'compras_estado_ai',
+)
+
+
+def _migracao_datas_inteiras(cursor):
+    """Converte compras.data_compra de texto AAAA-MM-DD para o dia juliano (inteiro)
+
+    Os gatilhos são removidos antes da conversão (a data de cada compra não
+    muda, então agregados, gastos e estado continuam válidos) e recriados
+    depois. Textos que não são datas ficam como estão.
+    """
+    for gatilho in GATILHOS_COMPRAS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {gatilho}")
+    cursor.execute('''
+    UPDATE compras
+    SET data_compra = COALESCE(CAST(julianday(data_compra) + 0.5 AS INTEGER), data_compra)
+    WHERE typeof(data_compra) = 'text'
+    ''')
+    _criar_gatilhos_agregados(cursor)
+    _criar_gatilhos_gastos(cursor)
+    _criar_gatilho_estado_precos(cursor)
+
+
+def _migracao_notas_fiscais(cursor):
+    """Guarda o CNPJ dos supermercados, o EAN dos produtos e as notas já importadas
+
+    Com eles a importação de NFC-e/NF-e (app/notas_fiscais.py) reconhece a
+    loja e o produto sem depender do nome, e não importa a mesma nota duas vezes.
+    """
+    if 'cnpj' not in _colunas(cursor, 'supermercados'):
+        cursor.execute("ALTER TABLE supermercados ADD COLUMN cnpj TEXT")
+    if 'ean' not in _colunas(cursor, 'produtos'):
+        cursor.execute("ALTER TABLE produtos ADD COLUMN ean TEXT")
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_supermercados_cnpj ON supermercados (cnpj)
+    WHERE cnpj IS NOT NULL
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_produtos_ean ON produtos (ean) WHERE ean IS NOT NULL
+    ''')
+
+    # Chave de acesso (44 dígitos) de cada nota importada
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS notas_importadas (
+        chave TEXT PRIMARY KEY,
+        supermercado_id INTEGER,
+        data_compra DATE,
+        itens INTEGER NOT NULL,
+        data_importacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (supermercado_id) REFERENCES supermercados(id)
+    )
+    ''')
+
+
+# Migrações em ordem; a posição na lista (a partir de 1) é a versão do esquema
+MIGRACOES = [
+    _migracao_esquema_inicial,
+    _migracao_colunas_antigas,
+    _migracao_indices,
+    _migracao_busca_produtos,
+    _migracao_agregados,
+    _migracao_unidades,
+    _migracao_listas,
+    _migracao_gastos,
+    _migracao_estado_precos,
+    _migracao_datas_inteiras,
+    _migracao_notas_fiscais,
+]
+
 
+def versao_esquema(conn):
+    """Retorna a versão do esquema gravada em PRAGMA user_version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
 
-def fazer_backup():
-    """Faz backup do banco de dados"""
-    backup_dir = Path('backups')
-    backup_dir.mkdir(exist_ok=True)
+
+def aplicar_migracoes(conn):
+    """Executa, uma única vez cada, as migrações ainda não aplicadas"""
+    versao_atual = versao_esquema(conn)
+    aplicadas = []
     
-    data_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = backup_dir / f'supermercado_{data_hora}.db'
+    for versao, migracao in enumerate(MIGRACOES, start=1):
+        if versao <= versao_atual:
+            continue
+        
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            migracao(cursor)
+            cursor.execute(f"PRAGMA user_version = {versao}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        aplicadas.append(versao)
     
-    if Path('supermercado.db').exists():
-        shutil.copy2('supermercado.db', backup_path)
-        print(f"Backup criado: {backup_path}")
-        return str(backup_path)
-    return None
+    return aplicadas
+
+
+# Versão mínima do SQLite: tokenizador trigram do FTS5 (3.34) e o
+# caminho JSON '$[#]' do gatilho de estado_precos (3.31)
+SQLITE_MINIMO = (3, 34, 0)
+
+
+def verificar_sqlite():
+    """Falha com uma mensagem clara se o SQLite do Python for antigo demais"""
+    if sqlite3.sqlite_version_info < SQLITE_MINIMO:
+        minimo = '.'.join(map(str, SQLITE_MINIMO))
+        raise RuntimeError(
+            f"É necessário o SQLite {minimo} ou mais recente (este Python usa o "
+            f"{sqlite3.sqlite_version}). Atualize o Python ou a biblioteca SQLite.")
+
+
+def init_db():
+    """Inicializa o banco de dados e aplica as migrações pendentes"""
+    verificar_sqlite()
+    conn = get_connection()
+    try:
+        aplicadas = aplicar_migracoes(conn)
+        if aplicadas:
+            print(f"Migrações aplicadas: {aplicadas}")
+    finally:
+        conn.close()
+
+
+def get_connection():
+    """Retorna uma conexão do pool; conn.close() a devolve para reutilização"""
+    return _gerenciador.obter()
 
 
 def validar_data_compra(data_str):
@@ -143,47 +1057,1071 @@ def validar_preco(preco_str):
         return False, "Preço inválido! Use números (ex: 5.99 ou 5,99)"
 
 
-def buscar_produtos_similares(termo, limite=5):
-    """Busca produtos similares ao termo digitado"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT nome, marca FROM produtos 
-    WHERE nome LIKE ? OR marca LIKE ?
-    ORDER BY nome
-    LIMIT ?
-    ''', (f'%{termo}%', f'%{termo}%', limite))
-    
+def validar_datas_lote(textos):
+    """Aplica as regras de validar_data_compra a uma coluna inteira de datas
+
+    Retorna uma lista de (True, date) ou (False, mensagem). Cada valor
+    distinto é convertido uma única vez; aceita também AAAA-MM-DD.
+    """
+    data_atual = datetime.now().date()
+    convertidas = {}
+    resultado = []
+    for texto in textos:
+        if texto not in convertidas:
+            data_compra = parsear_data(texto.strip()) if texto else None
+            if data_compra is None:
+                convertidas[texto] = (False, "Data inválida! Use o formato DD/MM/AAAA")
+            elif data_compra > data_atual:
+                convertidas[texto] = (False, "A data da compra não pode ser futura!")
+            else:
+                convertidas[texto] = (True, data_compra)
+        resultado.append(convertidas[texto])
+    return resultado
+
+
+def validar_precos_lote(textos):
+    """Aplica as regras de validar_preco a uma coluna inteira de preços"""
+    return [validar_preco(texto or '') for texto in textos]
+
+
+def validar_compra(produto_texto, supermercado, preco_texto, data_texto, quantidade_texto='1'):
+    """Valida os campos de uma compra como foram digitados
+
+    Retorna (True, dados) ou (False, mensagem de erro). dados tem
+    produto_nome, marca ("Nome (Marca)" é separado), supermercado, preco,
+    quantidade e data_compra (date), prontos para inserir_compra. A data
+    aceita DD/MM/AAAA ou AAAA-MM-DD e não pode ser futura.
+    """
+    campos = [str(campo).strip() if campo is not None else ''
+              for campo in (produto_texto, supermercado, preco_texto, data_texto,
+                            quantidade_texto)]
+    if not all(campos):
+        return False, "Preencha todos os campos obrigatórios!"
+    produto_texto, supermercado, preco_texto, data_texto, quantidade_texto = campos
+
+    valido, data_compra = validar_datas_lote([data_texto])[0]
+    if not valido:
+        return False, data_compra
+
+    valido, preco = validar_preco(preco_texto)
+    if not valido:
+        return False, preco
+
+    try:
+        quantidade = float(quantidade_texto.replace(',', '.'))
+    except ValueError:
+        return False, f"Quantidade inválida: {quantidade_texto}"
+    if quantidade <= 0:
+        return False, "A quantidade deve ser maior que zero!"
+
+    return True, {
+        'produto_nome': extrair_nome_produto(produto_texto),
+        'marca': extrair_marca_produto(produto_texto),
+        'supermercado': supermercado,
+        'preco': preco,
+        'quantidade': quantidade,
+        'data_compra': data_compra,
+    }
+
+
+def formatar_nome_produto(nome, marca):
+    """Formata o produto como 'Nome (Marca)' ou apenas 'Nome'"""
+    return f"{nome} ({marca})" if marca else nome
+
+
+# Quantos candidatos de cada etapa da busca são ordenados por relevância
+LIMITE_CANDIDATOS = 200
+
+
+def _etapas_busca(termo_norm):
+    """Retorna os filtros da busca, do mais relevante (prefixo) ao menos"""
+    # Prefixo do nome: com 3+ caracteres o LIKE usa o índice de trigramas
+    yield "nome LIKE :prefixo", {'prefixo': f'{termo_norm}%'}
+    
+    palavras = termo_norm.split()
+    if all(len(palavra) >= 3 for palavra in palavras):
+        # Cada palavra vira uma frase de trigramas; todas precisam aparecer
+        consulta = ' AND '.join('"' + palavra.replace('"', '""') + '"'
+                                for palavra in palavras)
+        yield "produtos_busca MATCH :consulta", {'consulta': consulta}
+    else:
+        # Trigramas exigem 3+ caracteres; termos curtos varrem o índice
+        yield "nome LIKE :padrao OR marca LIKE :padrao", {'padrao': f'%{termo_norm}%'}
+
+
+def buscar_produtos_similares(termo, limite=5):
+    """Busca produtos similares ao termo digitado usando o índice FTS5"""
+    termo_norm = normalizar_texto(termo).strip()
+    if not termo_norm:
+        return []
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    resultados = []
+    vistos = set()
+    for filtro, params in _etapas_busca(termo_norm):
+        if len(resultados) >= limite:
+            break
+        
+        # Só um número limitado de candidatos é ordenado, para que termos
+        # muito comuns não custem uma ordenação de todo o catálogo
+        params.update(termo=termo_norm, candidatos=LIMITE_CANDIDATOS,
+                      limite=limite + len(vistos))
+        cursor.execute(f'''
+        SELECT p.id, p.nome, p.marca
+        FROM (SELECT rowid, nome FROM produtos_busca WHERE {filtro} LIMIT :candidatos) b
+        JOIN produtos p ON p.id = b.rowid
+        ORDER BY instr(b.nome, :termo) = 0, instr(b.nome, :termo), length(b.nome), p.nome
+        LIMIT :limite
+        ''', params)
+        
+        for produto_id, nome, marca in cursor.fetchall():
+            if produto_id not in vistos and len(resultados) < limite:
+                vistos.add(produto_id)
+                resultados.append(formatar_nome_produto(nome, marca))
+    
+    conn.close()
+    return resultados
+
+
+def buscar_produtos_similares_like(termo, limite=5):
+    """Busca antiga com LIKE '%termo%' (mantida para comparação nos benchmarks)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT nome, marca FROM produtos 
+    WHERE nome LIKE ? OR marca LIKE ?
+    ORDER BY nome
+    LIMIT ?
+    ''', (f'%{termo}%', f'%{termo}%', limite))
+    
     resultados = cursor.fetchall()
     conn.close()
     
-    # Formata resultados: "Nome (Marca)" ou apenas "Nome"
-    produtos_formatados = []
-    for nome, marca in resultados:
-        if marca:
-            produtos_formatados.append(f"{nome} ({marca})")
-        else:
-            produtos_formatados.append(nome)
+    return [formatar_nome_produto(nome, marca) for nome, marca in resultados]
+
+
+# Consultas usadas pela interface (mantidas aqui para poderem ser
+# verificadas com EXPLAIN QUERY PLAN). O SQLite não consegue estimar a
+# seletividade de LIKE '%x%'; sem o CROSS JOIN, que fixa a ordem das tabelas,
+# ele prefere varrer compras inteira pela data em vez de usar os índices.
+LIMITE_ULTIMAS_COMPRAS = 20
+
+# "data_compra [dia]": a coluna volta como date (conversor de app/datas.py)
+SQL_ULTIMAS_COMPRAS = f'''
+SELECT c.data_compra AS "data_compra [dia]", p.nome, s.nome, c.preco, c.quantidade, c.promoção, c.quem_pagou
+FROM compras c
+JOIN produtos p ON c.produto_id = p.id
+JOIN supermercados s ON c.supermercado_id = s.id
+ORDER BY c.data_compra DESC
+LIMIT {LIMITE_ULTIMAS_COMPRAS}
+'''
+
+SQL_CONSULTA_PRECOS = '''
+SELECT c.data_compra AS "data_compra [dia]", p.nome, s.nome, c.preco, c.quantidade, 
+       c.preco/c.quantidade as preco_unitario, c.promoção, c.quem_pagou,
+       c.preco/c.quantidade * p.fator_referencia as preco_referencia, p.unidade_base
+'''
+
+ORIGEM_POR_PRODUTO = '''
+FROM produtos p
+CROSS JOIN compras c ON c.produto_id = p.id
+JOIN supermercados s ON c.supermercado_id = s.id
+'''
+
+ORIGEM_POR_SUPERMERCADO = '''
+FROM supermercados s
+CROSS JOIN compras c ON c.supermercado_id = s.id
+JOIN produtos p ON c.produto_id = p.id
+'''
+
+ORIGEM_COMPRAS = '''
+FROM compras c
+JOIN produtos p ON c.produto_id = p.id
+JOIN supermercados s ON c.supermercado_id = s.id
+'''
+
+# Unidade base comum aos produtos do filtro; NULL se misturam unidades ou
+# se algum não tem medida (aí o preço de referência não é comparável)
+SQL_UNIDADE_COMUM = '''CASE WHEN COUNT(DISTINCT p.unidade_base) = 1
+         AND COUNT(p.fator_referencia) = COUNT(*) THEN MIN(p.unidade_base) END'''
+
+# Estatísticas e gráfico leem os agregados (mensais/diários), cujo tamanho
+# não depende da quantidade de compras registradas no período
+SQL_ESTATISTICAS_PRODUTO = f'''
+SELECT 
+    MIN(a.minimo) as min_preco,
+    MAX(a.maximo) as max_preco,
+    SUM(a.soma) / SUM(a.contagem) as avg_preco,
+    COALESCE(SUM(a.contagem), 0) as total_compras,
+    MIN(a.primeira_compra) as primeira_compra,
+    MAX(a.ultima_compra) as ultima_compra,
+    MIN(a.minimo * p.fator_referencia) as min_referencia,
+    MAX(a.maximo * p.fator_referencia) as max_referencia,
+    SUM(a.soma * p.fator_referencia) / SUM(a.contagem) as avg_referencia,
+    {SQL_UNIDADE_COMUM} as unidade_base
+FROM produtos p
+CROSS JOIN precos_agregados a ON a.produto_id = p.id AND a.periodo = 'M'
+WHERE p.nome LIKE ?
+'''
+
+SQL_GRAFICO_PRODUTO = '''
+SELECT a.inicio, SUM(a.soma{referencia}) / SUM(a.contagem) as preco_unitario, s.nome
+FROM produtos p
+CROSS JOIN precos_agregados a ON a.produto_id = p.id AND a.periodo = 'D'
+JOIN supermercados s ON a.supermercado_id = s.id
+WHERE {condicoes}
+GROUP BY a.inicio, s.id
+ORDER BY a.inicio
+'''
+
+# Resumo barato dos agregados do gráfico: muda sempre que os dados (ou as
+# medidas dos produtos) mudam; a última coluna é a unidade base comum
+SQL_VERSAO_GRAFICO = f'''
+SELECT COUNT(*), TOTAL(a.soma), TOTAL(a.contagem), MAX(a.inicio), MAX(a.ultima_compra),
+       TOTAL(a.soma * p.fator_referencia), {SQL_UNIDADE_COMUM}
+FROM produtos p
+CROSS JOIN precos_agregados a ON a.produto_id = p.id AND a.periodo = 'D'
+WHERE {{condicoes}}
+'''
+
+# Preços por (produto, supermercado) dos itens de uma lista. O filtro
+# produto_id IN (?, ...) é levado para dentro da visão e usa o índice;
+# com uma subconsulta no IN a visão inteira seria calculada.
+SQL_ULTIMOS_PRECOS = '''
+SELECT produto_id, supermercado_id, preco_unitario
+FROM ultimos_precos
+WHERE produto_id IN ({marcadores})
+'''
+
+SQL_PRECOS_RECENTES = '''
+SELECT produto_id, supermercado_id, SUM(soma) / SUM(contagem)
+FROM precos_agregados
+WHERE periodo = 'D' AND produto_id IN ({marcadores}) AND inicio >= ?
+GROUP BY produto_id, supermercado_id
+'''
+
+# Resumo financeiro: lê só gastos_mensais (meses x chaves), nunca as compras
+SQL_GASTOS_POR_MES = '''
+SELECT mes, SUM(total), SUM(compras)
+FROM gastos_mensais
+WHERE dimensao = 'S' AND mes BETWEEN ? AND ?
+GROUP BY mes
+ORDER BY mes
+'''
+
+SQL_GASTOS_POR_DIMENSAO = {
+    'P': '''
+    SELECT CASE g.chave WHEN '' THEN 'Não informado' ELSE g.chave END,
+           SUM(g.total), SUM(g.compras)
+    FROM gastos_mensais g
+    WHERE g.dimensao = 'P' AND g.mes BETWEEN ? AND ?
+    GROUP BY g.chave
+    ORDER BY 2 DESC
+    ''',
+    'C': '''
+    SELECT COALESCE(c.nome, 'Sem categoria'), SUM(g.total), SUM(g.compras)
+    FROM gastos_mensais g
+    LEFT JOIN categorias c ON c.id = g.chave
+    WHERE g.dimensao = 'C' AND g.mes BETWEEN ? AND ?
+    GROUP BY g.chave
+    ORDER BY 2 DESC
+    ''',
+    'S': '''
+    SELECT COALESCE(s.nome, '?'), SUM(g.total), SUM(g.compras)
+    FROM gastos_mensais g
+    LEFT JOIN supermercados s ON s.id = g.chave
+    WHERE g.dimensao = 'S' AND g.mes BETWEEN ? AND ?
+    GROUP BY g.chave
+    ORDER BY 2 DESC
+    ''',
+}
+
+SELECT_LISTA_PRODUTOS = '''
+SELECT p.id, p.nome, COALESCE(c.nome, 'Sem categoria'), 
+       COALESCE(p.marca, ''), p.unidade_medida, COALESCE(p.qnt_medida, '')
+'''
+
+ORIGEM_LISTA_PRODUTOS = '''
+FROM produtos p
+LEFT JOIN categorias c ON p.categoria_id = c.id
+'''
+
+SQL_LISTA_PRODUTOS = SELECT_LISTA_PRODUTOS + ORIGEM_LISTA_PRODUTOS + "ORDER BY p.nome"
+
+
+
+def _filtros_consulta_precos(produto_nome='', supermercado='', data_inicio=None, data_fim=None):
+    """Retorna origem (FROM/JOIN), condições e parâmetros da consulta de preços"""
+    # A tabela filtrada conduz a junção; o filtro de produto é o mais seletivo
+    if produto_nome:
+        origem = ORIGEM_POR_PRODUTO
+    elif supermercado:
+        origem = ORIGEM_POR_SUPERMERCADO
+    else:
+        origem = ORIGEM_COMPRAS
+    
+    condicoes = []
+    params = []
+    
+    if produto_nome:
+        condicoes.append("p.nome LIKE ?")
+        params.append(f"%{produto_nome}%")
+    
+    if supermercado:
+        condicoes.append("s.nome LIKE ?")
+        params.append(f"%{supermercado}%")
+    
+    if data_inicio:
+        condicoes.append("c.data_compra >= ?")
+        params.append(datas.dia_juliano(data_inicio))
     
-    return produtos_formatados
+    if data_fim:
+        condicoes.append("c.data_compra <= ?")
+        params.append(datas.dia_juliano(data_fim))
+    
+    return origem, condicoes, params
 
-def adicionar_coluna_quem_pagou():
-    """Adiciona a coluna quem_pagou se não existir na tabela compras"""
-    conn = sqlite3.connect('supermercado.db')
-    cursor = conn.cursor()
+
+def montar_consulta_precos(produto_nome='', supermercado='', data_inicio=None, data_fim=None,
+                           select=SQL_CONSULTA_PRECOS):
+    """Monta a consulta de preços com os filtros informados"""
+    origem, condicoes, params = _filtros_consulta_precos(produto_nome, supermercado,
+                                                         data_inicio, data_fim)
+    
+    query = select + origem + "WHERE 1=1"
+    for condicao in condicoes:
+        query += f" AND {condicao}"
+    
+    query += " ORDER BY c.data_compra DESC"
+    return query, params
+
+
+def padrao_produto(produto_nome, exato=False):
+    """Padrão LIKE do filtro de produto: trecho do nome ou o nome inteiro"""
+    return produto_nome if exato else f"%{produto_nome}%"
+
+
+def montar_consulta_grafico(produto_nome, data_inicio=None, data_fim=None,
+                            select=SQL_GRAFICO_PRODUTO, exato=False, referencia=False):
+    """Monta a consulta do gráfico (ou da sua versão) com os filtros informados
+    
+    Com referencia=True o preço é por kg, L ou unidade (produtos.fator_referencia).
+    """
+    condicoes = ["p.nome LIKE ?"]
+    params = [padrao_produto(produto_nome, exato)]
+    
+    if data_inicio:
+        condicoes.append("a.inicio >= ?")
+        params.append(data_inicio.isoformat())
+    
+    if data_fim:
+        condicoes.append("a.inicio <= ?")
+        params.append(data_fim.isoformat())
+    
+    return select.format(condicoes=" AND ".join(condicoes),
+                         referencia=" * p.fator_referencia" if referencia else ""), params
+
+
+class ConsultaPaginada:
+    """Consulta paginada por keyset: cada página parte da chave da anterior"""
+    
+    def __init__(self, select, origem, condicoes=(), params=(),
+                 chave=('c.data_compra', 'c.id'), descendente=True):
+        self.select = select.strip()
+        self.origem = origem
+        self.condicoes = list(condicoes)
+        self.params = list(params)
+        self.chave = tuple(chave)
+        self.descendente = descendente
+    
+    def _where(self, condicoes):
+        """Monta a cláusula WHERE com as condições informadas"""
+        return "WHERE " + " AND ".join(condicoes) if condicoes else ""
+    
+    def contar(self):
+        """Retorna o total de linhas da consulta"""
+        conn = get_connection()
+        try:
+            cursor = conn.execute(
+                f"SELECT COUNT(*) {self.origem} {self._where(self.condicoes)}", self.params)
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+    
+    def pagina(self, tamanho, depois_de=None, antes_de=None):
+        """Retorna [(linha, chave)] após a chave depois_de ou antes de antes_de"""
+        para_tras = antes_de is not None
+        referencia = antes_de if para_tras else depois_de
+        
+        # Em ordem descendente, "depois" significa chaves menores
+        decrescente = self.descendente != para_tras
+        colunas_chave = ', '.join(self.chave)
+        
+        condicoes = list(self.condicoes)
+        params = list(self.params)
+        if referencia is not None:
+            marcadores = ', '.join('?' * len(self.chave))
+            operador = '<' if decrescente else '>'
+            condicoes.append(f"({colunas_chave}) {operador} ({marcadores})")
+            params.extend(referencia)
+        
+        direcao = 'DESC' if decrescente else 'ASC'
+        ordem = ', '.join(f"{coluna} {direcao}" for coluna in self.chave)
+        query = (f"{self.select}, {colunas_chave} {self.origem} "
+                 f"{self._where(condicoes)} ORDER BY {ordem} LIMIT ?")
+        params.append(tamanho)
+        
+        conn = get_connection()
+        try:
+            linhas = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        
+        n = len(self.chave)
+        resultado = [(linha[:-n], tuple(linha[-n:])) for linha in linhas]
+        if para_tras:
+            resultado.reverse()
+        return resultado
+
+
+    def inicio(self, tamanho):
+        """Retorna (total, primeira página), para carregar a consulta de uma vez"""
+        return self.contar(), self.pagina(tamanho)
+
+
+def consulta_precos_paginada(produto_nome='', supermercado='', data_inicio=None, data_fim=None):
+    """Consulta de preços paginada por (data_compra, id), mais recentes primeiro"""
+    origem, condicoes, params = _filtros_consulta_precos(produto_nome, supermercado,
+                                                         data_inicio, data_fim)
+    return ConsultaPaginada(SQL_CONSULTA_PRECOS, origem, condicoes, params,
+                            chave=('c.data_compra', 'c.id'), descendente=True)
+
+
+def consulta_produtos_paginada():
+    """Lista de produtos paginada por (nome, id), em ordem alfabética"""
+    return ConsultaPaginada(SELECT_LISTA_PRODUTOS, ORIGEM_LISTA_PRODUTOS,
+                            chave=('p.nome', 'p.id'), descendente=False)
+
+
+# maior_id do histórico colunar cujas compras já foram conferidas com o catálogo
+_historico_no_catalogo = 0
+
+
+def _catalogo_do_historico(historico):
+    """Catálogo que conhece os produtos e supermercados das compras do histórico
+
+    Compras gravadas por outro processo (servidor.py, importador, sqlite3)
+    podem ser de produtos e supermercados que o catálogo ainda não viu;
+    quando o histórico recebe compras novas, as linhas novas são buscadas.
+    """
+    global _historico_no_catalogo
+    catalogo = obter_catalogo()
+    if historico.maior_id != _historico_no_catalogo:
+        conn = get_connection()
+        try:
+            catalogo.carregar_novos(conn)
+        finally:
+            conn.close()
+        _historico_no_catalogo = historico.maior_id
+    return catalogo
+
+
+def _filtrar_historico(produto_nome='', supermercado='', data_inicio=None, data_fim=None,
+                       exato=False):
+    """Filtra o histórico colunar como a consulta de preços; retorna (histórico, posições)
+
+    Os nomes viram ids pelo catálogo (trecho do nome, como o LIKE da
+    consulta); as datas, dias julianos.
+    """
+    historico = obter_historico()
+    catalogo = _catalogo_do_historico(historico)
+    produto_ids = catalogo.produtos_com_nome(produto_nome, exato) if produto_nome else None
+    supermercado_ids = catalogo.supermercados_com_nome(supermercado) if supermercado else None
+    if produto_ids == [] or supermercado_ids == []:
+        # Falta: o nome pode ter sido cadastrado ou alterado por outro processo
+        catalogo = atualizar_catalogo()
+        if produto_ids == []:
+            produto_ids = catalogo.produtos_com_nome(produto_nome, exato)
+        if supermercado_ids == []:
+            supermercado_ids = catalogo.supermercados_com_nome(supermercado)
+    posicoes = historico.filtrar(
+        produto_ids, supermercado_ids,
+        datas.dia_juliano(data_inicio) if data_inicio else None,
+        datas.dia_juliano(data_fim) if data_fim else None)
+    return historico, posicoes
+
+
+def linhas_consulta_por_id(ids):
+    """Retorna {id: linha de SQL_CONSULTA_PRECOS} das compras informadas"""
+    ids = list(ids)
+    conn = get_connection()
+    try:
+        linhas = {}
+        for i in range(0, len(ids), LOTE_PRODUTOS):
+            lote = ids[i:i + LOTE_PRODUTOS]
+            cursor = conn.execute(
+                f"{SQL_CONSULTA_PRECOS}, c.id {ORIGEM_COMPRAS} "
+                f"WHERE c.id IN ({', '.join('?' * len(lote))})", lote)
+            linhas.update((linha[-1], linha[:-1]) for linha in cursor.fetchall())
+        return linhas
+    finally:
+        conn.close()
+
+
+def consulta_precos_colunar(produto_nome='', supermercado='', data_inicio=None, data_fim=None):
+    """Consulta de preços filtrada no histórico colunar, mais recentes primeiro
+
+    Tem a mesma interface (e as mesmas chaves) de consulta_precos_paginada;
+    filtro e contagem não passam pelo SQLite, só as linhas de cada página.
+    """
+    from app.analise import ConsultaColunar
+    historico, posicoes = _filtrar_historico(produto_nome, supermercado, data_inicio, data_fim)
+    dias, ids = historico.colunas(posicoes, 'dia', 'id')
+    return ConsultaColunar(dias, ids, linhas_consulta_por_id)
+
+
+def explicar_consulta(query, params=(), conn=None):
+    """Retorna as linhas de EXPLAIN QUERY PLAN de uma consulta"""
+    propria = conn is None
+    if propria:
+        conn = get_connection()
+    try:
+        cursor = conn.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        if propria:
+            conn.close()
+
+
+# Operações usadas pela interface (executadas nas threads do executor)
+def listar_produtos_formatados():
+    """Retorna os produtos como 'Nome (Marca)', em ordem alfabética"""
+    return obter_catalogo().nomes_produtos()
+
+
+def listar_nomes_produtos():
+    """Retorna os nomes distintos dos produtos, em ordem alfabética"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute("SELECT DISTINCT nome FROM produtos ORDER BY nome")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def listar_supermercados():
+    """Retorna os nomes dos supermercados, em ordem alfabética"""
+    return obter_catalogo().nomes_supermercados()
+
+
+def listar_quem_pagou():
+    """Retorna os valores de quem_pagou já usados nas compras"""
+    conn = get_connection()
+    try:
+        # Pelos gastos mensais: uma linha por mês e pagador, não por compra
+        cursor = conn.execute('''
+        SELECT DISTINCT chave
+        FROM gastos_mensais
+        WHERE dimensao = 'P' AND chave != ''
+        ORDER BY chave
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def ultimas_compras():
+    """Retorna as LIMITE_ULTIMAS_COMPRAS compras mais recentes"""
+    conn = get_connection()
+    try:
+        return conn.execute(SQL_ULTIMAS_COMPRAS).fetchall()
+    finally:
+        conn.close()
+
+
+def estatisticas_produto(produto_nome, exato=False):
+    """Retorna (min, max, média, total, primeira, última) do preço unitário,
+    seguidos de (min, max, média, unidade base) do preço de referência
+    
+    Por padrão o nome é um trecho (como na interface); com exato=True só o
+    produto com esse nome entra.
+    """
+    conn = get_connection()
+    try:
+        return conn.execute(SQL_ESTATISTICAS_PRODUTO,
+                            (padrao_produto(produto_nome, exato),)).fetchone()
+    finally:
+        conn.close()
+
+
+def dados_grafico(produto_nome, data_inicio=None, data_fim=None, exato=False, referencia=False):
+    """Retorna (data, preço, supermercado); com referencia=True, o preço por kg, L ou un"""
+    conn = get_connection()
+    try:
+        query, params = montar_consulta_grafico(produto_nome, data_inicio, data_fim,
+                                                exato=exato, referencia=referencia)
+        return conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+
+def versao_dados_grafico(produto_nome, data_inicio=None, data_fim=None, exato=False):
+    """Retorna uma tupla que muda sempre que os dados do gráfico mudam"""
+    conn = get_connection()
+    try:
+        query, params = montar_consulta_grafico(produto_nome, data_inicio, data_fim,
+                                                select=SQL_VERSAO_GRAFICO, exato=exato)
+        return tuple(conn.execute(query, params).fetchone())
+    finally:
+        conn.close()
+
+
+def resumo_supermercados_produto(produto_nome, exato=False, data_inicio=None, data_fim=None):
+    """Preço unitário do produto em cada supermercado, pelo histórico colunar
+
+    Retorna [(supermercado, compras, mínimo, média, máximo, último preço)],
+    da menor média para a maior.
+    """
+    from app.analise import agrupar_por_supermercado
+    historico, posicoes = _filtrar_historico(produto_nome, '', data_inicio, data_fim, exato)
+    supermercados, precos = historico.colunas(posicoes, 'supermercado_id', 'preco_unitario')
+    catalogo = obter_catalogo()
+    resumo = []
+    for supermercado_id, compras, minimo, media, maximo, ultimo in zip(
+            *agrupar_por_supermercado(supermercados, precos)):
+        registro = catalogo.supermercado(int(supermercado_id))
+        resumo.append((registro.nome if registro else '?', int(compras), float(minimo),
+                       float(media), float(maximo), float(ultimo)))
+    resumo.sort(key=lambda linha: linha[3])
+    return resumo
+
+
+def media_movel_produto(produto_nome, data_inicio=None, data_fim=None, exato=False,
+                        referencia=False, janela=30):
+    """Média móvel do preço unitário do produto (todos os supermercados)
+
+    Retorna (datas em datetime64[D], médias), um ponto por dia com compra;
+    com referencia=True o preço é por kg, L ou un (produtos.fator_referencia).
+    """
+    from app.analise import media_movel
+    historico, posicoes = _filtrar_historico(produto_nome, '', data_inicio, data_fim, exato)
+    dias, precos, produtos = historico.colunas(posicoes, 'dia', 'preco_unitario', 'produto_id')
+    if referencia and len(produtos):
+        precos = precos * _fatores_referencia(produtos)
+    dias, medias = media_movel(dias, precos, janela)
+    return datas.dias_para_datetime64(dias), medias
+
+
+def _fatores_referencia(produtos):
+    """produtos.fator_referencia de cada elemento do array de ids (NaN se não há)"""
+    import numpy as np
+    ids = np.unique(produtos).tolist()
+    fatores = {}
+    conn = get_connection()
+    try:
+        for i in range(0, len(ids), LOTE_PRODUTOS):
+            lote = ids[i:i + LOTE_PRODUTOS]
+            fatores.update(conn.execute(
+                f"SELECT id, fator_referencia FROM produtos "
+                f"WHERE id IN ({', '.join('?' * len(lote))})", lote).fetchall())
+    finally:
+        conn.close()
+    por_id = np.array([fatores.get(i) for i in ids], dtype=float)
+    return por_id[np.searchsorted(ids, produtos)]
+
+
+def contar_compras_produto(produto_id):
+    """Retorna quantas compras estão registradas para o produto"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute("SELECT COUNT(*) FROM compras WHERE produto_id = ?", (produto_id,))
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _linha_produto(conn, produto_id):
+    """Linha do produto no formato da lista de produtos (SELECT_LISTA_PRODUTOS)"""
+    return conn.execute(f"{SELECT_LISTA_PRODUTOS} {ORIGEM_LISTA_PRODUTOS} WHERE p.id = ?",
+                        (produto_id,)).fetchone()
+
+
+def salvar_produto(nome, categoria='', marca=None, unidade_medida='un', qnt_medida=None,
+                   produto_id=None):
+    """Cadastra o produto (ou altera, se produto_id) e retorna a sua linha na lista"""
+    conn = get_connection()
+    try:
+        categoria_id = None
+        if categoria:
+            linha = conn.execute("SELECT id FROM categorias WHERE nome = ?",
+                                 (categoria,)).fetchone()
+            categoria_id = linha[0] if linha else None
+
+        medidas = unidades.medidas_produto(qnt_medida, unidade_medida)
+        with conn:
+            if produto_id:
+                anterior = _linha_produto(conn, produto_id)
+                conn.execute('''
+                UPDATE produtos
+                SET nome = ?, categoria_id = ?, marca = ?,
+                    unidade_medida = ?, qnt_medida = ?,
+                    medida_base = ?, unidade_base = ?, fator_referencia = ?
+                WHERE id = ?
+                ''', (nome, categoria_id, marca, unidade_medida, qnt_medida, *medidas,
+                      produto_id))
+            else:
+                produto_id = conn.execute('''
+                INSERT INTO produtos (nome, categoria_id, marca, unidade_medida, qnt_medida,
+                                      medida_base, unidade_base, fator_referencia)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (nome, categoria_id, marca, unidade_medida, qnt_medida,
+                      *medidas)).lastrowid
+                anterior = None
+        produto = _linha_produto(conn, produto_id)
+    finally:
+        conn.close()
+
+    _catalogo.adicionar_produto(produto_id, nome, marca)
+    if anterior is None:
+        eventos.publicar(eventos.ProdutoAdicionado(produto))
+    else:
+        eventos.publicar(eventos.ProdutoAlterado(produto, anterior))
+    return produto
+
+
+def remover_produto(produto_id):
+    """Exclui o produto e suas compras; retorna quantas compras foram excluídas"""
+    conn = get_connection()
+    try:
+        produto = _linha_produto(conn, produto_id)
+        with conn:
+            cursor = conn.execute("DELETE FROM compras WHERE produto_id = ?", (produto_id,))
+            compras_excluidas = cursor.rowcount
+            conn.execute("DELETE FROM itens_lista WHERE produto_id = ?", (produto_id,))
+            conn.execute("DELETE FROM estado_precos WHERE produto_id = ?", (produto_id,))
+            conn.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
+    finally:
+        conn.close()
+
+    _catalogo.remover_produto(produto_id)
+    if _historico is not None:
+        _historico.remover_produto(produto_id)
+    if produto is not None:
+        eventos.publicar(eventos.ProdutoRemovido(produto, compras_excluidas))
+    return compras_excluidas
+
+
+def avaliar_preco(produto_nome, supermercado, preco, quantidade, marca=''):
+    """Compara o preço unitário com o histórico do produto no supermercado
+    
+    Retorna uma anomalias.AvaliacaoPreco, ou None se não há histórico.
+    """
+    if not quantidade or quantidade <= 0:
+        return None
+    catalogo = obter_catalogo()
+    produto_id = catalogo.resolver_produto(produto_nome, marca)
+    supermercado_id = catalogo.resolver_supermercado(supermercado)
+    if produto_id is None or supermercado_id is None:
+        return None
+    conn = get_connection()
+    try:
+        estado = conn.execute('''
+        SELECT contagem, ewma, variancia, janela
+        FROM estado_precos
+        WHERE produto_id = ? AND supermercado_id = ?
+        ''', (produto_id, supermercado_id)).fetchone()
+    finally:
+        conn.close()
+    if estado is None:
+        return None
+    return anomalias.AvaliacaoPreco.do_estado(preco / quantidade, estado)
+
+
+def inserir_compra(produto_nome, supermercado, preco, quantidade, data_compra,
+                   promocao=False, quem_pagou='', observacoes='', marca=''):
+    """Registra uma compra; retorna (True, id) ou (False, mensagem de erro)
     
+    Produto e supermercado são resolvidos pelo catálogo em memória; com mais
+    de um produto com o mesmo nome, a marca desempata.
+    """
+    return inserir_compras([dict(
+        produto_nome=produto_nome, supermercado=supermercado, preco=preco,
+        quantidade=quantidade, data_compra=data_compra, promocao=promocao,
+        quem_pagou=quem_pagou, observacoes=observacoes, marca=marca)])[0]
+
+
+def _produto_nao_encontrado(produto_nome):
+    return (f"Produto '{produto_nome}' não encontrado!\n"
+            "Cadastre o produto primeiro ou verifique o nome.")
+
+
+def _produtos_existentes(cursor, produto_ids):
+    """Dos ids informados, os que ainda estão na tabela produtos"""
+    produto_ids = list(produto_ids)
+    existentes = set()
+    for inicio in range(0, len(produto_ids), LOTE_PRODUTOS):
+        lote = produto_ids[inicio:inicio + LOTE_PRODUTOS]
+        existentes.update(produto_id for produto_id, in cursor.execute(
+            f"SELECT id FROM produtos WHERE id IN ({', '.join('?' * len(lote))})", lote))
+    return existentes
+
+
+def _conferir_produtos(cursor, catalogo, linhas, resultados):
+    """Linhas de inserir_compras cujos produtos existem no banco
+
+    Um id excluído por outro processo sai do catálogo e o nome é resolvido
+    de novo (o produto pode ter sido recadastrado); se ainda assim não
+    existir, só a sua compra é recusada.
+    """
+    excluidos = {produto_id for _, produto_id, _, _ in linhas}
+    excluidos -= _produtos_existentes(cursor, excluidos)
+    if not excluidos:
+        return linhas
+    for produto_id in excluidos:
+        catalogo.remover_produto(produto_id)
+    conferidas = []
+    for i, produto_id, supermercado, compra in linhas:
+        if produto_id in excluidos:
+            produto_id = _resolver_produto(compra['produto_nome'], compra.get('marca', ''))
+            if produto_id is None or not _produtos_existentes(cursor, [produto_id]):
+                resultados[i] = (False, _produto_nao_encontrado(compra['produto_nome']))
+                continue
+        conferidas.append((i, produto_id, supermercado, compra))
+    return conferidas
+
+
+def inserir_compras(compras):
+    """Registra várias compras numa única transação (um único commit)
+
+    Cada compra é um dict com os argumentos de inserir_compra. Retorna, na
+    mesma ordem, (True, id) ou (False, mensagem de erro): um produto que não
+    existe recusa só a sua compra. Supermercados novos são cadastrados uma
+    vez, mesmo que apareçam em várias compras do lote.
+    """
+    resultados = [None] * len(compras)
+    linhas = []        # (posição, produto_id, nome do supermercado, compra)
+    for i, compra in enumerate(compras):
+        # Buscar produto pelo nome (exato, depois sem acentos/maiúsculas)
+        produto_id = _resolver_produto(compra['produto_nome'], compra.get('marca', ''))
+        if produto_id is None:
+            resultados[i] = (False, _produto_nao_encontrado(compra['produto_nome']))
+        else:
+            linhas.append((i, produto_id, compra['supermercado'], compra))
+    if not linhas:
+        return resultados
+
+    catalogo = obter_catalogo()
+    if any(catalogo.resolver_supermercado(nome) is None for _, _, nome, _ in linhas):
+        catalogo = atualizar_catalogo()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    novos = {}         # nome normalizado -> (nome, id) dos cadastrados neste lote
+    registradas = []
     try:
-        # Verificar se a coluna quem_pagou existe
-        cursor.execute("PRAGMA table_info(compras)")
-        colunas = [col[1] for col in cursor.fetchall()]
+        # Os ids vêm do catálogo: outro processo pode ter excluído o produto
+        # depois da carga. A conferência é feita já com a trava de escrita,
+        # para que ninguém o exclua entre ela e as inserções.
+        cursor.execute("BEGIN IMMEDIATE")
+        linhas = _conferir_produtos(cursor, catalogo, linhas, resultados)
+        for i, produto_id, supermercado, compra in linhas:
+            supermercado_id = catalogo.resolver_supermercado(supermercado)
+            if supermercado_id is None:
+                # Inserir supermercado novo
+                chave = normalizar_texto(supermercado.strip())
+                if chave in novos:
+                    supermercado, supermercado_id = novos[chave]
+                else:
+                    cursor.execute("INSERT INTO supermercados (nome) VALUES (?)", (supermercado,))
+                    supermercado_id = cursor.lastrowid
+                    novos[chave] = (supermercado, supermercado_id)
+            else:
+                supermercado = catalogo.supermercado(supermercado_id).nome
+            
+            # Inserir compra (o date é gravado como dia juliano)
+            data_compra = compra['data_compra']
+            if isinstance(data_compra, str):
+                data_compra = date.fromisoformat(data_compra)
+            promocao = 1 if compra.get('promocao') else 0
+            quem_pagou = compra.get('quem_pagou', '')
+            cursor.execute('''
+            INSERT INTO compras (produto_id, supermercado_id, preco, quantidade, 
+                               data_compra, promoção,quem_pagou, observacoes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (produto_id, supermercado_id, compra['preco'], compra['quantidade'],
+                  data_compra, promocao, quem_pagou, compra.get('observacoes', '')))
+            resultados[i] = (True, cursor.lastrowid)
+            registradas.append((cursor.lastrowid, (
+                data_compra, catalogo.produto(produto_id).nome, supermercado,
+                compra['preco'], compra['quantidade'], promocao, quem_pagou)))
         
-        if 'quem_pagou' not in colunas:
-            print("Adicionando coluna 'quem_pagou' à tabela compras...")
-            cursor.execute("ALTER TABLE compras ADD COLUMN quem_pagou TEXT DEFAULT ''")
-            conn.commit()
-            print("✅ Coluna 'quem_pagou' adicionada com sucesso!")
-    except Exception as e:
-        print(f"Erro ao adicionar coluna: {e}")
+        conn.commit()
+    finally:
+        conn.close()
+    
+    for supermercado, supermercado_id in novos.values():
+        catalogo.adicionar_supermercado(supermercado_id, supermercado)
+        eventos.publicar(eventos.SupermercadoAdicionado(supermercado_id, supermercado))
+    for compra_id, compra in registradas:
+        eventos.publicar(eventos.CompraAdicionada(compra_id, compra))
+    return resultados
+
+
+# Listas de compra
+def listar_listas():
+    """Retorna (id, nome, quantidade de itens) das listas, em ordem alfabética"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute('''
+        SELECT l.id, l.nome, COUNT(i.produto_id)
+        FROM listas_compras l
+        LEFT JOIN itens_lista i ON i.lista_id = l.id
+        GROUP BY l.id
+        ORDER BY l.nome
+        ''')
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def criar_lista(nome):
+    """Cria uma lista de compras vazia; retorna o id"""
+    conn = get_connection()
+    try:
+        with conn:
+            cursor = conn.execute("INSERT INTO listas_compras (nome) VALUES (?)", (nome.strip(),))
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def remover_lista(lista_id):
+    """Exclui a lista e seus itens"""
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute("DELETE FROM itens_lista WHERE lista_id = ?", (lista_id,))
+            conn.execute("DELETE FROM listas_compras WHERE id = ?", (lista_id,))
+    finally:
+        conn.close()
+
+
+def adicionar_item_lista(lista_id, produto_nome, quantidade=1, marca=''):
+    """Adiciona o produto à lista (ou troca a quantidade, se já estiver nela)
+
+    Retorna (True, produto_id) ou (False, mensagem de erro). Com mais de um
+    produto com o mesmo nome, a marca informada desempata.
+    """
+    produto_id = _resolver_produto(produto_nome, marca)
+    if produto_id is None:
+        return False, f"Produto '{produto_nome}' não encontrado!"
+    
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute('''
+            INSERT INTO itens_lista (lista_id, produto_id, quantidade) VALUES (?, ?, ?)
+            ON CONFLICT (lista_id, produto_id) DO UPDATE SET quantidade = excluded.quantidade
+            ''', (lista_id, produto_id, quantidade))
+        return True, produto_id
+    finally:
+        conn.close()
+
+
+def remover_item_lista(lista_id, produto_id):
+    """Tira o produto da lista"""
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute("DELETE FROM itens_lista WHERE lista_id = ? AND produto_id = ?",
+                         (lista_id, produto_id))
+    finally:
+        conn.close()
+
+
+def itens_lista(lista_id):
+    """Retorna (produto_id, nome, marca, quantidade) dos itens da lista"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute('''
+        SELECT p.id, p.nome, COALESCE(p.marca, ''), i.quantidade
+        FROM itens_lista i
+        JOIN produtos p ON p.id = i.produto_id
+        WHERE i.lista_id = ?
+        ORDER BY p.nome
+        ''', (lista_id,))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+# Parâmetros por consulta bem abaixo do limite do SQLite (999 em versões antigas)
+LOTE_PRODUTOS = 500
+
+
+def precos_por_supermercado(produto_ids, desde=None):
+    """Retorna (produto_id, supermercado_id, preço unitário) dos produtos
+    
+    Sem desde, o preço é o do último dia com compra em cada supermercado;
+    com desde (date), a média das compras a partir dessa data.
+    """
+    produto_ids = list(produto_ids)
+    conn = get_connection()
+    try:
+        linhas = []
+        for i in range(0, len(produto_ids), LOTE_PRODUTOS):
+            lote = produto_ids[i:i + LOTE_PRODUTOS]
+            marcadores = ', '.join('?' * len(lote))
+            if desde is None:
+                query, params = SQL_ULTIMOS_PRECOS.format(marcadores=marcadores), lote
+            else:
+                query = SQL_PRECOS_RECENTES.format(marcadores=marcadores)
+                params = lote + [desde.isoformat()]
+            linhas.extend(conn.execute(query, params).fetchall())
+        return linhas
+    finally:
+        conn.close()
+
+
+def nomes_supermercados():
+    """Retorna {id: nome} de todos os supermercados"""
+    conn = get_connection()
+    try:
+        return dict(conn.execute("SELECT id, nome FROM supermercados").fetchall())
+    finally:
+        conn.close()
+
+
+# Resumo financeiro
+def meses_com_gastos():
+    """Retorna os meses (date, primeiro dia) com compras, do mais recente ao mais antigo"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute('''
+        SELECT DISTINCT mes FROM gastos_mensais WHERE dimensao = 'S' ORDER BY mes DESC
+        ''')
+        return [date.fromisoformat(row[0]) for row in cursor.fetchall()]
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+def resumo_gastos(mes_inicio, mes_fim):
+    """Resumo dos gastos entre dois meses (date, inclusive)
+    
+    Retorna {'mes': [(mês, total, compras)], 'P' | 'C' | 'S': [(nome, total,
+    compras)]}, com quem pagou, categoria e supermercado do maior para o
+    menor gasto. O custo depende só do número de meses e de chaves.
+    """
+    params = (mes_inicio.replace(day=1).isoformat(), mes_fim.replace(day=1).isoformat())
+    conn = get_connection()
+    try:
+        resumo = {'mes': [(date.fromisoformat(mes), total, compras) for mes, total, compras
+                          in conn.execute(SQL_GASTOS_POR_MES, params).fetchall()]}
+        for dimensao, query in SQL_GASTOS_POR_DIMENSAO.items():
+            resumo[dimensao] = conn.execute(query, params).fetchall()
+        return resumo
+    finally:
+        conn.close()
@@ -0,0 +1,53 @@
+# app/datas.py
+"""Datas das compras como número do dia juliano (inteiro)
+
+compras.data_compra guarda o dia juliano: um inteiro que ordena e compara
+como número e que as funções de data do SQLite entendem sem conversão
+(date(2460311) = '2024-01-01'). Um número inteiro corresponde ao meio-dia,
+então julianday('AAAA-MM-DD') (meia-noite) fica 0,5 abaixo do dia: o dia
+d está em [julianday(início), julianday(fim)) sem nenhum arredondamento.
+
+Os adaptadores do sqlite3 substituem os padrões, obsoletos desde o Python
+3.12: um date passado como parâmetro vira o dia juliano, e uma coluna lida
+com o nome 'data_compra [dia]' (PARSE_COLNAMES) volta como date.
+"""
+import sqlite3
+from datetime import date
+
+# date.toordinal() + DESLOCAMENTO_ORDINAL = dia juliano
+DESLOCAMENTO_ORDINAL = 1721425
+# Dia juliano de 1970-01-01, a origem do datetime64 do NumPy
+DIA_EPOCA = 2440588
+
+
+def dia_juliano(data):
+    """Dia juliano (int) de um date"""
+    return data.toordinal() + DESLOCAMENTO_ORDINAL
+
+
+def data_do_dia(dia):
+    """date de um dia juliano"""
+    return date.fromordinal(int(dia) - DESLOCAMENTO_ORDINAL)
+
+
+def dias_para_datetime64(dias):
+    """Converte uma coluna inteira de dias julianos para datetime64[D]"""
+    # Importado aqui: o numpy só é carregado quando uma coluna é convertida
+    import numpy as np
+    return (np.asarray(dias, dtype=np.int64) - DIA_EPOCA).astype('datetime64[D]')
+
+
+def datetime64_para_dias(datas):
+    """Converte datetime64 (ou textos AAAA-MM-DD) para dias julianos (int64)"""
+    import numpy as np
+    return np.asarray(datas, dtype='datetime64[D]').astype(np.int64) + DIA_EPOCA
+
+
+def _converter_dia(valor):
+    return data_do_dia(int(valor))
+
+
+def registrar_adaptadores():
+    """Registra no sqlite3 o adaptador de date e o conversor 'dia'"""
+    sqlite3.register_adapter(date, dia_juliano)
+    sqlite3.register_converter('dia', _converter_dia)
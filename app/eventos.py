@@ -0,0 +1,100 @@
+# app/eventos.py
+"""Eventos de alteração dos dados e o barramento que os entrega às telas
+
+As operações de escrita (database.py, importador, backup) publicam o que
+mudaram; cada tela assina os eventos que lhe interessam e aplica só a
+diferença (uma linha, um item de combobox) em vez de recarregar tudo.
+
+publicar() pode ser chamado de qualquer thread (as escritas rodam na
+thread do executor); os assinantes só são chamados por despachar(), na
+thread que o chama — o mainloop do Tk, via executor.bombear_com_after.
+"""
+import queue
+
+
+class Evento:
+    """Base dos eventos; assinar Evento recebe todos"""
+
+    def __repr__(self):
+        campos = ', '.join(f"{nome}={valor!r}" for nome, valor in vars(self).items())
+        return f"{type(self).__name__}({campos})"
+
+
+class ProdutoAdicionado(Evento):
+    def __init__(self, produto):
+        # (id, nome, categoria, marca, unidade, qnt_medida), como em SELECT_LISTA_PRODUTOS
+        self.produto = produto
+
+
+class ProdutoAlterado(Evento):
+    def __init__(self, produto, anterior):
+        self.produto = produto
+        self.anterior = anterior
+
+
+class ProdutoRemovido(Evento):
+    def __init__(self, produto, compras_excluidas):
+        self.produto = produto
+        self.compras_excluidas = compras_excluidas
+
+
+class SupermercadoAdicionado(Evento):
+    def __init__(self, supermercado_id, nome):
+        self.supermercado_id = supermercado_id
+        self.nome = nome
+
+
+class CompraAdicionada(Evento):
+    def __init__(self, compra_id, compra):
+        # (data, produto, supermercado, preço, quantidade, promoção, quem pagou),
+        # como em SQL_ULTIMAS_COMPRAS
+        self.compra_id = compra_id
+        self.compra = compra
+
+
+class DadosSubstituidos(Evento):
+    """Muitas linhas mudaram de uma vez (importação, restauração de backup)"""
+
+    def __init__(self, motivo):
+        self.motivo = motivo
+
+
+class BarramentoEventos:
+    """Fila de eventos com assinantes por tipo (inclui as subclasses)"""
+
+    def __init__(self):
+        self._fila = queue.Queue()
+        self._assinantes = {}
+
+    def assinar(self, tipo, funcao):
+        self._assinantes.setdefault(tipo, []).append(funcao)
+
+    def cancelar(self, tipo, funcao):
+        if funcao in self._assinantes.get(tipo, ()):
+            self._assinantes[tipo].remove(funcao)
+
+    def publicar(self, evento):
+        """Enfileira o evento; sem assinantes (scripts, benchmarks) é descartado"""
+        if any(self._assinantes.values()):
+            self._fila.put(evento)
+
+    def despachar(self):
+        """Entrega os eventos pendentes; retorna quantos foram entregues"""
+        entregues = 0
+        while True:
+            try:
+                evento = self._fila.get_nowait()
+            except queue.Empty:
+                return entregues
+            entregues += 1
+            for tipo in type(evento).__mro__:
+                for funcao in list(self._assinantes.get(tipo, ())):
+                    funcao(evento)
+
+
+barramento = BarramentoEventos()
+
+
+def publicar(evento):
+    """Publica no barramento da aplicação"""
+    barramento.publicar(evento)
@@ -0,0 +1,198 @@
+# app/executor.py
+import logging
+import queue
+import threading
+
+from app import instrumentacao
+
+log = logging.getLogger(__name__)
+
+
+class Tarefa:
+    """Trabalho enviado ao executor; funciona como um future"""
+
+    def __init__(self, funcao, args, kwargs, ao_concluir=None, ao_falhar=None,
+                 grupo=None, chave=None):
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = kwargs
+        self.ao_concluir = ao_concluir
+        self.ao_falhar = ao_falhar
+        self.grupo = grupo
+        self.chave = chave
+        self.cancelada = False
+        self.resultado = None
+        self.erro = None
+        self._concluida = threading.Event()
+
+    def cancelar(self):
+        """Cancela a tarefa; se já estiver rodando, o resultado é descartado"""
+        self.cancelada = True
+
+    @property
+    def concluida(self):
+        return self._concluida.is_set()
+
+    def aguardar(self, timeout=None):
+        """Bloqueia até a conclusão e retorna o resultado (ou relança o erro)"""
+        if not self._concluida.wait(timeout):
+            raise TimeoutError("A tarefa não terminou no tempo esperado")
+        if self.erro is not None:
+            raise self.erro
+        return self.resultado
+
+
+class ExecutorConsultas:
+    """Executa o acesso ao banco fora do mainloop do Tk
+
+    Leituras rodam em um pequeno conjunto de threads; escritas passam todas
+    por uma única thread, em ordem. Os callbacks ao_concluir/ao_falhar só
+    são chamados por despachar(), na thread que o chama (o mainloop), de
+    modo que o executor também pode ser usado sem interface gráfica.
+    """
+
+    def __init__(self, leitores=2):
+        self.leitores = leitores
+        self.ao_mudar_ocupado = None  # callback(grupo, ocupado)
+        self._fila_leitura = queue.Queue()
+        self._fila_escrita = queue.Queue()
+        self._concluidas = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._ocupados = {}
+        self._por_chave = {}
+
+    def _iniciar(self):
+        """Cria as threads na primeira tarefa enviada"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.leitores):
+                self._threads.append(threading.Thread(
+                    target=self._trabalhar, args=(self._fila_leitura,),
+                    name=f'leitor-{i + 1}', daemon=True))
+            self._threads.append(threading.Thread(
+                target=self._trabalhar, args=(self._fila_escrita,),
+                name='escritor', daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def ler(self, funcao, *args, ao_concluir=None, ao_falhar=None, grupo=None,
+            chave=None, **kwargs):
+        """Agenda uma leitura; uma nova tarefa com a mesma chave cancela a anterior"""
+        return self._enviar(self._fila_leitura, funcao, args, kwargs,
+                            ao_concluir, ao_falhar, grupo, chave)
+
+    def escrever(self, funcao, *args, ao_concluir=None, ao_falhar=None, grupo=None,
+                 **kwargs):
+        """Agenda uma escrita na thread única de escrita"""
+        return self._enviar(self._fila_escrita, funcao, args, kwargs,
+                            ao_concluir, ao_falhar, grupo, None)
+
+    def _enviar(self, fila, funcao, args, kwargs, ao_concluir, ao_falhar, grupo, chave):
+        self._iniciar()
+        tarefa = Tarefa(funcao, args, kwargs, ao_concluir, ao_falhar, grupo, chave)
+
+        if chave is not None:
+            anterior = self._por_chave.get(chave)
+            if anterior is not None:
+                anterior.cancelar()
+            self._por_chave[chave] = tarefa
+
+        self._alterar_ocupado(grupo, +1)
+        fila.put(tarefa)
+        return tarefa
+
+    def _trabalhar(self, fila):
+        """Laço das threads de trabalho"""
+        while True:
+            tarefa = fila.get()
+            if tarefa is None:
+                break
+            if not tarefa.cancelada:
+                try:
+                    if instrumentacao.ATIVO:
+                        tarefa.resultado = instrumentacao.chamar_medindo(
+                            'tarefa', instrumentacao.nome_funcao(tarefa.funcao), tarefa.funcao,
+                            *tarefa.args, **tarefa.kwargs)
+                    else:
+                        tarefa.resultado = tarefa.funcao(*tarefa.args, **tarefa.kwargs)
+                except Exception as e:
+                    tarefa.erro = e
+            tarefa._concluida.set()
+            self._concluidas.put(tarefa)
+
+    def despachar(self):
+        """Chama os callbacks das tarefas concluídas; retorna quantas foram tratadas"""
+        tratadas = 0
+        while True:
+            try:
+                tarefa = self._concluidas.get_nowait()
+            except queue.Empty:
+                return tratadas
+
+            tratadas += 1
+            self._alterar_ocupado(tarefa.grupo, -1)
+            if self._por_chave.get(tarefa.chave) is tarefa:
+                del self._por_chave[tarefa.chave]
+
+            if tarefa.cancelada:
+                continue
+            if tarefa.erro is not None:
+                if tarefa.ao_falhar:
+                    tarefa.ao_falhar(tarefa.erro)
+                else:
+                    self._registrar_erro(tarefa)
+            elif tarefa.ao_concluir:
+                if instrumentacao.ATIVO:
+                    instrumentacao.chamar_medindo(
+                        'callback', instrumentacao.nome_funcao(tarefa.ao_concluir),
+                        tarefa.ao_concluir, tarefa.resultado)
+                else:
+                    tarefa.ao_concluir(tarefa.resultado)
+
+    @staticmethod
+    def _registrar_erro(tarefa):
+        """Erro de uma tarefa sem ao_falhar: vai para o log e para o diagnóstico"""
+        nome = instrumentacao.nome_funcao(tarefa.funcao)
+        log.error("Erro em %s", nome, exc_info=tarefa.erro)
+        if instrumentacao.ATIVO:
+            instrumentacao.coletor.registrar_erro('tarefa', nome, tarefa.erro)
+
+    def _alterar_ocupado(self, grupo, delta):
+        """Atualiza o contador do grupo e avisa quando ele fica ocupado/livre"""
+        if grupo is None:
+            return
+        antes = self._ocupados.get(grupo, 0)
+        depois = antes + delta
+        self._ocupados[grupo] = depois
+        if (antes == 0) != (depois == 0) and self.ao_mudar_ocupado:
+            self.ao_mudar_ocupado(grupo, depois > 0)
+
+    def ocupado(self, grupo):
+        """Indica se o grupo (aba) tem tarefas pendentes"""
+        return self._ocupados.get(grupo, 0) > 0
+
+    def cancelar_grupo(self, grupo):
+        """Cancela as tarefas com chave pendentes de um grupo"""
+        for tarefa in list(self._por_chave.values()):
+            if tarefa.grupo == grupo:
+                tarefa.cancelar()
+
+    def encerrar(self, timeout=None):
+        """Termina as threads depois das tarefas já enfileiradas"""
+        for thread in self._threads:
+            fila = self._fila_escrita if thread.name == 'escritor' else self._fila_leitura
+            fila.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+def bombear_com_after(executor, widget, intervalo=20):
+    """Despacha periodicamente os callbacks do executor pelo mainloop do Tk"""
+    def bombear():
+        executor.despachar()
+        widget.after(intervalo, bombear)
+
+    widget.after(intervalo, bombear)
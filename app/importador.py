@@ -0,0 +1,334 @@
+# app/importador.py
+"""Importação em massa de compras a partir de planilhas CSV ou XLSX
+
+Uso: python -m app.importador compras.csv [--criar-produtos] [--log-erros erros.csv]
+"""
+import argparse
+import csv
+import sys
+import time
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+
+from app import eventos
+from app.database import (get_connection, configurar_banco, init_db, obter_catalogo,
+                          invalidar_catalogo, validar_datas_lote, validar_precos_lote)
+from app.unidades import medidas_produto
+from app.utils import normalizar_texto, extrair_nome_produto, extrair_marca_produto
+
+# Nome interno da coluna -> cabeçalhos aceitos (comparados sem acentos)
+COLUNAS = {
+    'produto': ('produto', 'nome', 'item'),
+    'supermercado': ('supermercado', 'mercado', 'loja'),
+    'preco': ('preco', 'valor', 'preco_total'),
+    'quantidade': ('quantidade', 'qtd', 'qtde'),
+    'data': ('data', 'data_compra'),
+    'promocao': ('promocao', 'em_promocao'),
+    'quem_pagou': ('quem_pagou', 'pagador'),
+    'observacoes': ('observacoes', 'obs'),
+}
+OBRIGATORIAS = ('produto', 'supermercado', 'preco', 'data')
+
+VALORES_VERDADEIROS = {'1', 's', 'sim', 'x', 'true', 'verdadeiro', 'y', 'yes'}
+
+
+class RelatorioImportacao:
+    """Contadores e log de erros de uma importação"""
+
+    MAXIMO_ERROS_EM_MEMORIA = 1000
+
+    def __init__(self, arquivo_erros=None):
+        self.lidas = 0
+        self.importadas = 0
+        self.rejeitadas = 0
+        self.produtos_criados = 0
+        self.supermercados_criados = 0
+        self.erros = []
+        self.cancelada = False
+        self.inicio = time.perf_counter()
+        self.fim = None
+        self._arquivo_erros = arquivo_erros
+        self._escritor_erros = None
+        if arquivo_erros is not None:
+            self._escritor_erros = csv.writer(arquivo_erros)
+            self._escritor_erros.writerow(['linha', 'erro'])
+
+    def rejeitar(self, linha, mensagem):
+        """Registra uma linha rejeitada"""
+        self.rejeitadas += 1
+        if len(self.erros) < self.MAXIMO_ERROS_EM_MEMORIA:
+            self.erros.append((linha, mensagem))
+        if self._escritor_erros is not None:
+            self._escritor_erros.writerow([linha, mensagem])
+
+    @property
+    def segundos(self):
+        return (self.fim or time.perf_counter()) - self.inicio
+
+    @property
+    def linhas_por_segundo(self):
+        return self.lidas / self.segundos if self.segundos > 0 else 0.0
+
+    def resumo(self):
+        """Texto curto com o resultado da importação"""
+        texto = (f"{self.importadas} compras importadas, {self.rejeitadas} rejeitadas "
+                 f"de {self.lidas} linhas em {self.segundos:.1f}s "
+                 f"({self.linhas_por_segundo:,.0f} linhas/s)")
+        if self.cancelada:
+            texto += " — importação cancelada"
+        return texto
+
+
+def _texto(valor):
+    """Converte o valor de uma célula para o texto esperado pelos validadores"""
+    if valor is None:
+        return ''
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(valor).strip()
+
+
+def _ler_csv(caminho):
+    """Gera as linhas de um CSV (separador detectado: vírgula, ; ou tab)"""
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+        except csv.Error:
+            dialeto = csv.excel
+        yield from csv.reader(arquivo, dialeto)
+
+
+def _ler_xlsx(caminho):
+    """Gera as linhas da primeira planilha de um XLSX, em modo somente leitura"""
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("Para importar XLSX instale o openpyxl: pip install openpyxl")
+
+    livro = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        for linha in livro.worksheets[0].iter_rows(values_only=True):
+            yield [_texto(valor) for valor in linha]
+    finally:
+        livro.close()
+
+
+def ler_linhas(caminho):
+    """Gera as linhas do arquivo conforme a extensão"""
+    if Path(caminho).suffix.lower() in ('.xlsx', '.xlsm'):
+        return _ler_xlsx(caminho)
+    return _ler_csv(caminho)
+
+
+def mapear_cabecalho(cabecalho):
+    """Retorna {coluna interna: índice}; lança ValueError se faltar coluna obrigatória"""
+    normalizados = [normalizar_texto(_texto(c)).replace(' ', '_') for c in cabecalho]
+    indices = {}
+    for coluna, aliases in COLUNAS.items():
+        for alias in aliases:
+            if alias in normalizados:
+                indices[coluna] = normalizados.index(alias)
+                break
+
+    faltando = [c for c in OBRIGATORIAS if c not in indices]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+    return indices
+
+
+class ResolvedorNomes:
+    """Resolve nomes de produto/supermercado para ids pelo catálogo em memória"""
+
+    def __init__(self, conn, criar_produtos=False):
+        self.conn = conn
+        self.criar_produtos = criar_produtos
+        self.catalogo = obter_catalogo()
+
+    def produto(self, texto, relatorio):
+        """Retorna o id do produto (ou None se não existir e não puder ser criado)"""
+        nome = extrair_nome_produto(texto)
+        marca = extrair_marca_produto(texto)
+        produto_id = self.catalogo.resolver_produto(nome, marca)
+        if produto_id is None and self.criar_produtos and nome:
+            cursor = self.conn.execute('''
+            INSERT INTO produtos (nome, marca, medida_base, unidade_base, fator_referencia)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (nome, marca or None, *medidas_produto('', 'un')))
+            produto_id = cursor.lastrowid
+            self.catalogo.adicionar_produto(produto_id, nome, marca)
+            relatorio.produtos_criados += 1
+        return produto_id
+
+    def supermercado(self, nome, relatorio):
+        """Retorna o id do supermercado, cadastrando-o se necessário"""
+        supermercado_id = self.catalogo.resolver_supermercado(nome)
+        if supermercado_id is None:
+            cursor = self.conn.execute("INSERT INTO supermercados (nome) VALUES (?)", (nome,))
+            supermercado_id = cursor.lastrowid
+            self.catalogo.adicionar_supermercado(supermercado_id, nome)
+            relatorio.supermercados_criados += 1
+        return supermercado_id
+
+
+def _processar_lote(lote, indices, resolvedor, relatorio):
+    """Valida um lote de (número da linha, linha) por coluna e retorna as tuplas para inserir"""
+    numeros = [numero for numero, _ in lote]
+    lote = [linha for _, linha in lote]
+
+    def coluna(nome, padrao=''):
+        i = indices.get(nome)
+        if i is None:
+            return [padrao] * len(lote)
+        return [_texto(linha[i]) if i < len(linha) else padrao for linha in lote]
+
+    produtos = coluna('produto')
+    supermercados = coluna('supermercado')
+    precos = validar_precos_lote(coluna('preco'))
+    datas = validar_datas_lote(coluna('data'))
+    quantidades = coluna('quantidade', '1')
+    promocoes = coluna('promocao')
+    quem_pagou = coluna('quem_pagou')
+    observacoes = coluna('observacoes')
+
+    registros = []
+    for i, numero in enumerate(numeros):
+        preco_ok, preco = precos[i]
+        data_ok, data_compra = datas[i]
+        if not produtos[i] or not supermercados[i]:
+            relatorio.rejeitar(numero, "Produto e supermercado são obrigatórios!")
+            continue
+        if not preco_ok:
+            relatorio.rejeitar(numero, preco)
+            continue
+        if not data_ok:
+            relatorio.rejeitar(numero, data_compra)
+            continue
+        try:
+            quantidade = float((quantidades[i] or '1').replace(',', '.'))
+        except ValueError:
+            relatorio.rejeitar(numero, f"Quantidade inválida: {quantidades[i]}")
+            continue
+        if quantidade <= 0:
+            relatorio.rejeitar(numero, "A quantidade deve ser maior que zero!")
+            continue
+
+        produto_id = resolvedor.produto(produtos[i], relatorio)
+        if produto_id is None:
+            relatorio.rejeitar(numero, f"Produto '{produtos[i]}' não encontrado!")
+            continue
+
+        registros.append((
+            produto_id, resolvedor.supermercado(supermercados[i], relatorio),
+            preco, quantidade, data_compra,
+            1 if normalizar_texto(promocoes[i]) in VALORES_VERDADEIROS else 0,
+            quem_pagou[i], observacoes[i]))
+    return registros
+
+
+def importar_compras(caminho, criar_produtos=False, tamanho_lote=5000,
+                     linhas_por_transacao=50000, arquivo_erros=None,
+                     ao_progresso=None, cancelar=None):
+    """Importa compras de um CSV/XLSX em lotes; retorna um RelatorioImportacao
+
+    ao_progresso(relatorio) é chamado a cada lote; se cancelar (threading.Event)
+    for sinalizado, a transação em andamento é confirmada e a leitura para.
+    Um erro desfaz só a transação em andamento: as anteriores (a cada
+    linhas_por_transacao linhas) ficam gravadas e as telas são avisadas.
+    """
+    relatorio = RelatorioImportacao(arquivo_erros)
+    linhas = iter(ler_linhas(caminho))
+    indices = mapear_cabecalho(next(linhas, []))
+    # Número de cada linha no arquivo (a 1 é o cabeçalho), contando as em branco
+    numeradas = ((numero, linha) for numero, linha in enumerate(linhas, start=2) if any(linha))
+
+    conn = get_connection()
+    confirmadas = False
+    try:
+        resolvedor = ResolvedorNomes(conn, criar_produtos)
+        conn.execute("BEGIN")
+        na_transacao = 0
+
+        while True:
+            lote = list(islice(numeradas, tamanho_lote))
+            if not lote:
+                break
+
+            registros = _processar_lote(lote, indices, resolvedor, relatorio)
+            conn.executemany('''
+            INSERT INTO compras (produto_id, supermercado_id, preco, quantidade,
+                               data_compra, promoção, quem_pagou, observacoes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', registros)
+
+            relatorio.lidas += len(lote)
+            relatorio.importadas += len(registros)
+            na_transacao += len(lote)
+            if na_transacao >= linhas_por_transacao:
+                conn.commit()
+                confirmadas = True
+                conn.execute("BEGIN")
+                na_transacao = 0
+
+            if ao_progresso:
+                ao_progresso(relatorio)
+            if cancelar is not None and cancelar.is_set():
+                relatorio.cancelada = True
+                break
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Produtos e supermercados criados na transação desfeita saem do catálogo
+        invalidar_catalogo()
+        if confirmadas:
+            eventos.publicar(eventos.DadosSubstituidos('importação de compras interrompida'))
+        raise
+    finally:
+        conn.close()
+        relatorio.fim = time.perf_counter()
+    if relatorio.importadas or relatorio.produtos_criados:
+        eventos.publicar(eventos.DadosSubstituidos('importação de compras'))
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa compras de um arquivo CSV ou XLSX")
+    parser.add_argument('arquivo')
+    parser.add_argument('--banco', help="arquivo do banco (padrão: supermercado.db)")
+    parser.add_argument('--criar-produtos', action='store_true',
+                        help="cadastra produtos que ainda não existem")
+    parser.add_argument('--log-erros', help="grava as linhas rejeitadas neste CSV")
+    parser.add_argument('--lote', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    if args.banco:
+        configurar_banco(args.banco)
+    init_db()
+
+    def progresso(relatorio):
+        print(f"\r{relatorio.lidas:,} linhas ({relatorio.linhas_por_segundo:,.0f}/s)",
+              end='', file=sys.stderr)
+
+    arquivo_erros = open(args.log_erros, 'w', newline='', encoding='utf-8') if args.log_erros else None
+    try:
+        relatorio = importar_compras(args.arquivo, criar_produtos=args.criar_produtos,
+                                     tamanho_lote=args.lote, arquivo_erros=arquivo_erros,
+                                     ao_progresso=progresso)
+    finally:
+        if arquivo_erros:
+            arquivo_erros.close()
+
+    print(file=sys.stderr)
+    print(relatorio.resumo())
+    for linha, erro in relatorio.erros[:20]:
+        print(f"  linha {linha}: {erro}")
+    return 0 if relatorio.rejeitadas == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# app/instrumentacao.py
+"""Medições de desempenho: latência por operação, SQL lento e contagem de widgets
+
+Desligada por padrão (ou ligada com SUPERMERCADO_DIAGNOSTICO=1). Desligada,
+custa uma verificação de flag nas funções decoradas com medir() e nada no
+acesso ao banco e nos widgets: os módulos que sabem instrumentar o SQLite e
+o Tk registram ganchos (registrar_gancho) que trocam os métodos só enquanto
+a coleta está ativa.
+
+Os dados ficam em `coletor` e podem ser exportados em JSON ou no formato
+Trace Event do Chrome (chrome://tracing, Perfetto).
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+ATIVO = os.environ.get('SUPERMERCADO_DIAGNOSTICO') == '1'
+
+# Limites superiores (ms) das faixas do histograma de latência
+FAIXAS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Consultas a partir deste tempo (execução + leitura das linhas) guardam o plano
+LIMITE_LENTA_MS = 50
+MAXIMO_LENTAS = 50
+# Erros de tarefas sem tratamento guardados (os mais antigos são descartados)
+MAXIMO_ERROS = 50
+# Eventos guardados para o trace (os mais antigos são descartados)
+MAXIMO_EVENTOS = 100_000
+
+_ganchos = []
+
+
+class Metrica:
+    """Latência e linhas de uma operação, com histograma por faixas"""
+
+    def __init__(self, categoria, nome):
+        self.categoria = categoria
+        self.nome = nome
+        self.chamadas = 0
+        self.total_ms = 0.0
+        self.maximo_ms = 0.0
+        self.linhas = 0
+        self.histograma = [0] * (len(FAIXAS_MS) + 1)
+
+    def registrar(self, ms, linhas=None):
+        self.chamadas += 1
+        self.total_ms += ms
+        self.maximo_ms = max(self.maximo_ms, ms)
+        if linhas is not None:
+            self.linhas += linhas
+        for i, limite in enumerate(FAIXAS_MS):
+            if ms <= limite:
+                self.histograma[i] += 1
+                return
+        self.histograma[-1] += 1
+
+    @property
+    def media_ms(self):
+        return self.total_ms / self.chamadas if self.chamadas else 0.0
+
+    def percentil(self, fracao):
+        """Limite superior da faixa que contém o percentil (aproximado pelo histograma)"""
+        alvo = fracao * self.chamadas
+        acumulado = 0
+        for i, quantidade in enumerate(self.histograma):
+            acumulado += quantidade
+            if quantidade and acumulado >= alvo:
+                return FAIXAS_MS[i] if i < len(FAIXAS_MS) else self.maximo_ms
+        return 0.0
+
+    def faixas(self):
+        """[(rótulo, quantidade)] das faixas do histograma"""
+        rotulos = [f"≤ {limite:g} ms" for limite in FAIXAS_MS] + [f"> {FAIXAS_MS[-1]:g} ms"]
+        return list(zip(rotulos, self.histograma))
+
+    def como_dict(self):
+        return {
+            'categoria': self.categoria,
+            'nome': self.nome,
+            'chamadas': self.chamadas,
+            'total_ms': round(self.total_ms, 3),
+            'media_ms': round(self.media_ms, 3),
+            'p50_ms': self.percentil(0.5),
+            'p95_ms': self.percentil(0.95),
+            'maximo_ms': round(self.maximo_ms, 3),
+            'linhas': self.linhas,
+            'histograma': dict(self.faixas()),
+        }
+
+
+class Coletor:
+    """Guarda as medições de todas as threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        with self._lock:
+            self.metricas = {}               # (categoria, nome) -> Metrica
+            self.eventos = deque(maxlen=MAXIMO_EVENTOS)
+            self.lentas = deque(maxlen=MAXIMO_LENTAS)
+            self.erros = deque(maxlen=MAXIMO_ERROS)
+            self.widgets = {}                # widget -> {'inserções': n, 'remoções': n}
+            self.threads = {}                # id da thread -> nome
+            self.origem = time.perf_counter()
+
+    def registrar(self, categoria, nome, inicio, ms, linhas=None):
+        """Registra uma chamada que começou em inicio (perf_counter) e durou ms"""
+        thread = threading.current_thread()
+        with self._lock:
+            metrica = self.metricas.get((categoria, nome))
+            if metrica is None:
+                metrica = self.metricas[(categoria, nome)] = Metrica(categoria, nome)
+            metrica.registrar(ms, linhas)
+            self.threads[thread.ident] = thread.name
+            self.eventos.append((categoria, nome, inicio, ms, thread.ident, linhas))
+
+    def registrar_lenta(self, sql, params, ms, linhas, plano):
+        with self._lock:
+            self.lentas.append({
+                'quando': datetime.now().isoformat(timespec='seconds'),
+                'ms': round(ms, 3),
+                'linhas': linhas,
+                'sql': sql,
+                'params': [repr(p)[:80] for p in params] if isinstance(params, (list, tuple))
+                          else repr(params)[:200],
+                'plano': plano,
+            })
+
+    def registrar_erro(self, categoria, nome, erro):
+        with self._lock:
+            self.erros.append({
+                'quando': datetime.now().isoformat(timespec='seconds'),
+                'categoria': categoria,
+                'nome': nome,
+                'erro': f"{type(erro).__name__}: {erro}",
+            })
+
+    def contar_widget(self, widget, operacao, quantidade=1):
+        with self._lock:
+            contagens = self.widgets.setdefault(widget, {'inserções': 0, 'remoções': 0})
+            contagens[operacao] += quantidade
+
+    def resumo(self):
+        """Cópia das medições, para exibir ou exportar"""
+        with self._lock:
+            return {
+                'metricas': sorted((m.como_dict() for m in self.metricas.values()),
+                                   key=lambda m: -m['total_ms']),
+                'lentas': list(self.lentas),
+                'erros': list(self.erros),
+                'widgets': {nome: dict(c) for nome, c in self.widgets.items()},
+            }
+
+    def metrica(self, categoria, nome):
+        with self._lock:
+            return self.metricas.get((categoria, nome))
+
+    def exportar_json(self, caminho):
+        documento = {'gerado_em': datetime.now().isoformat(timespec='seconds'), **self.resumo()}
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(documento, arquivo, indent=2, ensure_ascii=False)
+
+    def exportar_chrome_trace(self, caminho):
+        """Grava os eventos no formato Trace Event (um 'X' por chamada, em µs)"""
+        pid = os.getpid()
+        with self._lock:
+            eventos = list(self.eventos)
+            threads = dict(self.threads)
+            origem = self.origem
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                  'args': {'name': nome}} for tid, nome in threads.items()]
+        for categoria, nome, inicio, ms, tid, linhas in eventos:
+            evento = {'name': nome, 'cat': categoria, 'ph': 'X', 'pid': pid, 'tid': tid,
+                      'ts': round((inicio - origem) * 1e6, 1), 'dur': round(ms * 1000, 1)}
+            if linhas is not None:
+                evento['args'] = {'linhas': linhas}
+            trace.append(evento)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, arquivo,
+                      ensure_ascii=False)
+
+
+coletor = Coletor()
+
+
+def registrar_gancho(funcao):
+    """Registra funcao(ativo), chamada ao ligar e desligar a coleta"""
+    _ganchos.append(funcao)
+    if ATIVO:
+        funcao(True)
+
+
+def ativar():
+    global ATIVO
+    if not ATIVO:
+        ATIVO = True
+        for gancho in _ganchos:
+            gancho(True)
+
+
+def desativar():
+    global ATIVO
+    if ATIVO:
+        ATIVO = False
+        for gancho in _ganchos:
+            gancho(False)
+
+
+def contar_linhas(resultado):
+    """Linhas de um resultado de consulta, quando ele é uma lista"""
+    return len(resultado) if isinstance(resultado, list) else None
+
+
+def chamar_medindo(categoria, nome, funcao, *args, **kwargs):
+    """Chama funcao e registra a latência (mesmo se ela falhar)"""
+    inicio = time.perf_counter()
+    resultado = None
+    try:
+        resultado = funcao(*args, **kwargs)
+        return resultado
+    finally:
+        coletor.registrar(categoria, nome, inicio, (time.perf_counter() - inicio) * 1000,
+                          contar_linhas(resultado))
+
+
+def medir(categoria='tk', nome=None):
+    """Decorador que mede a função enquanto a coleta estiver ativa"""
+    def decorador(funcao):
+        rotulo = nome or funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if not ATIVO:
+                return funcao(*args, **kwargs)
+            return chamar_medindo(categoria, rotulo, funcao, *args, **kwargs)
+        return medida
+    return decorador
+
+
+def nome_funcao(funcao):
+    """Nome legível de uma função, método ligado ou functools.partial"""
+    funcao = getattr(funcao, 'func', funcao)
+    return getattr(funcao, '__qualname__', None) or repr(funcao)
@@ -0,0 +1,433 @@
+# app/notas_fiscais.py
+"""Importação de compras a partir dos XML de NFC-e / NF-e
+
+Uso: python -m app.notas_fiscais PASTA [--processos N] [--quem-pagou NOME]
+
+Os arquivos são lidos com iterparse: cada item (det) é convertido e
+descartado assim que termina, então a memória não cresce com o tamanho da
+nota. A leitura dos XML é feita em paralelo por um pool de processos; a
+gravação fica no processo principal (o SQLite aceita um escritor por vez),
+uma transação por nota.
+
+O emitente é reconhecido pelo CNPJ (supermercados.cnpj) e o item pelo EAN
+(produtos.ean) ou, sem ele, pela descrição; produtos novos são cadastrados
+com unidade_medida/qnt_medida tirados da unidade comercial e da descrição.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from app import eventos
+from app.database import get_connection, configurar_banco, init_db, obter_catalogo, invalidar_catalogo
+from app.unidades import interpretar_medida, medidas_produto
+from app.utils import normalizar_texto
+
+# Abaixo disso os arquivos são lidos no próprio processo (o pool não compensa)
+MINIMO_ARQUIVOS_POOL = 64
+# Arquivos por tarefa enviada ao pool e tarefas em andamento por processo
+ARQUIVOS_POR_TAREFA = 32
+TAREFAS_POR_PROCESSO = 4
+
+# Unidade comercial da nota (uCom) -> unidade_medida do produto
+UNIDADES_COMERCIAIS = {
+    'kg': 'kg', 'kgs': 'kg', 'g': 'g', 'gr': 'g', 'l': 'L', 'lt': 'L', 'lts': 'L',
+    'ml': 'ml', 'cx': 'cx',
+}
+
+# Medida na descrição do item: "ARROZ T1 5KG", "CERVEJA 12X350ML", "PAPEL 12 ROLOS"
+_MEDIDA_DESCRICAO = re.compile(
+    r'(?<![\w,.])((?:\d+\s*x\s*)?\d+(?:[.,]\d+)?\s*(?:kg|g|gr|grs|mg|ml|l|lt|lts|un|und|rolos?|pct|cx|dz))\b',
+    re.IGNORECASE)
+
+
+class NotaFiscal:
+    """Dados de uma nota já lidos do XML
+
+    itens: tuplas (ean, descricao, unidade, quantidade, valor, desconto).
+    """
+    __slots__ = ('chave', 'cnpj', 'emitente', 'data', 'itens')
+
+    def __init__(self, chave='', cnpj='', emitente='', data=None, itens=None):
+        self.chave = chave
+        self.cnpj = cnpj
+        self.emitente = emitente
+        self.data = data
+        self.itens = itens if itens is not None else []
+
+
+class RelatorioNotas:
+    """Contadores e erros de uma importação de notas"""
+
+    MAXIMO_ERROS_EM_MEMORIA = 1000
+
+    def __init__(self, total_arquivos=0):
+        self.total_arquivos = total_arquivos
+        self.arquivos = 0
+        self.notas = 0
+        self.itens = 0
+        self.repetidas = 0
+        self.rejeitadas = 0
+        self.produtos_criados = 0
+        self.supermercados_criados = 0
+        self.erros = []
+        self.cancelada = False
+        self.inicio = time.perf_counter()
+        self.fim = None
+
+    def rejeitar(self, origem, mensagem):
+        """Registra um arquivo, nota ou item rejeitado"""
+        self.rejeitadas += 1
+        if len(self.erros) < self.MAXIMO_ERROS_EM_MEMORIA:
+            self.erros.append((origem, mensagem))
+
+    @property
+    def segundos(self):
+        return (self.fim or time.perf_counter()) - self.inicio
+
+    @property
+    def arquivos_por_segundo(self):
+        return self.arquivos / self.segundos if self.segundos > 0 else 0.0
+
+    @property
+    def itens_por_segundo(self):
+        return self.itens / self.segundos if self.segundos > 0 else 0.0
+
+    def resumo(self):
+        """Texto curto com o resultado da importação"""
+        texto = (f"{self.notas} notas ({self.itens} itens) importadas de {self.arquivos} "
+                 f"arquivos em {self.segundos:.1f}s ({self.arquivos_por_segundo:,.0f} "
+                 f"arquivos/s, {self.itens_por_segundo:,.0f} itens/s)")
+        if self.repetidas:
+            texto += f", {self.repetidas} já importadas"
+        if self.rejeitadas:
+            texto += f", {self.rejeitadas} rejeitadas"
+        if self.cancelada:
+            texto += " — importação cancelada"
+        return texto
+
+
+def _numero(texto):
+    return float(texto) if texto else 0.0
+
+
+def _data_emissao(texto):
+    """date da dhEmi ("2024-03-05T10:22:31-03:00") ou da dEmi ("2024-03-05")"""
+    try:
+        return date.fromisoformat(texto[:10]) if texto else None
+    except ValueError:
+        return None
+
+
+def _ean(texto):
+    """EAN/GTIN só com dígitos; "SEM GTIN" e códigos inválidos viram ''"""
+    texto = (texto or '').strip()
+    return texto if texto.isdigit() and len(texto) in (8, 12, 13, 14) else ''
+
+
+def ler_notas(caminho):
+    """Gera as NotaFiscal de um XML (nfeProc, NFe ou um lote com várias)
+
+    Só os eventos de fim são pedidos ao iterparse, e os elementos são limpos
+    ao terminar: só a nota corrente (sem os itens já convertidos) fica em
+    memória.
+    """
+    nota = NotaFiscal()
+    nomes = {}  # tag com namespace -> (namespace, nome local)
+    for _, elem in ET.iterparse(caminho):
+        tag = elem.tag
+        if tag not in nomes:
+            ns, _, nome = tag.rpartition('}')
+            nomes[tag] = (ns + '}' if ns else '', nome)
+        ns, nome = nomes[tag]
+
+        if nome == 'det':
+            prod = elem.find(f'{ns}prod')
+            if prod is not None:
+                nota.itens.append((
+                    _ean(prod.findtext(f'{ns}cEAN')) or _ean(prod.findtext(f'{ns}cEANTrib')),
+                    ' '.join((prod.findtext(f'{ns}xProd') or '').split()),
+                    (prod.findtext(f'{ns}uCom') or '').strip(),
+                    _numero(prod.findtext(f'{ns}qCom')),
+                    _numero(prod.findtext(f'{ns}vProd')),
+                    _numero(prod.findtext(f'{ns}vDesc'))))
+            elem.clear()
+        elif nome == 'ide':
+            nota.data = _data_emissao(elem.findtext(f'{ns}dhEmi') or elem.findtext(f'{ns}dEmi'))
+            elem.clear()
+        elif nome == 'emit':
+            nota.cnpj = (elem.findtext(f'{ns}CNPJ') or elem.findtext(f'{ns}CPF') or '').strip()
+            nota.emitente = ' '.join((elem.findtext(f'{ns}xFant')
+                                      or elem.findtext(f'{ns}xNome') or '').split())
+            elem.clear()
+        elif nome == 'infNFe':
+            # Id="NFe<44 dígitos>" (sem str.removeprefix, que exige Python 3.9)
+            chave = elem.get('Id') or ''
+            nota.chave = chave[3:] if chave.startswith('NFe') else chave
+            yield nota
+            nota = NotaFiscal()
+            elem.clear()
+        elif nome in ('dest', 'total', 'transp', 'pag', 'infAdic', 'Signature', 'protNFe'):
+            elem.clear()
+
+
+def ler_arquivos(caminhos):
+    """Lê um grupo de arquivos; retorna [(caminho, [NotaFiscal], erro ou None)]
+
+    Executada nos processos do pool: só devolve dados, sem tocar no banco.
+    """
+    resultados = []
+    for caminho in caminhos:
+        try:
+            resultados.append((caminho, list(ler_notas(caminho)), None))
+        except (ET.ParseError, OSError, ValueError) as e:
+            resultados.append((caminho, [], str(e)))
+    return resultados
+
+
+def medida_da_descricao(descricao, unidade_medida='un'):
+    """qnt_medida tirada da descrição do item ("ARROZ 5KG" -> "5kg"), ou ''"""
+    encontradas = _MEDIDA_DESCRICAO.findall(descricao)
+    if not encontradas:
+        return ''
+    medida = re.sub(r'\s+', '', encontradas[-1]).lower()
+    return medida if interpretar_medida(medida, unidade_medida)[0] is not None else ''
+
+
+def unidade_comercial(ucom):
+    """unidade_medida do produto a partir da uCom da nota ("KG" -> "kg", "UN" -> "un")"""
+    return UNIDADES_COMERCIAIS.get(normalizar_texto(ucom or '').strip(), 'un')
+
+
+class ResolvedorNotas:
+    """Resolve CNPJ e EAN/descrição para ids, cadastrando o que faltar
+
+    Os índices por CNPJ e EAN são carregados uma vez; nomes vão pelo
+    catálogo em memória, como no importador de planilhas.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.catalogo = obter_catalogo()
+        self.por_cnpj = dict(conn.execute(
+            "SELECT cnpj, MIN(id) FROM supermercados WHERE cnpj IS NOT NULL GROUP BY cnpj"))
+        self.por_ean = dict(conn.execute(
+            "SELECT ean, MIN(id) FROM produtos WHERE ean IS NOT NULL GROUP BY ean"))
+
+    def supermercado(self, nota, relatorio):
+        """Id do emitente: pelo CNPJ, depois pelo nome; cadastra se não existir"""
+        cnpj = re.sub(r'\D', '', nota.cnpj)
+        if cnpj in self.por_cnpj:
+            return self.por_cnpj[cnpj]
+
+        nome = nota.emitente or f"CNPJ {cnpj}"
+        supermercado_id = self.catalogo.resolver_supermercado(nome)
+        if supermercado_id is None:
+            cursor = self.conn.execute(
+                "INSERT INTO supermercados (nome, cnpj) VALUES (?, ?)", (nome, cnpj or None))
+            supermercado_id = cursor.lastrowid
+            self.catalogo.adicionar_supermercado(supermercado_id, nome)
+            relatorio.supermercados_criados += 1
+        elif cnpj:
+            self.conn.execute("UPDATE supermercados SET cnpj = ? WHERE id = ? AND cnpj IS NULL",
+                              (cnpj, supermercado_id))
+        if cnpj:
+            self.por_cnpj[cnpj] = supermercado_id
+        return supermercado_id
+
+    def produto(self, ean, descricao, ucom, relatorio):
+        """Id do produto: pelo EAN, depois pela descrição; cadastra se não existir"""
+        if ean in self.por_ean:
+            return self.por_ean[ean]
+
+        produto_id = self.catalogo.resolver_produto(descricao)
+        if produto_id is None:
+            unidade = unidade_comercial(ucom)
+            medida = medida_da_descricao(descricao, unidade)
+            cursor = self.conn.execute('''
+            INSERT INTO produtos (nome, unidade_medida, qnt_medida, ean,
+                                  medida_base, unidade_base, fator_referencia)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (descricao, unidade, medida, ean or None, *medidas_produto(medida, unidade)))
+            produto_id = cursor.lastrowid
+            self.catalogo.adicionar_produto(produto_id, descricao, '')
+            relatorio.produtos_criados += 1
+        elif ean:
+            self.conn.execute("UPDATE produtos SET ean = ? WHERE id = ? AND ean IS NULL",
+                              (ean, produto_id))
+        if ean:
+            self.por_ean[ean] = produto_id
+        return produto_id
+
+
+def _registros_nota(nota, origem, resolvedor, quem_pagou, relatorio):
+    """Tuplas de compras da nota; itens inválidos são rejeitados um a um"""
+    supermercado_id = resolvedor.supermercado(nota, relatorio)
+    registros = []
+    for numero, (ean, descricao, ucom, quantidade, valor, desconto) in enumerate(nota.itens, 1):
+        if not descricao:
+            relatorio.rejeitar(f"{origem} item {numero}", "Item sem descrição")
+            continue
+        if quantidade <= 0 or valor - desconto < 0:
+            relatorio.rejeitar(f"{origem} item {numero}",
+                               f"Quantidade ou valor inválido: {quantidade} / {valor}")
+            continue
+        registros.append((
+            resolvedor.produto(ean, descricao, ucom, relatorio), supermercado_id,
+            round(valor - desconto, 2), quantidade, nota.data,
+            1 if desconto > 0 else 0, quem_pagou, ''))
+    return supermercado_id, registros
+
+
+def _gravar_nota(conn, nota, origem, resolvedor, quem_pagou, relatorio):
+    """Grava uma nota numa única transação; False se ela já tinha sido importada"""
+    conn.execute("BEGIN")
+    try:
+        if nota.chave and conn.execute("SELECT 1 FROM notas_importadas WHERE chave = ?",
+                                       (nota.chave,)).fetchone():
+            conn.rollback()
+            return False
+
+        supermercado_id, registros = _registros_nota(nota, origem, resolvedor, quem_pagou,
+                                                     relatorio)
+        conn.executemany('''
+        INSERT INTO compras (produto_id, supermercado_id, preco, quantidade,
+                           data_compra, promoção, quem_pagou, observacoes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', registros)
+        if nota.chave:
+            conn.execute('''
+            INSERT INTO notas_importadas (chave, supermercado_id, data_compra, itens)
+            VALUES (?, ?, ?, ?)
+            ''', (nota.chave, supermercado_id, nota.data, len(registros)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    relatorio.itens += len(registros)
+    return True
+
+
+def listar_xml(pasta):
+    """Arquivos .xml da pasta e das subpastas, em ordem"""
+    pasta = Path(pasta)
+    if pasta.is_file():
+        return [pasta]
+    return sorted(p for p in pasta.rglob('*') if p.suffix.lower() == '.xml' and p.is_file())
+
+
+def _grupos(caminhos, tamanho):
+    for i in range(0, len(caminhos), tamanho):
+        yield caminhos[i:i + tamanho]
+
+
+def _lidos(caminhos, processos):
+    """Gera (caminho, notas, erro) na ordem dos arquivos
+
+    Com muitos arquivos a leitura vai para um pool ('spawn', como em
+    reports/relatorios.py); só algumas tarefas ficam em andamento por vez,
+    para que a memória não dependa do tamanho da pasta.
+    """
+    processos = processos or os.cpu_count() or 1
+    if processos == 1 or len(caminhos) < MINIMO_ARQUIVOS_POOL:
+        for grupo in _grupos(caminhos, ARQUIVOS_POR_TAREFA):
+            yield from ler_arquivos(grupo)
+        return
+
+    limite = processos * TAREFAS_POR_PROCESSO
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+        pendentes = deque()
+        for grupo in _grupos(caminhos, ARQUIVOS_POR_TAREFA):
+            pendentes.append(pool.submit(ler_arquivos, grupo))
+            if len(pendentes) >= limite:
+                yield from pendentes.popleft().result()
+        while pendentes:
+            yield from pendentes.popleft().result()
+
+
+def importar_notas(pasta, processos=None, quem_pagou='', ao_progresso=None, cancelar=None):
+    """Importa as notas dos XML de uma pasta (ou de um arquivo); retorna um RelatorioNotas
+
+    ao_progresso(relatorio) é chamado a cada arquivo gravado; se cancelar
+    (threading.Event) for sinalizado, a importação para entre duas notas.
+    """
+    caminhos = listar_xml(pasta)
+    relatorio = RelatorioNotas(len(caminhos))
+    lidos = _lidos(caminhos, processos)
+
+    conn = get_connection()
+    try:
+        resolvedor = ResolvedorNotas(conn)
+        for caminho, notas, erro in lidos:
+            relatorio.arquivos += 1
+            origem = Path(caminho).name
+            if erro is not None:
+                relatorio.rejeitar(origem, f"XML inválido: {erro}")
+            elif not notas:
+                relatorio.rejeitar(origem, "Nenhuma NF-e/NFC-e no arquivo")
+
+            for nota in notas:
+                if nota.data is None:
+                    relatorio.rejeitar(origem, "Nota sem data de emissão")
+                    continue
+                try:
+                    if _gravar_nota(conn, nota, origem, resolvedor, quem_pagou, relatorio):
+                        relatorio.notas += 1
+                    else:
+                        relatorio.repetidas += 1
+                except Exception as e:
+                    relatorio.rejeitar(origem, str(e))
+                    # O que foi cadastrado na transação desfeita sai dos índices
+                    invalidar_catalogo()
+                    resolvedor = ResolvedorNotas(conn)
+
+            if ao_progresso:
+                ao_progresso(relatorio)
+            if cancelar is not None and cancelar.is_set():
+                relatorio.cancelada = True
+                break
+    finally:
+        lidos.close()
+        conn.close()
+        relatorio.fim = time.perf_counter()
+    if relatorio.notas:
+        eventos.publicar(eventos.DadosSubstituidos('importação de notas fiscais'))
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa compras dos XML de NFC-e/NF-e")
+    parser.add_argument('pasta', help="pasta com os XML (ou um único arquivo)")
+    parser.add_argument('--banco', help="arquivo do banco (padrão: supermercado.db)")
+    parser.add_argument('--processos', type=int, help="padrão: número de CPUs")
+    parser.add_argument('--quem-pagou', default='')
+    args = parser.parse_args(argv)
+
+    if args.banco:
+        configurar_banco(args.banco)
+    init_db()
+
+    def progresso(relatorio):
+        print(f"\r{relatorio.arquivos:,}/{relatorio.total_arquivos:,} arquivos "
+              f"({relatorio.arquivos_por_segundo:,.0f}/s, {relatorio.itens_por_segundo:,.0f} "
+              f"itens/s)", end='', file=sys.stderr)
+
+    relatorio = importar_notas(args.pasta, args.processos, args.quem_pagou,
+                               ao_progresso=progresso)
+    print(file=sys.stderr)
+    print(relatorio.resumo())
+    for origem, erro in relatorio.erros[:20]:
+        print(f"  {origem}: {erro}")
+    return 0 if relatorio.rejeitadas == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# app/unidades.py
+"""Interpretação de qnt_medida/unidade_medida em quantidades numéricas
+
+"500g", "1,5 kg", "2x500ml", "12un" são convertidos para uma unidade base
+(g, ml ou un). Com ela o preço por kg, por litro ou por unidade é
+calculado em SQL a partir de produtos.fator_referencia.
+"""
+import re
+from functools import lru_cache
+
+from app.utils import normalizar_texto
+
+# unidade escrita -> (unidade base, quantas unidades base ela vale)
+UNIDADES = {
+    'mg': ('g', 0.001), 'g': ('g', 1), 'gr': ('g', 1), 'grs': ('g', 1), 'grama': ('g', 1),
+    'gramas': ('g', 1), 'kg': ('g', 1000), 'kgs': ('g', 1000), 'kilo': ('g', 1000),
+    'quilo': ('g', 1000), 'ml': ('ml', 1), 'cl': ('ml', 10), 'l': ('ml', 1000),
+    'lt': ('ml', 1000), 'lts': ('ml', 1000), 'litro': ('ml', 1000), 'litros': ('ml', 1000),
+    'un': ('un', 1), 'und': ('un', 1), 'unid': ('un', 1), 'unidade': ('un', 1),
+    'unidades': ('un', 1), 'u': ('un', 1), 'pc': ('un', 1), 'pcs': ('un', 1),
+    'cx': ('un', 1), 'pct': ('un', 1), 'rolo': ('un', 1), 'rolos': ('un', 1),
+    'dz': ('un', 12), 'duzia': ('un', 12),
+}
+
+# Unidade em que o preço de referência é exibido, e quantas unidades base ela tem
+REFERENCIAS = {'g': ('kg', 1000), 'ml': ('L', 1000), 'un': ('un', 1)}
+
+_MEDIDA = re.compile(r'''^\s*
+    (?:(?P<vezes>\d+)\s*x\s*)?          # multiplicador opcional: "2x", "6 x"
+    (?P<numero>\d+(?:[.,]\d+)?)?\s*     # quantidade: "500", "1,5"
+    (?P<unidade>[a-z]+)?\s*$''', re.VERBOSE)
+
+
+@lru_cache(maxsize=4096)
+def interpretar_medida(qnt_medida, unidade_medida='un'):
+    """Retorna (quantidade na unidade base, unidade base) ou (None, None)
+
+    qnt_medida sem unidade ("500") usa unidade_medida; qnt_medida vazia
+    vale uma unidade_medida ("kg" -> 1000 g).
+    """
+    texto = normalizar_texto(qnt_medida or '').replace(' ', '')
+    padrao = normalizar_texto(unidade_medida or 'un').strip()
+
+    correspondencia = _MEDIDA.match(texto)
+    if not correspondencia:
+        return None, None
+    numero = correspondencia['numero']
+    unidade = correspondencia['unidade'] or padrao
+    if unidade not in UNIDADES or (numero is None and correspondencia['vezes']):
+        return None, None
+
+    base, fator = UNIDADES[unidade]
+    quantidade = float(numero.replace(',', '.')) if numero else 1.0
+    quantidade *= int(correspondencia['vezes'] or 1) * fator
+    if quantidade <= 0:
+        return None, None
+    return quantidade, base
+
+
+def medida_base(qnt_medida, unidade_medida='un'):
+    """Quantidade na unidade base (g, ml ou un), ou None"""
+    return interpretar_medida(qnt_medida, unidade_medida)[0]
+
+
+def unidade_base(qnt_medida, unidade_medida='un'):
+    """Unidade base (g, ml ou un), ou None"""
+    return interpretar_medida(qnt_medida, unidade_medida)[1]
+
+
+def fator_referencia(qnt_medida, unidade_medida='un'):
+    """Multiplica o preço unitário para obter o preço por kg, L ou unidade"""
+    quantidade, base = interpretar_medida(qnt_medida, unidade_medida)
+    if quantidade is None:
+        return None
+    return REFERENCIAS[base][1] / quantidade
+
+
+def medidas_produto(qnt_medida, unidade_medida='un'):
+    """(medida_base, unidade_base, fator_referencia) gravados em produtos"""
+    quantidade, base = interpretar_medida(qnt_medida, unidade_medida)
+    if quantidade is None:
+        return None, None, None
+    return quantidade, base, REFERENCIAS[base][1] / quantidade
+
+
+def unidade_referencia(unidade_base):
+    """Unidade exibida no preço de referência ('g' -> 'kg', 'ml' -> 'L')"""
+    return REFERENCIAS[unidade_base][0] if unidade_base in REFERENCIAS else None
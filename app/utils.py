@@ -1,4 +1,5 @@
 # app/utils.py
+import unicodedata
 from datetime import datetime
 
 def formatar_moeda(valor):
@@ -55,4 +56,12 @@ def extrair_marca_produto(produto_text):
             return marca
         except IndexError:
             return ""
-    return ""
\ No newline at end of file
+    return ""
+
+
+def normalizar_texto(texto):
+    """Remove acentos e converte para minúsculas ("Açúcar" -> "acucar")"""
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
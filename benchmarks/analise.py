@@ -0,0 +1,118 @@
+# benchmarks/analise.py
+"""Compara a consulta e as estatísticas em SQL com o histórico colunar (NumPy)
+
+Uso: python -m benchmarks.analise [--compras 1000000] [--repeticoes 50]
+Mede a carga do histórico, a memória por compra e, para produtos
+sorteados: contagem + primeira página da consulta (SQL x colunar) e
+preço por supermercado (GROUP BY x agrupamento vetorizado).
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import database
+from app.analise import BYTES_POR_COMPRA
+from app.datas import data_do_dia
+from benchmarks.gerador import gerar_banco
+
+# Memória máxima aceita por compra, com a folga de crescimento (bytes)
+LIMITE_BYTES = 41
+
+SQL_POR_SUPERMERCADO = '''
+SELECT s.nome, COUNT(*), MIN(c.preco / c.quantidade), AVG(c.preco / c.quantidade),
+       MAX(c.preco / c.quantidade)
+FROM produtos p
+CROSS JOIN compras c ON c.produto_id = p.id
+JOIN supermercados s ON s.id = c.supermercado_id
+WHERE p.nome = ? AND c.quantidade > 0
+GROUP BY s.id
+'''
+
+
+def cronometrar(funcao, casos):
+    """Tempo médio por caso, em ms"""
+    inicio = time.perf_counter()
+    for caso in casos:
+        funcao(*caso)
+    return (time.perf_counter() - inicio) / len(casos) * 1000
+
+
+def consulta_sql(produto, supermercado):
+    return database.consulta_precos_paginada(produto, supermercado).inicio(100)
+
+
+def consulta_colunar(produto, supermercado):
+    return database.consulta_precos_colunar(produto, supermercado).inicio(100)
+
+
+def supermercados_sql(produto, _):
+    conn = database.get_connection()
+    try:
+        return conn.execute(SQL_POR_SUPERMERCADO, (produto,)).fetchall()
+    finally:
+        conn.close()
+
+
+def supermercados_colunar(produto, _):
+    return database.resumo_supermercados_produto(produto, exato=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--compras', type=int, default=1_000_000)
+    parser.add_argument('--produtos', type=int, default=2000)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar_banco(Path(pasta) / 'analise.db')
+        database.init_db()
+        gerar_banco(args.produtos, 15, args.compras)
+
+        inicio = time.perf_counter()
+        historico = database.obter_historico()
+        carga = time.perf_counter() - inicio
+        bytes_carga = historico.bytes_alocados / historico.tamanho
+        # Força um crescimento: o pior caso da folga
+        database.inserir_compra(database.listar_nomes_produtos()[0],
+                                database.listar_supermercados()[0], 1.0, 1,
+                                data_do_dia(historico.dia[-1]))
+        historico = database.obter_historico()
+        compras = historico.tamanho
+        bytes_folga = historico.bytes_alocados / compras
+
+        aleatorio = random.Random(42)
+        nomes = database.listar_nomes_produtos()
+        supermercados = database.listar_supermercados()
+        casos = ([(aleatorio.choice(nomes), '') for _ in range(args.repeticoes)]
+                 + [('', aleatorio.choice(supermercados)[:5]) for _ in range(args.repeticoes)])
+        por_produto = casos[:args.repeticoes]
+
+        resultados = {
+            'consulta (ms)': (cronometrar(consulta_sql, casos),
+                              cronometrar(consulta_colunar, casos)),
+            'por supermercado (ms)': (cronometrar(supermercados_sql, por_produto),
+                                      cronometrar(supermercados_colunar, por_produto)),
+        }
+        database.configurar_banco(caminho_original)
+
+    print(f"Histórico de {compras} compras carregado em {carga:.1f}s")
+    print(f"Memória por compra: {BYTES_POR_COMPRA} bytes nas colunas; alocados "
+          f"{bytes_carga:.1f} após a carga e {bytes_folga:.1f} após crescer")
+    print(f"\n{'':>22} {'SQL':>9} {'colunar':>9}")
+    for medida, (sql, colunar) in resultados.items():
+        print(f"{medida:>22} {sql:>9.2f} {colunar:>9.2f}")
+
+    if bytes_folga > LIMITE_BYTES:
+        print(f"❌ Mais de {LIMITE_BYTES} bytes por compra")
+        return 1
+    print(f"✅ Até {LIMITE_BYTES} bytes por compra")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# benchmarks/anomalias.py
+"""Mede a reconstrução do estado dos preços (EWMA, mediana, z-score) sobre o histórico
+
+Uso: python -m benchmarks.anomalias [--tamanhos 100000 1000000]
+A coluna de inserção inclui todos os gatilhos de compras (agregados, gastos
+e estado dos preços); a reconstrução percorre o histórico com numpy.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from app import database
+from benchmarks.exportacao import popular_compras
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    print(f"{'compras':>10} {'inserção (s)':>12} {'reconstrução (s)':>17} {'compras/s':>11} "
+          f"{'anômalas':>9} {'promoções':>10}")
+    for tamanho in args.tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            database.configurar_banco(Path(pasta) / 'anomalias.db')
+            database.init_db()
+
+            inicio = time.perf_counter()
+            popular_compras(tamanho)
+            tempo_insercao = time.perf_counter() - inicio
+
+            conn = database.get_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("BEGIN")
+                inicio = time.perf_counter()
+                anomalas, promocoes = database._reconstruir_estado_precos(cursor)
+                tempo = time.perf_counter() - inicio
+                conn.commit()
+            finally:
+                conn.close()
+            print(f"{tamanho:>10} {tempo_insercao:>12.2f} {tempo:>17.2f} {tamanho / tempo:>11.0f} "
+                  f"{anomalas:>9} {promocoes:>10}")
+            database.configurar_banco(caminho_original)
+
+
+if __name__ == "__main__":
+    main()
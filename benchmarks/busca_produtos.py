@@ -0,0 +1,68 @@
+# benchmarks/busca_produtos.py
+"""Compara a busca de produtos pelo índice FTS5 com a busca antiga por LIKE
+
+Uso: python -m benchmarks.busca_produtos [--tamanhos 10000 100000 1000000]
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app import database
+
+NOMES = ['Açúcar', 'Leite', 'Café', 'Arroz', 'Feijão', 'Macarrão', 'Óleo', 'Sabão',
+         'Biscoito', 'Iogurte', 'Queijo', 'Manteiga', 'Farinha', 'Detergente', 'Suco']
+VARIANTES = ['Integral', 'Refinado', 'Tradicional', 'Light', 'Zero', 'Extra Forte',
+             'Desnatado', 'Orgânico', 'Premium', 'Em Pó', 'Líquido', 'Cremoso']
+MARCAS = ['União', 'Itambé', 'Pilão', 'Camil', 'Nestlé', 'Ypê', 'Piracanjuba', None]
+
+# Termos digitados no autocomplete (com e sem acento, prefixos e trechos)
+TERMOS = ['ac', 'acu', 'acucar', 'leite des', 'cafe', 'integral', 'nestle', 'premium',
+          'ypê', 'xyz123']
+
+
+def popular_produtos(quantidade, semente=42):
+    """Insere produtos sintéticos no banco configurado"""
+    aleatorio = random.Random(semente)
+    conn = database.get_connection()
+    conn.executemany(
+        "INSERT INTO produtos (nome, marca) VALUES (?, ?)",
+        ((f"{aleatorio.choice(NOMES)} {aleatorio.choice(VARIANTES)} {i}",
+          aleatorio.choice(MARCAS)) for i in range(quantidade)))
+    conn.commit()
+    conn.close()
+
+
+def medir(funcao, termos, repeticoes=5):
+    """Retorna o tempo médio por chamada, em milissegundos"""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for termo in termos:
+            funcao(termo, limite=10)
+    return (time.perf_counter() - inicio) * 1000 / (repeticoes * len(termos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    print(f"{'produtos':>10} {'LIKE (ms)':>10} {'FTS5 (ms)':>10} {'ganho':>7}")
+    for tamanho in args.tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            database.configurar_banco(Path(pasta) / 'busca.db')
+            database.init_db()
+            popular_produtos(tamanho)
+
+            tempo_like = medir(database.buscar_produtos_similares_like, TERMOS)
+            tempo_fts = medir(database.buscar_produtos_similares, TERMOS)
+            print(f"{tamanho:>10} {tempo_like:>10.2f} {tempo_fts:>10.2f} "
+                  f"{tempo_like / tempo_fts:>6.1f}x")
+            database.configurar_banco(caminho_original)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# benchmarks/carga_api.py
+"""Teste de carga do servidor HTTP/JSON (app/api.py): latência p50/p99 por rota
+
+Uso: python -m benchmarks.carga_api [--clientes 200] [--requisicoes 25]
+                                    [--url http://... [--token ...]]
+Sem --url, gera um banco sintético, sobe o servidor em outro processo e
+mede duas vezes: gravando uma compra por commit (--lote 1) e com o lote
+padrão. Cada cliente mantém uma conexão keep-alive e mistura buscas de
+produto, consultas de preço e registros de compra, todos no mesmo
+supermercado; no fim confere que cada 201 virou uma compra no banco.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from app import database
+from app.api import LOTE_MAXIMO, VARIAVEL_TOKEN
+from benchmarks.gerador import gerar_banco
+
+# Rota -> fração das requisições
+MISTURA = (('POST /compras', 0.3), ('GET /produtos', 0.4), ('GET /precos', 0.3))
+
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))] if ordenados else 0.0
+
+
+async def requisitar(reader, writer, metodo, caminho, corpo=None, token=None):
+    """Envia uma requisição pela conexão aberta; retorna o status"""
+    dados = json.dumps(corpo).encode('utf-8') if corpo is not None else b''
+    autorizacao = f"Authorization: Bearer {token}\r\n" if token else ''
+    writer.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: localhost\r\n{autorizacao}"
+                 f"Content-Type: application/json\r\nContent-Length: {len(dados)}\r\n\r\n"
+                 .encode('latin-1') + dados)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    tamanho = 0
+    while True:
+        linha = await reader.readline()
+        if linha in (b'\r\n', b''):
+            break
+        if linha.lower().startswith(b'content-length:'):
+            tamanho = int(linha.split(b':')[1])
+    await reader.readexactly(tamanho)
+    return status
+
+
+async def cliente(host, porta, numero, requisicoes, produtos, supermercado, latencias, status,
+                  token=None):
+    aleatorio = random.Random(numero)
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        for _ in range(requisicoes):
+            rota = aleatorio.choices([r for r, _ in MISTURA], [f for _, f in MISTURA])[0]
+            produto = aleatorio.choice(produtos)
+            if rota == 'POST /compras':
+                argumentos = ('POST', '/compras', {
+                    'produto': produto, 'supermercado': supermercado,
+                    'preco': round(aleatorio.uniform(1, 50), 2),
+                    'quantidade': aleatorio.randint(1, 3), 'data': date.today().isoformat(),
+                    'quem_pagou': f"cliente {numero % 5}"})
+            elif rota == 'GET /produtos':
+                argumentos = ('GET', '/produtos?' + urlencode({'q': produto[:4], 'limite': 5}))
+            else:
+                argumentos = ('GET', '/precos?' + urlencode({'produto': produto, 'limite': 20}))
+
+            inicio = time.perf_counter()
+            codigo = await requisitar(reader, writer, *argumentos, token=token)
+            latencias[rota].append((time.perf_counter() - inicio) * 1000)
+            status[(rota, codigo)] = status.get((rota, codigo), 0) + 1
+    finally:
+        writer.close()
+
+
+async def carga(url, clientes, requisicoes, produtos, supermercado, token=None):
+    partes = urlsplit(url)
+    latencias = {rota: [] for rota, _ in MISTURA}
+    status = {}
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(partes.hostname, partes.port, i, requisicoes, produtos,
+                                   supermercado, latencias, status, token)
+                           for i in range(clientes)))
+    return time.perf_counter() - inicio, latencias, status
+
+
+def imprimir(titulo, segundos, latencias, status):
+    total = sum(len(valores) for valores in latencias.values())
+    print(f"\n{titulo}: {total} requisições em {segundos:.1f}s ({total / segundos:,.0f}/s)")
+    print(f"{'':>15} {'n':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    todas = []
+    for rota, valores in latencias.items():
+        todas.extend(valores)
+        print(f"{rota:>15} {len(valores):>6} {percentil(valores, 0.5):>8.1f} "
+              f"{percentil(valores, 0.99):>8.1f}")
+    print(f"{'todas':>15} {len(todas):>6} {percentil(todas, 0.5):>8.1f} "
+          f"{percentil(todas, 0.99):>8.1f}")
+    print("  status: " + ", ".join(f"{rota} {codigo}: {n}"
+                                   for (rota, codigo), n in sorted(status.items())))
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def subir_servidor(banco, lote):
+    """Inicia python -m app.api em outro processo; retorna (processo, url)"""
+    porta = porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'app.api', '--banco', str(banco), '--host', '127.0.0.1',
+         '--porta', str(porta), '--lote', str(lote)],
+        stdout=subprocess.PIPE, text=True)
+    for linha in processo.stdout:
+        if 'ouvindo' in linha:
+            return processo, f"http://127.0.0.1:{porta}"
+    raise RuntimeError("O servidor não iniciou")
+
+
+def contar_compras(banco):
+    database.configurar_banco(banco)
+    conn = database.get_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM compras").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=200)
+    parser.add_argument('--requisicoes', type=int, default=25, help="por cliente")
+    parser.add_argument('--url', help="servidor já em execução (padrão: sobe um temporário)")
+    parser.add_argument('--token', default=os.environ.get(VARIAVEL_TOKEN),
+                        help=f"token do servidor em --url (padrão: ${VARIAVEL_TOKEN})")
+    parser.add_argument('--compras', type=int, default=100_000, help="banco temporário")
+    args = parser.parse_args()
+
+    if args.url:
+        produtos = ['Arroz', 'Feijão', 'Leite', 'Café', 'Açúcar']
+        segundos, latencias, status = asyncio.run(
+            carga(args.url, args.clientes, args.requisicoes, produtos, 'Mercado da API',
+                  args.token))
+        imprimir(args.url, segundos, latencias, status)
+        return 0
+
+    caminho_original = database.DB_PATH
+    falhas = 0
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = Path(pasta) / 'api.db'
+        database.configurar_banco(banco)
+        database.init_db()
+        gerar_banco(1000, 10, args.compras)
+        produtos = database.listar_nomes_produtos()
+        supermercado = database.listar_supermercados()[0]
+
+        for titulo, lote in (('uma compra por commit', 1), ('em lotes', LOTE_MAXIMO)):
+            antes = contar_compras(banco)
+            database.configurar_banco(caminho_original)  # o servidor é o único a usar o banco
+            processo, url = subir_servidor(banco, lote)
+            try:
+                segundos, latencias, status = asyncio.run(
+                    carga(url, args.clientes, args.requisicoes, produtos, supermercado))
+            finally:
+                processo.terminate()
+                processo.wait()
+            imprimir(titulo, segundos, latencias, status)
+
+            criadas = status.get(('POST /compras', 201), 0)
+            erros = sum(n for (_, codigo), n in status.items() if codigo >= 300)
+            gravadas = contar_compras(banco) - antes
+            if erros or gravadas != criadas:
+                print(f"❌ {erros} erros; {criadas} compras aceitas e {gravadas} gravadas")
+                falhas += 1
+        database.configurar_banco(caminho_original)
+
+    if falhas:
+        return 1
+    print("\n✅ Todas as requisições atendidas; cada compra aceita foi gravada")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
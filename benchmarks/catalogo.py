@@ -0,0 +1,108 @@
+# benchmarks/catalogo.py
+"""Mede a resolução de nomes por registro: consultas SQL (antes) x catálogo em memória
+
+Uso: python -m benchmarks.catalogo [--produtos 2000 20000] [--repeticoes 20000]
+Cada "registro" resolve 'Nome (Marca)' e o supermercado para ids, como
+registrar_compra. A coluna "SQL" repete as consultas que eram feitas
+(nome exato, depois TRIM(nome), depois o supermercado).
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import database
+from app.utils import extrair_nome_produto, extrair_marca_produto
+from benchmarks.gerador import gerar_banco
+
+# Custo máximo aceito por registro com o catálogo (µs)
+LIMITE_US = 20
+
+
+def resolver_sql(conn, texto, supermercado):
+    """Resolução como era feita antes do catálogo"""
+    nome = extrair_nome_produto(texto)
+    produto = conn.execute("SELECT id FROM produtos WHERE nome = ?", (nome,)).fetchone()
+    if not produto:
+        produto = conn.execute("SELECT id FROM produtos WHERE TRIM(nome) = ?",
+                               (nome.strip(),)).fetchone()
+    supermercado_id = conn.execute("SELECT id FROM supermercados WHERE nome = ?",
+                                   (supermercado,)).fetchone()
+    return produto, supermercado_id
+
+
+def resolver_catalogo(catalogo, texto, supermercado):
+    return (catalogo.resolver_produto(extrair_nome_produto(texto), extrair_marca_produto(texto)),
+            catalogo.resolver_supermercado(supermercado))
+
+
+def cronometrar(funcao, casos):
+    """Tempo médio por caso, em µs"""
+    inicio = time.perf_counter()
+    for texto, supermercado in casos:
+        funcao(texto, supermercado)
+    return (time.perf_counter() - inicio) / len(casos) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--produtos', type=int, nargs='+', default=[2000, 20000])
+    parser.add_argument('--repeticoes', type=int, default=20_000)
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    falhas = []
+    print(f"{'produtos':>9} {'carga (ms)':>11} {'SQL (µs)':>10} {'catálogo (µs)':>14} "
+          f"{'sem acento (µs)':>16} {'combobox SQL/catálogo (ms)':>27}")
+    for produtos in args.produtos:
+        with tempfile.TemporaryDirectory() as pasta:
+            database.configurar_banco(Path(pasta) / 'catalogo.db')
+            database.init_db()
+            gerar_banco(produtos, 15, compras=1000)
+
+            inicio = time.perf_counter()
+            catalogo = database.obter_catalogo()
+            carga = (time.perf_counter() - inicio) * 1000
+
+            aleatorio = random.Random(42)
+            nomes = catalogo.nomes_produtos()
+            supermercados = catalogo.nomes_supermercados()
+            casos = [(aleatorio.choice(nomes), aleatorio.choice(supermercados))
+                     for _ in range(args.repeticoes)]
+            # Digitado sem acentos e em minúsculas: o SQL não encontra, o catálogo sim
+            sem_acento = [(texto.lower().replace('ã', 'a').replace('é', 'e'), supermercado)
+                          for texto, supermercado in casos[:len(casos) // 10 or 1]]
+
+            conn = database.get_connection()
+            try:
+                tempo_sql = cronometrar(lambda t, s: resolver_sql(conn, t, s), casos)
+                inicio = time.perf_counter()
+                conn.execute("SELECT nome, marca FROM produtos ORDER BY nome").fetchall()
+                combobox_sql = (time.perf_counter() - inicio) * 1000
+            finally:
+                conn.close()
+            tempo_catalogo = cronometrar(lambda t, s: resolver_catalogo(catalogo, t, s), casos)
+            tempo_sem_acento = cronometrar(lambda t, s: resolver_catalogo(catalogo, t, s),
+                                           sem_acento)
+            inicio = time.perf_counter()
+            database.listar_produtos_formatados()
+            combobox_catalogo = (time.perf_counter() - inicio) * 1000
+
+            print(f"{produtos:>9} {carga:>11.1f} {tempo_sql:>10.1f} {tempo_catalogo:>14.2f} "
+                  f"{tempo_sem_acento:>16.2f} {combobox_sql:>14.2f} / {combobox_catalogo:.2f}")
+            if tempo_catalogo > LIMITE_US:
+                falhas.append(f"{produtos} produtos: {tempo_catalogo:.1f} µs por registro")
+            database.configurar_banco(caminho_original)
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return 1
+    print(f"✅ Resolução pelo catálogo abaixo de {LIMITE_US} µs por registro")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# benchmarks/cesta.py
+"""Mede o otimizador da cesta mais barata conforme a lista e o número de supermercados crescem
+
+Uso: python -m benchmarks.cesta [--itens 50 100 200] [--supermercados 10 25 50]
+Termina com código 1 se alguma otimização passar de LIMITE_MS.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import cesta, database
+from benchmarks.exportacao import popular_compras
+
+# Tempo aceitável para a interface (carregar a matriz não conta)
+LIMITE_MS = 100.0
+
+
+def sub_matriz(matriz, itens, supermercados):
+    """Os primeiros `itens` itens nos primeiros `supermercados` supermercados"""
+    return cesta.MatrizPrecos(matriz.produtos[:itens], matriz.quantidades[:itens],
+                              matriz.supermercados[:supermercados],
+                              matriz.precos[:itens, :supermercados])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--itens', type=int, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--supermercados', type=int, nargs='+', default=[10, 25, 50])
+    parser.add_argument('--maximo', type=int, nargs='+', default=[1, 2, 3, 4, 5])
+    parser.add_argument('--compras', type=int, default=300_000)
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar_banco(Path(pasta) / 'cesta.db')
+        database.init_db()
+        popular_compras(args.compras, produtos=max(args.itens),
+                        supermercados=max(args.supermercados))
+
+        lista_id = database.criar_lista('Benchmark')
+        for i in range(max(args.itens)):
+            database.adicionar_item_lista(lista_id, f"Produto {i}", 1 + i % 3)
+        inicio = time.perf_counter()
+        matriz = cesta.carregar_matriz(lista_id)
+        print(f"Matriz {len(matriz.produtos)} x {len(matriz.supermercados)} carregada em "
+              f"{(time.perf_counter() - inicio) * 1000:.1f} ms")
+        database.configurar_banco(caminho_original)
+
+    lentos = 0
+    print(f"{'itens':>6} {'superm.':>8} {'máx.':>5} {'ms':>8} {'nós':>9} {'exata':>6}")
+    for itens in args.itens:
+        for supermercados in args.supermercados:
+            parcial = sub_matriz(matriz, itens, supermercados)
+            for maximo in args.maximo:
+                resultado = cesta.otimizar_cesta(parcial, maximo)
+                ms = resultado.segundos * 1000
+                lentos += ms > LIMITE_MS
+                print(f"{itens:>6} {supermercados:>8} {maximo:>5} {ms:>8.1f} "
+                      f"{resultado.nos:>9} {'sim' if resultado.exato else 'não':>6}")
+
+    if lentos:
+        print(f"❌ {lentos} otimizações passaram de {LIMITE_MS:.0f} ms")
+        return 1
+    print(f"✅ Todas as otimizações abaixo de {LIMITE_MS:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# benchmarks/datas.py
+"""Compara data_compra como texto AAAA-MM-DD (antes) e como dia juliano inteiro
+
+Uso: python -m benchmarks.datas [--compras 5000000] [--consultas 200]
+Cria duas tabelas iguais, uma em cada formato, e mede: ordenação de todo o
+histórico por data, filtro por período (pelo índice de data) e preparo das
+datas para o gráfico (texto -> strptime por linha; dia -> NumPy de uma vez).
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from app import datas
+
+INICIO = date(2015, 1, 1)
+DIAS = 3650
+
+FORMATOS = {
+    'texto': lambda dia: (INICIO + timedelta(days=dia)).isoformat(),
+    'dia': lambda dia: datas.dia_juliano(INICIO) + dia,
+}
+
+
+def criar_banco(caminho, formato, compras, semente):
+    """Banco com compras (produto_id, preco, data_compra) e índice por data"""
+    converter = FORMATOS[formato]
+    aleatorio = random.Random(semente)
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute('''
+    CREATE TABLE compras (
+        id INTEGER PRIMARY KEY, produto_id INTEGER, preco REAL, data_compra DATE NOT NULL)
+    ''')
+    conn.executemany("INSERT INTO compras (produto_id, preco, data_compra) VALUES (?, ?, ?)",
+                     ((aleatorio.randrange(2000), round(aleatorio.uniform(1, 80), 2),
+                       converter(aleatorio.randrange(DIAS))) for _ in range(compras)))
+    conn.execute("CREATE INDEX idx_compras_data ON compras (data_compra, preco)")
+    conn.commit()
+    return conn
+
+
+def cronometrar(funcao):
+    """Tempo de uma chamada, em ms"""
+    inicio = time.perf_counter()
+    funcao()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def medir(conn, formato, consultas, semente):
+    converter = FORMATOS[formato]
+    resultado = {}
+
+    # Ordenação sem índice que a cubra (força o sorter do SQLite)
+    resultado['ordenação (ms)'] = cronometrar(lambda: conn.execute(
+        "SELECT produto_id, data_compra FROM compras ORDER BY data_compra, produto_id"
+    ).fetchall())
+
+    aleatorio = random.Random(semente)
+    periodos = []
+    for _ in range(consultas):
+        inicio = aleatorio.randrange(DIAS - 30)
+        periodos.append((converter(inicio), converter(inicio + 30)))
+    tempo = cronometrar(lambda: [conn.execute(
+        "SELECT COUNT(*), SUM(preco) FROM compras WHERE data_compra BETWEEN ? AND ?",
+        periodo).fetchone() for periodo in periodos])
+    resultado['filtro 30 dias (ms)'] = tempo / consultas
+
+    colunas = {}
+
+    def preparar():
+        valores = [linha[0] for linha in conn.execute("SELECT data_compra FROM compras")]
+        if formato == 'texto':
+            colunas['datas'] = np.array([datetime.strptime(valor, "%Y-%m-%d")
+                                         for valor in valores], dtype='datetime64[D]')
+        else:
+            colunas['datas'] = datas.dias_para_datetime64(valores)
+    resultado['preparo do gráfico (ms)'] = cronometrar(preparar)
+    resultado['bytes/linha'] = (conn.execute("PRAGMA page_count").fetchone()[0]
+                                * conn.execute("PRAGMA page_size").fetchone()[0]
+                                / conn.execute("SELECT COUNT(*) FROM compras").fetchone()[0])
+    return resultado, colunas['datas']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--compras', type=int, default=5_000_000)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    resultados = {}
+    colunas = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        for formato in FORMATOS:
+            inicio = time.perf_counter()
+            conn = criar_banco(Path(pasta) / f'{formato}.db', formato, args.compras, args.semente)
+            print(f"{formato}: {args.compras} compras geradas em "
+                  f"{time.perf_counter() - inicio:.1f}s")
+            try:
+                resultados[formato], colunas[formato] = medir(conn, formato, args.consultas,
+                                                              args.semente)
+            finally:
+                conn.close()
+
+    print(f"\n{'':>24} {'texto':>10} {'dia':>10} {'ganho':>7}")
+    for medida in resultados['texto']:
+        antes, depois = resultados['texto'][medida], resultados['dia'][medida]
+        print(f"{medida:>24} {antes:>10.2f} {depois:>10.2f} {antes / depois:>6.1f}x")
+
+    if not np.array_equal(colunas['texto'], colunas['dia']):
+        print("❌ As datas convertidas dos dois formatos diferem")
+        return 1
+    print("✅ Mesmas datas nos dois formatos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# benchmarks/exportacao.py
+"""Mede a vazão (MB/s) da exportação de compras em cada formato
+
+Uso: python -m benchmarks.exportacao [--compras 1000000]
+Formatos cuja dependência (openpyxl, pyarrow) não está instalada são pulados.
+"""
+import argparse
+import random
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+from app import database
+from reports.exports import ESCRITORES, exportar_compras
+
+
+def popular_compras(quantidade, produtos=500, supermercados=20, semente=42):
+    """Insere produtos, supermercados e compras sintéticos no banco configurado"""
+    aleatorio = random.Random(semente)
+    inicio = date(2020, 1, 1)
+    conn = database.get_connection()
+    conn.executemany("INSERT INTO produtos (nome, marca) VALUES (?, ?)",
+                     ((f"Produto {i}", f"Marca {i % 37}") for i in range(produtos)))
+    conn.executemany("INSERT INTO supermercados (nome) VALUES (?)",
+                     ((f"Supermercado {i}",) for i in range(supermercados)))
+    conn.executemany('''
+    INSERT INTO compras (produto_id, supermercado_id, preco, quantidade, data_compra,
+                         promoção, quem_pagou, observacoes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((aleatorio.randint(1, produtos), aleatorio.randint(1, supermercados),
+           round(aleatorio.uniform(1, 80), 2), aleatorio.choice((1, 1, 2, 3)),
+           inicio + timedelta(days=aleatorio.randint(0, 1800)),
+           aleatorio.random() < 0.2, aleatorio.choice(('Eu', 'Outro', '')), '')
+          for _ in range(quantidade)))
+    conn.commit()
+    conn.close()
+    database.invalidar_catalogo()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--compras', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar_banco(Path(pasta) / 'exportacao.db')
+        database.init_db()
+        popular_compras(args.compras)
+
+        print(f"{'formato':>8} {'linhas':>10} {'MB':>8} {'s':>7} {'MB/s':>7}")
+        for formato in ESCRITORES:
+            destino = Path(pasta) / f"compras.{formato}"
+            try:
+                relatorio = exportar_compras(destino, formato)
+            except ImportError as e:
+                print(f"{formato:>8}  pulado ({e})")
+                continue
+            print(f"{formato:>8} {relatorio.linhas:>10} {relatorio.bytes / 1e6:>8.1f} "
+                  f"{relatorio.segundos:>7.2f} {relatorio.mb_por_segundo:>7.1f}")
+        database.configurar_banco(caminho_original)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# benchmarks/gerador.py
+"""Gera um banco sintético e reproduzível: produtos, supermercados e compras
+
+Uso: python -m benchmarks.gerador [--produtos 2000] [--supermercados 15]
+                                  [--compras 500000] [--semente 42] [--banco supermercado.db]
+
+A mesma semente gera sempre o mesmo banco. Os preços seguem um preço base
+por kg, L ou unidade de cada produto, o nível de preço de cada
+supermercado, uma inflação mensal e ruído; parte das compras é promoção.
+Produtos e supermercados têm popularidade desigual (lei de potência).
+"""
+import argparse
+import itertools
+import math
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+from app import database, datas
+from app.unidades import interpretar_medida, medidas_produto
+
+# (nome, categoria, unidade_medida, medidas possíveis, preço base por kg, L ou unidade)
+CATALOGO = [
+    ('Arroz', 'Grãos e Cereais', 'kg', ['1kg', '2kg', '5kg'], 6.5),
+    ('Feijão', 'Grãos e Cereais', 'kg', ['500g', '1kg'], 8.0),
+    ('Macarrão', 'Grãos e Cereais', 'g', ['500g', '1kg'], 9.0),
+    ('Farinha de Trigo', 'Grãos e Cereais', 'kg', ['1kg', '5kg'], 5.5),
+    ('Açúcar', 'Doces', 'kg', ['1kg', '2kg', '5kg'], 4.8),
+    ('Café', 'Bebidas', 'g', ['250g', '500g'], 60.0),
+    ('Leite', 'Laticínios', 'L', ['1L', '12x1L'], 5.2),
+    ('Iogurte', 'Laticínios', 'g', ['170g', '6x170g', '1kg'], 16.0),
+    ('Queijo Mussarela', 'Laticínios', 'kg', ['', '200g', '500g'], 45.0),
+    ('Manteiga', 'Laticínios', 'g', ['200g', '500g'], 55.0),
+    ('Refrigerante', 'Bebidas', 'L', ['350ml', '2L', '6x2L'], 4.5),
+    ('Suco', 'Bebidas', 'L', ['1L', '200ml', '1,5L'], 9.0),
+    ('Cerveja', 'Bebidas', 'ml', ['350ml', '12x350ml', '600ml'], 12.0),
+    ('Água Mineral', 'Bebidas', 'L', ['500ml', '1,5L', '5L'], 1.8),
+    ('Óleo de Soja', 'Enlatados', 'ml', ['900ml'], 8.5),
+    ('Molho de Tomate', 'Enlatados', 'g', ['340g', '520g'], 11.0),
+    ('Milho em Conserva', 'Enlatados', 'g', ['170g', '200g'], 18.0),
+    ('Frango', 'Carnes', 'kg', ['', '1kg'], 14.0),
+    ('Carne Moída', 'Carnes', 'kg', ['', '500g'], 38.0),
+    ('Linguiça', 'Carnes', 'kg', ['', '1kg'], 24.0),
+    ('Pão de Forma', 'Padaria', 'g', ['400g', '500g'], 18.0),
+    ('Pão Francês', 'Padaria', 'kg', [''], 16.0),
+    ('Banana', 'Hortifrúti', 'kg', [''], 6.0),
+    ('Tomate', 'Hortifrúti', 'kg', [''], 8.0),
+    ('Batata', 'Hortifrúti', 'kg', ['', '2kg'], 5.5),
+    ('Alface', 'Hortifrúti', 'un', ['1un'], 3.5),
+    ('Detergente', 'Limpeza', 'ml', ['500ml'], 5.0),
+    ('Sabão em Pó', 'Limpeza', 'kg', ['800g', '1,6kg'], 18.0),
+    ('Amaciante', 'Limpeza', 'L', ['2L', '5L'], 8.0),
+    ('Papel Higiênico', 'Higiene', 'un', ['4un', '12un', '24un'], 1.6),
+    ('Sabonete', 'Higiene', 'un', ['1un', '6un'], 2.8),
+    ('Creme Dental', 'Higiene', 'g', ['90g', '3x90g'], 60.0),
+    ('Sorvete', 'Congelados', 'L', ['1,5L', '2L'], 14.0),
+    ('Pizza Congelada', 'Congelados', 'g', ['460g'], 45.0),
+    ('Chocolate', 'Doces', 'g', ['90g', '200g'], 80.0),
+    ('Biscoito', 'Doces', 'g', ['130g', '3x130g'], 35.0),
+]
+VARIANTES = ['', 'Integral', 'Tradicional', 'Light', 'Zero', 'Premium', 'Orgânico', 'Extra']
+MARCAS = ['União', 'Camil', 'Nestlé', 'Itambé', 'Piracanjuba', 'Ypê', 'Sadia', 'Seara',
+          'Pilão', 'Qualitá', 'Tio João', 'Kicaldo', 'Omo', 'Colgate', None]
+REDES = ['Extra', 'Carrefour', 'Pão de Açúcar', 'Assaí', 'Atacadão', 'Dia', 'Guanabara',
+         'Mundial', 'Zona Sul', 'Prezunic']
+BAIRROS = ['Centro', 'Norte', 'Sul', 'Leste', 'Oeste', 'Shopping', 'Rodovia', 'Praia']
+PAGADORES = [('Eu', 6), ('Outro', 2), ('Família', 1), ('', 1)]
+
+FIM_PADRAO = date(2024, 12, 31)
+INFLACAO_MENSAL = 0.005
+PROBABILIDADE_PROMOCAO = 0.12
+LOTE = 50_000
+
+
+def _preco_embalagem(medida, unidade, preco_base):
+    """Preço da embalagem a partir do preço por kg, L ou unidade"""
+    quantidade, unidade_base = interpretar_medida(medida, unidade)
+    if quantidade is None:
+        return preco_base
+    referencia = {'g': 1000, 'ml': 1000}.get(unidade_base, 1)
+    return preco_base * quantidade / referencia
+
+
+def _pesos_potencia(n, expoente, aleatorio):
+    """Pesos acumulados de popularidade 1/posição^expoente, em ordem aleatória"""
+    pesos = [1 / (i + 1) ** expoente for i in range(n)]
+    aleatorio.shuffle(pesos)
+    return list(itertools.accumulate(pesos))
+
+
+def gerar_banco(produtos=2000, supermercados=15, compras=500_000, semente=42, dias=3 * 365,
+                fim=FIM_PADRAO, ao_progresso=None):
+    """Preenche o banco configurado (com o esquema já criado) com dados sintéticos
+
+    As compras são inseridas em ordem de data, como num uso real, então os
+    gatilhos de agregados e de estado dos preços fazem o mesmo trabalho que
+    fariam no dia a dia. ao_progresso(compras_inseridas) é chamado a cada lote.
+    """
+    aleatorio = random.Random(semente)
+    conn = database.get_connection()
+    try:
+        categorias = dict(conn.execute("SELECT nome, id FROM categorias").fetchall())
+
+        # Preço de referência de cada produto (a embalagem inteira), na ordem de inserção
+        linhas_produtos = []
+        precos_produtos = []
+        for i in range(produtos):
+            nome, categoria, unidade, medidas, preco_base = aleatorio.choice(CATALOGO)
+            variante = aleatorio.choice(VARIANTES)
+            medida = aleatorio.choice(medidas)
+            preco_base *= math.exp(aleatorio.gauss(0, 0.25))
+            linhas_produtos.append((f"{nome} {variante} {i}".replace('  ', ' '),
+                                    categorias.get(categoria), aleatorio.choice(MARCAS),
+                                    unidade, medida, *medidas_produto(medida, unidade)))
+            precos_produtos.append(_preco_embalagem(medida, unidade, preco_base))
+        primeiro_produto = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM produtos")
+                            .fetchone()[0] + 1)
+        with conn:
+            conn.executemany('''
+            INSERT INTO produtos (nome, categoria_id, marca, unidade_medida, qnt_medida,
+                                  medida_base, unidade_base, fator_referencia)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', linhas_produtos)
+
+            nomes = [f"{aleatorio.choice(REDES)} {aleatorio.choice(BAIRROS)} {i}"
+                     for i in range(supermercados)]
+            primeiro_supermercado = (conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM supermercados").fetchone()[0] + 1)
+            conn.executemany("INSERT INTO supermercados (nome) VALUES (?)",
+                             ((nome,) for nome in nomes))
+        niveis = [math.exp(aleatorio.gauss(0, 0.06)) for _ in range(supermercados)]
+
+        pesos_produtos = _pesos_potencia(produtos, 0.8, aleatorio)
+        pesos_supermercados = _pesos_potencia(supermercados, 1.0, aleatorio)
+        pagadores, pesos_pagadores = zip(*PAGADORES)
+        pesos_pagadores = list(itertools.accumulate(pesos_pagadores))
+
+        inicio = fim - timedelta(days=dias - 1)
+        inseridas = 0
+        lote = []
+        for dia in range(dias):
+            # Distribui as compras entre os dias sem arredondamento acumulado
+            quantas = compras * (dia + 1) // dias - compras * dia // dias
+            dia_compra = datas.dia_juliano(inicio + timedelta(days=dia))
+            inflacao = (1 + INFLACAO_MENSAL) ** (dia / 30)
+            for _ in range(quantas):
+                p = aleatorio.choices(range(produtos), cum_weights=pesos_produtos)[0]
+                s = aleatorio.choices(range(supermercados), cum_weights=pesos_supermercados)[0]
+                promocao = aleatorio.random() < PROBABILIDADE_PROMOCAO
+                preco = (precos_produtos[p] * niveis[s] * inflacao
+                         * math.exp(aleatorio.gauss(0, 0.05)))
+                if promocao:
+                    preco *= 1 - aleatorio.uniform(0.1, 0.3)
+                quantidade = aleatorio.choices((1, 2, 3, 6), weights=(70, 18, 8, 4))[0]
+                lote.append((primeiro_produto + p, primeiro_supermercado + s,
+                             max(0.19, round(preco * quantidade, 1) - 0.01), quantidade,
+                             dia_compra, promocao,
+                             aleatorio.choices(pagadores, cum_weights=pesos_pagadores)[0]))
+            if len(lote) >= LOTE or dia == dias - 1:
+                with conn:
+                    conn.executemany('''
+                    INSERT INTO compras (produto_id, supermercado_id, preco, quantidade,
+                                         data_compra, promoção, quem_pagou)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', lote)
+                inseridas += len(lote)
+                lote = []
+                if ao_progresso:
+                    ao_progresso(inseridas)
+        return inseridas
+    finally:
+        conn.close()
+        database.invalidar_catalogo()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--produtos', type=int, default=2000)
+    parser.add_argument('--supermercados', type=int, default=15)
+    parser.add_argument('--compras', type=int, default=500_000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--banco', default=database.DB_PATH)
+    args = parser.parse_args()
+
+    database.configurar_banco(Path(args.banco))
+    database.init_db()
+    conn = database.get_connection()
+    existentes = conn.execute("SELECT COUNT(*) FROM compras").fetchone()[0]
+    conn.close()
+    if existentes:
+        print(f"❌ {args.banco} já tem {existentes} compras; use um banco novo")
+        return 1
+
+    total = gerar_banco(args.produtos, args.supermercados, args.compras, args.semente,
+                        ao_progresso=lambda n: print(f"\r{n}/{args.compras} compras", end=''))
+    print(f"\n✅ {args.produtos} produtos, {args.supermercados} supermercados e "
+          f"{total} compras em {args.banco}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# benchmarks/graficos.py
+"""Gera muitos gráficos seguidos e confere que a memória não cresce
+
+Uso: python -m benchmarks.graficos [--graficos 1000] [--compras 200000]
+Usa o backend Agg (não precisa de display).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from app import database
+from benchmarks.exportacao import popular_compras
+from reports import charts
+
+# Crescimento tolerado entre o aquecimento e o fim da série de gráficos
+MAXIMO_CRESCIMENTO_MB = 10.0
+
+
+def memoria_mb():
+    """Memória residente do processo (no Linux a atual; nos demais, o pico)"""
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 1e6 if sys.platform == 'darwin' else pico / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--graficos', type=int, default=1000)
+    parser.add_argument('--compras', type=int, default=200_000)
+    parser.add_argument('--produtos', type=int, default=500)
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar_banco(Path(pasta) / 'graficos.db')
+        database.init_db()
+        popular_compras(args.compras, produtos=args.produtos)
+
+        aleatorio = random.Random(7)
+        grafico = charts.GraficoPrecos()
+        canvas = FigureCanvasAgg(grafico.figura)
+        aquecimento = min(100, args.graficos // 10)
+        inicio = time.perf_counter()
+        for i in range(args.graficos):
+            if i == aquecimento:
+                memoria_base = memoria_mb()
+            produto = f"Produto {aleatorio.randrange(args.produtos)}"
+            if grafico.desenhar(charts.preparar_grafico(produto)):
+                canvas.draw()
+        segundos = time.perf_counter() - inicio
+        memoria_final = memoria_mb()
+        database.configurar_banco(caminho_original)
+
+    crescimento = memoria_final - memoria_base
+    print(f"{args.graficos} gráficos em {segundos:.1f}s "
+          f"({segundos * 1000 / args.graficos:.1f} ms por gráfico)")
+    print(f"Memória após {aquecimento} gráficos: {memoria_base:.1f} MB; "
+          f"ao final: {memoria_final:.1f} MB ({crescimento:+.1f} MB)")
+    if crescimento > MAXIMO_CRESCIMENTO_MB:
+        print(f"❌ A memória cresceu mais que {MAXIMO_CRESCIMENTO_MB} MB")
+        return 1
+    print("✅ Memória estável")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
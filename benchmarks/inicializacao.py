@@ -0,0 +1,106 @@
+# benchmarks/inicializacao.py
+"""Mede o tempo de importação da interface e o tempo até a primeira pintura da janela
+
+Uso: python -m benchmarks.inicializacao [--meta-ms 800] [--repeticoes 3]
+
+A parte de importação usa python -X importtime e funciona sem display; a
+medição da primeira pintura precisa de um display (é pulada sem ele).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Módulos pesados que não podem ser importados junto com a interface
+PROIBIDOS_NA_PARTIDA = ('matplotlib', 'numpy', 'openpyxl', 'pyarrow')
+
+META_PRIMEIRA_PINTURA_MS = 800
+
+FILHO = '''
+import sys, time, tkinter as tk
+from app import database
+database.configurar_banco(sys.argv[1])
+from gui.main_window import SupermercadoApp
+root = tk.Tk()
+app = SupermercadoApp(root)
+def pintado(event):
+    root.unbind('<Map>')
+    root.after_idle(lambda: (print(time.time(), flush=True), root.destroy()))
+root.bind('<Map>', pintado)
+root.mainloop()
+'''
+
+
+def medir_importacao():
+    """Roda -X importtime; retorna (total_ms, [(cumulativo_ms, modulo)])"""
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import gui.main_window'],
+        cwd=RAIZ, capture_output=True, text=True, check=True)
+
+    modulos = []
+    total = 0
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, cumulativo, nome = linha[len('import time:'):].split('|')
+        modulos.append((int(cumulativo) / 1000, nome.strip()))
+        if nome.strip() == 'gui.main_window':
+            total = int(cumulativo) / 1000
+    return total, modulos
+
+
+def medir_primeira_pintura():
+    """Tempo (ms) entre iniciar o processo e a janela ser exibida"""
+    with tempfile.TemporaryDirectory() as pasta:
+        inicio = time.time()
+        resultado = subprocess.run(
+            [sys.executable, '-c', FILHO, str(Path(pasta) / 'inicio.db')],
+            cwd=pasta, env={**os.environ, 'PYTHONPATH': str(RAIZ)},
+            capture_output=True, text=True, timeout=60)
+        if resultado.returncode != 0:
+            raise RuntimeError(resultado.stderr.strip().splitlines()[-1])
+        return (float(resultado.stdout.split()[-1]) - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--meta-ms', type=float, default=META_PRIMEIRA_PINTURA_MS)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+    falhas = 0
+
+    total, modulos = medir_importacao()
+    print(f"import gui.main_window: {total:.0f} ms")
+    for cumulativo, nome in sorted(modulos, reverse=True)[:10]:
+        print(f"  {cumulativo:8.1f} ms  {nome}")
+
+    carregados = {nome.split('.')[0] for _, nome in modulos}
+    pesados = [m for m in PROIBIDOS_NA_PARTIDA if m in carregados]
+    if pesados:
+        print(f"❌ Importados na partida: {', '.join(pesados)}")
+        falhas += 1
+    else:
+        print("✅ Nenhum módulo pesado importado na partida")
+
+    if not os.environ.get('DISPLAY') and sys.platform.startswith('linux'):
+        print("Sem display: medição da primeira pintura pulada")
+        return 1 if falhas else 0
+
+    tempos = [medir_primeira_pintura() for _ in range(args.repeticoes)]
+    melhor = min(tempos)
+    print(f"Primeira pintura: {melhor:.0f} ms (melhor de {len(tempos)}; meta {args.meta_ms:.0f} ms)")
+    if melhor > args.meta_ms:
+        print("❌ Acima da meta")
+        falhas += 1
+    else:
+        print("✅ Dentro da meta")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
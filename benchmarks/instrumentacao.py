@@ -0,0 +1,79 @@
+# benchmarks/instrumentacao.py
+"""Mede o custo da instrumentação ligada e desligada
+
+Uso: python -m benchmarks.instrumentacao [--compras 20000] [--repeticoes 20000]
+Compara uma função decorada com medir() e uma consulta simples com a
+versão sem instrumentação; desligada, a diferença deve ficar no ruído.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import database, instrumentacao
+from benchmarks.exportacao import popular_compras
+
+# Custo extra tolerado por chamada com a coleta desligada (µs)
+LIMITE_DESLIGADA_US = 1.0
+
+
+def cronometrar(funcao, repeticoes):
+    """Tempo médio por chamada, em µs (melhor de 5 rodadas)"""
+    melhor = float('inf')
+    for _ in range(5):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor / repeticoes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--compras', type=int, default=20_000)
+    parser.add_argument('--repeticoes', type=int, default=20_000)
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar_banco(Path(pasta) / 'instrumentacao.db')
+        database.init_db()
+        popular_compras(args.compras)
+        conn = database.get_connection()
+
+        def vazia():
+            return None
+
+        def consulta():
+            return conn.execute("SELECT preco FROM compras WHERE id = ?", (1,)).fetchone()
+
+        casos = [('função decorada', vazia, instrumentacao.medir('bench')(vazia)),
+                 ('consulta por id', consulta, consulta)]
+        print(f"{'operação':<18} {'original':>10} {'desligada':>10} {'ligada':>10}")
+        falhas = []
+        for nome, original, instrumentada in casos:
+            instrumentacao.desativar()
+            base = cronometrar(original, args.repeticoes)
+            desligada = cronometrar(instrumentada, args.repeticoes)
+            instrumentacao.ativar()
+            ligada = cronometrar(instrumentada, args.repeticoes)
+            instrumentacao.desativar()
+            instrumentacao.coletor.limpar()
+            print(f"{nome:<18} {base:>8.2f}µs {desligada:>8.2f}µs {ligada:>8.2f}µs")
+            if desligada - base > LIMITE_DESLIGADA_US:
+                falhas.append(f"{nome}: +{desligada - base:.2f} µs com a coleta desligada")
+
+        conn.close()
+        database.configurar_banco(caminho_original)
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return 1
+    print(f"✅ Desligada, a instrumentação custa menos de {LIMITE_DESLIGADA_US} µs por chamada")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
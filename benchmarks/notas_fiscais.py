@@ -0,0 +1,145 @@
+# benchmarks/notas_fiscais.py
+"""Mede a importação de XML de NFC-e, lendo num só processo e com o pool
+
+Uso: python -m benchmarks.notas_fiscais [--notas 2000] [--itens 40] [--processos 4]
+Gera notas sintéticas (sempre as mesmas para a mesma semente), importa a
+pasta em um banco vazio com --processos 1 e depois com o pool, e confere
+que os dois bancos ficaram com as mesmas compras. Reimportar a pasta não
+deve gravar nada (as notas já importadas são reconhecidas pela chave).
+"""
+import argparse
+import random
+import sys
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import date, timedelta
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from app import database
+from app.notas_fiscais import importar_notas, ler_notas
+
+NS = 'http://www.portalfiscal.inf.br/nfe'
+
+LOJAS = [('12345678000190', 'Mercado Central'), ('98765432000155', 'Super Bom'),
+         ('11222333000181', 'Atacadão do Bairro'), ('44555666000177', 'Hiper Preço')]
+
+ITENS = [
+    ('7891000100103', 'ARROZ TIPO 1 5KG', 'UN'), ('7891000200207', 'FEIJAO CARIOCA 1KG', 'UN'),
+    ('7891000300301', 'LEITE INTEGRAL 1L', 'UN'), ('7891000400405', 'CERVEJA LATA 12X350ML', 'UN'),
+    ('SEM GTIN', 'BANANA PRATA', 'KG'), ('SEM GTIN', 'TOMATE ITALIANO', 'KG'),
+    ('7891000500509', 'CAFE TORRADO 500G', 'UN'), ('7891000600603', 'SABAO EM PO 1,6KG', 'UN'),
+    ('7891000700707', 'PAPEL HIGIENICO 12 ROLOS', 'PCT'), ('SEM GTIN', 'PAO FRANCES', 'KG'),
+]
+
+
+def xml_nota(numero, aleatorio, itens_por_nota, inicio):
+    """Texto de um nfeProc com uma NFC-e (layout 4.00, campos usados na importação)"""
+    cnpj, loja = LOJAS[numero % len(LOJAS)]
+    emissao = inicio + timedelta(days=numero % 365)
+    chave = f"35{emissao:%y%m}{cnpj}65001{numero:09d}1{numero % 10**8:08d}0"
+    dets = []
+    for i in range(1, itens_por_nota + 1):
+        ean, descricao, unidade = aleatorio.choice(ITENS)
+        quantidade = round(aleatorio.uniform(0.2, 2.5), 3) if unidade == 'KG' else aleatorio.randint(1, 4)
+        unitario = round(aleatorio.uniform(2, 40), 2)
+        desconto = round(unitario * 0.1, 2) if aleatorio.random() < 0.1 else 0
+        dets.append(
+            f'<det nItem="{i}"><prod><cProd>{i}</cProd><cEAN>{ean}</cEAN>'
+            f'<xProd>{escape(descricao)}</xProd><NCM>00000000</NCM><CFOP>5102</CFOP>'
+            f'<uCom>{unidade}</uCom><qCom>{quantidade:.4f}</qCom><vUnCom>{unitario:.2f}</vUnCom>'
+            f'<vProd>{quantidade * unitario:.2f}</vProd><cEANTrib>{ean}</cEANTrib>'
+            + (f'<vDesc>{desconto:.2f}</vDesc>' if desconto else '')
+            + '</prod><imposto><ICMS><ICMSSN102><orig>0</orig><CSOSN>102</CSOSN></ICMSSN102>'
+              '</ICMS></imposto></det>')
+    return (f'<?xml version="1.0" encoding="UTF-8"?><nfeProc xmlns="{NS}" versao="4.00">'
+            f'<NFe><infNFe Id="NFe{chave}" versao="4.00"><ide><cUF>35</cUF><mod>65</mod>'
+            f'<nNF>{numero}</nNF><dhEmi>{emissao.isoformat()}T10:15:00-03:00</dhEmi></ide>'
+            f'<emit><CNPJ>{cnpj}</CNPJ><xNome>{escape(loja)} LTDA</xNome>'
+            f'<xFant>{escape(loja)}</xFant></emit>{"".join(dets)}'
+            f'<total><ICMSTot><vNF>0.00</vNF></ICMSTot></total></infNFe></NFe>'
+            f'<protNFe versao="4.00"><infProt><chNFe>{chave}</chNFe><cStat>100</cStat>'
+            f'</infProt></protNFe></nfeProc>')
+
+
+def gerar_pasta(pasta, notas, itens_por_nota, semente=42):
+    aleatorio = random.Random(semente)
+    inicio = date(2024, 1, 1)
+    for numero in range(1, notas + 1):
+        (pasta / f"nfce_{numero:06d}.xml").write_text(
+            xml_nota(numero, aleatorio, itens_por_nota, inicio), encoding='utf-8')
+
+
+def pico_leitura(ler, caminho):
+    """Pico de memória (KB) de uma leitura do arquivo"""
+    tracemalloc.start()
+    ler(caminho)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pico / 1024
+
+
+def importar(caminho_banco, pasta, processos):
+    database.configurar_banco(caminho_banco)
+    database.init_db()
+    relatorio = importar_notas(pasta, processos)
+    conn = database.get_connection()
+    try:
+        compras = conn.execute('''
+        SELECT p.nome, s.cnpj, c.preco, c.quantidade, c.data_compra, c.promoção
+        FROM compras c JOIN produtos p ON p.id = c.produto_id
+        JOIN supermercados s ON s.id = c.supermercado_id
+        ORDER BY c.id
+        ''').fetchall()
+    finally:
+        conn.close()
+    return relatorio, compras
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notas', type=int, default=2000)
+    parser.add_argument('--itens', type=int, default=40)
+    parser.add_argument('--processos', type=int, default=4)
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as temporaria:
+        temporaria = Path(temporaria)
+        pasta = temporaria / 'xml'
+        pasta.mkdir()
+        gerar_pasta(pasta, args.notas, args.itens)
+        # Uma nota grande: árvore inteira (ET.parse) x iterparse
+        grande = temporaria / 'grande.xml'
+        grande.write_text(xml_nota(1, random.Random(1), 5000, date(2024, 1, 1)),
+                          encoding='utf-8')
+        picos = (pico_leitura(ET.parse, grande),
+                 pico_leitura(lambda caminho: list(ler_notas(caminho)), grande))
+
+        resultados = {}
+        for processos in (1, args.processos):
+            resultados[processos] = importar(temporaria / f'notas_{processos}.db', pasta, processos)
+        repeticao = importar_notas(pasta, args.processos)
+        database.configurar_banco(caminho_original)
+
+    print(f"{args.notas} notas com {args.itens} itens cada")
+    for processos, (relatorio, _) in resultados.items():
+        print(f"  {processos} processo(s): {relatorio.resumo()}")
+    print(f"  reimportação: {repeticao.resumo()}")
+    print(f"Pico de memória lendo uma nota de 5000 itens: {picos[0]:,.0f} KB com "
+          f"ET.parse, {picos[1]:,.0f} KB com iterparse")
+
+    serial, paralelo = (compras for _, compras in resultados.values())
+    if serial != paralelo or len(serial) != args.notas * args.itens:
+        print("❌ As compras importadas diferem entre as execuções")
+        return 1
+    if repeticao.notas or repeticao.repetidas != args.notas:
+        print("❌ A reimportação gravou notas já importadas")
+        return 1
+    print("✅ Mesmas compras com e sem o pool; reimportação ignorada")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
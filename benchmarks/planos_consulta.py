@@ -0,0 +1,82 @@
+# benchmarks/planos_consulta.py
+"""Verifica com EXPLAIN QUERY PLAN que as consultas da interface usam os índices
+
+Uso: python -m benchmarks.planos_consulta
+Termina com código 1 se alguma consulta voltar a varrer a tabela compras.
+"""
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from app import database
+
+# (descrição, consulta, parâmetros, índice esperado)
+CASOS = [
+    ("Últimas compras", database.SQL_ULTIMAS_COMPRAS, (), 'idx_compras_data'),
+    ("Consulta por produto", *database.montar_consulta_precos('leite', ''),
+     'idx_compras_produto_data'),
+    ("Consulta por supermercado", *database.montar_consulta_precos('', 'Extra'),
+     'idx_compras_supermercado_data'),
+    ("Consulta por produto e supermercado", *database.montar_consulta_precos('leite', 'Extra'),
+     'idx_compras_produto_data'),
+    ("Estatísticas do produto", database.SQL_ESTATISTICAS_PRODUTO, ('%leite%',),
+     'SEARCH a USING PRIMARY KEY (produto_id=? AND periodo=?)'),
+    # Sem período, o índice dos últimos preços cobre o gráfico inteiro
+    ("Gráfico do produto", *database.montar_consulta_grafico('leite'),
+     'SEARCH a USING COVERING INDEX idx_agregados_ultimo_preco (periodo=? AND produto_id=?)'),
+    ("Gráfico do produto no período",
+     *database.montar_consulta_grafico('leite', date(2024, 1, 1), date(2024, 12, 31)),
+     'SEARCH a USING PRIMARY KEY (produto_id=? AND periodo=? AND inicio>? AND inicio<?)'),
+    ("Versão dos dados do gráfico",
+     *database.montar_consulta_grafico('leite', select=database.SQL_VERSAO_GRAFICO),
+     'SEARCH a USING PRIMARY KEY (produto_id=? AND periodo=?)'),
+    ("Lista de produtos", database.SQL_LISTA_PRODUTOS, (), 'idx_produtos_nome'),
+    ("Produto pelo nome", "SELECT id FROM produtos WHERE nome = ?", ('Leite',),
+     'idx_produtos_nome'),
+    ("Últimos preços da lista", database.SQL_ULTIMOS_PRECOS.format(marcadores='?, ?'),
+     (1, 2), 'COVERING INDEX idx_agregados_ultimo_preco'),
+    ("Preços recentes da lista", database.SQL_PRECOS_RECENTES.format(marcadores='?, ?'),
+     (1, 2, '2024-01-01'), 'COVERING INDEX idx_agregados_ultimo_preco'),
+    ("Gastos por mês", database.SQL_GASTOS_POR_MES, ('2024-01-01', '2024-12-01'),
+     'SEARCH gastos_mensais USING PRIMARY KEY (dimensao=? AND mes>? AND mes<?)'),
+    *((f"Gastos por dimensão {dimensao}", query, ('2024-01-01', '2024-12-01'),
+       'SEARCH g USING PRIMARY KEY (dimensao=? AND mes>? AND mes<?)')
+      for dimensao, query in database.SQL_GASTOS_POR_DIMENSAO.items()),
+]
+
+
+def verificar_planos():
+    """Retorna a lista de falhas (vazia se todas as consultas usam os índices)"""
+    falhas = []
+    for descricao, query, params, indice in CASOS:
+        plano = database.explicar_consulta(query, params)
+        usa_indice = any(indice in linha for linha in plano)
+        varre_compras = any(linha.startswith('SCAN c') and 'INDEX' not in linha
+                            for linha in plano)
+        if not usa_indice or varre_compras:
+            falhas.append((descricao, indice, plano))
+    return falhas
+
+
+def main():
+    caminho_original = database.DB_PATH
+    with tempfile.TemporaryDirectory() as pasta:
+        database.configurar_banco(Path(pasta) / 'planos.db')
+        database.init_db()
+        falhas = verificar_planos()
+        database.configurar_banco(caminho_original)
+
+    for descricao, indice, plano in falhas:
+        print(f"❌ {descricao}: esperado {indice}")
+        for linha in plano:
+            print(f"     {linha}")
+
+    if falhas:
+        return 1
+    print(f"✅ {len(CASOS)} consultas usam os índices esperados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
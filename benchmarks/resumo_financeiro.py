@@ -0,0 +1,48 @@
+# benchmarks/resumo_financeiro.py
+"""Confere que o resumo financeiro não fica mais lento com o histórico de compras
+
+Uso: python -m benchmarks.resumo_financeiro [--tamanhos 1000 100000 1000000]
+Mede o resumo dos últimos 12 meses e o registro de uma compra (que atualiza
+os gastos mensais pelos gatilhos) em bancos de tamanhos diferentes.
+"""
+import argparse
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from app import database
+from benchmarks.exportacao import popular_compras
+
+
+def medir(funcao, *args, repeticoes=50):
+    """Retorna o tempo médio por chamada, em milissegundos"""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao(*args)
+    return (time.perf_counter() - inicio) * 1000 / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    caminho_original = database.DB_PATH
+    print(f"{'compras':>10} {'resumo (ms)':>12} {'registro (ms)':>14}")
+    for tamanho in args.tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            database.configurar_banco(Path(pasta) / 'resumo.db')
+            database.init_db()
+            popular_compras(tamanho)
+
+            meses = database.meses_com_gastos()
+            tempo_resumo = medir(database.resumo_gastos, meses[min(11, len(meses) - 1)], meses[0])
+            tempo_registro = medir(database.inserir_compra, 'Produto 1', 'Supermercado 1',
+                                   5.0, 1, date(2024, 5, 10))
+            print(f"{tamanho:>10} {tempo_resumo:>12.2f} {tempo_registro:>14.2f}")
+            database.configurar_banco(caminho_original)
+
+
+if __name__ == "__main__":
+    main()
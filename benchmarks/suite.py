@@ -0,0 +1,222 @@
+# benchmarks/suite.py
+"""Mede os caminhos principais da aplicação num banco sintético e grava o resultado em JSON
+
+Uso: python -m benchmarks.suite [--compras 200000] [--saida resultado.json]
+                                [--comparar anterior.json] [--tolerancia 0.25]
+
+O banco é gerado por benchmarks.gerador (mesma semente, mesmos dados). Com
+--comparar, termina com código 1 se alguma operação ficar mais lenta que a
+do arquivo anterior além da tolerância, ou passar do limite absoluto.
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app import backup, database
+from benchmarks.gerador import gerar_banco
+from reports import charts
+from reports.relatorios import texto_estatisticas
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Linhas da primeira página das tabelas (TreeviewPaginado.TAMANHO_PAGINA)
+TAMANHO_PAGINA = 100
+
+# Termos digitados no autocomplete
+TERMOS = ['ar', 'arroz', 'leite int', 'cafe', 'integral', 'nestle', 'premium', 'papel hig',
+          'sabao', 'xyz123']
+
+# Limite absoluto da mediana de cada operação (ms), independente da comparação
+LIMITES_MS = {
+    'init_db (banco novo)': 500,
+    'init_db (banco migrado)': 20,
+    'buscar_produtos_similares': 30,
+    'buscar_precos': 100,
+    'calcular_estatisticas': 50,
+    'gerar_grafico (dados)': 200,
+    'load_produtos': 50,
+    'fazer_backup': 5000,
+}
+
+# Diferença absoluta abaixo da qual a comparação não acusa regressão (ms)
+RUIDO_MS = 1.0
+
+
+def cronometrar(funcao, argumentos, repeticoes):
+    """Chama funcao(argumento) para cada argumento; retorna os tempos em ms"""
+    tempos = []
+    for i in range(repeticoes):
+        argumento = argumentos[i % len(argumentos)]
+        inicio = time.perf_counter()
+        funcao(argumento)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def resumir(tempos):
+    """Mediana, p95, mínimo e máximo (ms) de uma série de tempos"""
+    ordenados = sorted(tempos)
+    return {
+        'mediana_ms': round(statistics.median(ordenados), 3),
+        'p95_ms': round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))], 3),
+        'minimo_ms': round(ordenados[0], 3),
+        'maximo_ms': round(ordenados[-1], 3),
+        'repeticoes': len(ordenados),
+    }
+
+
+def versao_codigo():
+    """Commit atual (com '+' se há alterações não commitadas), ou None fora do git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        alterado = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                  cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+' if alterado else '')
+
+
+def medir_init_db(pasta, repeticoes):
+    """init_db num banco vazio (todas as migrações) e num banco já migrado"""
+    tempos_novo = []
+    for i in range(repeticoes):
+        database.configurar_banco(Path(pasta) / f'novo_{i}.db')
+        inicio = time.perf_counter()
+        database.init_db()
+        tempos_novo.append((time.perf_counter() - inicio) * 1000)
+    return tempos_novo, cronometrar(lambda _: database.init_db(), [None], repeticoes)
+
+
+def executar(compras, produtos, supermercados, semente, repeticoes):
+    """Gera o banco, mede cada operação e retorna {operação: resumo}"""
+    caminho_original = database.DB_PATH
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        tempos_novo, tempos_migrado = medir_init_db(pasta, max(3, repeticoes // 10))
+        resultados['init_db (banco novo)'] = resumir(tempos_novo)
+        resultados['init_db (banco migrado)'] = resumir(tempos_migrado)
+
+        database.configurar_banco(Path(pasta) / 'suite.db')
+        database.init_db()
+        inicio = time.perf_counter()
+        gerar_banco(produtos, supermercados, compras, semente)
+        segundos_geracao = time.perf_counter() - inicio
+
+        aleatorio = random.Random(semente)
+        nomes = database.listar_nomes_produtos()
+        amostra = aleatorio.sample(nomes, min(len(nomes), repeticoes))
+
+        def buscar_precos(nome):
+            database.consulta_precos_paginada(nome, '').inicio(TAMANHO_PAGINA)
+
+        def calcular_estatisticas(nome):
+            texto_estatisticas(nome, database.estatisticas_produto(nome))
+
+        def preparar_grafico(nome):
+            charts.cache_dados.limpar()
+            charts.preparar_grafico(nome)
+
+        operacoes = [
+            ('buscar_produtos_similares', database.buscar_produtos_similares, TERMOS),
+            ('buscar_precos', buscar_precos, amostra),
+            ('calcular_estatisticas', calcular_estatisticas, amostra),
+            ('gerar_grafico (dados)', preparar_grafico, amostra),
+            ('load_produtos',
+             lambda _: database.consulta_produtos_paginada().inicio(TAMANHO_PAGINA), [None]),
+        ]
+        for nome, funcao, argumentos in operacoes:
+            funcao(argumentos[0])  # aquecimento (cache de páginas e de statements)
+            resultados[nome] = resumir(cronometrar(funcao, argumentos, repeticoes))
+
+        pasta_backups = Path(pasta) / 'backups'
+        resultados['fazer_backup'] = resumir(cronometrar(
+            lambda _: backup.fazer_backup(pasta_backups, forcar=True), [None],
+            max(3, repeticoes // 10)))
+        database.configurar_banco(caminho_original)
+
+    return resultados, segundos_geracao
+
+
+def comparar(atual, anterior, tolerancia):
+    """Retorna as regressões: [(operação, mediana anterior, mediana atual)]"""
+    regressoes = []
+    for nome, resumo in atual.items():
+        if nome not in anterior:
+            continue
+        antes = anterior[nome]['mediana_ms']
+        agora = resumo['mediana_ms']
+        if agora > antes * (1 + tolerancia) and agora - antes > RUIDO_MS:
+            regressoes.append((nome, antes, agora))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--compras', type=int, default=200_000)
+    parser.add_argument('--produtos', type=int, default=2000)
+    parser.add_argument('--supermercados', type=int, default=15)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    parser.add_argument('--saida', type=Path, help="arquivo JSON com o resultado")
+    parser.add_argument('--comparar', type=Path, help="resultado anterior, para comparação")
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help="aumento relativo da mediana tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    resultados, segundos_geracao = executar(args.compras, args.produtos, args.supermercados,
+                                            args.semente, args.repeticoes)
+    documento = {
+        'versao': versao_codigo(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                     'plataforma': platform.platform()},
+        'parametros': {'compras': args.compras, 'produtos': args.produtos,
+                       'supermercados': args.supermercados, 'semente': args.semente,
+                       'repeticoes': args.repeticoes},
+        'geracao_s': round(segundos_geracao, 2),
+        'resultados': resultados,
+    }
+
+    print(f"Banco gerado em {segundos_geracao:.1f}s ({args.compras} compras)")
+    print(f"{'operação':<28} {'mediana':>9} {'p95':>9} {'limite':>8}")
+    falhas = []
+    for nome, resumo in resultados.items():
+        limite = LIMITES_MS.get(nome)
+        acima = limite is not None and resumo['mediana_ms'] > limite
+        if acima:
+            falhas.append(f"{nome}: mediana {resumo['mediana_ms']:.1f} ms acima de {limite} ms")
+        print(f"{nome:<28} {resumo['mediana_ms']:>7.2f}ms {resumo['p95_ms']:>7.2f}ms "
+              f"{limite if limite is not None else '-':>6}ms{' ❌' if acima else ''}")
+
+    if args.saida:
+        args.saida.write_text(json.dumps(documento, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"Resultado gravado em {args.saida}")
+
+    if args.comparar:
+        anterior = json.loads(args.comparar.read_text(encoding='utf-8'))
+        if anterior.get('parametros') != documento['parametros']:
+            print("⚠️  Parâmetros diferentes dos da execução anterior; a comparação é aproximada")
+        for nome, antes, agora in comparar(resultados, anterior['resultados'], args.tolerancia):
+            falhas.append(f"{nome}: {antes:.2f} ms → {agora:.2f} ms "
+                          f"(+{(agora / antes - 1) * 100:.0f}%, versão {anterior.get('versao')})")
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if falhas:
+        return 1
+    print("✅ Nenhuma regressão")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
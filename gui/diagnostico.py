@@ -0,0 +1,225 @@
+# gui/diagnostico.py
+"""Janela de diagnóstico (Ctrl+Shift+D): latências, SQL lento e widgets"""
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from app import instrumentacao
+from app.instrumentacao import coletor
+
+_treeview_original = {}
+
+
+def _instrumentar_treeview(ativo):
+    """Conta as linhas inseridas e removidas de cada Treeview enquanto ativo"""
+    if ativo:
+        inserir, remover = ttk.Treeview.insert, ttk.Treeview.delete
+        _treeview_original.update(insert=inserir, delete=remover)
+
+        def insert(self, *args, **kwargs):
+            coletor.contar_widget(str(self), 'inserções')
+            return inserir(self, *args, **kwargs)
+
+        def delete(self, *itens):
+            coletor.contar_widget(str(self), 'remoções', len(itens))
+            return remover(self, *itens)
+
+        ttk.Treeview.insert, ttk.Treeview.delete = insert, delete
+    elif _treeview_original:
+        ttk.Treeview.insert = _treeview_original.pop('insert')
+        ttk.Treeview.delete = _treeview_original.pop('delete')
+
+
+instrumentacao.registrar_gancho(_instrumentar_treeview)
+
+
+class DiagnosticoJanela:
+    """Exibe as medições do coletor e exporta em JSON ou Chrome trace"""
+
+    INTERVALO_MS = 1000
+    COLUNAS = (('nome', 'Operação', 320), ('chamadas', 'Chamadas', 70),
+               ('media', 'Média', 70), ('p50', 'p50', 60), ('p95', 'p95', 60),
+               ('maximo', 'Máx.', 70), ('linhas', 'Linhas', 70))
+
+    def __init__(self, parent, app=None):
+        self.app = app
+        self.janela = tk.Toplevel(parent)
+        self.janela.title("Diagnóstico")
+        self.janela.geometry("900x600")
+        self.janela.transient(parent)
+        self._agendado = None
+
+        self.criar_widgets()
+        self.atualizar()
+        self.janela.protocol("WM_DELETE_WINDOW", self.fechar)
+
+    def criar_widgets(self):
+        """Cria os widgets da janela"""
+        topo = ttk.Frame(self.janela, padding=(10, 10, 10, 0))
+        topo.pack(fill='x')
+        self.ativo_var = tk.BooleanVar(value=instrumentacao.ATIVO)
+        ttk.Checkbutton(topo, text="Coletar medições", variable=self.ativo_var,
+                        command=self.alternar).pack(side='left')
+        ttk.Button(topo, text="Exportar Chrome Trace...",
+                   command=self.exportar_trace).pack(side='right')
+        ttk.Button(topo, text="Exportar JSON...", command=self.exportar_json).pack(side='right')
+        ttk.Button(topo, text="Limpar", command=self.limpar).pack(side='right')
+        ttk.Button(topo, text="Atualizar", command=self.atualizar).pack(side='right')
+
+        notebook = ttk.Notebook(self.janela)
+        notebook.pack(fill='both', expand=True, padx=10, pady=10)
+
+        # Operações da interface e do executor, com o histograma da selecionada
+        aba = ttk.Frame(notebook)
+        notebook.add(aba, text="Operações")
+        self.tree_operacoes = self.criar_tabela(aba, (('categoria', 'Tipo', 70),) + self.COLUNAS)
+        self.tree_operacoes.bind('<<TreeviewSelect>>', lambda e: self.mostrar_histograma())
+        self.text_histograma = tk.Text(aba, height=8, font=('Courier', 9))
+        self.text_histograma.pack(fill='x', pady=(5, 0))
+
+        aba = ttk.Frame(notebook)
+        notebook.add(aba, text="SQL")
+        self.tree_sql = self.criar_tabela(aba, self.COLUNAS)
+
+        # Consultas lentas com o plano de execução
+        aba = ttk.Frame(notebook)
+        notebook.add(aba, text="Consultas lentas")
+        self.tree_lentas = self.criar_tabela(aba, (('quando', 'Quando', 140), ('ms', 'ms', 70),
+                                                   ('linhas', 'Linhas', 70), ('sql', 'SQL', 500)))
+        self.tree_lentas.bind('<<TreeviewSelect>>', lambda e: self.mostrar_lenta())
+        self.text_lenta = tk.Text(aba, height=10, font=('Courier', 9))
+        self.text_lenta.pack(fill='x', pady=(5, 0))
+
+        aba = ttk.Frame(notebook)
+        notebook.add(aba, text="Widgets")
+        self.tree_widgets = self.criar_tabela(aba, (('widget', 'Widget', 500),
+                                                    ('insercoes', 'Inserções', 90),
+                                                    ('remocoes', 'Remoções', 90)))
+
+        ttk.Label(self.janela, text=f"Tempos em ms. p50/p95 são aproximados pelas faixas do "
+                                    f"histograma; consultas com {instrumentacao.LIMITE_LENTA_MS} ms "
+                                    f"ou mais guardam o plano.").pack(anchor='w', padx=10,
+                                                                      pady=(0, 10))
+        self._lentas = []
+
+    def criar_tabela(self, parent, colunas):
+        """Treeview com barra de rolagem e as colunas (id, título, largura)"""
+        frame = ttk.Frame(parent)
+        frame.pack(fill='both', expand=True)
+        tree = ttk.Treeview(frame, columns=[c[0] for c in colunas], show='headings')
+        for coluna, titulo, largura in colunas:
+            tree.heading(coluna, text=titulo)
+            tree.column(coluna, width=largura, stretch=coluna in ('nome', 'sql', 'widget'))
+        scrollbar = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        return tree
+
+    def nomes_widgets(self):
+        """Caminho Tk -> nome do atributo da aplicação (ex.: tree_historico)"""
+        if self.app is None:
+            return {}
+        return {str(valor): nome for nome, valor in vars(self.app).items()
+                if isinstance(valor, tk.Misc)}
+
+    def alternar(self):
+        if self.ativo_var.get():
+            instrumentacao.ativar()
+        else:
+            instrumentacao.desativar()
+        self.atualizar()
+
+    def atualizar(self):
+        """Recarrega as tabelas; repete a cada INTERVALO_MS enquanto coleta"""
+        if self._agendado is not None:
+            self.janela.after_cancel(self._agendado)
+            self._agendado = None
+
+        self.preencher(coletor.resumo())
+        if instrumentacao.ATIVO:
+            self._agendado = self.janela.after(self.INTERVALO_MS, self.atualizar)
+
+    def preencher(self, resumo):
+        selecionada = self.tree_operacoes.selection()
+        for tree in (self.tree_operacoes, self.tree_sql, self.tree_lentas, self.tree_widgets):
+            tree.delete(*tree.get_children())
+
+        for metrica in resumo['metricas']:
+            valores = (metrica['nome'], metrica['chamadas'], f"{metrica['media_ms']:.2f}",
+                       f"{metrica['p50_ms']:g}", f"{metrica['p95_ms']:g}",
+                       f"{metrica['maximo_ms']:.2f}", metrica['linhas'])
+            if metrica['categoria'] == 'sql':
+                self.tree_sql.insert('', 'end', values=valores)
+            else:
+                iid = f"{metrica['categoria']}|{metrica['nome']}"
+                self.tree_operacoes.insert('', 'end', iid=iid,
+                                           values=(metrica['categoria'],) + valores)
+        if selecionada and self.tree_operacoes.exists(selecionada[0]):
+            self.tree_operacoes.selection_set(selecionada[0])
+
+        self._lentas = resumo['lentas'][::-1]
+        for lenta in self._lentas:
+            self.tree_lentas.insert('', 'end', values=(lenta['quando'], lenta['ms'], lenta['linhas'],
+                                                       ' '.join(lenta['sql'].split())))
+
+        nomes = self.nomes_widgets()
+        propria = str(self.janela)
+        for widget, contagens in sorted(resumo['widgets'].items()):
+            if widget.startswith(propria):
+                continue  # as tabelas desta janela
+            self.tree_widgets.insert('', 'end', values=(nomes.get(widget, widget),
+                                                        contagens['inserções'],
+                                                        contagens['remoções']))
+
+    def mostrar_histograma(self):
+        """Histograma de latência da operação selecionada"""
+        self.text_histograma.delete('1.0', 'end')
+        selecionada = self.tree_operacoes.selection()
+        if not selecionada:
+            return
+        metrica = coletor.metrica(*selecionada[0].split('|', 1))
+        if metrica is None:
+            return
+        faixas = metrica.faixas()
+        maior = max(quantidade for _, quantidade in faixas) or 1
+        linhas = [f"{rotulo:>12} {'█' * round(40 * quantidade / maior):<40} {quantidade}"
+                  for rotulo, quantidade in faixas if quantidade]
+        self.text_histograma.insert('1.0', "\n".join(linhas))
+
+    def mostrar_lenta(self):
+        """SQL, parâmetros e plano da consulta lenta selecionada"""
+        self.text_lenta.delete('1.0', 'end')
+        selecionada = self.tree_lentas.selection()
+        if not selecionada:
+            return
+        lenta = self._lentas[self.tree_lentas.index(selecionada[0])]
+        self.text_lenta.insert('1.0', f"{lenta['sql']}\n\nParâmetros: {lenta['params']}\n\n"
+                                      "Plano:\n" + "\n".join(lenta['plano']))
+
+    def limpar(self):
+        coletor.limpar()
+        self.atualizar()
+
+    def exportar_json(self):
+        caminho = filedialog.asksaveasfilename(parent=self.janela, defaultextension='.json',
+                                               filetypes=[("JSON", "*.json")],
+                                               initialfile='diagnostico.json')
+        if caminho:
+            coletor.exportar_json(caminho)
+            messagebox.showinfo("Diagnóstico", f"Medições exportadas para\n{caminho}",
+                                parent=self.janela)
+
+    def exportar_trace(self):
+        caminho = filedialog.asksaveasfilename(parent=self.janela, defaultextension='.json',
+                                               filetypes=[("Chrome trace", "*.json")],
+                                               initialfile='trace.json')
+        if caminho:
+            coletor.exportar_chrome_trace(caminho)
+            messagebox.showinfo("Diagnóstico", f"Trace exportado para\n{caminho}\n\n"
+                                "Abra em chrome://tracing ou ui.perfetto.dev.",
+                                parent=self.janela)
+
+    def fechar(self):
+        if self._agendado is not None:
+            self.janela.after_cancel(self._agendado)
+        self.janela.destroy()
@@ -1,15 +1,42 @@
 # gui/dialogs.py
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import date
-from app.database import get_connection
+from app.database import get_connection, salvar_produto
+
+
+def dados_produto(produto_id=None):
+    """Categorias cadastradas e (nome, categoria, marca, unidade, qnt_medida) do produto"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT nome FROM categorias ORDER BY nome")
+        categorias = [row[0] for row in cursor.fetchall()]
+        
+        produto = None
+        if produto_id:
+            cursor.execute('''
+            SELECT p.nome, c.nome, p.marca, p.unidade_medida, p.qnt_medida
+            FROM produtos p
+            LEFT JOIN categorias c ON p.categoria_id = c.id
+            WHERE p.id = ?
+            ''', (produto_id,))
+            produto = cursor.fetchone()
+        return categorias, produto
+    finally:
+        conn.close()
 
 
 class ProdutoDialog:
-    """Diálogo para cadastro/edição de produtos"""
+    """Diálogo para cadastro/edição de produtos
     
-    def __init__(self, parent, produto_id=None, callback=None):
+    Leitura e gravação passam pelo ExecutorConsultas da janela principal.
+    """
+    
+    def __init__(self, parent, executor, produto_id=None, callback=None):
         self.parent = parent
+        self.executor = executor
         self.produto_id = produto_id
         self.callback = callback
         
@@ -67,42 +94,39 @@ class ProdutoDialog:
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=5, column=0, columnspan=2, pady=20)
         
-        ttk.Button(button_frame, text="Salvar", 
-                  command=self.salvar_produto).pack(side='left', padx=5)
+        self.botao_salvar = ttk.Button(button_frame, text="Salvar", 
+                                       command=self.salvar_produto)
+        self.botao_salvar.pack(side='left', padx=5)
         ttk.Button(button_frame, text="Cancelar", 
                   command=self.janela.destroy).pack(side='left', padx=5)
     
     def carregar_dados(self):
         """Carrega categorias e dados do produto (se edição)"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Carregar categorias
-        cursor.execute("SELECT nome FROM categorias ORDER BY nome")
-        categorias = [row[0] for row in cursor.fetchall()]
+        self.executor.ler(dados_produto, self.produto_id, grupo='produtos',
+                          chave='dados_produto', ao_concluir=self.preencher,
+                          ao_falhar=self.mostrar_erro)
+    
+    def preencher(self, dados):
+        """Preenche o formulário com o resultado de dados_produto"""
+        if not self.janela.winfo_exists():
+            return
+        categorias, produto = dados
         self.combo_categoria['values'] = categorias
-        
-        # Se for edição, carregar dados do produto
-        if self.produto_id:
-            cursor.execute('''
-            SELECT p.nome, c.nome, p.marca, p.unidade_medida, p.qnt_medida
-            FROM produtos p
-            LEFT JOIN categorias c ON p.categoria_id = c.id
-            WHERE p.id = ?
-            ''', (self.produto_id,))
-            
-            produto = cursor.fetchone()
-            if produto:
-                self.entry_nome.insert(0, produto[0] or "")
-                self.combo_categoria.set(produto[1] or "")
-                self.entry_marca.insert(0, produto[2] or "")
-                self.combo_unidade.set(produto[3] or "un")
-                self.entry_qnt_medida.insert(0, produto[4] or "")
-        
-        conn.close()
+        if produto:
+            self.entry_nome.insert(0, produto[0] or "")
+            self.combo_categoria.set(produto[1] or "")
+            self.entry_marca.insert(0, produto[2] or "")
+            self.combo_unidade.set(produto[3] or "un")
+            self.entry_qnt_medida.insert(0, produto[4] or "")
+    
+    def mostrar_erro(self, erro):
+        """Exibe o erro e libera o botão Salvar"""
+        if self.janela.winfo_exists():
+            self.botao_salvar.config(state='normal')
+        messagebox.showerror("Erro", f"Ocorreu um erro: {str(erro)}")
     
     def salvar_produto(self):
-        """Salva o produto no banco de dados"""
+        """Salva o produto no banco de dados (na thread de escrita)"""
         nome = self.entry_nome.get().strip()
         categoria = self.combo_categoria.get().strip()
         
@@ -110,39 +134,12 @@ class ProdutoDialog:
             messagebox.showerror("Erro", "Informe o nome do produto!")
             return
         
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Obter ID da categoria
-        categoria_id = None
-        if categoria:
-            cursor.execute("SELECT id FROM categorias WHERE nome = ?", (categoria,))
-            result = cursor.fetchone()
-            if result:
-                categoria_id = result[0]
-        
         # Preparar dados
         marca = self.entry_marca.get().strip() or None
         unidade = self.combo_unidade.get()
         qnt_medida = self.entry_qnt_medida.get().strip() or None
         
-        try:
-            if self.produto_id:
-                # Atualizar produto existente
-                cursor.execute('''
-                UPDATE produtos 
-                SET nome = ?, categoria_id = ?, marca = ?, 
-                    unidade_medida = ?, qnt_medida = ?
-                WHERE id = ?
-                ''', (nome, categoria_id, marca, unidade, qnt_medida, self.produto_id))
-            else:
-                # Inserir novo produto
-                cursor.execute('''
-                INSERT INTO produtos (nome, categoria_id, marca, unidade_medida, qnt_medida)
-                VALUES (?, ?, ?, ?, ?)
-                ''', (nome, categoria_id, marca, unidade, qnt_medida))
-            
-            conn.commit()
+        def salvo(_):
             messagebox.showinfo("Sucesso", 
                 "Produto atualizado com sucesso!" if self.produto_id 
                 else "Produto cadastrado com sucesso!")
@@ -150,9 +147,69 @@ class ProdutoDialog:
             if self.callback:
                 self.callback()
             
+            if self.janela.winfo_exists():
+                self.janela.destroy()
+        
+        # Um clique só; as telas abertas se atualizam pelo evento publicado
+        self.botao_salvar.config(state='disabled')
+        self.executor.escrever(salvar_produto, nome, categoria, marca, unidade, qnt_medida,
+                               self.produto_id, grupo='produtos',
+                               ao_concluir=salvo, ao_falhar=self.mostrar_erro)
+
+
+class ProgressoDialog:
+    """Janela com barra de progresso e botão Cancelar para tarefas longas
+    
+    ao_progresso(relatorio) pode ser chamado da thread da tarefa: só guarda o
+    último relatório, que a janela lê no mainloop a cada INTERVALO_MS.
+    descrever(relatorio) retorna (texto, percentual ou None).
+    """
+    
+    INTERVALO_MS = 100
+    
+    def __init__(self, parent, titulo, descrever):
+        self.descrever = descrever
+        self.cancelar = threading.Event()  # passado à tarefa
+        self._relatorio = None
+        
+        self.janela = tk.Toplevel(parent)
+        self.janela.title(titulo)
+        self.janela.resizable(False, False)
+        self.janela.transient(parent)
+        self.janela.protocol("WM_DELETE_WINDOW", self.cancelar_tarefa)
+        
+        frame = ttk.Frame(self.janela, padding="20")
+        frame.pack(fill='both', expand=True)
+        self.label = ttk.Label(frame, text="Iniciando...", width=45)
+        self.label.pack(anchor='w')
+        self.barra = ttk.Progressbar(frame, length=320, maximum=100, mode='indeterminate')
+        self.barra.pack(pady=10)
+        self.barra.start()
+        self.botao = ttk.Button(frame, text="Cancelar", command=self.cancelar_tarefa)
+        self.botao.pack()
+        
+        self.janela.after(self.INTERVALO_MS, self._atualizar)
+    
+    def ao_progresso(self, relatorio):
+        self._relatorio = relatorio
+    
+    def cancelar_tarefa(self):
+        """Sinaliza a tarefa; ela para no próximo lote"""
+        self.cancelar.set()
+        self.label.config(text="Cancelando...")
+        self.botao.config(state='disabled')
+    
+    def _atualizar(self):
+        if not self.janela.winfo_exists():
+            return
+        if self._relatorio is not None and not self.cancelar.is_set():
+            texto, percentual = self.descrever(self._relatorio)
+            self.label.config(text=texto)
+            if percentual is not None:
+                self.barra.stop()
+                self.barra.config(mode='determinate', value=percentual)
+        self.janela.after(self.INTERVALO_MS, self._atualizar)
+    
+    def fechar(self):
+        if self.janela.winfo_exists():
             self.janela.destroy()
-            
-        except Exception as e:
-            messagebox.showerror("Erro", f"Ocorreu um erro: {str(e)}")
-        finally:
-            conn.close()
\ No newline at end of file
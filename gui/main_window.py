@@ -1,10 +1,9 @@
 # gui/main_window.py
 import tkinter as tk
-from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from tkinter import ttk, messagebox, filedialog, simpledialog
 from datetime import datetime, date
 from pathlib import Path
+from bisect import insort
 import sys
 import os
 
@@ -13,36 +12,85 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Agora importa os módulos locais
 try:
-    from app.database import init_db, get_connection, fazer_backup, validar_data_compra, validar_preco
+    from app.database import (init_db, validar_compra,
+                              consulta_precos_colunar, consulta_produtos_paginada,
+                              resumo_supermercados_produto, obter_historico,
+                              listar_produtos_formatados, listar_supermercados, listar_quem_pagou,
+                              ultimas_compras, estatisticas_produto,
+                              contar_compras_produto, remover_produto, inserir_compra,
+                              reconstruir_agregados, listar_listas, criar_lista, remover_lista,
+                              adicionar_item_lista, remover_item_lista, itens_lista,
+                              formatar_nome_produto, meses_com_gastos, resumo_gastos,
+                              avaliar_preco, LIMITE_ULTIMAS_COMPRAS)
+    from app.executor import ExecutorConsultas, bombear_com_after
+    from app.eventos import (barramento, ProdutoAdicionado, ProdutoAlterado, ProdutoRemovido,
+                             SupermercadoAdicionado, CompraAdicionada, DadosSubstituidos)
+    from app.instrumentacao import medir
+    from app.importador import importar_compras
+    from app.notas_fiscais import importar_notas
+    from app.backup import PASTA_BACKUPS, fazer_backup, restaurar_backup
+    from app.unidades import unidade_referencia
+    from reports.exports import exportar_compras, PARQUET_DISPONIVEL
+    from reports.relatorios import texto_estatisticas
     from app.utils import formatar_moeda, extrair_nome_produto, extrair_marca_produto
-    from .dialogs import ProdutoDialog
-    from .widgets import AutoCompleteCombobox, ValidatedEntry
+    from .dialogs import ProdutoDialog, ProgressoDialog
+    from .diagnostico import DiagnosticoJanela
+    from .widgets import (AutoCompleteCombobox, ValidatedEntry, TreeviewPaginado,
+                          invalidar_cache_sugestoes)
 except ImportError as e:
     print(f"Erro ao importar módulos: {e}")
     print(f"Diretório atual: {os.getcwd()}")
     print(f"Caminho do script: {__file__}")
     raise
 
+def carregar_matplotlib():
+    """Importa o matplotlib (lento); chamada em segundo plano ao abrir a aba de gráficos"""
+    import reports.charts
+    import matplotlib.backends.backend_tkagg
+
+
 class SupermercadoApp:
+    # Rótulo do combobox de preços da cesta -> janela em dias (None: último preço)
+    JANELAS_PRECOS = {
+        'Último preço': None,
+        'Últimos 30 dias': 30,
+        'Últimos 90 dias': 90,
+    }
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Supermercado Price Tracker")
         self.root.geometry("1000x700")
+        self.banco_pronto = False
         
-        # Inicializar banco de dados
-        init_db()
+        # Acesso ao banco fora do mainloop; callbacks voltam via root.after
+        self.executor = ExecutorConsultas()
+        self.executor.ao_mudar_ocupado = self.indicar_ocupado
+        bombear_com_after(self.executor, self.root)
         
-        # Fazer backup automático
-        backup_path = fazer_backup()
-        if backup_path:
-            print(f"Backup criado: {backup_path}")
+        # Alterações publicadas pelas escritas; cada tela aplica só a diferença
+        bombear_com_after(barramento, self.root)
+        self.assinar_eventos()
         
         # Configurar estilo
         self.setup_styles()
         
-        # Criar interface
+        # Criar interface (só a primeira aba; as demais ao serem abertas)
         self.create_widgets()
         
+        # Migrações na thread de escrita; a janela aparece sem esperar por elas
+        self.executor.escrever(init_db, grupo='registrar', ao_concluir=self.ao_banco_pronto,
+                               ao_falhar=self.mostrar_erro_banco)
+    
+    def ao_banco_pronto(self, _):
+        """Carrega os dados iniciais depois que as migrações terminam"""
+        self.banco_pronto = True
+        
+        # Backup automático em segundo plano (pulado se o banco não mudou)
+        self.executor.ler(fazer_backup,
+                          ao_concluir=lambda caminho: caminho and print(f"Backup criado: {caminho}"),
+                          ao_falhar=lambda erro: print(f"Falha no backup automático: {erro}"))
+        
         # Carregar dados iniciais
         self.load_data()
 
@@ -67,25 +115,206 @@ class SupermercadoApp:
         # Aba 1: Registrar Compra
         self.frame_registrar = ttk.Frame(self.notebook)
         self.notebook.add(self.frame_registrar, text='📝 Registrar Compra')
-        self.create_registrar_tab()
         
         # Aba 2: Consultar Preços
         self.frame_consultar = ttk.Frame(self.notebook)
         self.notebook.add(self.frame_consultar, text='🔍 Consultar Preços')
-        self.create_consultar_tab()
         
         # Aba 3: Estatísticas
         self.frame_estatisticas = ttk.Frame(self.notebook)
         self.notebook.add(self.frame_estatisticas, text='📊 Estatísticas')
-        self.create_estatisticas_tab()
         
         # Aba 4: Gerenciar Produtos
         self.frame_produtos = ttk.Frame(self.notebook)
         self.notebook.add(self.frame_produtos, text='📦 Gerenciar Produtos')
-        self.create_produtos_tab()
+        
+        # Aba 5: Listas de Compra
+        self.frame_listas = ttk.Frame(self.notebook)
+        self.notebook.add(self.frame_listas, text='🛒 Listas de Compra')
+        
+        # Aba 6: Resumo Financeiro
+        self.frame_financeiro = ttk.Frame(self.notebook)
+        self.notebook.add(self.frame_financeiro, text='💰 Resumo Financeiro')
+        
+        # Abas por grupo de tarefas do executor (indicador de ocupado)
+        self.abas = {
+            'registrar': self.frame_registrar,
+            'consultar': self.frame_consultar,
+            'estatisticas': self.frame_estatisticas,
+            'produtos': self.frame_produtos,
+            'listas': self.frame_listas,
+            'financeiro': self.frame_financeiro,
+        }
+        self.titulos_abas = {grupo: self.notebook.tab(frame, 'text')
+                             for grupo, frame in self.abas.items()}
+        
+        # O conteúdo de cada aba é criado na primeira vez que ela é selecionada
+        self.construtores_abas = {
+            'registrar': self.create_registrar_tab,
+            'consultar': self.create_consultar_tab,
+            'estatisticas': self.create_estatisticas_tab,
+            'produtos': self.create_produtos_tab,
+            'listas': self.create_listas_tab,
+            'financeiro': self.create_financeiro_tab,
+        }
+        self.abas_construidas = set()
+        self.garantir_aba('registrar')
+        self.notebook.bind('<<NotebookTabChanged>>', self.ao_trocar_aba)
         
         # Menu
         self.create_menu()
+        
+        # Janela de diagnóstico, fora do menu
+        self.root.bind('<Control-Shift-D>', lambda e: self.abrir_diagnostico())
+    
+    def garantir_aba(self, grupo):
+        """Constrói a aba se ela ainda não foi construída"""
+        if grupo in self.abas_construidas:
+            return
+        self.abas_construidas.add(grupo)
+        self.construtores_abas[grupo]()
+        if grupo == 'produtos' and self.banco_pronto:
+            self.load_produtos()
+        if grupo == 'listas' and self.banco_pronto:
+            self.load_listas()
+        if grupo == 'financeiro' and self.banco_pronto:
+            self.load_meses_financeiro()
+        if grupo in ('consultar', 'estatisticas') and self.banco_pronto:
+            self.adiantar_historico(grupo)
+    
+    def adiantar_historico(self, grupo):
+        """Adianta a carga do histórico colunar (filtros, estatísticas e média móvel)
+        
+        Só depois de init_db: num banco antigo as datas ainda não são dias
+        julianos, e o histórico carregado valeria pela sessão inteira.
+        """
+        self.executor.ler(obter_historico, grupo=grupo)
+    
+    def banco_disponivel(self):
+        """Avisa e retorna False enquanto as migrações não terminaram"""
+        if not self.banco_pronto:
+            messagebox.showinfo("Info", "O banco de dados ainda está sendo preparado. "
+                                        "Tente novamente em instantes.")
+        return self.banco_pronto
+    
+    def ao_trocar_aba(self, event):
+        """Constrói a aba selecionada na primeira vez que é aberta"""
+        selecionada = self.notebook.select()
+        for grupo, frame in self.abas.items():
+            if str(frame) == selecionada:
+                self.garantir_aba(grupo)
+                break
+    
+    def indicar_ocupado(self, grupo, ocupado):
+        """Marca a aba com ⏳ enquanto houver consultas pendentes"""
+        if grupo not in self.abas:
+            return
+        titulo = self.titulos_abas[grupo]
+        self.notebook.tab(self.abas[grupo], text=f"⏳ {titulo}" if ocupado else titulo)
+    
+    def mostrar_erro_banco(self, erro):
+        """Exibe erros das tarefas do executor"""
+        messagebox.showerror("Erro", f"Ocorreu um erro: {str(erro)}")
+    
+    def assinar_eventos(self):
+        """Liga os eventos de alteração dos dados às telas"""
+        barramento.assinar(ProdutoAdicionado, self.ao_produto_adicionado)
+        barramento.assinar(ProdutoAlterado, self.ao_produto_alterado)
+        barramento.assinar(ProdutoRemovido, self.ao_produto_removido)
+        barramento.assinar(SupermercadoAdicionado, self.ao_supermercado_adicionado)
+        barramento.assinar(CompraAdicionada, self.ao_compra_adicionada)
+        barramento.assinar(DadosSubstituidos, self.ao_dados_substituidos)
+    
+    @staticmethod
+    def inserir_opcao(combo, valor):
+        """Acrescenta um valor à lista ordenada de um combobox"""
+        valores = list(combo['values'] or ())
+        if valor not in valores:
+            insort(valores, valor)
+            combo['values'] = valores
+    
+    @staticmethod
+    def remover_opcao(combo, valor):
+        """Tira um valor da lista de um combobox"""
+        valores = list(combo['values'] or ())
+        if valor in valores:
+            valores.remove(valor)
+            combo['values'] = valores
+    
+    def produtos_carregados(self):
+        """Indica se a aba de produtos já exibe a lista"""
+        return 'produtos' in self.abas_construidas and self.tree_produtos.consulta is not None
+    
+    def ao_produto_adicionado(self, evento):
+        produto_id, nome, _, marca = evento.produto[:4]
+        invalidar_cache_sugestoes()
+        self.inserir_opcao(self.combo_produto, formatar_nome_produto(nome, marca))
+        if self.produtos_carregados():
+            self.tree_produtos.inserir_linha(evento.produto, (nome, produto_id))
+    
+    def ao_produto_alterado(self, evento):
+        produto_id, nome, _, marca = evento.produto[:4]
+        _, nome_anterior, _, marca_anterior = evento.anterior[:4]
+        invalidar_cache_sugestoes()
+        self.remover_opcao(self.combo_produto, formatar_nome_produto(nome_anterior, marca_anterior))
+        self.inserir_opcao(self.combo_produto, formatar_nome_produto(nome, marca))
+        if self.produtos_carregados():
+            self.tree_produtos.atualizar_linha((nome_anterior, produto_id), evento.produto,
+                                               (nome, produto_id))
+        if nome != nome_anterior:
+            for item in self.tree_historico.get_children():
+                valores = list(self.tree_historico.item(item, 'values'))
+                if str(valores[1]) == nome_anterior:
+                    valores[1] = nome
+                    self.tree_historico.item(item, values=valores)
+        if 'listas' in self.abas_construidas:
+            self.load_itens_lista()
+    
+    def ao_produto_removido(self, evento):
+        produto_id, nome, _, marca = evento.produto[:4]
+        invalidar_cache_sugestoes()
+        self.remover_opcao(self.combo_produto, formatar_nome_produto(nome, marca))
+        if self.produtos_carregados():
+            self.tree_produtos.remover_linha((nome, produto_id))
+        # As compras excluídas podem estar entre as últimas: só então recarrega
+        if evento.compras_excluidas and any(
+                str(self.tree_historico.item(item, 'values')[1]) == nome
+                for item in self.tree_historico.get_children()):
+            self.carregar_historico()
+        if 'listas' in self.abas_construidas:
+            self.load_listas()
+            self.load_itens_lista()
+        if evento.compras_excluidas and 'financeiro' in self.abas_construidas:
+            self.load_meses_financeiro()
+    
+    def ao_dados_substituidos(self, evento):
+        invalidar_cache_sugestoes()
+        self.load_data()
+    
+    def ao_supermercado_adicionado(self, evento):
+        self.inserir_opcao(self.combo_supermercado, evento.nome)
+    
+    def ao_compra_adicionada(self, evento):
+        compra = evento.compra
+        # Histórico: as LIMITE_ULTIMAS_COMPRAS mais recentes, por data decrescente
+        # (a árvore guarda a data como texto AAAA-MM-DD)
+        itens = self.tree_historico.get_children()
+        data = compra[0].isoformat()
+        posicao = next((i for i, item in enumerate(itens)
+                        if self.tree_historico.item(item, 'values')[0] < data), len(itens))
+        if posicao < LIMITE_ULTIMAS_COMPRAS:
+            self.tree_historico.insert('', posicao, values=self.formatar_linha_historico(compra))
+            excedentes = self.tree_historico.get_children()[LIMITE_ULTIMAS_COMPRAS:]
+            if excedentes:
+                self.tree_historico.delete(*excedentes)
+        
+        quem_pagou = compra[6]
+        if quem_pagou and quem_pagou not in self.combo_quem_pagou['values']:
+            self.combo_quem_pagou['values'] = (*self.combo_quem_pagou['values'], quem_pagou)
+        
+        # O resumo é agregado (uma consulta pequena): recalcula o período
+        if 'financeiro' in self.abas_construidas:
+            self.load_meses_financeiro()
     
     def create_menu(self):
         """Cria a barra de menu"""
@@ -95,7 +324,12 @@ class SupermercadoApp:
         # Menu Arquivo
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Arquivo", menu=file_menu)
+        file_menu.add_command(label="Importar Compras...", command=self.importar_compras)
+        file_menu.add_command(label="Importar Notas Fiscais (XML)...",
+                              command=self.importar_notas_fiscais)
         file_menu.add_command(label="Fazer Backup", command=self.fazer_backup_manual)
+        file_menu.add_command(label="Restaurar Backup...", command=self.restaurar_backup)
+        file_menu.add_command(label="Reconstruir Estatísticas", command=self.reconstruir_estatisticas)
         file_menu.add_separator()
         file_menu.add_command(label="Sair", command=self.root.quit)
         
@@ -104,6 +338,10 @@ class SupermercadoApp:
         menubar.add_cascade(label="Ajuda", menu=help_menu)
         help_menu.add_command(label="Sobre", command=self.mostrar_sobre)
     
+    def abrir_diagnostico(self):
+        """Abre a janela de diagnóstico de desempenho (Ctrl+Shift+D)"""
+        DiagnosticoJanela(self.root, app=self)
+    
     def criar_campos_registro(self, form_frame):
         """Cria os campos do formulário de registro"""
         # Produto
@@ -177,26 +415,18 @@ class SupermercadoApp:
 
     def carregar_sugestoes_quem_pagou(self):
         """Carrega sugestões de quem pagou baseado no histórico"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT DISTINCT quem_pagou 
-        FROM compras 
-        WHERE quem_pagou != ''
-        ORDER BY quem_pagou
-        ''')
-        
-        sugestoes = [row[0] for row in cursor.fetchall()]
-        
+        self.executor.ler(listar_quem_pagou, grupo='registrar', chave='quem_pagou',
+                          ao_concluir=self.aplicar_sugestoes_quem_pagou,
+                          ao_falhar=self.mostrar_erro_banco)
+    
+    def aplicar_sugestoes_quem_pagou(self, sugestoes):
+        """Atualiza o combobox de quem pagou"""
         # Adicionar valores padrão se não existirem
         valores_padrao = ["Eu", "Parceiro(a)", "Família", "Amigo", "Outro"]
         todos_valores = list(set(sugestoes + valores_padrao))
         
         # Atualizar o combobox
         self.combo_quem_pagou['values'] = todos_valores
-        
-        conn.close()
     
     def criar_botoes_registro(self, form_frame):
         """Cria os botões do formulário de registro"""
@@ -261,13 +491,23 @@ class SupermercadoApp:
                   command=self.buscar_precos).grid(row=0, column=4, padx=10)
         ttk.Button(filter_frame, text="🧹 Limpar Filtros", 
                   command=self.limpar_filtros).grid(row=0, column=5, padx=5)
+        ttk.Button(filter_frame, text="📤 Exportar", 
+                  command=self.exportar_consulta).grid(row=0, column=6, padx=5)
         
         # Treeview para resultados
         result_frame = ttk.Frame(self.frame_consultar)
         result_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        columns = ('Data', 'Produto', 'Supermercado', 'Preço', 'Preço/Un', 'Qtd', 'Promoção')
-        self.tree_consulta = ttk.Treeview(result_frame, columns=columns, show='headings', height=20)
+        # Indicador de total (a Treeview só mantém uma janela de linhas)
+        self.label_total_consulta = ttk.Label(result_frame, text="")
+        self.label_total_consulta.pack(side='bottom', anchor='e')
+        
+        columns = ('Data', 'Produto', 'Supermercado', 'Preço', 'Preço/Un', 'Preço Ref.', 'Qtd',
+                   'Promoção')
+        self.tree_consulta = TreeviewPaginado(result_frame, columns=columns, show='headings', height=20,
+                                              formatar_linha=self.formatar_linha_consulta,
+                                              label_total=self.label_total_consulta,
+                                              executor=self.executor, grupo='consultar')
         
         for col in columns:
             self.tree_consulta.heading(col, text=col)
@@ -276,16 +516,25 @@ class SupermercadoApp:
         self.tree_consulta.pack(side='left', fill='both', expand=True)
         
         # Scrollbar
-        scrollbar = ttk.Scrollbar(result_frame, orient='vertical', command=self.tree_consulta.yview)
-        self.tree_consulta.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(result_frame, orient='vertical')
+        self.tree_consulta.configurar_scrollbar(scrollbar)
         scrollbar.pack(side='right', fill='y')
         
         # Frame de estatísticas rápidas
         stats_frame = ttk.LabelFrame(self.frame_consultar, text="Estatísticas do Produto", padding=10)
         stats_frame.pack(fill='x', padx=10, pady=10)
         
-        self.stats_text = tk.Text(stats_frame, height=4, width=80)
-        self.stats_text.pack(fill='x', pady=5)
+        self.stats_text = tk.Text(stats_frame, height=6, width=60)
+        self.stats_text.pack(side='left', fill='x', expand=True, pady=5)
+        
+        # Preço unitário por supermercado (histórico colunar)
+        colunas_supermercados = ('Supermercado', 'Compras', 'Mínimo', 'Média', 'Máximo', 'Último')
+        self.tree_supermercados_produto = ttk.Treeview(stats_frame, columns=colunas_supermercados,
+                                                       show='headings', height=6)
+        for col in colunas_supermercados:
+            self.tree_supermercados_produto.heading(col, text=col)
+            self.tree_supermercados_produto.column(col, width=140 if col == 'Supermercado' else 80)
+        self.tree_supermercados_produto.pack(side='left', fill='both', padx=(10, 0), pady=5)
     
     def create_estatisticas_tab(self):
         """Cria a aba de estatísticas"""
@@ -293,9 +542,11 @@ class SupermercadoApp:
         graph_frame = ttk.LabelFrame(self.frame_estatisticas, text="Gráficos", padding=10)
         graph_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        # Área para gráfico
+        # Área para gráfico (a figura é criada no primeiro desenho)
         self.graph_canvas = tk.Canvas(graph_frame, bg='white')
         self.graph_canvas.pack(fill='both', expand=True)
+        self.grafico = None
+        self.canvas_grafico = None
         
         # Frame para controles
         control_frame = ttk.Frame(self.frame_estatisticas)
@@ -310,6 +561,10 @@ class SupermercadoApp:
         
         ttk.Button(control_frame, text="📈 Gerar Gráfico", 
                   command=self.gerar_grafico).pack(side='left', padx=10)
+        
+        # Adianta o import do matplotlib enquanto o usuário escolhe o produto
+        # (o histórico só depois das migrações: adiantar_historico)
+        self.executor.ler(carregar_matplotlib, grupo='estatisticas')
     
     def create_produtos_tab(self):
         """Cria a aba de gerenciamento de produtos"""
@@ -318,8 +573,13 @@ class SupermercadoApp:
         list_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
         # Treeview para produtos
+        self.label_total_produtos = ttk.Label(list_frame, text="")
+        self.label_total_produtos.pack(side='bottom', anchor='e')
+        
         columns = ('ID', 'Nome', 'Categoria', 'Marca', 'Unidade', 'Qnt Medida')
-        self.tree_produtos = ttk.Treeview(list_frame, columns=columns, show='headings', height=15)
+        self.tree_produtos = TreeviewPaginado(list_frame, columns=columns, show='headings', height=15,
+                                              label_total=self.label_total_produtos,
+                                              executor=self.executor, grupo='produtos')
         
         for col in columns:
             self.tree_produtos.heading(col, text=col)
@@ -334,8 +594,8 @@ class SupermercadoApp:
         self.tree_produtos.pack(side='left', fill='both', expand=True)
         
         # Scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.tree_produtos.yview)
-        self.tree_produtos.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(list_frame, orient='vertical')
+        self.tree_produtos.configurar_scrollbar(scrollbar)
         scrollbar.pack(side='right', fill='y')
         
         # Frame para botões
@@ -364,164 +624,473 @@ class SupermercadoApp:
         # Também permitir editar com duplo clique
         self.tree_produtos.bind("<Double-1>", lambda e: self.editar_produto())
     
+    def create_listas_tab(self):
+        """Cria a aba de listas de compra e da cesta mais barata"""
+        # Listas (esquerda)
+        listas_frame = ttk.LabelFrame(self.frame_listas, text="Listas", padding=10)
+        listas_frame.pack(side='left', fill='y', padx=10, pady=10)
+        
+        self.tree_listas = ttk.Treeview(listas_frame, columns=('Nome', 'Itens'),
+                                        show='headings', height=15, selectmode='browse')
+        self.tree_listas.heading('Nome', text='Nome')
+        self.tree_listas.heading('Itens', text='Itens')
+        self.tree_listas.column('Nome', width=160)
+        self.tree_listas.column('Itens', width=50)
+        self.tree_listas.pack(fill='y', expand=True)
+        self.tree_listas.bind('<<TreeviewSelect>>', lambda e: self.load_itens_lista())
+        
+        ttk.Button(listas_frame, text="➕ Nova Lista",
+                  command=self.nova_lista).pack(fill='x', pady=(10, 2))
+        ttk.Button(listas_frame, text="🗑️ Excluir Lista",
+                  command=self.excluir_lista).pack(fill='x', pady=2)
+        
+        direita = ttk.Frame(self.frame_listas)
+        direita.pack(side='left', fill='both', expand=True, padx=(0, 10), pady=10)
+        
+        # Itens da lista selecionada
+        itens_frame = ttk.LabelFrame(direita, text="Itens", padding=10)
+        itens_frame.pack(fill='both', expand=True)
+        
+        form = ttk.Frame(itens_frame)
+        form.pack(fill='x')
+        ttk.Label(form, text="Produto:").pack(side='left', padx=5)
+        self.item_produto_var = tk.StringVar()
+        AutoCompleteCombobox(form, textvariable=self.item_produto_var,
+                             width=30).pack(side='left', padx=5)
+        ttk.Label(form, text="Qtd:").pack(side='left', padx=5)
+        self.entry_item_quantidade = ValidatedEntry(form, validate_type='float', width=8)
+        self.entry_item_quantidade.insert(0, "1")
+        self.entry_item_quantidade.pack(side='left', padx=5)
+        ttk.Button(form, text="➕ Adicionar",
+                  command=self.adicionar_item).pack(side='left', padx=5)
+        ttk.Button(form, text="➖ Remover",
+                  command=self.remover_item).pack(side='left', padx=5)
+        
+        # iid de cada linha é o id do produto
+        self.tree_itens = ttk.Treeview(itens_frame, columns=('Produto', 'Qtd'),
+                                       show='headings', height=8)
+        self.tree_itens.heading('Produto', text='Produto')
+        self.tree_itens.heading('Qtd', text='Qtd')
+        self.tree_itens.column('Produto', width=300)
+        self.tree_itens.column('Qtd', width=60)
+        self.tree_itens.pack(fill='both', expand=True, pady=(10, 0))
+        
+        # Cesta mais barata
+        cesta_frame = ttk.LabelFrame(direita, text="Cesta Mais Barata", padding=10)
+        cesta_frame.pack(fill='both', expand=True, pady=(10, 0))
+        
+        controles = ttk.Frame(cesta_frame)
+        controles.pack(fill='x')
+        ttk.Label(controles, text="Até").pack(side='left', padx=5)
+        self.maximo_supermercados_var = tk.IntVar(value=1)
+        ttk.Spinbox(controles, from_=1, to=5, width=3,
+                    textvariable=self.maximo_supermercados_var).pack(side='left')
+        ttk.Label(controles, text="supermercado(s)   Preços:").pack(side='left', padx=5)
+        self.janela_precos_var = tk.StringVar(value=next(iter(self.JANELAS_PRECOS)))
+        ttk.Combobox(controles, textvariable=self.janela_precos_var, state='readonly',
+                     values=list(self.JANELAS_PRECOS), width=16).pack(side='left', padx=5)
+        ttk.Button(controles, text="🛒 Calcular Cesta",
+                  command=self.calcular_cesta).pack(side='left', padx=10)
+        
+        self.cesta_text = tk.Text(cesta_frame, height=10, width=80)
+        self.cesta_text.pack(fill='both', expand=True, pady=(10, 0))
+    
+    def lista_selecionada(self):
+        """Retorna o id da lista selecionada, ou None"""
+        selecionado = self.tree_listas.selection()
+        return int(selecionado[0]) if selecionado else None
+    
+    def load_listas(self):
+        """Carrega as listas de compra"""
+        self.executor.ler(listar_listas, grupo='listas', chave='load_listas',
+                          ao_concluir=self.mostrar_listas, ao_falhar=self.mostrar_erro_banco)
+    
+    def mostrar_listas(self, listas):
+        """Exibe as listas, mantendo a seleção atual"""
+        selecionada = self.lista_selecionada()
+        self.tree_listas.delete(*self.tree_listas.get_children())
+        for lista_id, nome, itens in listas:
+            self.tree_listas.insert('', 'end', iid=str(lista_id), values=(nome, itens))
+        if selecionada is not None and self.tree_listas.exists(str(selecionada)):
+            self.tree_listas.selection_set(str(selecionada))
+    
+    def load_itens_lista(self):
+        """Carrega os itens da lista selecionada"""
+        lista_id = self.lista_selecionada()
+        self.cesta_text.delete("1.0", "end")
+        if lista_id is None:
+            self.tree_itens.delete(*self.tree_itens.get_children())
+            return
+        self.executor.ler(itens_lista, lista_id, grupo='listas', chave='itens_lista',
+                          ao_concluir=self.mostrar_itens_lista, ao_falhar=self.mostrar_erro_banco)
+    
+    def mostrar_itens_lista(self, itens):
+        """Exibe os itens da lista selecionada"""
+        self.tree_itens.delete(*self.tree_itens.get_children())
+        for produto_id, nome, marca, quantidade in itens:
+            self.tree_itens.insert('', 'end', iid=str(produto_id),
+                                   values=(formatar_nome_produto(nome, marca), f"{quantidade:g}"))
+    
+    def nova_lista(self):
+        """Cria uma lista de compras com o nome informado"""
+        nome = simpledialog.askstring("Nova Lista", "Nome da lista:", parent=self.root)
+        if not nome or not nome.strip():
+            return
+        self.executor.escrever(criar_lista, nome, grupo='listas',
+                               ao_concluir=lambda _: self.load_listas(),
+                               ao_falhar=self.mostrar_erro_banco)
+    
+    def excluir_lista(self):
+        """Exclui a lista selecionada"""
+        lista_id = self.lista_selecionada()
+        if lista_id is None:
+            messagebox.showwarning("Aviso", "Selecione uma lista para excluir!")
+            return
+        nome = self.tree_listas.item(str(lista_id))['values'][0]
+        if not messagebox.askyesno("Confirmar Exclusão", f"Excluir a lista '{nome}'?"):
+            return
+        
+        def excluida(_):
+            self.tree_itens.delete(*self.tree_itens.get_children())
+            self.cesta_text.delete("1.0", "end")
+            self.load_listas()
+        
+        self.executor.escrever(remover_lista, lista_id, grupo='listas',
+                               ao_concluir=excluida, ao_falhar=self.mostrar_erro_banco)
+    
+    def adicionar_item(self):
+        """Adiciona o produto informado à lista selecionada"""
+        lista_id = self.lista_selecionada()
+        produto_text = self.item_produto_var.get()
+        if lista_id is None or not produto_text:
+            messagebox.showwarning("Aviso", "Selecione uma lista e um produto!")
+            return
+        
+        try:
+            quantidade = float(self.entry_item_quantidade.get().replace(',', '.'))
+        except ValueError:
+            messagebox.showerror("Erro", "Quantidade inválida!")
+            return
+        if quantidade <= 0:
+            messagebox.showerror("Erro", "A quantidade deve ser maior que zero!")
+            return
+        
+        def adicionado(resultado):
+            sucesso, mensagem = resultado
+            if not sucesso:
+                messagebox.showerror("Erro", mensagem)
+                return
+            self.item_produto_var.set('')
+            self.load_itens_lista()
+            self.load_listas()
+        
+        self.executor.escrever(adicionar_item_lista, lista_id,
+                               extrair_nome_produto(produto_text), quantidade,
+                               extrair_marca_produto(produto_text), grupo='listas',
+                               ao_concluir=adicionado, ao_falhar=self.mostrar_erro_banco)
+    
+    def remover_item(self):
+        """Tira da lista os itens selecionados"""
+        lista_id = self.lista_selecionada()
+        selecionados = self.tree_itens.selection()
+        if lista_id is None or not selecionados:
+            messagebox.showwarning("Aviso", "Selecione um item para remover!")
+            return
+        # A fila de escrita é sequencial: recarrega depois da última remoção
+        for i, produto_id in enumerate(selecionados):
+            ultima = i == len(selecionados) - 1
+            self.executor.escrever(
+                remover_item_lista, lista_id, int(produto_id), grupo='listas',
+                ao_concluir=(lambda _: (self.load_itens_lista(), self.load_listas())) if ultima else None,
+                ao_falhar=self.mostrar_erro_banco)
+    
+    def calcular_cesta(self):
+        """Calcula o total da lista em cada supermercado e a melhor divisão"""
+        lista_id = self.lista_selecionada()
+        if lista_id is None:
+            messagebox.showwarning("Aviso", "Selecione uma lista!")
+            return
+        try:
+            maximo = max(1, int(self.maximo_supermercados_var.get()))
+        except (tk.TclError, ValueError):
+            maximo = 1
+        
+        # Importado aqui: o numpy não é carregado na partida
+        from app.cesta import calcular_cesta
+        self.executor.ler(calcular_cesta, lista_id, maximo,
+                          self.JANELAS_PRECOS[self.janela_precos_var.get()],
+                          grupo='listas', chave='cesta',
+                          ao_concluir=lambda r: self.mostrar_cesta(*r),
+                          ao_falhar=self.mostrar_erro_banco)
+    
+    def mostrar_cesta(self, comparacao, resultado):
+        """Exibe o ranking de supermercados e a divisão da lista"""
+        linhas = []
+        if not comparacao:
+            linhas.append("Nenhum preço encontrado para os itens da lista.")
+        else:
+            total_itens = len(resultado.itens) + len(resultado.nao_cobertos) + len(resultado.sem_preco)
+            linhas.append("Lista inteira em um só supermercado:")
+            for supermercado, total, cobertos in comparacao:
+                faltam = f" (faltam {total_itens - cobertos})" if cobertos < total_itens else ""
+                linhas.append(f"  {supermercado}: {formatar_moeda(total)}{faltam}")
+            
+            linhas.append("")
+            titulo = "Melhor divisão" if resultado.exato else "Melhor divisão encontrada"
+            linhas.append(f"{titulo}: {formatar_moeda(resultado.total)} "
+                          f"({resultado.segundos * 1000:.0f} ms)")
+            for supermercado, itens in resultado.por_supermercado().items():
+                subtotal = sum(item[4] for item in itens)
+                linhas.append(f"  {supermercado} — {formatar_moeda(subtotal)}")
+                for produto, quantidade, _, preco, custo in itens:
+                    linhas.append(f"    {produto}: {quantidade:g} x {formatar_moeda(preco)}"
+                                  f" = {formatar_moeda(custo)}")
+        
+        if resultado.nao_cobertos:
+            linhas.append("")
+            linhas.append("Sem preço nos supermercados escolhidos: "
+                          + ", ".join(resultado.nao_cobertos))
+        if resultado.sem_preco:
+            linhas.append("")
+            linhas.append("Sem preço registrado: " + ", ".join(resultado.sem_preco))
+        
+        self.cesta_text.delete("1.0", "end")
+        self.cesta_text.insert("1.0", "\n".join(linhas))
+    
+    def create_financeiro_tab(self):
+        """Cria a aba de resumo financeiro (gastos por mês, pagador, categoria e supermercado)"""
+        # Período
+        control_frame = ttk.Frame(self.frame_financeiro)
+        control_frame.pack(fill='x', padx=10, pady=10)
+        
+        ttk.Label(control_frame, text="De:").pack(side='left', padx=5)
+        self.financeiro_de_var = tk.StringVar()
+        self.combo_financeiro_de = ttk.Combobox(control_frame, textvariable=self.financeiro_de_var,
+                                                state='readonly', width=10)
+        self.combo_financeiro_de.pack(side='left', padx=5)
+        ttk.Label(control_frame, text="Até:").pack(side='left', padx=5)
+        self.financeiro_ate_var = tk.StringVar()
+        self.combo_financeiro_ate = ttk.Combobox(control_frame, textvariable=self.financeiro_ate_var,
+                                                 state='readonly', width=10)
+        self.combo_financeiro_ate.pack(side='left', padx=5)
+        self.combo_financeiro_de.bind('<<ComboboxSelected>>', lambda e: self.load_financeiro())
+        self.combo_financeiro_ate.bind('<<ComboboxSelected>>', lambda e: self.load_financeiro())
+        ttk.Button(control_frame, text="🔄 Atualizar",
+                  command=self.load_meses_financeiro).pack(side='left', padx=10)
+        
+        self.label_resumo_financeiro = ttk.Label(control_frame, text="", font=('TkDefaultFont', 10, 'bold'))
+        self.label_resumo_financeiro.pack(side='right', padx=5)
+        
+        # Uma tabela por visão, em grade 2 x 2
+        grade = ttk.Frame(self.frame_financeiro)
+        grade.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        grade.columnconfigure((0, 1), weight=1)
+        grade.rowconfigure((0, 1), weight=1)
+        
+        self.trees_financeiro = {}
+        visoes = [('mes', "Por Mês", 'Mês'), ('P', "Por Quem Pagou", 'Quem Pagou'),
+                  ('C', "Por Categoria", 'Categoria'), ('S', "Por Supermercado", 'Supermercado')]
+        for i, (chave, titulo, coluna) in enumerate(visoes):
+            frame = ttk.LabelFrame(grade, text=titulo, padding=5)
+            frame.grid(row=i // 2, column=i % 2, sticky='nsew', padx=5, pady=5)
+            columns = (coluna, 'Total', '%', 'Compras')
+            tree = ttk.Treeview(frame, columns=columns, show='headings', height=8)
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=70 if col in ('%', 'Compras') else 130)
+            tree.pack(side='left', fill='both', expand=True)
+            scrollbar = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side='right', fill='y')
+            self.trees_financeiro[chave] = tree
+        
+        self.meses_financeiro = []
+    
+    def load_meses_financeiro(self):
+        """Carrega os meses com compras e, em seguida, o resumo"""
+        self.executor.ler(meses_com_gastos, grupo='financeiro', chave='meses_financeiro',
+                          ao_concluir=self.aplicar_meses_financeiro, ao_falhar=self.mostrar_erro_banco)
+    
+    def aplicar_meses_financeiro(self, meses):
+        """Preenche os meses do período (padrão: os últimos 12 com compras)"""
+        self.meses_financeiro = meses
+        rotulos = [mes.strftime("%m/%Y") for mes in meses]
+        self.combo_financeiro_de['values'] = rotulos
+        self.combo_financeiro_ate['values'] = rotulos
+        if self.financeiro_de_var.get() not in rotulos or self.financeiro_ate_var.get() not in rotulos:
+            self.financeiro_ate_var.set(rotulos[0] if rotulos else '')
+            self.financeiro_de_var.set(rotulos[min(11, len(rotulos) - 1)] if rotulos else '')
+        self.load_financeiro()
+    
+    def load_financeiro(self):
+        """Carrega o resumo financeiro do período escolhido"""
+        if not self.meses_financeiro:
+            for tree in self.trees_financeiro.values():
+                tree.delete(*tree.get_children())
+            self.label_resumo_financeiro.config(text="Nenhuma compra registrada")
+            return
+        de = datetime.strptime(self.financeiro_de_var.get(), "%m/%Y").date()
+        ate = datetime.strptime(self.financeiro_ate_var.get(), "%m/%Y").date()
+        if de > ate:
+            de, ate = ate, de
+        self.executor.ler(resumo_gastos, de, ate, grupo='financeiro', chave='resumo_financeiro',
+                          ao_concluir=self.mostrar_financeiro, ao_falhar=self.mostrar_erro_banco)
+    
+    def mostrar_financeiro(self, resumo):
+        """Exibe o total do período e as quatro visões do resumo"""
+        total = sum(linha[1] for linha in resumo['mes'])
+        compras = sum(linha[2] for linha in resumo['mes'])
+        meses = len(resumo['mes'])
+        media = total / meses if meses else 0
+        self.label_resumo_financeiro.config(
+            text=f"Total: {formatar_moeda(total)}   Média mensal: {formatar_moeda(media)}   "
+                 f"Compras: {compras}")
+        
+        for chave, tree in self.trees_financeiro.items():
+            tree.delete(*tree.get_children())
+            for nome, valor, quantidade in resumo[chave]:
+                if chave == 'mes':
+                    nome = nome.strftime("%m/%Y")
+                percentual = f"{valor * 100 / total:.1f}%" if total else "-"
+                tree.insert('', 'end', values=(nome, formatar_moeda(valor), percentual, quantidade))
+    
+    @medir()
     def load_data(self):
         """Carrega dados iniciais nos comboboxes"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        
         # Carregar produtos
-        cursor.execute("SELECT nome, marca FROM produtos ORDER BY nome")
-        produtos = [f"{row[0]} ({row[1]})" if row[1] else row[0] for row in cursor.fetchall()]
-        self.combo_produto['values'] = produtos
-        self.combo_produto.set('')
+        self.executor.ler(listar_produtos_formatados, grupo='registrar', chave='produtos',
+                          ao_concluir=self.aplicar_produtos, ao_falhar=self.mostrar_erro_banco)
         
         # Carregar supermercados
-        cursor.execute("SELECT nome FROM supermercados ORDER BY nome")
-        supermercados = [row[0] for row in cursor.fetchall()]
-        self.combo_supermercado['values'] = supermercados
-        self.combo_supermercado.set('')
+        self.executor.ler(listar_supermercados, grupo='registrar', chave='supermercados',
+                          ao_concluir=self.aplicar_supermercados, ao_falhar=self.mostrar_erro_banco)
         
         # Carregar histórico recente
         self.carregar_historico()
         
         # Carregar produtos para consulta
-        self.consulta_produto_var.set('')
+        if 'consultar' in self.abas_construidas:
+            self.consulta_produto_var.set('')
         
         # Carregar produtos para gráfico
-        self.graph_produto_var.set('')
+        if 'estatisticas' in self.abas_construidas:
+            self.graph_produto_var.set('')
+        
+        # Histórico colunar das abas abertas antes das migrações terminarem
+        for grupo in ('consultar', 'estatisticas'):
+            if grupo in self.abas_construidas:
+                self.adiantar_historico(grupo)
+        
+        # Carregar lista de produtos (as outras abas carregam ao serem abertas)
+        if 'produtos' in self.abas_construidas:
+            self.load_produtos()
         
-        # Carregar lista de produtos
-        self.load_produtos()
+        if 'listas' in self.abas_construidas:
+            self.load_listas()
         
-        conn.close()
+        if 'financeiro' in self.abas_construidas:
+            self.load_meses_financeiro()
+    
+    def aplicar_produtos(self, produtos):
+        """Preenche o combobox de produtos do registro"""
+        self.combo_produto['values'] = produtos
+        self.combo_produto.set('')
+    
+    def aplicar_supermercados(self, supermercados):
+        """Preenche o combobox de supermercados do registro"""
+        self.combo_supermercado['values'] = supermercados
+        self.combo_supermercado.set('')
     
+    @medir()
     def carregar_historico(self):
         """Carrega as últimas compras no histórico"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT c.data_compra, p.nome, s.nome, c.preco, c.quantidade, c.promoção, c.quem_pagou
-        FROM compras c
-        JOIN produtos p ON c.produto_id = p.id
-        JOIN supermercados s ON c.supermercado_id = s.id
-        ORDER BY c.data_compra DESC
-        LIMIT 20
-        ''')
-        
+        self.executor.ler(ultimas_compras, grupo='registrar', chave='historico',
+                          ao_concluir=self.mostrar_historico, ao_falhar=self.mostrar_erro_banco)
+    
+    @medir()
+    def mostrar_historico(self, compras):
+        """Exibe as últimas compras na treeview do histórico"""
         # Limpar treeview
-        for item in self.tree_historico.get_children():
-            self.tree_historico.delete(item)
+        self.tree_historico.delete(*self.tree_historico.get_children())
         
         # Adicionar novos itens
-        for row in cursor.fetchall():
-            data = row[0]
-            produto = row[1]
-            supermercado = row[2]
-            preco = formatar_moeda(row[3])
-            qtd = f"{row[4]} un"
-            promocao = "✅" if row[5] else "❌"
-            quem_pagou = row[6] if row[6] else "Não informado"
-            
-            self.tree_historico.insert('', 'end', 
-                                      values=(data, produto, supermercado, preco, qtd, promocao, quem_pagou))
-        
-        conn.close()
+        for row in compras:
+            self.tree_historico.insert('', 'end', values=self.formatar_linha_historico(row))
+    
+    def formatar_linha_historico(self, row):
+        """Valores exibidos de uma compra (linha de SQL_ULTIMAS_COMPRAS)"""
+        data = row[0]
+        produto = row[1]
+        supermercado = row[2]
+        preco = formatar_moeda(row[3])
+        qtd = f"{row[4]} un"
+        promocao = "✅" if row[5] else "❌"
+        quem_pagou = row[6] if row[6] else "Não informado"
+        return (data, produto, supermercado, preco, qtd, promocao, quem_pagou)
     
     def registrar_compra(self):
         """Registra uma nova compra no banco de dados"""
-        # Validar campos obrigatórios
-        produto_text = self.produto_var.get()
-        supermercado = self.supermercado_var.get()
-        preco_text = self.entry_preco.get()
-        data_text = self.entry_data.get()
-        quantidade_text = self.entry_quantidade.get()
-        
-        if not all([produto_text, supermercado, preco_text, data_text, quantidade_text]):
-            messagebox.showerror("Erro", "Preencha todos os campos obrigatórios!")
-            return
-        
-        # Validar data (não pode ser futura)
-        valido, mensagem = validar_data_compra(data_text)
+        # Mesmas regras da API (app/api.py): obrigatórios, data, preço e quantidade
+        valido, dados = validar_compra(self.produto_var.get(), self.supermercado_var.get(),
+                                       self.entry_preco.get(), self.entry_data.get(),
+                                       self.entry_quantidade.get())
         if not valido:
-            messagebox.showerror("Erro", mensagem)
+            messagebox.showerror("Erro", dados)
             return
-        
-        # Validar preço (deve ser > 0)
-        valido, preco_val = validar_preco(preco_text)
-        if not valido:
-            messagebox.showerror("Erro", preco_val)
+        produto_nome, marca, supermercado = (dados['produto_nome'], dados['marca'],
+                                             dados['supermercado'])
+        preco_val, quantidade, data_obj = (dados['preco'], dados['quantidade'],
+                                           dados['data_compra'])
+        
+        # Compara o preço com o histórico antes de gravar
+        self.executor.ler(
+            avaliar_preco, produto_nome, supermercado, preco_val, quantidade, marca,
+            grupo='registrar', chave='avaliar_preco',
+            ao_concluir=lambda avaliacao: self.confirmar_compra(
+                avaliacao, produto_nome, marca, supermercado, preco_val, quantidade, data_obj),
+            ao_falhar=self.mostrar_erro_banco)
+    
+    def confirmar_compra(self, avaliacao, produto_nome, marca, supermercado, preco, quantidade,
+                         data_obj):
+        """Avisa sobre preços fora do padrão, sugere a promoção e grava a compra"""
+        if avaliacao is not None:
+            variacao = f"{abs(avaliacao.variacao) * 100:.0f}%"
+            if avaliacao.promocao and not self.promocao_var.get():
+                if messagebox.askyesno(
+                        "Promoção?",
+                        f"O preço unitário ({formatar_moeda(avaliacao.preco)}) está {variacao} "
+                        f"abaixo da mediana recente ({formatar_moeda(avaliacao.mediana)}) "
+                        f"neste supermercado.\n\nMarcar a compra como promoção?"):
+                    self.promocao_var.set(True)
+            elif avaliacao.anomalo and avaliacao.z > 0:
+                if not messagebox.askyesno(
+                        "Preço fora do padrão",
+                        f"O preço unitário ({formatar_moeda(avaliacao.preco)}) está {variacao} "
+                        f"acima da mediana recente ({formatar_moeda(avaliacao.mediana)}) "
+                        f"neste supermercado.\n\nRegistrar mesmo assim?"):
+                    return
+        
+        # Inserir compra pela thread de escrita
+        self.executor.escrever(
+            inserir_compra, produto_nome, supermercado, preco, quantidade, data_obj,
+            promocao=self.promocao_var.get(),
+            quem_pagou=self.quem_pagou_var.get(),
+            observacoes=self.text_observacoes.get("1.0", "end-1c"),
+            marca=marca,
+            grupo='registrar',
+            ao_concluir=self.compra_registrada,
+            ao_falhar=self.mostrar_erro_banco)
+    
+    def compra_registrada(self, resultado):
+        """Trata o resultado da inserção da compra"""
+        sucesso, mensagem = resultado
+        if not sucesso:
+            messagebox.showerror("Erro", mensagem)
             return
         
-        try:
-            # Extrair nome do produto (remover marca se houver)
-            if '(' in produto_text and ')' in produto_text:
-                produto_nome = produto_text.split('(')[0].strip()
-            else:
-                produto_nome = produto_text
-            
-            # Converter quantidade
-            quantidade = float(quantidade_text.replace(',', '.'))
-            
-            if quantidade <= 0:
-                messagebox.showerror("Erro", "A quantidade deve ser maior que zero!")
-                return
-            
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Buscar produto pelo nome (CORREÇÃO DO BUG - buscar exatamente pelo nome)
-            cursor.execute("SELECT id FROM produtos WHERE nome = ?", (produto_nome,))
-            produto_id = cursor.fetchone()
-            
-            if not produto_id:
-                # Tentar buscar ignorando espaços extras
-                cursor.execute("SELECT id FROM produtos WHERE TRIM(nome) = ?", (produto_nome.strip(),))
-                produto_id = cursor.fetchone()
-            
-            if not produto_id:
-                messagebox.showerror("Erro", 
-                    f"Produto '{produto_nome}' não encontrado!\n"
-                    "Cadastre o produto primeiro ou verifique o nome.")
-                conn.close()
-                return
-            
-            produto_id = produto_id[0]
-            
-            # Buscar/inserir supermercado
-            cursor.execute("SELECT id FROM supermercados WHERE nome = ?", (supermercado,))
-            supermercado_id = cursor.fetchone()
-            
-            if not supermercado_id:
-                cursor.execute("INSERT INTO supermercados (nome) VALUES (?)", (supermercado,))
-                supermercado_id = cursor.lastrowid
-            else:
-                supermercado_id = supermercado_id[0]
-            
-            # Converter data
-            data_obj = datetime.strptime(data_text, "%d/%m/%Y").date()
-            
-            # Inserir compra
-            cursor.execute('''
-            INSERT INTO compras (produto_id, supermercado_id, preco, quantidade, 
-                               data_compra, promoção,quem_pagou, observacoes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (produto_id, supermercado_id, preco_val, quantidade, 
-                  data_obj, 1 if self.promocao_var.get() else 0,self.quem_pagou_var.get(),
-                  self.text_observacoes.get("1.0", "end-1c")))
-            
-            conn.commit()
-            conn.close()
-            
-            messagebox.showinfo("✅ Sucesso", "Compra registrada com sucesso!")
-            self.limpar_formulario()
-            self.carregar_historico()
-            self.load_data()  # Atualizar comboboxes
-            
-        except ValueError as e:
-            messagebox.showerror("Erro", f"Valor inválido: {str(e)}")
-        except Exception as e:
-            messagebox.showerror("Erro", f"Ocorreu um erro: {str(e)}")
+        # Histórico e comboboxes se atualizam pelos eventos da inserção
+        messagebox.showinfo("✅ Sucesso", "Compra registrada com sucesso!")
+        self.limpar_formulario()
     
     def limpar_formulario(self):
         """Limpa o formulário de registro"""
@@ -536,135 +1105,137 @@ class SupermercadoApp:
         self.quem_pagou_var.set("Eu")  # NOVO: resetar para valor padrão
         self.text_observacoes.delete("1.0", "end")
     
+    @medir()
     def buscar_precos(self):
         """Busca preços com base nos filtros"""
+        if not self.banco_disponivel():
+            return
         produto = self.consulta_produto_var.get()
         supermercado = self.consulta_supermercado_var.get()
         
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        query = '''
-        SELECT c.data_compra, p.nome, s.nome, c.preco, c.quantidade, 
-               c.preco/c.quantidade as preco_unitario, c.promoção, c.quem_pagou
-        FROM compras c
-        JOIN produtos p ON c.produto_id = p.id
-        JOIN supermercados s ON c.supermercado_id = s.id
-        WHERE 1=1
-        '''
-        params = []
-        
+        produto_nome = ''
         if produto:
             # Extrair apenas o nome do produto (remover marca)
             if '(' in produto and ')' in produto:
                 produto_nome = produto.split('(')[0].strip()
             else:
                 produto_nome = produto
-            query += " AND p.nome LIKE ?"
-            params.append(f"%{produto_nome}%")
-        
-        if supermercado:
-            query += " AND s.nome LIKE ?"
-            params.append(f"%{supermercado}%")
         
-        query += " ORDER BY c.data_compra DESC"
+        # Filtro no histórico colunar; só a primeira página é lida do banco,
+        # as demais vêm ao rolar
+        def buscar():
+            consulta = consulta_precos_colunar(produto_nome, supermercado)
+            return consulta, consulta.inicio(self.tree_consulta.TAMANHO_PAGINA)
         
-        cursor.execute(query, params)
-        
-        # Limpar treeview
-        for item in self.tree_consulta.get_children():
-            self.tree_consulta.delete(item)
-        
-        # Adicionar resultados
-        for row in cursor.fetchall():
-            data = row[0]
-            produto_nome = row[1]
-            supermercado_nome = row[2]
-            preco = formatar_moeda(row[3])
-            preco_unit = formatar_moeda(row[5])
-            qtd = f"{row[4]}"
-            promocao = "✅" if row[6] else "❌"
-            quem_pagou = row[7] if row[7] else "Não informado"
-            
-            self.tree_consulta.insert('', 'end', 
-                                    values=(data, produto_nome, supermercado_nome, 
-                                            preco, preco_unit, qtd, promocao, quem_pagou))
+        self.executor.ler(buscar, grupo='consultar', chave='buscar_precos',
+                          ao_concluir=lambda r: self.tree_consulta.carregar(r[0], *r[1]),
+                          ao_falhar=self.mostrar_erro_banco)
         
         # Calcular estatísticas
         if produto:
-            self.calcular_estatisticas(produto_nome if 'produto_nome' in locals() else produto)
-        
-        conn.close()
+            self.calcular_estatisticas(produto_nome)
+    
+    def formatar_linha_consulta(self, row):
+        """Formata uma linha da consulta de preços para a Treeview"""
+        data = row[0]
+        produto_nome = row[1]
+        supermercado_nome = row[2]
+        preco = formatar_moeda(row[3])
+        preco_unit = formatar_moeda(row[5])
+        # Preço por kg/L/un, para comparar embalagens de tamanhos diferentes
+        unidade = unidade_referencia(row[9])
+        preco_ref = f"{formatar_moeda(row[8])}/{unidade}" if unidade else ""
+        qtd = f"{row[4]}"
+        promocao = "✅" if row[6] else "❌"
+        quem_pagou = row[7] if row[7] else "Não informado"
+        
+        return (data, produto_nome, supermercado_nome, 
+                preco, preco_unit, preco_ref, qtd, promocao, quem_pagou)
     
     def calcular_estatisticas(self, produto):
         """Calcula estatísticas para um produto"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT 
-            MIN(c.preco/c.quantidade) as min_preco,
-            MAX(c.preco/c.quantidade) as max_preco,
-            AVG(c.preco/c.quantidade) as avg_preco,
-            COUNT(*) as total_compras,
-            MIN(c.data_compra) as primeira_compra,
-            MAX(c.data_compra) as ultima_compra
-        FROM compras c
-        JOIN produtos p ON c.produto_id = p.id
-        WHERE p.nome LIKE ?
-        ''', (f"%{produto}%",))
-        
-        stats = cursor.fetchone()
-        
-        if stats and stats[3] > 0:
+        self.executor.ler(estatisticas_produto, produto, grupo='consultar', chave='estatisticas',
+                          ao_concluir=lambda stats: self.mostrar_estatisticas(produto, stats),
+                          ao_falhar=self.mostrar_erro_banco)
+        self.executor.ler(resumo_supermercados_produto, produto, grupo='consultar',
+                          chave='supermercados_produto',
+                          ao_concluir=self.mostrar_supermercados_produto,
+                          ao_falhar=self.mostrar_erro_banco)
+    
+    def mostrar_estatisticas(self, produto, stats):
+        """Exibe as estatísticas do produto"""
+        texto = texto_estatisticas(produto, stats)
+        if texto:
             self.stats_text.delete("1.0", "end")
-            self.stats_text.insert("1.0", 
-                f"📊 Estatísticas para '{produto}':\n"
-                f"• Total de registros: {stats[3]}\n"
-                f"• Período: {stats[4]} a {stats[5]}\n"
-                f"• Preço médio: {formatar_moeda(stats[2])}\n"
-                f"• Menor preço: {formatar_moeda(stats[0])}\n"
-                f"• Maior preço: {formatar_moeda(stats[1])}"
-            )
+            self.stats_text.insert("1.0", texto)
+    
+    def mostrar_supermercados_produto(self, resumo):
+        """Exibe o preço unitário do produto em cada supermercado"""
+        tree = self.tree_supermercados_produto
+        tree.delete(*tree.get_children())
+        for nome, compras, minimo, media, maximo, ultimo in resumo:
+            tree.insert('', 'end', values=(nome, compras, formatar_moeda(minimo),
+                                           formatar_moeda(media), formatar_moeda(maximo),
+                                           formatar_moeda(ultimo)))
+    
+    def exportar_consulta(self):
+        """Exporta as compras com os filtros atuais da consulta"""
+        tipos = [("CSV", "*.csv"), ("Excel", "*.xlsx"), ("JSON Lines", "*.jsonl")]
+        if PARQUET_DISPONIVEL:
+            tipos.append(("Parquet", "*.parquet"))
+        caminho = filedialog.asksaveasfilename(
+            title="Exportar Compras", defaultextension=".csv", filetypes=tipos)
+        if not caminho:
+            return
+        
+        produto = self.consulta_produto_var.get()
+        produto_nome = produto.split('(')[0].strip() if '(' in produto and ')' in produto else produto
+        
+        def descrever(relatorio):
+            if relatorio.total:
+                return f"{relatorio.linhas:,} de {relatorio.total:,} linhas", relatorio.percentual
+            return f"{relatorio.linhas:,} linhas", None
+        
+        progresso = ProgressoDialog(self.root, "📤 Exportando compras", descrever)
         
-        conn.close()
+        def concluido(relatorio):
+            progresso.fechar()
+            messagebox.showinfo("📤 Exportação", relatorio.resumo())
+        
+        def falhou(erro):
+            progresso.fechar()
+            self.mostrar_erro_banco(erro)
+        
+        # Sem chave: limpar os filtros não descarta uma exportação em andamento;
+        # o Cancelar da janela de progresso para a leitura no próximo lote
+        self.executor.ler(exportar_compras, caminho, produto_nome=produto_nome,
+                          supermercado=self.consulta_supermercado_var.get(),
+                          ao_progresso=progresso.ao_progresso, cancelar=progresso.cancelar,
+                          grupo='consultar', ao_concluir=concluido, ao_falhar=falhou)
     
     def limpar_filtros(self):
         """Limpa os filtros de consulta"""
+        self.executor.cancelar_grupo('consultar')
         self.consulta_produto_var.set('')
         self.consulta_supermercado_var.set('')
         self.stats_text.delete("1.0", "end")
+        self.tree_supermercados_produto.delete(*self.tree_supermercados_produto.get_children())
         
         # Limpar treeview
-        for item in self.tree_consulta.get_children():
-            self.tree_consulta.delete(item)
+        self.tree_consulta.limpar()
     
     def novo_produto(self):
         """Abre janela para cadastrar novo produto"""
-        ProdutoDialog(self.root, callback=self.load_data)
+        ProdutoDialog(self.root, self.executor)
     
+    @medir()
     def load_produtos(self):
-        """Carrega a lista de produtos"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT p.id, p.nome, COALESCE(c.nome, 'Sem categoria'), 
-               COALESCE(p.marca, ''), p.unidade_medida, COALESCE(p.qnt_medida, '')
-        FROM produtos p
-        LEFT JOIN categorias c ON p.categoria_id = c.id
-        ORDER BY p.nome
-        ''')
-        
-        # Limpar treeview
-        for item in self.tree_produtos.get_children():
-            self.tree_produtos.delete(item)
-        
-        # Adicionar produtos
-        for row in cursor.fetchall():
-            self.tree_produtos.insert('', 'end', values=row)
-        
-        conn.close()
+        """Carrega a lista de produtos (paginada por nome)"""
+        consulta = consulta_produtos_paginada()
+        self.executor.ler(consulta.inicio, self.tree_produtos.TAMANHO_PAGINA,
+                          grupo='produtos', chave='load_produtos',
+                          ao_concluir=lambda r: self.tree_produtos.carregar(consulta, *r),
+                          ao_falhar=self.mostrar_erro_banco)
     
     def editar_produto(self):
         """Edita o produto selecionado"""
@@ -677,7 +1248,7 @@ class SupermercadoApp:
         item = self.tree_produtos.item(selecionado[0])
         produto_id = item['values'][0]
         
-        ProdutoDialog(self.root, produto_id=produto_id, callback=self.load_data)
+        ProdutoDialog(self.root, self.executor, produto_id=produto_id)
     
     def excluir_produto(self):
         """Exclui o produto selecionado"""
@@ -696,47 +1267,39 @@ class SupermercadoApp:
                                       "Esta ação não pode ser desfeita!")
         
         if resposta:
-            conn = get_connection()
-            cursor = conn.cursor()
+            # Verificar se há compras associadas
+            self.executor.ler(contar_compras_produto, produto_id, grupo='produtos',
+                              ao_concluir=lambda n: self.confirmar_exclusao(produto_id, produto_nome, n),
+                              ao_falhar=self.mostrar_erro_banco)
+    
+    def confirmar_exclusao(self, produto_id, produto_nome, count_compras):
+        """Confirma a exclusão das compras (se houver) e exclui o produto"""
+        if count_compras > 0:
+            # Perguntar se quer excluir as compras também
+            resposta2 = messagebox.askyesno("Compras Encontradas",
+                f"⚠️  Este produto possui {count_compras} compra(s) registrada(s).\n\n"
+                "Deseja excluir o produto E TODAS as suas compras?\n"
+                "Ou apenas cancelar a exclusão?")
             
-            try:
-                # Verificar se há compras associadas
-                cursor.execute("SELECT COUNT(*) FROM compras WHERE produto_id = ?", (produto_id,))
-                count_compras = cursor.fetchone()[0]
-                
-                if count_compras > 0:
-                    # Perguntar se quer excluir as compras também
-                    resposta2 = messagebox.askyesno("Compras Encontradas",
-                        f"⚠️  Este produto possui {count_compras} compra(s) registrada(s).\n\n"
-                        "Deseja excluir o produto E TODAS as suas compras?\n"
-                        "Ou apenas cancelar a exclusão?")
-                    
-                    if resposta2:
-                        # Excluir compras primeiro, depois o produto
-                        cursor.execute("DELETE FROM compras WHERE produto_id = ?", (produto_id,))
-                        cursor.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
-                        conn.commit()
-                        messagebox.showinfo("✅ Sucesso", 
-                            f"Produto '{produto_nome}' e suas {count_compras} compra(s) foram excluídos.")
-                    else:
-                        messagebox.showinfo("Cancelado", 
-                            "Exclusão cancelada. O produto não foi removido.")
-                        conn.close()
-                        return
-                else:
-                    # Não tem compras, só excluir o produto
-                    cursor.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
-                    conn.commit()
-                    messagebox.showinfo("✅ Sucesso", "Produto excluído com sucesso!")
-                
-                # Atualizar a lista
-                self.load_produtos()
-                self.load_data()
-                
-            except Exception as e:
-                messagebox.showerror("❌ Erro", f"Ocorreu um erro ao excluir: {str(e)}")
-            finally:
-                conn.close()
+            if not resposta2:
+                messagebox.showinfo("Cancelado", 
+                    "Exclusão cancelada. O produto não foi removido.")
+                return
+        
+        def excluido(compras_excluidas):
+            # A lista e os comboboxes se atualizam pelo evento ProdutoRemovido
+            if compras_excluidas:
+                messagebox.showinfo("✅ Sucesso", 
+                    f"Produto '{produto_nome}' e suas {compras_excluidas} compra(s) foram excluídos.")
+            else:
+                messagebox.showinfo("✅ Sucesso", "Produto excluído com sucesso!")
+        
+        def falhou(erro):
+            messagebox.showerror("❌ Erro", f"Ocorreu um erro ao excluir: {str(erro)}")
+        
+        # Excluir compras primeiro, depois o produto (na thread de escrita)
+        self.executor.escrever(remover_produto, produto_id, grupo='produtos',
+                               ao_concluir=excluido, ao_falhar=falhou)
     
     def mostrar_menu_contexto(self, event):
         """Mostra menu de contexto ao clicar com botão direito"""
@@ -759,6 +1322,7 @@ class SupermercadoApp:
         produto_nome = item['values'][1]
         
         # Mudar para aba de consulta e preencher o filtro
+        self.garantir_aba('consultar')
         self.notebook.select(self.frame_consultar)
         self.consulta_produto_var.set(produto_nome)
         self.buscar_precos()
@@ -766,8 +1330,11 @@ class SupermercadoApp:
         # Rolar para o topo
         self.tree_consulta.yview_moveto(0)
     
+    @medir()
     def gerar_grafico(self):
         """Gera gráfico de evolução de preços"""
+        if not self.banco_disponivel():
+            return
         produto = self.graph_produto_var.get()
         if not produto:
             messagebox.showwarning("Aviso", "Selecione um produto!")
@@ -779,72 +1346,108 @@ class SupermercadoApp:
         else:
             produto_nome = produto
         
-        conn = get_connection()
-        cursor = conn.cursor()
+        from reports.charts import preparar_grafico
+        self.executor.ler(preparar_grafico, produto_nome, grupo='estatisticas', chave='grafico',
+                          ao_concluir=self.desenhar_grafico, ao_falhar=self.mostrar_erro_banco)
+    
+    @medir()
+    def desenhar_grafico(self, dados):
+        """Desenha o gráfico reaproveitando a mesma figura e o mesmo canvas"""
+        if not dados.series:
+            messagebox.showinfo("Info", "Nenhum dado encontrado para este produto!")
+            return
         
-        cursor.execute('''
-        SELECT c.data_compra, c.preco/c.quantidade as preco_unitario, s.nome
-        FROM compras c
-        JOIN produtos p ON c.produto_id = p.id
-        JOIN supermercados s ON c.supermercado_id = s.id
-        WHERE p.nome LIKE ?
-        ORDER BY c.data_compra
-        ''', (f"%{produto_nome}%",))
+        # Importado aqui: o matplotlib só é carregado quando há gráfico
+        if self.grafico is None:
+            from reports.charts import GraficoPrecos
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.grafico = GraficoPrecos()
+            self.canvas_grafico = FigureCanvasTkAgg(self.grafico.figura, master=self.graph_canvas)
+            self.canvas_grafico.get_tk_widget().pack(fill='both', expand=True)
         
-        dados = cursor.fetchall()
-        conn.close()
+        if self.grafico.desenhar(dados):
+            self.canvas_grafico.draw_idle()
+    
+    def fazer_backup_manual(self):
+        """Faz backup manual do banco de dados"""
+        def concluido(backup_path):
+            if backup_path:
+                messagebox.showinfo("✅ Backup", f"Backup criado com sucesso:\n{backup_path}")
+            else:
+                messagebox.showerror("❌ Erro", "Não foi possível criar o backup!")
         
-        if not dados:
-            messagebox.showinfo("Info", "Nenhum dado encontrado para este produto!")
+        self.executor.ler(fazer_backup, forcar=True, ao_concluir=concluido,
+                          ao_falhar=self.mostrar_erro_banco)
+    
+    def restaurar_backup(self):
+        """Restaura o banco a partir de um backup escolhido"""
+        caminho = filedialog.askopenfilename(
+            title="Restaurar Backup", initialdir=PASTA_BACKUPS,
+            filetypes=[("Backups", "*.db *.db.gz")])
+        if not caminho:
+            return
+        if not messagebox.askyesno("Restaurar Backup",
+                                   "Os dados atuais serão substituídos pelos do backup "
+                                   "(uma cópia do estado atual será salva antes). Continuar?"):
             return
         
-        # Preparar dados para o gráfico
-        from datetime import datetime
-        datas = [datetime.strptime(row[0], "%Y-%m-%d") for row in dados]
-        precos = [row[1] for row in dados]
-        supermercados = [row[2] for row in dados]
-        
-        # Limpar canvas anterior
-        for widget in self.graph_canvas.winfo_children():
-            widget.destroy()
+        def concluido(seguranca):
+            # As telas recarregam pelo evento DadosSubstituidos
+            messagebox.showinfo("✅ Backup", f"Banco restaurado.\nEstado anterior salvo em:\n{seguranca}")
         
-        # Criar figura do matplotlib
-        fig, ax = plt.subplots(figsize=(8, 4))
+        self.executor.escrever(restaurar_backup, caminho, ao_concluir=concluido,
+                               ao_falhar=self.mostrar_erro_banco)
+    
+    def importar_compras(self):
+        """Importa compras de uma planilha CSV/XLSX"""
+        caminho = filedialog.askopenfilename(
+            title="Importar Compras",
+            filetypes=[("Planilhas", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")])
+        if not caminho:
+            return
         
-        # Agrupar por supermercado
-        supermercados_unicos = list(set(supermercados))
-        cores = plt.cm.Set3(range(len(supermercados_unicos)))
+        criar_produtos = messagebox.askyesno(
+            "Importar Compras", "Cadastrar automaticamente os produtos que não existirem?")
         
-        for i, supermercado in enumerate(supermercados_unicos):
-            indices = [j for j, s in enumerate(supermercados) if s == supermercado]
-            datas_sm = [datas[j] for j in indices]
-            precos_sm = [precos[j] for j in indices]
-            
-            ax.plot(datas_sm, precos_sm, 'o-', label=supermercado, 
-                   color=cores[i], linewidth=2, markersize=8)
+        def concluido(relatorio):
+            texto = relatorio.resumo()
+            if relatorio.erros:
+                texto += "\n\nPrimeiros erros:\n" + "\n".join(
+                    f"Linha {linha}: {erro}" for linha, erro in relatorio.erros[:10])
+            messagebox.showinfo("📥 Importação", texto)
         
-        ax.set_xlabel('Data')
-        ax.set_ylabel('Preço Unitário (R$)')
-        ax.set_title(f'Evolução de Preços: {produto_nome}')
-        ax.legend()
-        ax.grid(True, alpha=0.3)
+        self.executor.escrever(importar_compras, caminho, criar_produtos=criar_produtos,
+                               grupo='registrar', ao_concluir=concluido,
+                               ao_falhar=self.mostrar_erro_banco)
+    
+    def importar_notas_fiscais(self):
+        """Importa as compras dos XML de NFC-e/NF-e de uma pasta"""
+        pasta = filedialog.askdirectory(title="Pasta com os XML das notas fiscais")
+        if not pasta:
+            return
         
-        # Rotacionar labels do eixo x
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+        def concluido(relatorio):
+            texto = relatorio.resumo()
+            if relatorio.erros:
+                texto += "\n\nPrimeiros erros:\n" + "\n".join(
+                    f"{origem}: {erro}" for origem, erro in relatorio.erros[:10])
+            messagebox.showinfo("🧾 Notas Fiscais", texto)
         
-        # Converter para imagem tkinter
-        canvas = FigureCanvasTkAgg(fig, master=self.graph_canvas)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
+        self.executor.escrever(importar_notas, pasta, grupo='registrar', ao_concluir=concluido,
+                               ao_falhar=self.mostrar_erro_banco)
     
-    def fazer_backup_manual(self):
-        """Faz backup manual do banco de dados"""
-        backup_path = fazer_backup()
-        if backup_path:
-            messagebox.showinfo("✅ Backup", f"Backup criado com sucesso:\n{backup_path}")
-        else:
-            messagebox.showerror("❌ Erro", "Não foi possível criar o backup!")
+    def reconstruir_estatisticas(self):
+        """Recalcula do zero os agregados usados em estatísticas e gráficos"""
+        def concluido(resultado):
+            total, anomalas, promocoes = resultado
+            messagebox.showinfo(
+                "✅ Estatísticas",
+                f"Agregados reconstruídos ({total} linhas).\n\n"
+                f"Histórico de preços: {anomalas} compra(s) fora do padrão e "
+                f"{promocoes} provável(is) promoção(ões).")
+        
+        self.executor.escrever(reconstruir_agregados, grupo='estatisticas',
+                               ao_concluir=concluido, ao_falhar=self.mostrar_erro_banco)
     
     def mostrar_sobre(self):
         """Mostra informações sobre o aplicativo"""
@@ -855,5 +1458,7 @@ class SupermercadoApp:
             "• Registro de compras com preços\n"
             "• Consulta e comparação de preços\n"
             "• Estatísticas e gráficos\n"
-            "• Gerenciamento de produtos\n\n"
+            "• Gerenciamento de produtos\n"
+            "• Listas de compra e cesta mais barata\n"
+            "• Resumo financeiro mensal\n\n"
             "Desenvolvido com Python, Tkinter e SQLite")
\ No newline at end of file
@@ -1,32 +1,432 @@
 # gui/widgets.py
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk
+from collections import OrderedDict, deque
 from datetime import datetime, date
 from app.database import buscar_produtos_similares
+from app.utils import normalizar_texto
+
+# Teclas de navegação não disparam nova busca
+TECLAS_IGNORADAS = {
+    'Up', 'Down', 'Left', 'Right', 'Return', 'KP_Enter', 'Escape', 'Tab',
+    'Home', 'End', 'Prior', 'Next', 'Shift_L', 'Shift_R', 'Control_L',
+    'Control_R', 'Alt_L', 'Alt_R', 'Caps_Lock',
+}
+
+
+def normalizar_chave(texto):
+    """Normaliza o texto digitado para uso como chave de cache"""
+    return ' '.join(normalizar_texto(texto).split())
+
+
+class CacheSugestoes:
+    """Cache LRU das sugestões, indexado pelo prefixo normalizado"""
+    
+    def __init__(self, capacidade=256):
+        self.capacidade = capacidade
+        self.versao = 0
+        self._itens = OrderedDict()
+    
+    def obter(self, chave, limite):
+        """Retorna as sugestões em cache para a chave, ou None"""
+        if chave in self._itens:
+            self._itens.move_to_end(chave)
+            return self._itens[chave][:limite]
+        
+        # Um prefixo com a lista completa (menos que o limite) já contém
+        # todos os produtos que podem casar com o texto estendido
+        for tamanho in range(len(chave) - 1, 1, -1):
+            prefixo = chave[:tamanho]
+            sugestoes = self._itens.get(prefixo)
+            if sugestoes is not None and len(sugestoes) < limite:
+                palavras = chave.split()
+                filtradas = [s for s in sugestoes
+                             if all(p in normalizar_texto(s) for p in palavras)]
+                self.guardar(chave, filtradas)
+                return filtradas
+        return None
+    
+    def guardar(self, chave, sugestoes):
+        """Guarda as sugestões, descartando as menos usadas"""
+        self._itens[chave] = list(sugestoes)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+    
+    def invalidar(self):
+        """Descarta todas as sugestões (a tabela de produtos mudou)"""
+        self._itens.clear()
+        self.versao += 1
+
+
+class PedidoSugestao:
+    """Busca de sugestões enviada para a thread de trabalho"""
+    
+    def __init__(self, termo, limite, versao_cache):
+        self.termo = termo
+        self.limite = limite
+        self.versao_cache = versao_cache
+        self.cancelado = False
+        self.resultado = None
+        self.erro = None
+        self.concluido = threading.Event()
+
+
+class ServicoSugestoes:
+    """Thread única que executa as buscas de sugestões fora do mainloop"""
+    
+    def __init__(self, funcao_busca=buscar_produtos_similares):
+        self.funcao_busca = funcao_busca
+        self._pedidos = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def enviar(self, pedido):
+        """Enfileira um pedido, iniciando a thread na primeira vez"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar,
+                                                name='sugestoes', daemon=True)
+                self._thread.start()
+        self._pedidos.put(pedido)
+    
+    def _executar(self):
+        """Laço da thread: descarta pedidos cancelados e executa os demais"""
+        while True:
+            pedido = self._pedidos.get()
+            if pedido.cancelado:
+                continue
+            try:
+                pedido.resultado = self.funcao_busca(pedido.termo, limite=pedido.limite)
+            except Exception as e:
+                pedido.erro = e
+            pedido.concluido.set()
+
+
+# Compartilhados por todos os comboboxes de produto
+cache_sugestoes = CacheSugestoes()
+servico_sugestoes = ServicoSugestoes()
+
+
+def invalidar_cache_sugestoes():
+    """Invalida o cache após alterações na tabela de produtos"""
+    cache_sugestoes.invalidar()
 
 
 class AutoCompleteCombobox(ttk.Combobox):
-    """Combobox com autocomplete"""
+    """Combobox com autocomplete assíncrono (debounce + thread de busca)"""
+    
+    ATRASO_MS = 150
+    INTERVALO_VERIFICACAO_MS = 15
+    LIMITE = 10
     
     def __init__(self, parent, **kwargs):
         super().__init__(parent, **kwargs)
         self._hits = []
         self._hit_index = 0
         self.position = 0
+        self._agendamento = None
+        self._pedido = None
         self.bind('<KeyRelease>', self.handle_keyrelease)
     
     def handle_keyrelease(self, event):
         """Lida com liberação de teclas para autocomplete"""
-        value = event.widget.get()
+        if event.keysym in TECLAS_IGNORADAS:
+            return
+        
+        # Reinicia o debounce a cada tecla
+        if self._agendamento is not None:
+            self.after_cancel(self._agendamento)
+            self._agendamento = None
         
+        value = self.get()
         if value == '':
+            self._cancelar_pedido()
             self['values'] = []
         elif len(value) >= 2:
-            # Buscar produtos similares
-            sugestoes = buscar_produtos_similares(value, limite=10)
-            if sugestoes:
-                self['values'] = sugestoes
-                self.event_generate('<Down>')
+            self._agendamento = self.after(self.ATRASO_MS, self._buscar, value)
+    
+    def _cancelar_pedido(self):
+        """Marca o pedido em andamento como obsoleto"""
+        if self._pedido is not None:
+            self._pedido.cancelado = True
+            self._pedido = None
+    
+    def _buscar(self, value):
+        """Busca no cache ou envia a busca para a thread de trabalho"""
+        self._agendamento = None
+        self._cancelar_pedido()
+        
+        chave = normalizar_chave(value)
+        sugestoes = cache_sugestoes.obter(chave, self.LIMITE)
+        if sugestoes is not None:
+            self._mostrar(sugestoes)
+            return
+        
+        self._pedido = PedidoSugestao(value, self.LIMITE, cache_sugestoes.versao)
+        servico_sugestoes.enviar(self._pedido)
+        self.after(self.INTERVALO_VERIFICACAO_MS, self._verificar_pedido, self._pedido)
+    
+    def _verificar_pedido(self, pedido):
+        """Recebe o resultado no mainloop, ignorando pedidos obsoletos"""
+        if pedido is not self._pedido:
+            return
+        if not pedido.concluido.is_set():
+            self.after(self.INTERVALO_VERIFICACAO_MS, self._verificar_pedido, pedido)
+            return
+        
+        self._pedido = None
+        if pedido.erro is not None:
+            return
+        
+        # Resultados de antes de uma invalidação não entram no cache
+        if pedido.versao_cache == cache_sugestoes.versao:
+            cache_sugestoes.guardar(normalizar_chave(pedido.termo), pedido.resultado)
+        self._mostrar(pedido.resultado)
+    
+    def _mostrar(self, sugestoes):
+        """Exibe as sugestões na lista do combobox"""
+        if sugestoes:
+            self['values'] = sugestoes
+            self.event_generate('<Down>')
+
+
+class TreeviewPaginado(ttk.Treeview):
+    """Treeview que mantém só uma janela de linhas, buscando páginas ao rolar
+    
+    Com um ExecutorConsultas, as páginas são lidas nas threads de leitura e
+    inseridas quando o callback volta ao mainloop; sem ele, no próprio mainloop.
+    """
+    
+    TAMANHO_PAGINA = 100
+    MAXIMO_LINHAS = 400  # janela visível + buffer
+    LIMIAR = 0.15        # fração perto da borda que dispara uma nova página
+    
+    def __init__(self, parent, formatar_linha=None, label_total=None, executor=None,
+                 grupo=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.formatar_linha = formatar_linha or (lambda linha: linha)
+        self.label_total = label_total
+        self.executor = executor
+        self.grupo = grupo
+        self.consulta = None
+        self.total = 0
+        self._linhas = deque()     # (iid, chave) na ordem exibida
+        self._deslocamento = 0     # linhas descartadas acima da janela
+        self._fim = True
+        self._pendente = None      # página sendo lida (só uma por vez)
+        self._scrollbar = None
+        self.configure(yscrollcommand=self._ao_rolar)
+    
+    def configurar_scrollbar(self, scrollbar):
+        """Liga a scrollbar, que passa a ser atualizada por _ao_rolar"""
+        self._scrollbar = scrollbar
+        scrollbar.configure(command=self.yview)
+    
+    def carregar(self, consulta, total=None, primeira_pagina=None):
+        """Exibe uma ConsultaPaginada a partir da primeira página
+        
+        total e primeira_pagina podem vir já calculados (consulta.inicio() em
+        outra thread), evitando acessar o banco no mainloop.
+        """
+        self.limpar()
+        self.consulta = consulta
+        self.total = consulta.contar() if total is None else total
+        self._fim = False
+        if primeira_pagina is None:
+            self._carregar_depois()
+        else:
+            self._acrescentar(primeira_pagina)
+            self.yview_moveto(0)
+    
+    def limpar(self):
+        """Remove todas as linhas e desliga a consulta atual"""
+        self.delete(*self.get_children())
+        self._linhas.clear()
+        self.consulta = None
+        self.total = 0
+        self._deslocamento = 0
+        self._fim = True
+        self._pendente = None
+        self._atualizar_total()
+    
+    def _ao_rolar(self, primeiro, ultimo):
+        """Repassa a posição à scrollbar e busca páginas perto das bordas"""
+        if self._scrollbar is not None:
+            self._scrollbar.set(primeiro, ultimo)
+        if self.consulta is None or self._pendente:
+            return
+        
+        if float(ultimo) >= 1 - self.LIMIAR and not self._fim:
+            self._carregar_depois()
+        elif float(primeiro) <= self.LIMIAR and self._deslocamento > 0:
+            self._carregar_antes()
+    
+    def _ler_pagina(self, ancora, aplicar, **posicao):
+        """Lê uma página e a aplica no mainloop, se a janela não mudou
+        
+        ancora() é a chave de referência da página; se ela mudou (outra
+        consulta, linhas inseridas ou removidas), a página é descartada e a
+        próxima rolagem pede outra.
+        """
+        consulta, chave = self.consulta, ancora()
+        pedido = self._pendente = object()
+        
+        def concluido(pagina):
+            if pedido is not self._pendente:
+                return
+            self._pendente = None
+            if consulta is self.consulta and ancora() == chave:
+                aplicar(pagina)
+        
+        def falhou(_):
+            if pedido is self._pendente:
+                self._pendente = None
+        
+        if self.executor is None:
+            def ler_no_mainloop():
+                try:
+                    pagina = consulta.pagina(self.TAMANHO_PAGINA, **posicao)
+                except Exception as e:
+                    falhou(e)
+                    raise
+                concluido(pagina)
+            
+            # Fora do callback de rolagem
+            self.after_idle(ler_no_mainloop)
+        else:
+            self.executor.ler(consulta.pagina, self.TAMANHO_PAGINA, grupo=self.grupo,
+                              chave=('pagina', id(self)), ao_concluir=concluido,
+                              ao_falhar=falhou, **posicao)
+    
+    def _linha_no_topo(self):
+        """Índice, dentro da janela, da primeira linha visível"""
+        return self.yview()[0] * len(self._linhas)
+    
+    def _reposicionar(self, topo):
+        """Mantém a mesma linha no topo após inserir/descartar linhas"""
+        if self._linhas:
+            self.yview_moveto(max(topo, 0) / len(self._linhas))
+    
+    def _carregar_depois(self):
+        """Pede a próxima página; ela entra no fim da janela"""
+        def ultima():
+            return self._linhas[-1][1] if self._linhas else None
+        
+        def aplicar(pagina):
+            vazia = not self._linhas
+            self._acrescentar(pagina, self._linha_no_topo())
+            if vazia:
+                self.yview_moveto(0)
+        
+        self._ler_pagina(ultima, aplicar, depois_de=ultima())
+    
+    def _acrescentar(self, pagina, topo=0):
+        """Insere uma página no fim da janela, respeitando MAXIMO_LINHAS"""
+        if len(pagina) < self.TAMANHO_PAGINA:
+            self._fim = True
+        
+        for linha, chave in pagina:
+            iid = self.insert('', 'end', values=self.formatar_linha(linha))
+            self._linhas.append((iid, chave))
+        
+        excesso = len(self._linhas) - self.MAXIMO_LINHAS
+        if excesso > 0:
+            self.delete(*(self._linhas.popleft()[0] for _ in range(excesso)))
+            self._deslocamento += excesso
+            self._reposicionar(topo - excesso)
+        self._atualizar_total()
+    
+    def _carregar_antes(self):
+        """Pede a página anterior; ela entra no início da janela"""
+        def primeira():
+            return self._linhas[0][1] if self._linhas else None
+        
+        if self._linhas:
+            self._ler_pagina(primeira, self._inserir_antes, antes_de=primeira())
+    
+    def _inserir_antes(self, pagina):
+        """Insere a página anterior e descarta linhas do fim da janela"""
+        topo = self._linha_no_topo()
+        for linha, chave in reversed(pagina):
+            iid = self.insert('', 0, values=self.formatar_linha(linha))
+            self._linhas.appendleft((iid, chave))
+        self._deslocamento = max(self._deslocamento - len(pagina), 0)
+        if len(pagina) < self.TAMANHO_PAGINA:
+            self._deslocamento = 0
+        
+        excesso = len(self._linhas) - self.MAXIMO_LINHAS
+        if excesso > 0:
+            self.delete(*(self._linhas.pop()[0] for _ in range(excesso)))
+            self._fim = False
+        self._reposicionar(topo + len(pagina))
+        self._atualizar_total()
+    
+    def _antes(self, chave, outra):
+        """Indica se chave vem antes de outra na ordem da consulta"""
+        return chave > outra if self.consulta.descendente else chave < outra
+    
+    def _indice(self, chave):
+        """Posição da chave na janela, ou None"""
+        for i, (_, existente) in enumerate(self._linhas):
+            if existente == chave:
+                return i
+        return None
+    
+    def inserir_linha(self, linha, chave):
+        """Acrescenta uma linha nova sem recarregar a consulta
+        
+        Só entra na janela se a chave cair dentro dela; antes ou depois,
+        apenas o total e o deslocamento mudam (a linha vem ao rolar).
+        """
+        if self.consulta is None:
+            return
+        self.total += 1
+        posicao = next((i for i, (_, existente) in enumerate(self._linhas)
+                        if self._antes(chave, existente)), len(self._linhas))
+        if posicao == 0 and self._deslocamento > 0:
+            self._deslocamento += 1
+        elif posicao < len(self._linhas) or self._fim:
+            iid = self.insert('', posicao, values=self.formatar_linha(linha))
+            self._linhas.insert(posicao, (iid, chave))
+        self._atualizar_total()
+    
+    def remover_linha(self, chave):
+        """Tira uma linha excluída sem recarregar a consulta"""
+        if self.consulta is None:
+            return
+        self.total = max(self.total - 1, 0)
+        i = self._indice(chave)
+        if i is not None:
+            self.delete(self._linhas[i][0])
+            del self._linhas[i]
+        elif self._linhas and self._deslocamento > 0 and self._antes(chave, self._linhas[0][1]):
+            self._deslocamento -= 1
+        self._atualizar_total()
+    
+    def atualizar_linha(self, chave_anterior, linha, chave):
+        """Atualiza uma linha alterada, movendo-a se a chave mudou"""
+        if self.consulta is None:
+            return
+        i = self._indice(chave_anterior)
+        if i is not None and chave == chave_anterior:
+            self.item(self._linhas[i][0], values=self.formatar_linha(linha))
+            return
+        self.remover_linha(chave_anterior)
+        self.inserir_linha(linha, chave)
+    
+    def _atualizar_total(self):
+        """Atualiza o indicador 'linhas X–Y de N'"""
+        if self.label_total is None:
+            return
+        if not self._linhas:
+            self.label_total.config(text="Nenhum registro" if self.consulta else "")
+            return
+        inicio = self._deslocamento + 1
+        fim = self._deslocamento + len(self._linhas)
+        self.label_total.config(text=f"Exibindo {inicio}–{fim} de {self.total} registros")
 
 
 class ValidatedEntry(ttk.Entry):
@@ -0,0 +1,84 @@
+# reports/__main__.py
+"""Relatórios e exportações pela linha de comando, sem interface gráfica
+
+Uso:
+    python -m reports relatorio [PRODUTO ...] [--saida relatorios] [--formatos png pdf]
+    python -m reports exportar compras.csv [--produto NOME] [--supermercado NOME]
+"""
+import argparse
+import sys
+
+from app.database import configurar_banco, init_db, listar_nomes_produtos
+from app.utils import parsear_data
+
+
+def _data(texto):
+    data = parsear_data(texto)
+    if data is None:
+        raise argparse.ArgumentTypeError(f"data inválida: {texto}")
+    return data
+
+
+def comando_relatorio(args):
+    from reports.relatorios import gerar_relatorios
+
+    produtos = args.produtos or listar_nomes_produtos()
+    if not produtos:
+        print("Nenhum produto cadastrado")
+        return 0
+
+    def progresso(relatorio):
+        feitos = len(relatorio.resumos) + len(relatorio.falhas)
+        print(f"\r{feitos}/{len(produtos)} produtos ({relatorio.produtos_por_segundo:.1f}/s)",
+              end='', file=sys.stderr)
+
+    relatorio = gerar_relatorios(produtos, args.saida, args.formatos, args.processos,
+                                 ao_progresso=progresso)
+    print(file=sys.stderr)
+    print(relatorio.resumo())
+    for produto, erro in relatorio.falhas[:20]:
+        print(f"  {produto}: {erro}")
+    return 1 if relatorio.falhas else 0
+
+
+def comando_exportar(args):
+    from reports.exports import exportar_compras
+
+    relatorio = exportar_compras(args.arquivo, args.formato, args.produto, args.supermercado,
+                                 args.desde, args.ate)
+    print(relatorio.resumo())
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m reports',
+                                     description="Relatórios sem interface gráfica")
+    parser.add_argument('--banco', help="arquivo do banco (padrão: supermercado.db)")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    relatorio = comandos.add_parser('relatorio', help="gráficos e estatísticas por produto")
+    relatorio.add_argument('produtos', nargs='*', help="padrão: todos os produtos")
+    relatorio.add_argument('--saida', default='relatorios')
+    relatorio.add_argument('--formatos', nargs='+', default=['png'],
+                           choices=('png', 'svg', 'pdf'))
+    relatorio.add_argument('--processos', type=int, help="padrão: número de CPUs")
+    relatorio.set_defaults(funcao=comando_relatorio)
+
+    exportar = comandos.add_parser('exportar', help="exporta compras (csv, xlsx, jsonl, parquet)")
+    exportar.add_argument('arquivo')
+    exportar.add_argument('--formato', help="padrão: deduzido da extensão")
+    exportar.add_argument('--produto', default='')
+    exportar.add_argument('--supermercado', default='')
+    exportar.add_argument('--desde', type=_data)
+    exportar.add_argument('--ate', type=_data)
+    exportar.set_defaults(funcao=comando_exportar)
+
+    args = parser.parse_args(argv)
+    if args.banco:
+        configurar_banco(args.banco)
+    init_db()
+    return args.funcao(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
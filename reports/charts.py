@@ -0,0 +1,238 @@
+# reports/charts.py
+"""Gráficos de evolução de preços
+
+A figura é criada uma vez e reaproveitada: a cada gráfico as linhas de
+cada supermercado são atualizadas no lugar. Séries longas são reduzidas
+com LTTB antes de desenhar, e os dados preparados ficam em cache por
+(produto, filtros, versão dos dados). Quando todos os produtos do filtro
+têm medida na mesma unidade base, o preço é por kg, L ou unidade. A média
+móvel de todos os supermercados vem do histórico colunar (app/analise.py).
+"""
+import io
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import matplotlib
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+
+from app.database import dados_grafico, media_movel_produto, versao_dados_grafico
+from app.unidades import unidade_referencia
+
+MAXIMO_PONTOS = 400       # por supermercado, depois da redução
+PONTOS_COM_MARCADOR = 60  # acima disso as linhas são desenhadas sem marcadores
+LINHAS_POR_COLUNA = 10    # entradas por coluna da legenda
+JANELA_MEDIA_MOVEL = 30   # dias corridos
+
+
+def agrupar_por_supermercado(dados):
+    """Separa as linhas (data, preço, supermercado) em séries
+
+    Cada coluna é convertida de uma vez (datas para datetime64[D]); a
+    ordenação estável por supermercado mantém a ordem de data de cada série.
+    """
+    if not dados:
+        return {}
+    datas, precos, supermercados = zip(*dados)
+    datas = np.array(datas, dtype='datetime64[D]')
+    precos = np.array(precos, dtype=float)
+    nomes, grupos = np.unique(np.array(supermercados, dtype=object), return_inverse=True)
+    ordem = np.argsort(grupos, kind='stable')
+    bordas = np.searchsorted(grupos[ordem], np.arange(len(nomes) + 1))
+    return {nome: (datas[ordem[inicio:fim]], precos[ordem[inicio:fim]])
+            for nome, inicio, fim in zip(nomes, bordas[:-1], bordas[1:])}
+
+
+def reduzir_lttb(x, y, limite):
+    """Índices dos pontos escolhidos pelo Largest-Triangle-Three-Buckets
+
+    Mantém o primeiro e o último ponto e, em cada balde intermediário, o
+    ponto que forma o maior triângulo com o escolhido antes e a média do
+    balde seguinte, preservando picos e vales da série.
+    """
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bordas = np.linspace(1, n - 1, limite - 1).astype(np.int64)
+    indices = np.empty(limite, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        proximo_fim = bordas[i + 2] if i + 2 < len(bordas) else n
+        media_x = x[fim:proximo_fim].mean()
+        media_y = y[fim:proximo_fim].mean()
+
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(areas.argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+class DadosGrafico:
+    """Séries prontas para desenhar: {supermercado: (datas, preços)}"""
+
+    def __init__(self, chave, produto_nome, series, pontos_originais, unidade=None,
+                 media_movel=None):
+        self.chave = chave
+        self.produto_nome = produto_nome
+        self.series = series
+        self.pontos_originais = pontos_originais
+        self.unidade = unidade  # 'kg', 'L', 'un' ou None (preço unitário da compra)
+        self.media_movel = media_movel  # (datas, médias) de todos os supermercados, ou None
+
+    @property
+    def pontos(self):
+        return sum(len(x) for x, _ in self.series.values())
+
+
+class CacheLRU:
+    """Dicionário limitado e seguro entre threads; descarta o item menos usado"""
+
+    def __init__(self, capacidade=64):
+        self.capacidade = capacidade
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+cache_dados = CacheLRU()
+
+
+def preparar_grafico(produto_nome, data_inicio=None, data_fim=None, maximo_pontos=MAXIMO_PONTOS,
+                     exato=False, referencia=True):
+    """Lê, agrupa e reduz os dados do gráfico; usa o cache se os dados não mudaram
+
+    Com referencia=True usa o preço por kg, L ou unidade quando os produtos
+    do filtro têm uma unidade base comum.
+    """
+    versao = versao_dados_grafico(produto_nome, data_inicio, data_fim, exato)
+    chave = (produto_nome, exato, data_inicio, data_fim, maximo_pontos, referencia, versao)
+    dados = cache_dados.obter(chave)
+    if dados is not None:
+        return dados
+
+    unidade = unidade_referencia(versao[-1]) if referencia else None
+    series = agrupar_por_supermercado(dados_grafico(produto_nome, data_inicio, data_fim, exato,
+                                                    referencia=unidade is not None))
+    pontos_originais = sum(len(x) for x, _ in series.values())
+    for supermercado, (x, y) in series.items():
+        if len(x) > maximo_pontos:
+            indices = reduzir_lttb(x.astype(np.int64), y, maximo_pontos)
+            series[supermercado] = (x[indices], y[indices])
+
+    datas_media, medias = media_movel_produto(produto_nome, data_inicio, data_fim, exato,
+                                              referencia=unidade is not None,
+                                              janela=JANELA_MEDIA_MOVEL)
+    if len(datas_media) > maximo_pontos:
+        indices = reduzir_lttb(datas_media.astype(np.int64), medias, maximo_pontos)
+        datas_media, medias = datas_media[indices], medias[indices]
+
+    dados = DadosGrafico(chave, produto_nome, series, pontos_originais, unidade,
+                         media_movel=(datas_media, medias) if len(medias) else None)
+    cache_dados.guardar(chave, dados)
+    return dados
+
+
+class GraficoPrecos:
+    """Figura única de evolução de preços, atualizada no lugar a cada desenho"""
+
+    def __init__(self, largura=8, altura=4, dpi=100):
+        # O layout 'constrained' se ajusta sozinho a cada desenho
+        self.figura = Figure(figsize=(largura, altura), dpi=dpi, layout='constrained')
+        self.eixo = self.figura.add_subplot()
+        self.eixo.set_xlabel('Data')
+        self.eixo.set_ylabel('Preço Unitário (R$)')
+        self.eixo.grid(True, alpha=0.3)
+        localizador = mdates.AutoDateLocator()
+        self.eixo.xaxis.set_major_locator(localizador)
+        self.eixo.xaxis.set_major_formatter(mdates.ConciseDateFormatter(localizador))
+        self.cores = matplotlib.colormaps['Set3']
+        self.linhas = {}
+        self.linha_media = None
+        self.chave = None
+        self._imagens = CacheLRU(capacidade=16)
+
+    def desenhar(self, dados):
+        """Atualiza a figura com os dados; retorna False se ela já os exibia"""
+        if dados.chave == self.chave:
+            return False
+
+        for supermercado in list(self.linhas):
+            if supermercado not in dados.series:
+                self.linhas.pop(supermercado).remove()
+
+        for i, supermercado in enumerate(sorted(dados.series)):
+            x, y = dados.series[supermercado]
+            linha = self.linhas.get(supermercado)
+            if linha is None:
+                linha, = self.eixo.plot(x, y, 'o-', label=supermercado, linewidth=2)
+                self.linhas[supermercado] = linha
+            else:
+                linha.set_data(x, y)
+            linha.set_color(self.cores(i % self.cores.N))
+            linha.set_markersize(8 if len(x) <= PONTOS_COM_MARCADOR else 0)
+
+        if dados.media_movel is not None:
+            if self.linha_media is None:
+                self.linha_media, = self.eixo.plot(
+                    *dados.media_movel, '--', color='black', linewidth=1.5,
+                    label=f'Média móvel ({JANELA_MEDIA_MOVEL} dias)', zorder=3)
+            else:
+                self.linha_media.set_data(*dados.media_movel)
+        elif self.linha_media is not None:
+            self.linha_media.remove()
+            self.linha_media = None
+
+        self.eixo.relim()
+        self.eixo.autoscale_view()
+        self.eixo.set_title(f'Evolução de Preços: {dados.produto_nome}')
+        self.eixo.set_ylabel(f'Preço por {dados.unidade} (R$)' if dados.unidade
+                             else 'Preço Unitário (R$)')
+        if self.linhas:
+            # Muitos supermercados: legenda em colunas para não espremer o eixo
+            self.eixo.legend(fontsize='small', ncol=math.ceil(len(self.linhas) / LINHAS_POR_COLUNA))
+        elif self.eixo.get_legend() is not None:
+            self.eixo.get_legend().remove()
+        self.chave = dados.chave
+        return True
+
+    def renderizar(self, dados, formato='png'):
+        """Retorna a imagem (bytes) do gráfico; imagens já geradas vêm do cache"""
+        chave = (dados.chave, formato)
+        imagem = self._imagens.obter(chave)
+        if imagem is None:
+            self.desenhar(dados)
+            buffer = io.BytesIO()
+            self.figura.savefig(buffer, format=formato)
+            imagem = buffer.getvalue()
+            self._imagens.guardar(chave, imagem)
+        return imagem
@@ -0,0 +1,214 @@
+# reports/exports.py
+"""Exportação das compras para CSV, XLSX, JSON Lines e Parquet
+
+As linhas são lidas com fetchmany e gravadas lote a lote, de modo que o
+consumo de memória não depende do tamanho da exportação.
+"""
+import csv
+import importlib.util
+import json
+import time
+from datetime import date
+from pathlib import Path
+
+from app.database import get_connection, montar_consulta_precos, consulta_precos_paginada
+
+SQL_EXPORTACAO = '''
+SELECT c.data_compra AS "data_compra [dia]", p.nome, p.marca, s.nome, c.preco, c.quantidade,
+       c.preco/c.quantidade as preco_unitario, c.promoção, c.quem_pagou, c.observacoes
+'''
+
+COLUNAS = ('data_compra', 'produto', 'marca', 'supermercado', 'preco', 'quantidade',
+           'preco_unitario', 'promocao', 'quem_pagou', 'observacoes')
+
+# O pyarrow é opcional: sem ele a exportação em Parquet não é oferecida
+PARQUET_DISPONIVEL = importlib.util.find_spec('pyarrow') is not None
+
+EXTENSOES = {
+    '.csv': 'csv',
+    '.xlsx': 'xlsx',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+}
+
+
+class EscritorCSV:
+    """Grava as linhas em CSV (UTF-8 com BOM, para abrir direto no Excel)"""
+
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, 'w', newline='', encoding='utf-8-sig')
+        self.escritor = csv.writer(self.arquivo)
+        self.escritor.writerow(COLUNAS)
+
+    def escrever(self, linhas):
+        self.escritor.writerows(linhas)
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+class EscritorJSONL:
+    """Grava um objeto JSON por linha"""
+
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, 'w', encoding='utf-8')
+
+    def escrever(self, linhas):
+        self.arquivo.writelines(
+            json.dumps(dict(zip(COLUNAS, linha)), ensure_ascii=False, default=date.isoformat)
+            + '\n'
+            for linha in linhas)
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+class EscritorXLSX:
+    """Grava em XLSX com o modo write_only do openpyxl (linhas não ficam em memória)"""
+
+    def __init__(self, caminho):
+        try:
+            import openpyxl
+        except ImportError:
+            raise ImportError("Para exportar XLSX instale o openpyxl: pip install openpyxl")
+        self.caminho = caminho
+        self.livro = openpyxl.Workbook(write_only=True)
+        self.planilha = self.livro.create_sheet("Compras")
+        self.planilha.append(COLUNAS)
+
+    def escrever(self, linhas):
+        for linha in linhas:
+            self.planilha.append(linha)
+
+    def fechar(self):
+        self.livro.save(self.caminho)
+
+
+class EscritorParquet:
+    """Grava em Parquet, um row group por lote lido do banco"""
+
+    def __init__(self, caminho):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Para exportar Parquet instale o pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.esquema = pa.schema([
+            ('data_compra', pa.date32()), ('produto', pa.string()), ('marca', pa.string()),
+            ('supermercado', pa.string()), ('preco', pa.float64()),
+            ('quantidade', pa.float64()), ('preco_unitario', pa.float64()),
+            ('promocao', pa.bool_()), ('quem_pagou', pa.string()),
+            ('observacoes', pa.string()),
+        ])
+        self.escritor = pq.ParquetWriter(caminho, self.esquema, compression='zstd')
+
+    def escrever(self, linhas):
+        colunas = list(zip(*linhas))
+        dados = {nome: list(valores) for nome, valores in zip(COLUNAS, colunas)}
+        dados['promocao'] = [bool(v) for v in dados['promocao']]
+        self.escritor.write_table(self.pa.Table.from_pydict(dados, schema=self.esquema))
+
+    def fechar(self):
+        self.escritor.close()
+
+
+ESCRITORES = {
+    'csv': EscritorCSV,
+    'jsonl': EscritorJSONL,
+    'xlsx': EscritorXLSX,
+    'parquet': EscritorParquet,
+}
+
+
+class RelatorioExportacao:
+    """Progresso e resultado de uma exportação"""
+
+    def __init__(self, caminho, formato, total=None):
+        self.caminho = caminho
+        self.formato = formato
+        self.total = total
+        self.linhas = 0
+        self.bytes = 0
+        self.cancelada = False
+        self.inicio = time.perf_counter()
+        self.fim = None
+
+    @property
+    def segundos(self):
+        return (self.fim or time.perf_counter()) - self.inicio
+
+    @property
+    def percentual(self):
+        return 100.0 * self.linhas / self.total if self.total else None
+
+    @property
+    def mb_por_segundo(self):
+        return self.bytes / 1e6 / self.segundos if self.segundos > 0 else 0.0
+
+    def resumo(self):
+        """Texto curto com o resultado da exportação"""
+        if self.cancelada:
+            return f"Exportação cancelada após {self.linhas} linhas"
+        return (f"{self.linhas} linhas exportadas para {self.caminho} "
+                f"({self.bytes / 1e6:.1f} MB em {self.segundos:.1f}s, "
+                f"{self.mb_por_segundo:.1f} MB/s)")
+
+
+def formato_por_extensao(caminho):
+    """Deduz o formato a partir da extensão do arquivo"""
+    extensao = Path(caminho).suffix.lower()
+    if extensao not in EXTENSOES:
+        raise ValueError(f"Formato de exportação não suportado: '{extensao}'")
+    return EXTENSOES[extensao]
+
+
+def contar_compras(produto_nome='', supermercado='', data_inicio=None, data_fim=None):
+    """Conta as compras que uma exportação com esses filtros vai gravar"""
+    return consulta_precos_paginada(produto_nome, supermercado, data_inicio, data_fim).contar()
+
+
+def exportar_compras(caminho, formato=None, produto_nome='', supermercado='',
+                     data_inicio=None, data_fim=None, tamanho_lote=5000,
+                     ao_progresso=None, cancelar=None):
+    """Exporta as compras filtradas; retorna um RelatorioExportacao
+
+    ao_progresso(relatorio) é chamado a cada lote; se cancelar (threading.Event)
+    for sinalizado, a exportação para e o arquivo parcial é removido.
+    """
+    formato = formato or formato_por_extensao(caminho)
+    total = None
+    if ao_progresso is not None:
+        total = contar_compras(produto_nome, supermercado, data_inicio, data_fim)
+    relatorio = RelatorioExportacao(caminho, formato, total)
+
+    query, params = montar_consulta_precos(produto_nome, supermercado, data_inicio, data_fim,
+                                           select=SQL_EXPORTACAO)
+    escritor = ESCRITORES[formato](caminho)
+    conn = get_connection()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                break
+            escritor.escrever(linhas)
+            relatorio.linhas += len(linhas)
+
+            if ao_progresso:
+                ao_progresso(relatorio)
+            if cancelar is not None and cancelar.is_set():
+                relatorio.cancelada = True
+                break
+        cursor.close()
+    finally:
+        conn.close()
+        escritor.fechar()
+        relatorio.fim = time.perf_counter()
+
+    if relatorio.cancelada:
+        Path(caminho).unlink(missing_ok=True)
+    else:
+        relatorio.bytes = Path(caminho).stat().st_size
+    return relatorio
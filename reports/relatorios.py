@@ -0,0 +1,166 @@
+# reports/relatorios.py
+"""Relatórios de preços por produto, sem interface gráfica
+
+Cada produto gera um gráfico (PNG, SVG ou PDF, com o backend Agg) e um
+texto com as estatísticas. Vários produtos são processados em paralelo
+por um pool de processos.
+"""
+import csv
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from app import database
+from app.unidades import unidade_referencia
+from app.utils import formatar_moeda, normalizar_texto
+
+FORMATOS_GRAFICO = ('png', 'svg', 'pdf')
+
+# Figura reaproveitada por todos os relatórios de um mesmo processo
+_grafico = None
+
+
+def texto_estatisticas(produto, stats):
+    """Texto das estatísticas de um produto (None se não houver compras)"""
+    if not stats or not stats[3]:
+        return None
+    texto = (f"📊 Estatísticas para '{produto}':\n"
+             f"• Total de registros: {stats[3]}\n"
+             f"• Período: {stats[4]} a {stats[5]}\n"
+             f"• Preço médio: {formatar_moeda(stats[2])}\n"
+             f"• Menor preço: {formatar_moeda(stats[0])}\n"
+             f"• Maior preço: {formatar_moeda(stats[1])}")
+    unidade = unidade_referencia(stats[9])
+    if unidade:
+        texto += (f"\n• Preço por {unidade}: média {formatar_moeda(stats[8])}, "
+                  f"de {formatar_moeda(stats[6])} a {formatar_moeda(stats[7])}")
+    return texto
+
+
+def nome_arquivo(produto):
+    """Nome de arquivo seguro para o produto ('Feijão Preto' -> 'feijao_preto')"""
+    return re.sub(r'[^a-z0-9]+', '_', normalizar_texto(produto)).strip('_') or 'produto'
+
+
+def _iniciar_processo(caminho_banco):
+    """Prepara um processo do pool: backend Agg e conexão com o banco"""
+    import matplotlib
+    matplotlib.use('Agg')
+    database.configurar_banco(caminho_banco)
+
+
+def gerar_relatorio_produto(produto, pasta, formatos=('png',)):
+    """Grava gráfico(s) e estatísticas de um produto; retorna um resumo (dict)
+
+    O nome é comparado por inteiro: 'Leite' não inclui 'Leite Condensado'.
+    """
+    global _grafico
+    from reports.charts import GraficoPrecos, preparar_grafico
+
+    pasta = Path(pasta)
+    base = nome_arquivo(produto)
+    stats = database.estatisticas_produto(produto, exato=True)
+    unidade = unidade_referencia(stats[9]) if stats else None
+    resumo = {
+        'produto': produto,
+        'compras': stats[3] if stats else 0,
+        'menor_preco': stats[0] if stats else None,
+        'maior_preco': stats[1] if stats else None,
+        'preco_medio': stats[2] if stats else None,
+        'primeira_compra': stats[4] if stats else None,
+        'ultima_compra': stats[5] if stats else None,
+        'preco_medio_referencia': stats[8] if unidade else None,
+        'unidade_referencia': unidade,
+        'arquivos': [],
+    }
+
+    texto = texto_estatisticas(produto, stats)
+    if texto is None:
+        return resumo
+    caminho = pasta / f"{base}.txt"
+    caminho.write_text(texto + "\n", encoding='utf-8')
+    resumo['arquivos'].append(caminho.name)
+
+    dados = preparar_grafico(produto, exato=True)
+    if dados.series:
+        if _grafico is None:
+            _grafico = GraficoPrecos()
+        for formato in formatos:
+            caminho = pasta / f"{base}.{formato}"
+            caminho.write_bytes(_grafico.renderizar(dados, formato))
+            resumo['arquivos'].append(caminho.name)
+    return resumo
+
+
+class RelatorioLote:
+    """Resultado de uma geração de relatórios em lote"""
+
+    def __init__(self, pasta):
+        self.pasta = Path(pasta)
+        self.resumos = []
+        self.falhas = []
+        self.inicio = time.perf_counter()
+        self.fim = None
+
+    @property
+    def segundos(self):
+        return (self.fim or time.perf_counter()) - self.inicio
+
+    @property
+    def produtos_por_segundo(self):
+        total = len(self.resumos) + len(self.falhas)
+        return total / self.segundos if self.segundos > 0 else 0.0
+
+    def resumo(self):
+        """Texto curto com o resultado do lote"""
+        texto = (f"{len(self.resumos)} relatórios em {self.pasta} em {self.segundos:.1f}s "
+                 f"({self.produtos_por_segundo:.1f} produtos/s)")
+        if self.falhas:
+            texto += f", {len(self.falhas)} falhas"
+        return texto
+
+
+def _gravar_indice(relatorio):
+    """Grava um CSV com uma linha por produto, em ordem alfabética"""
+    colunas = ('produto', 'compras', 'menor_preco', 'maior_preco', 'preco_medio',
+               'primeira_compra', 'ultima_compra', 'preco_medio_referencia',
+               'unidade_referencia')
+    with open(relatorio.pasta / 'indice.csv', 'w', newline='', encoding='utf-8-sig') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(colunas + ('arquivos',))
+        for resumo in sorted(relatorio.resumos, key=lambda r: r['produto']):
+            escritor.writerow([resumo[c] for c in colunas] + [' '.join(resumo['arquivos'])])
+
+
+def gerar_relatorios(produtos, pasta, formatos=('png',), processos=None, ao_progresso=None):
+    """Gera os relatórios de vários produtos em paralelo; retorna um RelatorioLote
+
+    Os processos usam 'spawn' (em todas as plataformas), para não herdar as
+    conexões SQLite abertas no processo principal.
+    """
+    formatos = tuple(formatos)
+    invalidos = [f for f in formatos if f not in FORMATOS_GRAFICO]
+    if invalidos:
+        raise ValueError(f"Formato de gráfico não suportado: {', '.join(invalidos)}")
+
+    relatorio = RelatorioLote(pasta)
+    relatorio.pasta.mkdir(parents=True, exist_ok=True)
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto,
+                             initializer=_iniciar_processo,
+                             initargs=(database.DB_PATH,)) as pool:
+        futuros = {pool.submit(gerar_relatorio_produto, produto, relatorio.pasta, formatos): produto
+                   for produto in produtos}
+        for futuro in as_completed(futuros):
+            try:
+                relatorio.resumos.append(futuro.result())
+            except Exception as e:
+                relatorio.falhas.append((futuros[futuro], str(e)))
+            if ao_progresso:
+                ao_progresso(relatorio)
+
+    _gravar_indice(relatorio)
+    relatorio.fim = time.perf_counter()
+    return relatorio
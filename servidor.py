@@ -0,0 +1,11 @@
+# servidor.py
+"""Servidor HTTP/JSON local (app/api.py): registro de compras pelo celular
+
+Pode rodar junto com o aplicativo (python main.py) sobre o mesmo banco.
+"""
+import sys
+
+from app.api import main
+
+if __name__ == "__main__":
+    sys.exit(main())
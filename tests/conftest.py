@@ -0,0 +1,14 @@
+# tests/conftest.py
+import pytest
+
+from app import database
+
+
+@pytest.fixture
+def banco(tmp_path):
+    """Banco migrado em um diretório temporário, configurado como o da aplicação"""
+    caminho_original = database.DB_PATH
+    database.configurar_banco(tmp_path / 'teste.db')
+    database.init_db()
+    yield database.DB_PATH
+    database.configurar_banco(caminho_original)
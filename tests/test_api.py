@@ -0,0 +1,66 @@
+# tests/test_api.py
+import asyncio
+import json
+
+import pytest
+
+from app import api
+
+TOKEN = 'segredo-de-teste'
+
+
+async def requisitar(porta, caminho, token=None):
+    """GET em uma conexão nova; retorna (status, objeto JSON)"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', porta)
+    autorizacao = f"Authorization: Bearer {token}\r\n" if token is not None else ''
+    writer.write(f"GET {caminho} HTTP/1.1\r\nHost: localhost\r\n{autorizacao}"
+                 "Connection: close\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    resposta = await reader.read()
+    writer.close()
+    cabecalho, _, corpo = resposta.partition(b'\r\n\r\n')
+    return int(cabecalho.split()[1]), json.loads(corpo)
+
+
+def com_servidor(token, *caminhos_e_tokens):
+    """Sobe o servidor em uma porta livre e faz as requisições, em ordem"""
+    async def executar():
+        iniciado = asyncio.get_running_loop().create_future()
+        servidor = api.ServidorAPI(leitores=1, token=token)
+        tarefa = asyncio.ensure_future(servidor.servir(
+            '127.0.0.1', 0, ao_iniciar=lambda enderecos: iniciado.set_result(enderecos[0][1])))
+        try:
+            porta = await asyncio.wait_for(iniciado, 10)
+            return [await requisitar(porta, caminho, t) for caminho, t in caminhos_e_tokens]
+        finally:
+            tarefa.cancel()
+            await asyncio.gather(tarefa, return_exceptions=True)
+    return asyncio.run(executar())
+
+
+def test_token_obrigatorio_quando_configurado(banco):
+    sem, errado, certo = com_servidor(TOKEN, ('/saude', None), ('/saude', 'outro'),
+                                      ('/saude', TOKEN))
+    assert sem[0] == errado[0] == 401
+    assert certo[0] == 200
+    assert certo[1]['requisicoes'] == 3
+
+
+def test_sem_token_atende_localmente(banco):
+    [(status, _)] = com_servidor(None, ('/supermercados', None))
+    assert status == 200
+
+
+def test_rede_local_exige_token(monkeypatch, capsys):
+    monkeypatch.delenv(api.VARIAVEL_TOKEN, raising=False)
+    with pytest.raises(SystemExit) as saida:
+        api.main(['--host', '0.0.0.0'])
+    assert saida.value.code == 2
+    assert api.VARIAVEL_TOKEN in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('host, local', [('127.0.0.1', True), ('localhost', True), ('::1', True),
+                                         ('0.0.0.0', False), ('192.168.0.10', False),
+                                         ('meu-pc.lan', False)])
+def test_somente_local(host, local):
+    assert api._somente_local(host) is local
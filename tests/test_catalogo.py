@@ -0,0 +1,144 @@
+# tests/test_catalogo.py
+import sqlite3
+from datetime import date
+
+from app import database
+from app.datas import dia_juliano
+
+
+def inserir_por_fora(banco, nome):
+    """Cadastra um produto como outro processo faria (sem passar pelo catálogo)"""
+    conn = sqlite3.connect(banco)
+    try:
+        conn.execute("INSERT INTO produtos (nome) VALUES (?)", (nome,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def registrar(produto):
+    return database.inserir_compra(produto, 'Mercado A', 9.9, 1, date(2024, 3, 1))
+
+
+def test_falta_traz_so_os_produtos_novos(banco, monkeypatch):
+    conn = sqlite3.connect(banco)
+    conn.execute("INSERT INTO supermercados (nome) VALUES ('Mercado A')")
+    conn.commit()
+    conn.close()
+    database.obter_catalogo()
+    cargas = []
+    monkeypatch.setattr(database._catalogo, 'carregar', lambda conn: cargas.append(conn))
+
+    inserir_por_fora(banco, 'Café Pilão')
+    assert registrar('cafe pilao')[0]
+    assert not registrar('Produto que não existe')[0]
+    assert not registrar('Outro que não existe')[0]
+    assert cargas == []
+
+
+def test_supermercado_novo_nao_recarrega_o_catalogo(banco, monkeypatch):
+    inserir_por_fora(banco, 'Arroz')
+    database.obter_catalogo()
+    cargas = []
+    monkeypatch.setattr(database._catalogo, 'carregar', lambda conn: cargas.append(conn))
+
+    for supermercado in ('Mercado A', 'Mercado B', 'mercado a'):
+        assert database.inserir_compra('Arroz', supermercado, 9.9, 1, date(2024, 3, 1))[0]
+    assert database.listar_supermercados() == ['Mercado A', 'Mercado B']
+    assert cargas == []
+
+
+def test_recarga_completa_no_maximo_uma_por_intervalo(banco, monkeypatch):
+    catalogo = database.obter_catalogo()
+    conn = sqlite3.connect(banco)
+    conn.execute("INSERT INTO produtos (nome) VALUES ('Arroz')")
+    conn.commit()
+    database.inserir_compra('Arroz', 'Mercado A', 9.9, 1, date(2024, 3, 1))
+
+    # Renomeado por outro processo: a falta só o encontra após o intervalo
+    conn.execute("UPDATE produtos SET nome = 'Arroz Integral' WHERE nome = 'Arroz'")
+    conn.commit()
+    conn.close()
+    assert not registrar('Arroz Integral')[0]
+
+    monkeypatch.setattr(catalogo, 'carregado_em',
+                        catalogo.carregado_em - database.INTERVALO_RECARGA_CATALOGO)
+    assert registrar('Arroz Integral')[0]
+
+
+def excluir_por_fora(banco, nome):
+    """Exclui um produto como outro processo faria (o catálogo não fica sabendo)"""
+    conn = sqlite3.connect(banco)
+    try:
+        conn.execute("DELETE FROM produtos WHERE nome = ?", (nome,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_produto_excluido_por_outro_processo_recusa_so_a_sua_compra(banco):
+    inserir_por_fora(banco, 'Arroz')
+    inserir_por_fora(banco, 'Feijão')
+    assert registrar('Arroz')[0]
+
+    excluir_por_fora(banco, 'Arroz')
+    resultados = database.inserir_compras([
+        dict(produto_nome=nome, supermercado='Mercado A', preco=9.9, quantidade=1,
+             data_compra=date(2024, 3, 2)) for nome in ('Arroz', 'Feijão')])
+    assert [ok for ok, _ in resultados] == [False, True]
+    assert 'não encontrado' in resultados[0][1]
+    assert database.obter_catalogo().resolver_produto('Arroz') is None
+
+    conn = sqlite3.connect(banco)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM compras WHERE data_compra = ?",
+                            (dia_juliano(date(2024, 3, 2)),)).fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_produto_recadastrado_por_outro_processo_usa_o_novo_id(banco):
+    inserir_por_fora(banco, 'Arroz')
+    assert registrar('Arroz')[0]
+
+    excluir_por_fora(banco, 'Arroz')
+    inserir_por_fora(banco, 'Arroz')
+    ok, compra_id = registrar('Arroz')
+    assert ok
+    conn = sqlite3.connect(banco)
+    try:
+        assert conn.execute("SELECT p.nome FROM compras c JOIN produtos p ON p.id = c.produto_id "
+                            "WHERE c.id = ?", (compra_id,)).fetchone() == ('Arroz',)
+    finally:
+        conn.close()
+
+
+def registrar_por_fora(banco, produto, supermercado, preco):
+    """Cadastra produto, supermercado e compra como o servidor ou o importador fariam"""
+    conn = sqlite3.connect(banco)
+    try:
+        produto_id = conn.execute("INSERT INTO produtos (nome) VALUES (?)", (produto,)).lastrowid
+        supermercado_id = conn.execute("INSERT INTO supermercados (nome) VALUES (?)",
+                                       (supermercado,)).lastrowid
+        conn.execute("INSERT INTO compras (produto_id, supermercado_id, preco, quantidade, "
+                     "data_compra) VALUES (?, ?, ?, 1, ?)",
+                     (produto_id, supermercado_id, preco, dia_juliano(date(2024, 3, 1))))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_consultas_colunares_veem_cadastros_de_outro_processo(banco):
+    inserir_por_fora(banco, 'Arroz')
+    assert registrar('Arroz')[0]
+    # Catálogo e histórico já carregados, como na interface
+    assert database.consulta_precos_colunar('Arroz').contar() == 1
+
+    registrar_por_fora(banco, 'Arroz Integral', 'Mercado B', 12.5)
+    assert database.consulta_precos_colunar('Arroz').contar() == \
+        database.consulta_precos_paginada('Arroz').contar() == 2
+    assert database.consulta_precos_colunar('', 'Mercado B').contar() == 1
+
+    registrar_por_fora(banco, 'Feijão', 'Mercado C', 8.0)
+    [resumo] = database.resumo_supermercados_produto('Feijão', exato=True)
+    assert resumo[0] == 'Mercado C'
@@ -0,0 +1,39 @@
+# tests/test_database.py
+import pytest
+
+from app import database
+
+
+def test_init_db_recusa_sqlite_antigo(tmp_path, monkeypatch):
+    monkeypatch.setattr(database.sqlite3, 'sqlite_version_info', (3, 31, 1))
+    monkeypatch.setattr(database.sqlite3, 'sqlite_version', '3.31.1')
+    caminho_original = database.DB_PATH
+    database.configurar_banco(tmp_path / 'antigo.db')
+    try:
+        with pytest.raises(RuntimeError, match='3.34.0'):
+            database.init_db()
+    finally:
+        database.configurar_banco(caminho_original)
+
+
+def _gastos(conn):
+    return sorted(conn.execute("SELECT * FROM gastos_mensais").fetchall())
+
+
+def test_compra_de_produto_inexistente_conta_sem_categoria(banco):
+    conn = database.get_connection()
+    try:
+        conn.execute("INSERT INTO supermercados (nome) VALUES ('Mercado')")
+        conn.execute("INSERT INTO compras (produto_id, supermercado_id, preco, quantidade, "
+                     "data_compra) VALUES (999, 1, 10.0, 1, 2460000)")
+        pelo_gatilho = _gastos(conn)
+        assert ('C', 0) in {(dimensao, chave) for _, dimensao, chave, _, _ in pelo_gatilho}
+
+        database._reconstruir_gastos(conn.cursor())
+        assert _gastos(conn) == pelo_gatilho
+
+        conn.execute("DELETE FROM compras")
+        assert _gastos(conn) == []
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,139 @@
+# tests/test_executor.py
+"""ExecutorConsultas sem Tk: despachar() é chamado diretamente pelo teste"""
+import threading
+import time
+
+import pytest
+
+from app.executor import ExecutorConsultas
+
+TEMPO_LIMITE = 5
+
+
+@pytest.fixture
+def executor():
+    executor = ExecutorConsultas(leitores=2)
+    yield executor
+    executor.encerrar(TEMPO_LIMITE)
+
+
+def despachar_ate(executor, condicao):
+    """Chama despachar() até a condição valer (como o after do mainloop faria)"""
+    limite = time.monotonic() + TEMPO_LIMITE
+    while not condicao():
+        assert time.monotonic() < limite, "os callbacks não chegaram"
+        executor.despachar()
+        time.sleep(0.005)
+
+
+def test_leituras_rodam_em_paralelo(executor):
+    # Cada leitura só termina se a outra estiver rodando ao mesmo tempo
+    barreira = threading.Barrier(2, timeout=TEMPO_LIMITE)
+    resultados = []
+
+    def leitura(i):
+        barreira.wait()
+        return i
+
+    for i in range(2):
+        executor.ler(leitura, i, ao_concluir=resultados.append)
+
+    despachar_ate(executor, lambda: len(resultados) == 2)
+    assert sorted(resultados) == [0, 1]
+
+
+def test_escritas_sao_serializadas_em_ordem(executor):
+    ativas = []
+    maximo = []
+    ordem = []
+
+    def escrita(i):
+        ativas.append(i)
+        maximo.append(len(ativas))
+        time.sleep(0.01)
+        ativas.remove(i)
+        return i
+
+    for i in range(5):
+        executor.escrever(escrita, i, ao_concluir=ordem.append)
+
+    despachar_ate(executor, lambda: len(ordem) == 5)
+    assert ordem == list(range(5))
+    assert max(maximo) == 1
+
+
+def test_cancelar_descarta_o_resultado(executor):
+    liberar = threading.Event()
+    resultados = []
+    tarefa = executor.ler(lambda: liberar.wait(TEMPO_LIMITE) and 'lido',
+                          ao_concluir=resultados.append, grupo='consultar')
+    assert executor.ocupado('consultar')
+
+    tarefa.cancelar()
+    liberar.set()
+    despachar_ate(executor, lambda: not executor.ocupado('consultar'))
+    assert tarefa.concluida
+    assert resultados == []
+
+
+def test_nova_leitura_com_a_mesma_chave_cancela_a_anterior(executor):
+    liberar = threading.Event()
+    resultados = []
+    primeira = executor.ler(lambda: liberar.wait(TEMPO_LIMITE) and 'antiga',
+                            ao_concluir=resultados.append, grupo='consultar', chave='busca')
+    executor.ler(lambda: 'nova', ao_concluir=resultados.append, grupo='consultar',
+                 chave='busca')
+    assert primeira.cancelada
+
+    liberar.set()
+    despachar_ate(executor, lambda: not executor.ocupado('consultar'))
+    assert resultados == ['nova']
+
+
+def test_cancelar_grupo(executor):
+    liberar = threading.Event()
+    resultados = []
+    for chave in ('a', 'b'):
+        executor.ler(lambda: liberar.wait(TEMPO_LIMITE), ao_concluir=resultados.append,
+                     grupo='estatisticas', chave=chave)
+
+    executor.cancelar_grupo('estatisticas')
+    liberar.set()
+    despachar_ate(executor, lambda: not executor.ocupado('estatisticas'))
+    assert resultados == []
+
+
+def test_erro_vai_para_ao_falhar(executor):
+    erros = []
+
+    def falhar():
+        raise ValueError("banco indisponível")
+
+    tarefa = executor.escrever(falhar, ao_falhar=erros.append)
+    despachar_ate(executor, lambda: erros)
+    assert isinstance(erros[0], ValueError)
+    with pytest.raises(ValueError):
+        tarefa.aguardar(TEMPO_LIMITE)
+
+
+def test_ocupado_avisa_ao_mudar(executor):
+    avisos = []
+    executor.ao_mudar_ocupado = lambda grupo, ocupado: avisos.append((grupo, ocupado))
+    executor.ler(lambda: None, grupo='listas')
+    executor.ler(lambda: None, grupo='listas')
+
+    despachar_ate(executor, lambda: not executor.ocupado('listas'))
+    assert avisos == [('listas', True), ('listas', False)]
+
+
+def test_erro_sem_ao_falhar_vai_para_o_log(executor, caplog):
+    def falhar():
+        raise ValueError("banco indisponível")
+
+    tarefa = executor.ler(falhar, grupo='consultar')
+    with caplog.at_level('ERROR', logger='app.executor'):
+        despachar_ate(executor, lambda: not executor.ocupado('consultar'))
+    assert tarefa.concluida
+    [registro] = caplog.records
+    assert 'falhar' in registro.getMessage()
+    assert registro.exc_info[0] is ValueError
@@ -0,0 +1,50 @@
+# tests/test_exports.py
+import threading
+
+import pytest
+
+from app import database
+from reports import exports
+
+
+@pytest.fixture
+def compras(banco):
+    conn = database.get_connection()
+    try:
+        conn.execute("INSERT INTO produtos (nome) VALUES ('Arroz')")
+        conn.execute("INSERT INTO supermercados (nome) VALUES ('Mercado A')")
+        conn.executemany('''
+        INSERT INTO compras (produto_id, supermercado_id, preco, quantidade, data_compra)
+        VALUES (1, 1, ?, 1, ?)
+        ''', ((10.0 + i % 7, 2460000 + i) for i in range(50)))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_progresso_e_total(compras, tmp_path):
+    vistos = []
+    relatorio = exports.exportar_compras(tmp_path / 'compras.csv', tamanho_lote=20,
+                                         ao_progresso=lambda r: vistos.append(r.linhas))
+    assert relatorio.total == 50
+    assert vistos == [20, 40, 50]
+    assert relatorio.bytes > 0
+
+
+def test_cancelar_para_e_remove_o_arquivo(compras, tmp_path):
+    cancelar = threading.Event()
+    caminho = tmp_path / 'compras.jsonl'
+    relatorio = exports.exportar_compras(caminho, tamanho_lote=20,
+                                         ao_progresso=lambda r: cancelar.set(),
+                                         cancelar=cancelar)
+    assert relatorio.cancelada
+    assert relatorio.linhas == 20
+    assert not caminho.exists()
+
+
+@pytest.mark.skipif(exports.PARQUET_DISPONIVEL, reason="pyarrow instalado")
+def test_parquet_sem_pyarrow_explica_o_que_instalar(compras, tmp_path):
+    caminho = tmp_path / 'compras.parquet'
+    with pytest.raises(ImportError, match='pip install pyarrow'):
+        exports.exportar_compras(caminho)
+    assert not caminho.exists()
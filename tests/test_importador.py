@@ -0,0 +1,82 @@
+# tests/test_importador.py
+import pytest
+
+from app import database, eventos, importador
+
+
+@pytest.fixture
+def recebidos():
+    """Eventos DadosSubstituidos entregues pelo barramento durante o teste"""
+    lista = []
+    eventos.barramento.assinar(eventos.DadosSubstituidos, lista.append)
+    yield lista
+    eventos.barramento.cancelar(eventos.DadosSubstituidos, lista.append)
+    eventos.barramento.despachar()
+
+
+def escrever_csv(caminho, linhas):
+    caminho.write_text('\n'.join(['produto;supermercado;preco;data'] + linhas) + '\n',
+                       encoding='utf-8')
+    return caminho
+
+
+def contar_compras():
+    conn = database.get_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM compras").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_linhas_em_branco_nao_deslocam_os_numeros(banco, tmp_path):
+    csv = escrever_csv(tmp_path / 'compras.csv', [
+        'Arroz;Mercado A;10,50;01/02/2024',      # linha 2
+        ';;;',                                   # linha 3, em branco
+        '',                                      # linha 4, em branco
+        'Feijão;Mercado A;abc;01/02/2024',       # linha 5
+        'Leite;;4,99;01/02/2024',                # linha 6
+        'Café;Mercado B;15,90;31/02/2024',       # linha 7
+    ])
+    relatorio = importador.importar_compras(csv, criar_produtos=True, tamanho_lote=2)
+
+    assert relatorio.lidas == 4
+    assert relatorio.importadas == 1
+    assert [linha for linha, _ in relatorio.erros] == [5, 6, 7]
+
+
+def test_erro_depois_de_um_commit_avisa_as_telas(banco, tmp_path, monkeypatch, recebidos):
+    csv = escrever_csv(tmp_path / 'compras.csv',
+                       [f'Produto {i};Mercado A;{i + 1},00;01/02/2024' for i in range(6)])
+    processar = importador._processar_lote
+    chamadas = []
+
+    def falhar_no_terceiro_lote(*args):
+        chamadas.append(1)
+        if len(chamadas) == 3:
+            raise RuntimeError("disco cheio")
+        return processar(*args)
+
+    monkeypatch.setattr(importador, '_processar_lote', falhar_no_terceiro_lote)
+    with pytest.raises(RuntimeError):
+        importador.importar_compras(csv, criar_produtos=True, tamanho_lote=2,
+                                    linhas_por_transacao=4)
+
+    # Os dois primeiros lotes foram confirmados juntos; o terceiro foi desfeito
+    assert contar_compras() == 4
+    eventos.barramento.despachar()
+    assert [evento.motivo for evento in recebidos] == ['importação de compras interrompida']
+
+
+def test_erro_sem_commit_nao_publica(banco, tmp_path, monkeypatch, recebidos):
+    csv = escrever_csv(tmp_path / 'compras.csv', ['Arroz;Mercado A;10,50;01/02/2024'])
+
+    def falhar(*args):
+        raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(importador, '_processar_lote', falhar)
+    with pytest.raises(RuntimeError):
+        importador.importar_compras(csv, criar_produtos=True)
+
+    assert contar_compras() == 0
+    eventos.barramento.despachar()
+    assert recebidos == []
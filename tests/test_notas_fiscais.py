@@ -0,0 +1,23 @@
+# tests/test_notas_fiscais.py
+from app import notas_fiscais
+from benchmarks.notas_fiscais import gerar_pasta
+
+
+def test_chave_sem_o_prefixo_nfe(tmp_path):
+    gerar_pasta(tmp_path, notas=2, itens_por_nota=3)
+    notas = [nota for caminho in sorted(tmp_path.glob('*.xml'))
+             for nota in notas_fiscais.ler_notas(caminho)]
+
+    assert len(notas) == 2
+    for nota in notas:
+        assert len(nota.chave) == 44 and nota.chave.isdigit()
+        assert len(nota.itens) == 3
+
+
+def test_reimportar_a_mesma_pasta_nao_duplica(banco, tmp_path):
+    gerar_pasta(tmp_path, notas=3, itens_por_nota=4)
+    primeira = notas_fiscais.importar_notas(tmp_path, processos=1)
+    segunda = notas_fiscais.importar_notas(tmp_path, processos=1)
+
+    assert (primeira.notas, primeira.itens) == (3, 12)
+    assert (segunda.notas, segunda.repetidas) == (0, 3)
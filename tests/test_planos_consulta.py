@@ -0,0 +1,22 @@
+# tests/test_planos_consulta.py
+"""As consultas da interface usam os índices esperados (EXPLAIN QUERY PLAN)"""
+import pytest
+
+from app import database
+from benchmarks.planos_consulta import CASOS
+
+
+@pytest.mark.parametrize('query, params, indice',
+                         [caso[1:] for caso in CASOS], ids=[caso[0] for caso in CASOS])
+def test_consulta_usa_o_indice(banco, query, params, indice):
+    plano = database.explicar_consulta(query, params)
+    assert any(indice in linha for linha in plano), plano
+    assert not any(linha.startswith('SCAN c') and 'INDEX' not in linha for linha in plano), plano
+
+
+def test_banco_migrado_ate_a_ultima_versao(banco):
+    conn = database.get_connection()
+    try:
+        assert database.versao_esquema(conn) == len(database.MIGRACOES)
+    finally:
+        conn.close()